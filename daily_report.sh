@@ -11,20 +11,21 @@ TIME=$(date +%H:%M)
 
 cd /home/ubuntu/LuckyNiuMaNote
 
-# 读取交易日志
-LOG_FILE="logs/trader.log"
-TRADE_FILE="logs/trades.jsonl"
+# 交易日志（logs/trades/ 按天分段 + 索引，只读昨天那一段）
+JOURNAL="trading-scripts/scripts/trade_journal.py"
 
-# 统计今日交易
+# 统计今日交易（每行一笔，已是 Markdown 表格行）
 today_trades=""
-if [ -f "$TRADE_FILE" ]; then
-    today_trades=$(grep "\"time\":\"$YESTERDAY" "$TRADE_FILE" 2>/dev/null || echo "")
+if [ -f "$JOURNAL" ]; then
+    today_trades=$(python3 "$JOURNAL" --date "$YESTERDAY" --markdown 2>/dev/null || echo "")
 fi
 
 # 获取当前持仓和账户信息
 ACCOUNT_INFO=$(curl -s http://localhost:3000/api/position 2>/dev/null || echo '{}')
 TOTAL_VALUE=$(echo "$ACCOUNT_INFO" | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('account',{}).get('totalValue',0))" 2>/dev/null || echo "97.98")
-PNL=$(echo "$ACCOUNT_INFO" | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('account',{}).get('totalPnl',0))" 2>/dev/null || echo "0")
+# 累计净盈亏取本地成交统计（realtime-data 服务每 30 秒增量同步一次），失败时退回接口返回值
+PNL=$(python3 trading-scripts/scripts/fill_sync.py --no-sync --json 2>/dev/null | python3 -c "import sys,json; print(round(json.load(sys.stdin)['totals']['net_pnl'], 2))" 2>/dev/null \
+    || echo "$ACCOUNT_INFO" | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('account',{}).get('totalPnl',0))" 2>/dev/null || echo "0")
 
 # 计算收益率
 INITIAL_CAPITAL=98
@@ -45,22 +46,9 @@ if [ -n "$today_trades" ]; then
     TRADE_COUNT=$(echo "$today_trades" | wc -l)
     TRADE_CONTENT="## 📝 今日交易 ($TRADE_COUNT 笔)
 
-| 时间 | 币种 | 方向 | 结果 |
-|------|------|------|------|
-"
-    # 解析交易记录
-    echo "$today_trades" | while read line; do
-        trade_time=$(echo "$line" | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('time','')[:19])" 2>/dev/null || echo "")
-        symbol=$(echo "$line" | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('signal',{}).get('symbol',''))" 2>/dev/null || echo "")
-        action=$(echo "$line" | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('signal',{}).get('action',''))" 2>/dev/null || echo "")
-        if [ -n "$symbol" ]; then
-            echo "| $trade_time | $symbol | $action | 已执行 |" >> /tmp/trade_table.txt
-        fi
-    done
-    if [ -f /tmp/trade_table.txt ]; then
-        TRADE_CONTENT="${TRADE_CONTENT}$(cat /tmp/trade_table.txt)"
-        rm -f /tmp/trade_table.txt
-    fi
+| 时间 | 策略 | 币种 | 方向 | 状态 |
+|------|------|------|------|------|
+${today_trades}"
 else
     TRADE_CONTENT="## 📝 今日交易
 
@@ -30,6 +30,23 @@ function isTraderProcessRunning(scriptFile) {
   return false;
 }
 
+// 多策略运行时（strategy_runtime.py --strategies a,b,c）托管的策略也算运行中
+function isHostedByRuntime(traderId) {
+  const r = spawnSync('pgrep', ['-f', 'strategy_runtime.py'], { encoding: 'utf8' });
+  if (r.status !== 0) return false;
+  const pids = r.stdout.trim().split('\n').filter(Boolean);
+  for (const pid of pids) {
+    try {
+      const args = fs.readFileSync(`/proc/${pid}/cmdline`, 'utf8').split('\0');
+      if (!args.some(a => a.includes('strategy_runtime.py'))) continue;
+      const idx = args.indexOf('--strategies');
+      const value = idx >= 0 ? (args[idx + 1] || '') : 'nfi,boll_macd,supertrend,adx';
+      if (value === 'all' || value.split(',').includes(traderId)) return true;
+    } catch (_) {}
+  }
+  return false;
+}
+
 function firstTraderPidForScript(scriptFile) {
   const r = spawnSync('pgrep', ['-f', scriptFile], { encoding: 'utf8' });
   if (r.status !== 0) return null;
@@ -43,6 +60,47 @@ function firstTraderPidForScript(scriptFile) {
   return null;
 }
 
+// 机器人每轮写入的状态板（trading-scripts/scripts/status_board.py），读取是一次小文件读
+const STATUS_DIR = path.join(__dirname, 'memory', 'trading', 'status');
+const STATUS_STALE_MS = 5 * 60 * 1000;
+const LOG_TAIL_BYTES = 64 * 1024;
+
+function isPidAlive(pid) {
+  if (!pid) return false;
+  try {
+    process.kill(pid, 0);
+    return true;
+  } catch (e) {
+    return e.code === 'EPERM';
+  }
+}
+
+function readStatusBoard(traderId) {
+  try {
+    const board = JSON.parse(fs.readFileSync(path.join(STATUS_DIR, `${traderId}.json`), 'utf8'));
+    board.running = Date.now() - board.updated_at * 1000 < STATUS_STALE_MS && isPidAlive(board.pid);
+    return board;
+  } catch (_) {
+    return null;  // 旧版本机器人没有状态板，退回读日志
+  }
+}
+
+/** 只读日志末尾一段，日志再大也不整份读进内存 */
+function readLogTail(logPath, bytes = LOG_TAIL_BYTES) {
+  const fd = fs.openSync(logPath, 'r');
+  try {
+    const size = fs.fstatSync(fd).size;
+    const start = Math.max(0, size - bytes);
+    const buf = Buffer.alloc(size - start);
+    fs.readSync(fd, buf, 0, buf.length, start);
+    const lines = buf.toString('utf8').split('\n').filter(line => line.trim());
+    if (start > 0) lines.shift();  // 第一行可能被截断
+    return lines;
+  } finally {
+    fs.closeSync(fd);
+  }
+}
+
 // 调用 Hyperliquid API
 function hlRequest(body) {
   return new Promise((resolve, reject) => {
@@ -87,14 +145,38 @@ app.get(['/', '/strategy', '/learn', '/chart', '/entry/:slug'], (req, res) => {
 app.get('/api/trader-status', (req, res) => {
   try {
     // 读取交易机器人日志获取最新状态
+    const board = readStatusBoard('nfi');
+    if (board) {
+      // 与 ps -o etime 相同的 [D-]HH:MM:SS 格式
+      const sec = Math.floor(Date.now() / 1000 - board.started_at);
+      const pad = n => String(n).padStart(2, '0');
+      const days = Math.floor(sec / 86400);
+      const etime = `${days ? days + '-' : ''}${pad(Math.floor(sec % 86400 / 3600))}:${pad(Math.floor(sec % 3600 / 60))}:${pad(sec % 60)}`;
+      return res.json({
+        success: true,
+        timestamp: Date.now(),
+        status: board.running ? 'running' : 'offline',
+        uptime: board.running ? etime : 'unknown',
+        strategy: 'NFI (NostalgiaForInfinity)',
+        config: {
+          tradeSide: { BTC: 'short_only', ETH: 'both' },
+          checkInterval: '60s',
+          cooldown: '4h'
+        },
+        lastSignals: board.signals || {},
+        lastCycle: board.last_cycle,
+        errorCount: board.error_count,
+        recentLogs: (board.events || []).slice(-5)
+      });
+    }
+
     const logPath = path.join(__dirname, 'logs', 'trader_nfi.log');
     let lastLines = [];
     let status = 'unknown';
     let lastSignal = {};
     
     if (fs.existsSync(logPath)) {
-      const logContent = fs.readFileSync(logPath, 'utf-8');
-      const lines = logContent.split('\n').filter(line => line.trim());
+      const lines = readLogTail(logPath);
       lastLines = lines.slice(-20); // 最后20行
       
       // 解析最新状态
@@ -154,17 +236,29 @@ app.get('/api/traders-status', (req, res) => {
     ];
 
     const results = traders.map(trader => {
+      const board = readStatusBoard(trader.id);
+      if (board) {
+        return {
+          id: trader.id, name: trader.name, description: trader.description,
+          status: board.running ? 'running' : 'offline',
+          lastSignal: board.signals || {},
+          lastActive: Math.round(board.updated_at * 1000),
+          lastCycle: board.last_cycle,
+          errorCount: board.error_count,
+          recentLogs: (board.events || []).slice(-3)
+        };
+      }
+
       const logPath = path.join(__dirname, 'logs', trader.logFile);
       let lastSignal = {};
       let lastLines = [];
       let lastActive = null;
 
-      const status = isTraderProcessRunning(trader.script) ? 'running' : 'offline';
+      const status = (isTraderProcessRunning(trader.script) || isHostedByRuntime(trader.id)) ? 'running' : 'offline';
 
       if (fs.existsSync(logPath)) {
         lastActive = fs.statSync(logPath).mtime.getTime();
-        const logContent = fs.readFileSync(logPath, 'utf-8');
-        const lines = logContent.split('\n').filter(line => line.trim());
+        const lines = readLogTail(logPath);
         lastLines = lines.slice(-10);
 
         for (let i = lines.length - 1; i >= Math.max(0, lines.length - 50); i--) {
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 import requests
 
+from backtest_cache import cached
+
 HL_API = "https://api.hyperliquid.xyz/info"
 
 def hl_request(body: dict) -> dict:
@@ -93,17 +95,29 @@ PARAMS = {
     "take_profit_atr": 3.0,
 }
 
-def backtest_adx(candles: list, symbol: str) -> dict:
+# 参数扫描空间 (param_sweep.py)
+PARAM_SPACE = {
+    "adx_strong": [20, 22, 25, 28, 30],
+    "ema_fast": [10, 15, 20, 25, 30],
+    "ema_slow": [30, 50],
+    "stop_loss_atr": [1.5, 2.0, 2.5],
+    "take_profit_atr": [2.0, 3.0, 4.0],
+}
+INDICATOR_PARAMS = ["adx_period", "ema_fast", "ema_slow"]
+
+def backtest_adx(candles: list, symbol: str, params: dict = None, cache: dict = None) -> dict:
+    """params 为空时使用 PARAMS；cache 用于同一份K线多组参数间复用指标"""
     if len(candles) < 50: return {"error": "数据不足"}
+    p = params or PARAMS
     
-    c = [float(x["c"]) for x in candles]
-    h = [float(x["h"]) for x in candles]
-    l = [float(x["l"]) for x in candles]
+    c = cached(cache, ("c",), lambda: [float(x["c"]) for x in candles])
+    h = cached(cache, ("h",), lambda: [float(x["h"]) for x in candles])
+    l = cached(cache, ("l",), lambda: [float(x["l"]) for x in candles])
     
-    adx_vals, plus_di, minus_di = adx_calc(h, l, c, PARAMS["adx_period"])
-    ema_fast = ema(c, PARAMS["ema_fast"])
-    ema_slow = ema(c, PARAMS["ema_slow"])
-    atr_vals = atr(h, l, c)
+    adx_vals, plus_di, minus_di = cached(cache, ("adx", p["adx_period"]), adx_calc, h, l, c, p["adx_period"])
+    ema_fast = cached(cache, ("ema", p["ema_fast"]), ema, c, p["ema_fast"])
+    ema_slow = cached(cache, ("ema", p["ema_slow"]), ema, c, p["ema_slow"])
+    atr_vals = cached(cache, ("atr", 14), atr, h, l, c)
     
     capital = 1000
     leverage = 2
@@ -117,8 +131,8 @@ def backtest_adx(candles: list, symbol: str) -> dict:
     for i in range(30, len(c)-1):
         price = c[i]
         
-        adx_strong = adx_vals[i] > PARAMS["adx_strong"]
-        adx_weak = adx_vals[i] < PARAMS["adx_weak"]
+        adx_strong = adx_vals[i] > p["adx_strong"]
+        adx_weak = adx_vals[i] < p["adx_weak"]
         
         di_bullish = plus_di[i] > minus_di[i]
         di_bearish = minus_di[i] > plus_di[i]
@@ -150,12 +164,12 @@ def backtest_adx(candles: list, symbol: str) -> dict:
             
             if di_bullish and ema_bullish:
                 pos = {"type": "LONG", "entry": price,
-                       "sl": price - PARAMS["stop_loss_atr"] * atr_val,
-                       "tp": price + PARAMS["take_profit_atr"] * atr_val}
+                       "sl": price - p["stop_loss_atr"] * atr_val,
+                       "tp": price + p["take_profit_atr"] * atr_val}
             elif di_bearish and ema_bearish:
                 pos = {"type": "SHORT", "entry": price,
-                       "sl": price + PARAMS["stop_loss_atr"] * atr_val,
-                       "tp": price - PARAMS["take_profit_atr"] * atr_val}
+                       "sl": price + p["stop_loss_atr"] * atr_val,
+                       "tp": price - p["take_profit_atr"] * atr_val}
     
     # 计算指标
     if not trades: return {"error": "无交易"}
@@ -183,13 +197,11 @@ def backtest_adx(candles: list, symbol: str) -> dict:
 
 def parameter_test(candles: list, param_name: str, values: list) -> list:
     results = []
+    cache = {}
     for val in values:
-        old_val = PARAMS[param_name]
-        PARAMS[param_name] = val
-        result = backtest_adx(candles, "TEST")
+        result = backtest_adx(candles, "TEST", {**PARAMS, param_name: val}, cache)
         result["param"] = val
         results.append(result)
-        PARAMS[param_name] = old_val
     return results
 
 def run():
@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 import requests
 
+from backtest_cache import cached
+
 HL_API = "https://api.hyperliquid.xyz/info"
 
 def hl_request(body: dict) -> dict:
@@ -72,6 +74,16 @@ PARAMS = {
     "stop_loss_atr": 2.0,        # 2倍ATR止损(防止趋势延续)
 }
 
+# 参数扫描空间 (param_sweep.py)
+PARAM_SPACE = {
+    "bb_period": [15, 20, 25],
+    "bb_stddev": [1.5, 2.0, 2.5],
+    "exit_threshold": [0.002, 0.005, 0.01, 0.3],
+    "max_bandwidth_pct": [0.03, 0.05, 0.08],
+    "stop_loss_atr": [1.5, 2.0, 3.0],
+}
+INDICATOR_PARAMS = ["bb_period", "bb_stddev"]
+
 def adx_simple(highs: list, lows: list, closes: list) -> float:
     """简化ADX估算"""
     p = 14
@@ -84,15 +96,23 @@ def adx_simple(highs: list, lows: list, closes: list) -> float:
     price_range = max(closes[-p:]) - min(closes[-p:])
     return min(50, (price_range / atr) * 10) if atr > 0 else 20
 
-def backtest_bb_mean_reversion(candles: list, symbol: str) -> dict:
+def adx_simple_series(highs: list, lows: list, closes: list) -> list:
+    """逐根K线的 adx_simple，与参数无关，回测中整体计算一次"""
+    return [adx_simple(highs[:i+1], lows[:i+1], closes[:i+1]) for i in range(len(closes))]
+
+def backtest_bb_mean_reversion(candles: list, symbol: str, params: dict = None, cache: dict = None) -> dict:
+    """params 为空时使用 PARAMS；cache 用于同一份K线多组参数间复用指标"""
     if len(candles) < 50: return {"error": "数据不足"}
+    p = params or PARAMS
     
-    c = [float(x["c"]) for x in candles]
-    h = [float(x["h"]) for x in candles]
-    l = [float(x["l"]) for x in candles]
+    c = cached(cache, ("c",), lambda: [float(x["c"]) for x in candles])
+    h = cached(cache, ("h",), lambda: [float(x["h"]) for x in candles])
+    l = cached(cache, ("l",), lambda: [float(x["l"]) for x in candles])
     
-    bb_mid, bb_upper, bb_lower = bb(c, PARAMS["bb_period"], PARAMS["bb_stddev"])
-    atr_vals = atr(h, l, c)
+    bb_mid, bb_upper, bb_lower = cached(cache, ("bb", p["bb_period"], p["bb_stddev"]),
+                                        bb, c, p["bb_period"], p["bb_stddev"])
+    atr_vals = cached(cache, ("atr", 14), atr, h, l, c)
+    adx_vals = cached(cache, ("adx_simple",), adx_simple_series, h, l, c)
     
     capital = 1000
     leverage = 2
@@ -112,12 +132,12 @@ def backtest_bb_mean_reversion(candles: list, symbol: str) -> dict:
         bandwidth = (upper - lower) / mid if mid > 0 else 0
         
         # 趋势过滤
-        adx_val = adx_simple(h[:i+1], l[:i+1], c[:i+1])
-        is_ranging = bandwidth <= PARAMS["max_bandwidth_pct"] and bandwidth >= PARAMS["min_bandwidth_pct"]
+        adx_val = adx_vals[i]
+        is_ranging = bandwidth <= p["max_bandwidth_pct"] and bandwidth >= p["min_bandwidth_pct"]
         
         # 检查平仓
         if pos:
-            near_mid = abs(price - mid) / mid < PARAMS["exit_threshold"]
+            near_mid = abs(price - mid) / mid < p["exit_threshold"]
             stop_hit = (pos["type"] == "LONG" and price <= pos["sl"]) or (pos["type"] == "SHORT" and price >= pos["sl"])
             
             if near_mid or stop_hit:
@@ -133,18 +153,18 @@ def backtest_bb_mean_reversion(candles: list, symbol: str) -> dict:
         
         # 开新仓 (只在震荡市)
         if not pos and is_ranging and adx_val < 25:
-            touch_lower = price <= lower * (1 + PARAMS["entry_threshold"] - 1)
-            touch_upper = price >= upper * (1 - PARAMS["entry_threshold"] + 1)
-            near_mid = abs(price - mid) / mid < PARAMS["exit_threshold"]
+            touch_lower = price <= lower * (1 + p["entry_threshold"] - 1)
+            touch_upper = price >= upper * (1 - p["entry_threshold"] + 1)
+            near_mid = abs(price - mid) / mid < p["exit_threshold"]
             
             atr_val = atr_vals[i] if atr_vals[i] > 0 else price * 0.01
             
             if touch_lower and not near_mid:
                 pos = {"type": "LONG", "entry": price,
-                       "sl": price - PARAMS["stop_loss_atr"] * atr_val}
+                       "sl": price - p["stop_loss_atr"] * atr_val}
             elif touch_upper and not near_mid:
                 pos = {"type": "SHORT", "entry": price,
-                       "sl": price + PARAMS["stop_loss_atr"] * atr_val}
+                       "sl": price + p["stop_loss_atr"] * atr_val}
     
     # 计算指标
     if not trades: return {"error": "无交易"}
@@ -13,6 +13,8 @@ from typing import Dict, List, Tuple
 import requests
 import math
 
+from backtest_cache import cached
+
 # 配置
 CONFIG = {
     "symbols": ["BTC", "ETH"],
@@ -36,6 +38,15 @@ DEFAULT_PARAMS = {
     "take_profit_atr": 3.0,  # 止盈：3倍ATR
 }
 
+# 参数扫描空间 (param_sweep.py)
+# backtest() 只在信号反转时平仓，stop_loss_atr / take_profit_atr 不影响结果，不参与扫描
+PARAM_SPACE = {
+    "bb_period": [10, 15, 20, 25, 30],
+    "bb_stddev": [1.5, 2.0, 2.5],
+    "macd_fast": [8, 10, 12, 14, 16],
+}
+INDICATOR_PARAMS = ["bb_period", "bb_stddev", "macd_fast", "macd_slow", "macd_signal", "min_bandwidth_expansion"]
+
 # Hyperliquid API
 HL_API = "https://api.hyperliquid.xyz/info"
 
@@ -65,6 +76,10 @@ def get_historical_candles(symbol: str, timeframe: str, start_time: int, end_tim
         print(f"获取数据失败 {symbol}: {e}")
         return []
 
+def get_candles(symbol: str, start_time: int, end_time: int) -> List[dict]:
+    """1小时K线（与其他回测脚本接口一致，供 param_sweep.py 使用）"""
+    return get_historical_candles(symbol, CONFIG["timeframe"], start_time, end_time)
+
 def sma(values: List[float], period: int) -> List[float]:
     if not values:
         return []
@@ -142,25 +157,27 @@ def calculate_atr(highs: List[float], lows: List[float], closes: List[float], pe
     
     return atr
 
-def generate_signals(candles: List[dict], params: dict) -> List[dict]:
-    """生成交易信号"""
+def generate_signals(candles: List[dict], params: dict, cache: dict = None) -> List[dict]:
+    """生成交易信号（cache 用于同一份K线多组参数间复用指标）"""
     if len(candles) < 50:
         return []
     
-    closes = [float(c["c"]) for c in candles]
-    highs = [float(c["h"]) for c in candles]
-    lows = [float(c["l"]) for c in candles]
+    closes = cached(cache, ("c",), lambda: [float(c["c"]) for c in candles])
+    highs = cached(cache, ("h",), lambda: [float(c["h"]) for c in candles])
+    lows = cached(cache, ("l",), lambda: [float(c["l"]) for c in candles])
     
     # 计算指标
-    bb_mid, bb_upper, bb_lower = bollinger_bands(
-        closes, params["bb_period"], params["bb_stddev"]
+    bb_mid, bb_upper, bb_lower = cached(
+        cache, ("bb", params["bb_period"], params["bb_stddev"]),
+        bollinger_bands, closes, params["bb_period"], params["bb_stddev"]
     )
     
-    macd_line, signal_line, histogram = macd_calc(
-        closes, params["macd_fast"], params["macd_slow"], params["macd_signal"]
+    macd_line, signal_line, histogram = cached(
+        cache, ("macd", params["macd_fast"], params["macd_slow"], params["macd_signal"]),
+        macd_calc, closes, params["macd_fast"], params["macd_slow"], params["macd_signal"]
     )
     
-    atr = calculate_atr(highs, lows, closes)
+    atr = cached(cache, ("atr", 14), calculate_atr, highs, lows, closes)
     
     # 计算带宽
     bandwidths = []
@@ -210,15 +227,12 @@ def generate_signals(candles: List[dict], params: dict) -> List[dict]:
     
     return signals
 
-def backtest(candles: List[dict], signals: List[dict], params: dict) -> dict:
+def backtest(candles: List[dict], signals: List[dict], params: dict, cache: dict = None) -> dict:
     """执行回测"""
     if not signals or not candles:
         return {"error": "无数据"}
     
-    closes = [float(c["c"]) for c in candles]
-    highs = [float(c["h"]) for c in candles]
-    lows = [float(c["l"]) for c in candles]
-    atr_values = calculate_atr(highs, lows, closes)
+    closes = cached(cache, ("c",), lambda: [float(c["c"]) for c in candles])
     
     capital = CONFIG["initial_capital"]
     position = None  # 当前持仓
@@ -377,15 +391,21 @@ def calculate_metrics(trades: List[dict], equity_curve: List[tuple], final_capit
         "trades": trades[:10],  # 只保留前10笔交易详情
     }
 
+def run_with_params(candles: List[dict], symbol: str, params: dict, cache: dict = None) -> dict:
+    """信号 + 回测一步完成；信号只取决于指标参数，按指标参数缓存"""
+    signal_key = ("signals",) + tuple(params[k] for k in INDICATOR_PARAMS)
+    signals = cached(cache, signal_key, generate_signals, candles, params, cache)
+    return backtest(candles, signals, params, cache)
+
 def parameter_sensitivity_analysis(candles: List[dict], param_name: str, param_values: List[float], base_params: dict) -> List[dict]:
     """参数敏感性分析"""
     results = []
+    cache = {}
     for val in param_values:
         test_params = base_params.copy()
         test_params[param_name] = val
         
-        signals = generate_signals(candles, test_params)
-        result = backtest(candles, signals, test_params)
+        result = run_with_params(candles, "TEST", test_params, cache)
         result["param_name"] = param_name
         result["param_value"] = val
         results.append(result)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+回测指标缓存 — 各 backtest_*.py 和 param_sweep.py 共用
+
+同一份K线上指标参数相同的组合只算一次指标；cache 由调用方（param_sweep 的每批任务）持有，
+单独跑回测时传 None，直接计算
+"""
+
+from typing import Callable, Optional, Tuple
+
+# 单个进程内指标缓存的上限（条目数），超过后清空，避免大网格撑爆内存
+MAX_CACHE_ENTRIES = 512
+
+
+def cached(cache: Optional[dict], key: Tuple, fn: Callable, *args):
+    """按 key 缓存指标计算结果；cache 为 None 时直接计算。
+
+    一个 cache 只能绑定同一份 K 线使用，key 必须包含所有影响结果的参数。
+    """
+    if cache is None:
+        return fn(*args)
+    if key not in cache:
+        if len(cache) >= MAX_CACHE_ENTRIES:
+            cache.clear()
+        cache[key] = fn(*args)
+    return cache[key]
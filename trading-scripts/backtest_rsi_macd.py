@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 import requests
 
+from backtest_cache import cached
+
 HL_API = "https://api.hyperliquid.xyz/info"
 
 def hl_request(body: dict) -> dict:
@@ -87,16 +89,29 @@ PARAMS = {
     "take_profit_atr": 3.0,
 }
 
-def backtest(candles: list, symbol: str) -> dict:
+# 参数扫描空间 (param_sweep.py)
+PARAM_SPACE = {
+    "rsi_oversold": [20, 25, 30, 35, 40],
+    "rsi_overbought": [60, 65, 70, 75, 80],
+    "macd_fast": [8, 10, 12, 14, 16],
+    "stop_loss_atr": [1.5, 2.0, 2.5],
+    "take_profit_atr": [2.0, 3.0, 4.0],
+}
+INDICATOR_PARAMS = ["rsi_period", "macd_fast", "macd_slow", "macd_signal"]
+
+def backtest(candles: list, symbol: str, params: dict = None, cache: dict = None) -> dict:
+    """params 为空时使用 PARAMS；cache 用于同一份K线多组参数间复用指标"""
     if len(candles) < 50: return {"error": "数据不足"}
+    p = params or PARAMS
     
-    c = [float(x["c"]) for x in candles]
-    h = [float(x["h"]) for x in candles]
-    l = [float(x["l"]) for x in candles]
+    c = cached(cache, ("c",), lambda: [float(x["c"]) for x in candles])
+    h = cached(cache, ("h",), lambda: [float(x["h"]) for x in candles])
+    l = cached(cache, ("l",), lambda: [float(x["l"]) for x in candles])
     
-    rsi_vals = rsi_wilder(c, PARAMS["rsi_period"])
-    macd_line, macd_sig = macd(c, PARAMS["macd_fast"], PARAMS["macd_slow"], PARAMS["macd_signal"])
-    atr_vals = atr(h, l, c)
+    rsi_vals = cached(cache, ("rsi", p["rsi_period"]), rsi_wilder, c, p["rsi_period"])
+    macd_line, macd_sig = cached(cache, ("macd", p["macd_fast"], p["macd_slow"], p["macd_signal"]),
+                                 macd, c, p["macd_fast"], p["macd_slow"], p["macd_signal"])
+    atr_vals = cached(cache, ("atr", 14), atr, h, l, c)
     
     capital = 1000
     leverage = 2
@@ -132,8 +147,8 @@ def backtest(candles: list, symbol: str) -> dict:
             prev_rsi = rsi_vals[i-1]
             
             # RSI信号
-            rsi_oversold = rsi < PARAMS["rsi_oversold"]
-            rsi_overbought = rsi > PARAMS["rsi_overbought"]
+            rsi_oversold = rsi < p["rsi_oversold"]
+            rsi_overbought = rsi > p["rsi_overbought"]
             rsi_turning_up = prev_rsi < rsi
             rsi_turning_down = prev_rsi > rsi
             
@@ -151,12 +166,12 @@ def backtest(candles: list, symbol: str) -> dict:
             
             if long_signal:
                 pos = {"type": "LONG", "entry": price, "atr": atr_val,
-                       "sl": price - PARAMS["stop_loss_atr"] * atr_val,
-                       "tp": price + PARAMS["take_profit_atr"] * atr_val}
+                       "sl": price - p["stop_loss_atr"] * atr_val,
+                       "tp": price + p["take_profit_atr"] * atr_val}
             elif short_signal:
                 pos = {"type": "SHORT", "entry": price, "atr": atr_val,
-                       "sl": price + PARAMS["stop_loss_atr"] * atr_val,
-                       "tp": price - PARAMS["take_profit_atr"] * atr_val}
+                       "sl": price + p["stop_loss_atr"] * atr_val,
+                       "tp": price - p["take_profit_atr"] * atr_val}
     
     # 计算指标
     if not trades: return {"error": "无交易"}
@@ -185,13 +200,11 @@ def backtest(candles: list, symbol: str) -> dict:
 def parameter_test(candles: list, param_name: str, values: list) -> list:
     """参数敏感性测试"""
     results = []
+    cache = {}
     for val in values:
-        old_val = PARAMS[param_name]
-        PARAMS[param_name] = val
-        result = backtest(candles, "TEST")
+        result = backtest(candles, "TEST", {**PARAMS, param_name: val}, cache)
         result["param"] = val
         results.append(result)
-        PARAMS[param_name] = old_val
     return results
 
 def run():
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 import requests
 
+from backtest_cache import cached
+
 HL_API = "https://api.hyperliquid.xyz/info"
 
 def hl_request(body: dict) -> dict:
@@ -92,14 +94,25 @@ PARAMS = {
     "stop_loss_pct": 0.02,  # 2%止损
 }
 
-def backtest_supertrend(candles: list, symbol: str) -> dict:
+# 参数扫描空间 (param_sweep.py)
+PARAM_SPACE = {
+    "atr_period": [7, 10, 14, 21],
+    "atr_multiplier": [2.0, 2.5, 3.0, 3.5, 4.0],
+    "stop_loss_pct": [0.01, 0.02, 0.03, 0.05],
+}
+INDICATOR_PARAMS = ["atr_period", "atr_multiplier"]
+
+def backtest_supertrend(candles: list, symbol: str, params: dict = None, cache: dict = None) -> dict:
+    """params 为空时使用 PARAMS；cache 用于同一份K线多组参数间复用指标"""
     if len(candles) < 50: return {"error": "数据不足"}
+    p = params or PARAMS
     
-    c = [float(x["c"]) for x in candles]
-    h = [float(x["h"]) for x in candles]
-    l = [float(x["l"]) for x in candles]
+    c = cached(cache, ("c",), lambda: [float(x["c"]) for x in candles])
+    h = cached(cache, ("h",), lambda: [float(x["h"]) for x in candles])
+    l = cached(cache, ("l",), lambda: [float(x["l"]) for x in candles])
     
-    st, trend, upper, lower = supertrend(h, l, c, PARAMS["atr_period"], PARAMS["atr_multiplier"])
+    st, trend, upper, lower = cached(cache, ("supertrend", p["atr_period"], p["atr_multiplier"]),
+                                     supertrend, h, l, c, p["atr_period"], p["atr_multiplier"])
     
     capital = 1000
     leverage = 2
@@ -137,13 +150,13 @@ def backtest_supertrend(candles: list, symbol: str) -> dict:
                 pos = {
                     "type": "LONG", 
                     "entry": price,
-                    "sl": price * (1 - PARAMS["stop_loss_pct"])
+                    "sl": price * (1 - p["stop_loss_pct"])
                 }
             elif trend[i] == -1 and trend[i-1] == 1:  # 多头转空头
                 pos = {
                     "type": "SHORT", 
                     "entry": price,
-                    "sl": price * (1 + PARAMS["stop_loss_pct"])
+                    "sl": price * (1 + p["stop_loss_pct"])
                 }
     
     # 计算指标
@@ -172,13 +185,11 @@ def backtest_supertrend(candles: list, symbol: str) -> dict:
 
 def parameter_test(candles: list, param_name: str, values: list) -> list:
     results = []
+    cache = {}
     for val in values:
-        old_val = PARAMS[param_name]
-        PARAMS[param_name] = val
-        result = backtest_supertrend(candles, "TEST")
+        result = backtest_supertrend(candles, "TEST", {**PARAMS, param_name: val}, cache)
         result["param"] = val
         results.append(result)
-        PARAMS[param_name] = old_val
     return results
 
 def run():
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 import requests
 
+from backtest_cache import cached
+
 HL_API = "https://api.hyperliquid.xyz/info"
 
 def hl_request(body: dict) -> dict:
@@ -67,17 +69,29 @@ PARAMS = {
     "take_profit_atr": 2.5,
 }
 
-def backtest_vwap(candles: list, symbol: str) -> dict:
+# 参数扫描空间 (param_sweep.py)
+PARAM_SPACE = {
+    "vwap_period": [12, 18, 24, 30, 36],
+    "breakout_threshold": [0.001, 0.002, 0.003, 0.005, 0.01],
+    "min_volume_ratio": [1.0, 1.2, 1.5, 2.0],
+    "stop_loss_atr": [1.0, 1.5, 2.0],
+    "take_profit_atr": [2.0, 2.5, 3.0],
+}
+INDICATOR_PARAMS = ["vwap_period"]
+
+def backtest_vwap(candles: list, symbol: str, params: dict = None, cache: dict = None) -> dict:
+    """params 为空时使用 PARAMS；cache 用于同一份K线多组参数间复用指标"""
     if len(candles) < 50: return {"error": "数据不足"}
+    p = params or PARAMS
     
-    c = [float(x["c"]) for x in candles]
-    h = [float(x["h"]) for x in candles]
-    l = [float(x["l"]) for x in candles]
-    v = [float(x["v"]) for x in candles]
+    c = cached(cache, ("c",), lambda: [float(x["c"]) for x in candles])
+    h = cached(cache, ("h",), lambda: [float(x["h"]) for x in candles])
+    l = cached(cache, ("l",), lambda: [float(x["l"]) for x in candles])
+    v = cached(cache, ("v",), lambda: [float(x["v"]) for x in candles])
     
-    vwap = calculate_vwap(c, v, PARAMS["vwap_period"])
-    vol_sma = sma(v, 20)
-    atr_vals = atr(h, l, c)
+    vwap = cached(cache, ("vwap", p["vwap_period"]), calculate_vwap, c, v, p["vwap_period"])
+    vol_sma = cached(cache, ("vol_sma", 20), sma, v, 20)
+    atr_vals = cached(cache, ("atr", 14), atr, h, l, c)
     
     capital = 1000
     leverage = 2
@@ -114,13 +128,13 @@ def backtest_vwap(candles: list, symbol: str) -> dict:
             prev_vwap = vwap[i-1]
             
             # 突破检测
-            price_above = price > current_vwap * (1 + PARAMS["breakout_threshold"])
-            price_below = price < current_vwap * (1 - PARAMS["breakout_threshold"])
+            price_above = price > current_vwap * (1 + p["breakout_threshold"])
+            price_below = price < current_vwap * (1 - p["breakout_threshold"])
             cross_up = prev_price <= prev_vwap and price > current_vwap
             cross_down = prev_price >= prev_vwap and price < current_vwap
             
             # 成交量确认
-            volume_ok = v[i] > vol_sma[i] * PARAMS["min_volume_ratio"] if vol_sma[i] > 0 else False
+            volume_ok = v[i] > vol_sma[i] * p["min_volume_ratio"] if vol_sma[i] > 0 else False
             
             # 信号
             long_signal = cross_up and price_above and volume_ok
@@ -135,12 +149,12 @@ def backtest_vwap(candles: list, symbol: str) -> dict:
             
             if long_signal:
                 pos = {"type": "LONG", "entry": price, "atr": atr_val,
-                       "sl": price - PARAMS["stop_loss_atr"] * atr_val,
-                       "tp": price + PARAMS["take_profit_atr"] * atr_val}
+                       "sl": price - p["stop_loss_atr"] * atr_val,
+                       "tp": price + p["take_profit_atr"] * atr_val}
             elif short_signal:
                 pos = {"type": "SHORT", "entry": price, "atr": atr_val,
-                       "sl": price + PARAMS["stop_loss_atr"] * atr_val,
-                       "tp": price - PARAMS["take_profit_atr"] * atr_val}
+                       "sl": price + p["stop_loss_atr"] * atr_val,
+                       "tp": price - p["take_profit_atr"] * atr_val}
     
     # 计算指标
     if not trades: return {"error": "无交易"}
@@ -168,13 +182,11 @@ def backtest_vwap(candles: list, symbol: str) -> dict:
 
 def parameter_test_vwap(candles: list, param_name: str, values: list) -> list:
     results = []
+    cache = {}
     for val in values:
-        old_val = PARAMS[param_name]
-        PARAMS[param_name] = val
-        result = backtest_vwap(candles, "TEST")
+        result = backtest_vwap(candles, "TEST", {**PARAMS, param_name: val}, cache)
         result["param"] = val
         results.append(result)
-        PARAMS[param_name] = old_val
     return results
 
 def run():
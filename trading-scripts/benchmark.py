@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+性能基准 — 指标、回测、参数优化的耗时，带历史记录和回退检查
+
+- indicators: 每个指标的各份实现（机器人和回测脚本里各有副本）在 1k / 10k / 100k / 1M 根K线上的耗时
+- backtest: 每个 backtest_*.py 策略（以及 test/ 下的 NFI / auto_trader 回测）每秒处理的K线数
+- optimizer: param_sweep 和 test/optimize*.py 的 scan_configs 每秒跑的参数组数
+- analysis: 多策略运行时里各机器人每根K线的分析函数（最近 100 根，指标走共享的指标图），逐个和合在一起每秒处理的K线数；
+  合在一起比逐个相加快的部分就是跨策略共用的指标
+- 行情是固定 seed 的合成K线（synthetic_market），不联网，每次结果可比
+- 每项重复运行取最快一次；按上一档规模推算超过 --max-seconds 的项跳过（O(n·period) 的实现在 1M 上很慢）
+- 结果追加到 benchmarks/history.json（带 git 提交、机器名、Python 版本）；compare 对比两次记录，
+  任一项变慢超过阈值时退出码 1，可以放进提交前检查；只和同一台机器的记录比，虚拟机上波动大时调大 --threshold
+
+用法:
+  python benchmark.py run                                   # 全部跑一遍并写入历史
+  python benchmark.py run --only indicators --sizes 1000,10000 --no-save
+  python benchmark.py run --check --label after-ema-fix     # 跑完和同一台机器上一次记录对比，变慢就退出 1
+  python benchmark.py compare                               # 最近两次记录对比
+  python benchmark.py compare --base before-ema-fix --threshold 0.1
+  python benchmark.py history
+"""
+
+import argparse
+import contextlib
+import gc
+import importlib
+import io
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "test"))
+
+HISTORY_PATH = ROOT / "benchmarks" / "history.json"
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+SUITES = ("indicators", "backtest", "optimizer", "analysis")
+# 变慢超过 20% 算回退；比这更快的项（秒）计时噪声太大，不参与比较
+DEFAULT_THRESHOLD = 0.2
+NOISE_FLOOR = 0.001
+# 每项至少累计运行这么久（秒）再取最快一次，最多重复 MAX_REPEAT 次
+MIN_TIME = 0.3
+MAX_REPEAT = 50
+SEED = 42
+INTERVAL_MS = 3_600_000
+
+# 指标 -> 各份实现 (模块, 函数)
+INDICATORS: Dict[str, List[Tuple[str, str]]] = {
+    "ema": [
+        ("indicator_graph", "ema"),
+        ("backtest_adx", "ema"),
+    ],
+    "rolling_std": [
+        ("indicator_graph", "rolling_std"),
+        ("backtest_boll_macd", "rolling_std"),
+    ],
+    "atr": [
+        ("indicator_graph", "calculate_atr"),
+        ("trader_04_supertrend", "calculate_atr"),
+        ("auto_trader_nostalgia_for_infinity", "atr_wilder"),
+        ("backtest_adx", "atr"),
+        ("backtest_supertrend", "atr"),
+    ],
+    "rsi_wilder": [
+        ("trader_02_rsi_macd", "rsi_wilder"),
+        ("auto_trader_nostalgia_for_infinity", "rsi_wilder"),
+        ("backtest_rsi_macd", "rsi_wilder"),
+    ],
+    "calculate_adx": [
+        ("trader_05_adx", "calculate_adx"),
+        ("trader_01_boll_macd_v2", "calculate_adx"),
+        ("backtest_boll_macd_v2", "calculate_adx"),
+        ("backtest_adx", "adx_calc"),
+    ],
+    "supertrend": [
+        ("trader_04_supertrend", "calculate_supertrend"),
+        ("backtest_supertrend", "supertrend"),
+    ],
+    "calculate_vwap": [
+        ("trader_03_vwap", "calculate_vwap"),
+        ("backtest_vwap", "calculate_vwap"),
+    ],
+}
+
+# 指标 -> 参数（用各策略的默认周期）
+INDICATOR_ARGS: Dict[str, Callable[[Dict[str, List[float]]], tuple]] = {
+    "ema": lambda s: (s["c"], 21),
+    "rolling_std": lambda s: (s["c"], 20),
+    "atr": lambda s: (s["h"], s["l"], s["c"], 14),
+    "rsi_wilder": lambda s: (s["c"], 14),
+    "calculate_adx": lambda s: (s["h"], s["l"], s["c"], 14),
+    "supertrend": lambda s: (s["h"], s["l"], s["c"], 10, 3.0),
+    "calculate_vwap": lambda s: (s["c"], s["v"], 24),
+}
+
+# 机器人分析函数 (模块, 函数, 调用方式)；和运行时一样每次给最近 ANALYSIS_WINDOW 根
+ANALYZERS: Dict[str, Tuple[str, str, Callable]] = {
+    "boll_macd": ("trader_01_boll_macd", "analyze_boll_macd", lambda f, s: f("BTC", s["c"], s["h"], s["l"])),
+    "rsi_macd": ("trader_02_rsi_macd", "analyze_rsi_macd", lambda f, s: f(s["c"])),
+    "vwap": ("trader_03_vwap", "analyze_vwap_breakout", lambda f, s: f(s["c"], s["v"])),
+    "supertrend": ("trader_04_supertrend", "analyze_supertrend", lambda f, s: f(s["h"], s["l"], s["c"])),
+    "adx": ("trader_05_adx", "analyze_adx_trend", lambda f, s: f("BTC", s["h"], s["l"], s["c"])),
+    "bb_mean_reversion": ("trader_06_bb_mean_reversion", "analyze_bb_mean_reversion", lambda f, s: f(s["c"], s["h"], s["l"])),
+}
+ANALYSIS_WINDOW = 100
+
+
+class Market:
+    """合成行情，按需生成一次最长的序列，各档规模取前 N 根"""
+
+    def __init__(self, seed: int = SEED):
+        self.seed = seed
+        self.rows: List[tuple] = []
+
+    def _ensure(self, bars: int) -> None:
+        if len(self.rows) < bars:
+            from synthetic_market import generate_rows
+
+            self.rows = generate_rows("BTC", bars, "1h", self.seed)
+
+    def series(self, bars: int) -> Dict[str, List[float]]:
+        self._ensure(bars)
+        rows = self.rows[:bars]
+        return {key: [r[i] for r in rows] for i, key in enumerate(("t", "o", "h", "l", "c", "v"))}
+
+    def candles(self, bars: int) -> List[Dict]:
+        """candleSnapshot 格式（backtest_*.py 用）"""
+        self._ensure(bars)
+        return [{"t": t, "T": t + INTERVAL_MS - 1, "s": "BTC", "i": "1h", "o": str(o), "h": str(h), "l": str(l),
+                 "c": str(c), "v": str(v), "n": 1} for t, o, h, l, c, v in self.rows[:bars]]
+
+    def klines(self, bars: int) -> List[Dict]:
+        """fetch_historical_klines 格式（test/ 下的回测用）"""
+        self._ensure(bars)
+        return [{"timestamp": t, "open": o, "high": h, "low": l, "close": c, "volume": v}
+                for t, o, h, l, c, v in self.rows[:bars]]
+
+
+def measure(fn: Callable, *args) -> float:
+    """重复运行取最快一次（秒）；运行期间关掉 GC 和输出"""
+    best = math.inf
+    spent = 0.0
+    runs = 0
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            while runs < MAX_REPEAT and (runs == 0 or spent < MIN_TIME):
+                started = time.perf_counter()
+                fn(*args)
+                elapsed = time.perf_counter() - started
+                best = min(best, elapsed)
+                spent += elapsed
+                runs += 1
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+
+def _load(module: str, name: str) -> Optional[Callable]:
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return getattr(importlib.import_module(module), name)
+    except Exception as e:
+        print(f"  跳过 {module}.{name}: {e}")
+        return None
+
+
+def _record(results: Dict, key: str, seconds: float, work: float, unit: str) -> None:
+    results[key] = {"seconds": seconds, "rate": work / seconds if seconds > 0 else 0.0, "unit": unit}
+    print(f"  {key:<58}{seconds * 1000:>12.2f} ms{results[key]['rate']:>14,.0f} {unit}")
+
+
+def bench_indicators(market: Market, sizes: List[int], max_seconds: float, results: Dict) -> None:
+    print("\n[indicators]")
+    for name, impls in INDICATORS.items():
+        for module, func in impls:
+            fn = _load(module, func)
+            if fn is None:
+                continue
+            previous: Optional[Tuple[int, float]] = None
+            for size in sorted(sizes):
+                key = f"indicator.{name}.{module}.{size}"
+                if previous and previous[1] * size / previous[0] > max_seconds:
+                    print(f"  {key:<58}  跳过（预计 > {max_seconds:g}s）")
+                    continue
+                seconds = measure(fn, *INDICATOR_ARGS[name](market.series(size)))
+                _record(results, key, seconds, size, "bars/s")
+                previous = (size, seconds)
+
+
+def backtest_cases() -> Dict[str, Tuple[str, Callable]]:
+    """策略 -> (K线格式, 在一份K线上跑一次完整回测的函数)"""
+    import param_sweep
+
+    cases: Dict[str, Tuple[str, Callable]] = {}
+    for name, spec in param_sweep.STRATEGIES.items():
+        runner = _load(spec["module"], spec["runner"])
+        defaults = _load(spec["module"], spec["defaults"])
+        if runner and defaults is not None:
+            cases[name] = ("candles", lambda data, r=runner, d=defaults: r(data, "BTC", dict(d), None))
+    generate_v2 = _load("backtest_boll_macd_v2", "generate_signals_v2")
+    backtest_v2 = _load("backtest_boll_macd_v2", "backtest_v2")
+    if generate_v2 and backtest_v2:
+        cases["boll_macd_v2"] = ("candles", lambda data: backtest_v2(data, generate_v2(data, "BTC"), "BTC"))
+    backtest_v3 = _load("backtest_boll_macd_v3", "backtest_v3")
+    if backtest_v3:
+        cases["boll_macd_v3"] = ("candles", lambda data: backtest_v3(data, "BTC"))
+    nfi = _load("backtest_nostalgia_for_infinity", "run_backtest")
+    if nfi:
+        cases["nfi"] = ("klines", lambda data: nfi(data, symbol="BTC"))
+    auto = _load("backtest", "run_backtest")
+    if auto:
+        cases["auto_trader"] = ("klines", lambda data: auto(data, symbol="BTC"))
+    return cases
+
+
+def bench_backtests(market: Market, bars: int, results: Dict) -> None:
+    print(f"\n[backtest] {bars} 根K线")
+    data = {"candles": market.candles(bars), "klines": market.klines(bars)}
+    for name, (kind, run) in backtest_cases().items():
+        _record(results, f"backtest.{name}.{bars}", measure(run, data[kind]), bars, "bars/s")
+
+
+def _trim_space(space: Dict[str, List], per_dim: int) -> Dict[str, List]:
+    return {k: list(v)[:per_dim] for k, v in space.items()}
+
+
+def bench_optimizers(market: Market, bars: int, configs: int, results: Dict) -> None:
+    import param_sweep
+
+    print(f"\n[optimizer] {bars} 根K线")
+    candles = market.candles(bars)
+    for name, spec in param_sweep.STRATEGIES.items():
+        module = importlib.import_module(spec["module"])
+        # 每维取前两个值，组合数固定，指标缓存的命中率和完整网格一致
+        space = _trim_space(module.PARAM_SPACE, 2)
+        combos = len(param_sweep.expand_grid(space))
+        seconds = measure(param_sweep.sweep, name, candles, "BTC", space, 1)
+        _record(results, f"optimizer.param_sweep.{name}.{bars}x{combos}", seconds, combos, "configs/s")
+
+    klines = market.klines(bars)
+    optimize = importlib.import_module("optimize")
+    cfgs = optimize.generate_configs()[:configs]
+    seconds = measure(optimize.scan_configs, klines, cfgs)
+    _record(results, f"optimizer.optimize.{bars}x{len(cfgs)}", seconds, len(cfgs), "configs/s")
+
+    nfi = importlib.import_module("optimize_nostalgia_for_infinity")
+    cfgs = nfi.generate_configs()[:configs]
+    seconds = measure(nfi.scan_configs, klines, "BTC", cfgs)
+    _record(results, f"optimizer.optimize_nfi.{bars}x{len(cfgs)}", seconds, len(cfgs), "configs/s")
+
+
+def bench_analysis(market: Market, bars: int, results: Dict) -> None:
+    import indicator_graph
+
+    print(f"\n[analysis] {bars} 根K线，每根分析最近 {ANALYSIS_WINDOW} 根")
+    series = market.series(bars + ANALYSIS_WINDOW)
+    windows = [{k: v[i - ANALYSIS_WINDOW:i] for k, v in series.items()} for i in range(ANALYSIS_WINDOW, bars + ANALYSIS_WINDOW)]
+    calls = {}
+    for name, (module, func, call) in ANALYZERS.items():
+        fn = _load(module, func)
+        if fn is not None:
+            calls[name] = lambda w, f=fn, c=call: c(f, w)
+
+    def run(names: List[str]) -> None:
+        for w in windows:
+            # 运行时每轮换一代缓存，这里每根K线算一轮
+            indicator_graph.begin_cycle()
+            for name in names:
+                calls[name](w)
+
+    for name in calls:
+        _record(results, f"analysis.{name}.{bars}", measure(run, [name]), bars, "bars/s")
+    before = indicator_graph.stats()
+    _record(results, f"analysis.all.{bars}", measure(run, list(calls)), bars, "bars/s")
+    after = indicator_graph.stats()
+    computed = after["computed"] - before["computed"]
+    requests = after["requests"] - before["requests"]
+    if requests:
+        print(f"  指标图: 引用 {requests} 个节点，实际计算 {computed} 个（{1 - computed / requests:.0%} 复用）")
+
+
+def load_history(path: Path = HISTORY_PATH) -> List[Dict]:
+    if not path.exists():
+        return []
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"读取历史失败 {path}: {e}")
+
+
+def save_history(history: List[Dict], path: Path = HISTORY_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(history, ensure_ascii=False, indent=1))
+    tmp.replace(path)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def pick(history: List[Dict], ref: str) -> Dict:
+    """按序号（-1 = 最近一次）或 label 取一条记录"""
+    try:
+        return history[int(ref)]
+    except ValueError:
+        pass
+    except IndexError:
+        raise SystemExit(f"历史里没有第 {ref} 条（共 {len(history)} 条）")
+    for entry in reversed(history):
+        if entry.get("label") == ref:
+            return entry
+    raise SystemExit(f"历史里没有 label={ref} 的记录")
+
+
+def _describe(entry: Dict) -> str:
+    label = f" [{entry['label']}]" if entry.get("label") else ""
+    return f"{entry['time']} {entry.get('git') or '-'}{label} @{entry.get('host', '?')}"
+
+
+def compare(base: Dict, head: Dict, threshold: float) -> List[str]:
+    """打印两次记录的对比，返回回退的项；只比较两边都有的项"""
+    print(f"基准: {_describe(base)}\n对比: {_describe(head)}\n阈值: 变慢 > {threshold:.0%}\n")
+    regressions = []
+    common = [k for k in head["results"] if k in base["results"]]
+    for key in common:
+        old = base["results"][key]["seconds"]
+        new = head["results"][key]["seconds"]
+        change = new / old - 1 if old > 0 else 0.0
+        if max(old, new) < NOISE_FLOOR:
+            mark = "  (噪声)"
+        elif change > threshold:
+            mark = "  ← 回退"
+            regressions.append(key)
+        elif change < -threshold:
+            mark = "  ↑ 提升"
+        else:
+            mark = ""
+        print(f"  {key:<58}{old * 1000:>11.2f} →{new * 1000:>11.2f} ms {change:>+8.1%}{mark}")
+    skipped = len(set(base["results"]) ^ set(head["results"]))
+    print(f"\n比较 {len(common)} 项，回退 {len(regressions)} 项" + (f"，{skipped} 项只在一边出现" if skipped else ""))
+    return regressions
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    suites = [s.strip() for s in args.only.split(",") if s.strip()] if args.only else list(SUITES)
+    unknown = [s for s in suites if s not in SUITES]
+    if unknown:
+        raise SystemExit(f"未知项目: {', '.join(unknown)}（可选: {', '.join(SUITES)}）")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    market = Market(args.seed)
+    results: Dict[str, Dict] = {}
+    started = time.perf_counter()
+    if "indicators" in suites:
+        bench_indicators(market, sizes, args.max_seconds, results)
+    if "backtest" in suites:
+        bench_backtests(market, args.bars, results)
+    if "optimizer" in suites:
+        bench_optimizers(market, args.opt_bars, args.opt_configs, results)
+    if "analysis" in suites:
+        bench_analysis(market, args.analysis_bars, results)
+    print(f"\n完成 {len(results)} 项，耗时 {time.perf_counter() - started:.1f}s")
+
+    entry = {
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "label": args.label,
+        "git": _git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "results": results,
+    }
+    path = Path(args.history)
+    history = load_history(path)
+    code = 0
+    if args.check:
+        same_host = [e for e in history if e.get("host") == entry["host"]]
+        if same_host:
+            print()
+            code = 1 if compare(same_host[-1], entry, args.threshold) else 0
+        else:
+            print("\n本机还没有历史记录，跳过对比")
+    if not args.no_save:
+        history.append(entry)
+        save_history(history, path)
+        print(f"已写入 {path}（第 {len(history)} 条）")
+    return code
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    history = load_history(Path(args.history))
+    if len(history) < 2 and args.base is None:
+        raise SystemExit("历史记录不足两条")
+    head = pick(history, args.head)
+    base = pick(history, args.base) if args.base is not None else pick(history, "-2")
+    return 1 if compare(base, head, args.threshold) else 0
+
+
+def cmd_history(args: argparse.Namespace) -> int:
+    for i, entry in enumerate(load_history(Path(args.history))):
+        print(f"{i:>4}  {_describe(entry)}  {len(entry['results'])} 项")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="指标 / 回测 / 参数优化 / 机器人分析性能基准")
+    parser.add_argument("--history", default=str(HISTORY_PATH), help="历史记录文件")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="跑基准")
+    run.add_argument("--only", default="", help=f"逗号分隔: {','.join(SUITES)}（默认全部）")
+    run.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="指标的K线规模")
+    run.add_argument("--max-seconds", type=float, default=30.0, help="单项预计超过这么多秒就跳过")
+    run.add_argument("--bars", type=int, default=5000, help="回测用的K线数")
+    run.add_argument("--opt-bars", type=int, default=2000, help="参数优化用的K线数")
+    run.add_argument("--opt-configs", type=int, default=24, help="scan_configs 跑的参数组数")
+    run.add_argument("--analysis-bars", type=int, default=1000, help="机器人分析函数跑的K线数")
+    run.add_argument("--seed", type=int, default=SEED)
+    run.add_argument("--label", default="", help="给这次记录起个名字，compare --base 可以引用")
+    run.add_argument("--check", action="store_true", help="和本机上一次记录对比，有回退时退出码 1")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="变慢超过这个比例算回退")
+    run.add_argument("--no-save", action="store_true", help="不写入历史")
+    run.set_defaults(func=cmd_run)
+
+    cmp = sub.add_parser("compare", help="对比两次记录，有回退时退出码 1")
+    cmp.add_argument("--base", default=None, help="基准记录: 序号或 label（默认倒数第二条）")
+    cmp.add_argument("--head", default="-1", help="对比记录: 序号或 label（默认最近一条）")
+    cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="变慢超过这个比例算回退")
+    cmp.set_defaults(func=cmd_compare)
+
+    hist = sub.add_parser("history", help="列出历史记录")
+    hist.set_defaults(func=cmd_history)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
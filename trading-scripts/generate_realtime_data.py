@@ -2,46 +2,115 @@
 """
 生成网站实时数据
 包含：持仓、机器人状态、最新价格
+
+用法:
+  python generate_realtime_data.py            # 生成一次
+  python generate_realtime_data.py --serve    # 常驻服务：各数据源按自己的节奏刷新，内容变化才写文件
+  HL_RECORD=1 python generate_realtime_data.py  # 同时把接口返回录成 cassette（scripts/cassette.py）
 """
 
+import argparse
+import hashlib
 import json
 import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-import requests
 
-# Hyperliquid API
-HL_API = "https://api.hyperliquid.xyz/info"
+STARTED = time.time()
+
+# Hyperliquid API；HL_API_URL 可以指向本地回放服务（scripts/cassette.py replay）
+HL_API = os.getenv("HL_API_URL", "https://api.hyperliquid.xyz").rstrip("/") + "/info"
+
+# 钱包地址
+WALLET = "0xfFd91a584cf6419b92E58245898D2A9281c628eb"
+
+LOG_DIR = Path(__file__).parent.parent / "logs"
+# 机器人每轮写入的状态板（scripts/status_board.py）
+STATUS_DIR = Path(__file__).parent.parent / "memory" / "trading" / "status"
+OUTPUT_PATH = Path(__file__).parent.parent / "frontend" / "dist" / "realtime-data.json"
+SCRIPTS_DIR = Path(__file__).parent / "scripts"
+
+# 初始资金（与 daily_report.sh 一致），用于计算收益率
+INITIAL_CAPITAL = 98
+
+ROBOT_CONFIGS = [
+    {"name": "NFI原版", "log": "trader_nfi.log", "id": "nfi"},
+    {"name": "BOLL+MACD V3", "log": "trader_01_boll_macd.log", "id": "boll_macd"},
+    {"name": "SuperTrend×4.0", "log": "trader_04_supertrend.log", "id": "supertrend"},
+    {"name": "ADX趋势过滤", "log": "trader_05_adx.log", "id": "adx"},
+]
+
+# 常驻模式下各数据源的刷新间隔（秒）
+REFRESH_INTERVALS = {
+    "prices": 5,
+    "account": 30,
+    "robots": 15,
+    "fills": 30,
+}
+# 内容没变时也至少隔这么久重写一次，timestamp 不会太旧
+HEARTBEAT_INTERVAL = 60
+# 日志首次读取时最多回看的字节数（只需要最后一行）
+TAIL_WINDOW = 64 * 1024
+# 超过这么久没有更新状态就视为离线（秒）
+STALE_AFTER = 300
 
-def hl_request(body):
+def _recorder():
+    """设置了 HL_RECORD 时返回接口录制器（scripts/cassette.py），否则 None"""
+    if not os.getenv("HL_RECORD"):
+        return None
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+    from cassette import recorder
+
+    return recorder()
+
+def hl_request(body, session=None):
+    # 单次运行用标准库 urllib，省掉 requests 的导入时间；常驻服务传入复用连接的 Session
+    started = time.perf_counter()
     try:
-        resp = requests.post(HL_API, json=body, timeout=10)
-        return resp.json()
+        if session is not None:
+            result = session.post(HL_API, json=body, timeout=10).json()
+        else:
+            req = urllib.request.Request(
+                HL_API,
+                data=json.dumps(body).encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                result = json.loads(resp.read())
+        rec = _recorder()
+        if rec is not None:
+            rec.record(body, result, time.perf_counter() - started)
+        return result
     except Exception as e:
         print(f"API Error: {e}")
         return {}
 
-def get_prices():
+def get_prices(session=None):
     """获取最新价格"""
-    mids = hl_request({"type": "allMids"})
+    mids = hl_request({"type": "allMids"}, session)
     return {
         "BTC": float(mids.get("BTC", 0)),
         "ETH": float(mids.get("ETH", 0))
     }
 
-def get_account_state(wallet):
+def get_account_state(wallet, session=None):
     """获取账户状态"""
     try:
         state = hl_request({
             "type": "clearinghouseState",
             "user": wallet
-        })
-        
+        }, session)
+
         if not state:
             return None
-            
+
         account_value = float(state.get("marginSummary", {}).get("accountValue", 0))
-        
+
         positions = []
         for pos in state.get("assetPositions", []):
             p = pos.get("position", {})
@@ -53,7 +122,7 @@ def get_account_state(wallet):
                 "unrealized_pnl": float(p.get("unrealizedPnl", 0)),
                 "liquidation_price": float(p.get("liquidationPx", 0)) if p.get("liquidationPx") else None
             })
-        
+
         return {
             "account_value": account_value,
             "positions": positions
@@ -62,69 +131,139 @@ def get_account_state(wallet):
         print(f"获取账户状态失败: {e}")
         return None
 
-def get_robot_states():
-    """获取机器人状态（从日志文件）"""
-    log_dir = Path(__file__).parent.parent / "logs"
+class LogTail:
+    """增量读取日志：记住上次读到的偏移量，只读新增部分"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.inode = None
+        self.last_line = ""
+
+    def poll(self):
+        """返回 (最后一行, 修改时间)；文件不存在时返回 ("", None)"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return "", None
+        # 日志轮转或被截断后重新定位
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.inode = st.st_ino
+            self.offset = 0
+            self.last_line = ""
+        if st.st_size > self.offset:
+            # 积压太多（比如服务刚启动）时只看最后一段
+            start = max(self.offset, st.st_size - TAIL_WINDOW)
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                chunk = f.read(st.st_size - start)
+            # 只消费到最后一个完整行，写了一半的行留到下次
+            end = chunk.rfind(b"\n")
+            if end >= 0:
+                lines = [l for l in chunk[:end].splitlines() if l.strip()]
+                if lines:
+                    self.last_line = lines[-1].decode("utf-8", "replace").strip()
+                self.offset = start + end + 1
+        return self.last_line, st.st_mtime
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except PermissionError:
+        return True
+    except (OSError, TypeError):
+        return False
+
+def read_status_board(robot_id):
+    """读取机器人状态板，没有状态文件（旧版本机器人）时返回 None"""
+    try:
+        with open(STATUS_DIR / f"{robot_id}.json") as f:
+            board = json.load(f)
+    except (OSError, ValueError):
+        return None
+    running = time.time() - board.get("updated_at", 0) < STALE_AFTER and pid_alive(board.get("pid"))
+    events = board.get("events") or []
+    signals = board.get("signals") or {}
+    if events:
+        last_log = events[-1]
+    elif signals:
+        symbol, sig = list(signals.items())[-1]
+        last_log = f"{sig.get('time', '')} {symbol} {sig.get('action')}: {sig.get('reason', '')}"
+    else:
+        last_log = ""
+    return {
+        "status": "running" if running else "offline",
+        "last_log": last_log,
+        "last_cycle": board.get("last_cycle"),
+        "error_count": board.get("error_count", 0),
+    }
+
+def get_robot_states(tails=None):
+    """获取机器人状态（优先读状态板，没有时退回增量读取日志）"""
+    tails = {} if tails is None else tails
     robots = []
-    
-    robot_configs = [
-        {"name": "NFI原版", "log": "trader_nfi.log", "id": "nfi"},
-        {"name": "BOLL+MACD V3", "log": "trader_01_boll_macd.log", "id": "boll_macd"},
-        {"name": "SuperTrend×4.0", "log": "trader_04_supertrend.log", "id": "supertrend"},
-        {"name": "ADX趋势过滤", "log": "trader_05_adx.log", "id": "adx"},
-    ]
-    
-    for cfg in robot_configs:
-        log_path = log_dir / cfg["log"]
+
+    for cfg in ROBOT_CONFIGS:
+        board = read_status_board(cfg["id"])
+        if board is not None:
+            robots.append({
+                "id": cfg["id"],
+                "name": cfg["name"],
+                "status": board["status"],
+                "last_log": board["last_log"][-100:],
+                "last_cycle": board["last_cycle"],
+                "error_count": board["error_count"],
+            })
+            continue
+
+        tail = tails.setdefault(cfg["log"], LogTail(LOG_DIR / cfg["log"]))
         status = "offline"
         last_log = ""
-        
-        if log_path.exists():
-            try:
-                # 检查文件修改时间
-                mtime = log_path.stat().st_mtime
-                from time import time
-                if time() - mtime < 300:  # 5分钟内有更新
-                    status = "running"
-                
-                # 读取最后几行日志
-                with open(log_path, 'r') as f:
-                    lines = f.readlines()
-                    last_log = lines[-1].strip() if lines else ""
-            except:
-                pass
-        
+
+        try:
+            last_log, mtime = tail.poll()
+            if mtime and time.time() - mtime < STALE_AFTER:  # 5分钟内有更新
+                status = "running"
+        except Exception:
+            pass
+
         robots.append({
             "id": cfg["id"],
             "name": cfg["name"],
             "status": status,
             "last_log": last_log[-100:]  # 最后100字符
         })
-    
+
     return robots
 
-def generate_data():
-    """生成网站数据"""
-    
-    # 钱包地址
-    wallet = "0xfFd91a584cf6419b92E58245898D2A9281c628eb"
-    
-    # 获取数据
-    prices = get_prices()
-    account = get_account_state(wallet)
-    robots = get_robot_states()
-    
-    # 构建数据
-    data = {
+def get_fill_stats(session=None):
+    """增量同步成交（scripts/fill_sync.py），返回累计盈亏 / 手续费 / 笔数；失败时返回 None"""
+    try:
+        if str(SCRIPTS_DIR) not in sys.path:
+            sys.path.insert(0, str(SCRIPTS_DIR))
+        from fill_sync import FillSync
+
+        sync = FillSync(lambda body: hl_request(body, session), WALLET)
+        sync.sync()
+        return sync.totals()
+    except Exception as e:
+        print(f"同步成交失败: {e}")
+        return None
+
+def build_data(prices, account, robots, fills=None):
+    """构建网站数据"""
+    earnings = round(fills["net_pnl"], 2) if fills else 0
+    return {
         "timestamp": datetime.now().isoformat(),
         "prices": prices,
         "account": account,
         "robots": robots,
         "STATS": {
             "balance": account["account_value"] if account else 98,
-            "earnings": 0,
-            "returnPct": 0,
-            "trades": 0
+            "earnings": earnings,
+            "returnPct": round(earnings / INITIAL_CAPITAL * 100, 2),
+            "trades": fills["trades"] if fills else 0
         },
         "SITE_CONFIG": {
             "name": "赛博牛马交易日记",
@@ -136,24 +275,119 @@ def generate_data():
             "logo256": "/logo_256.png",
         },
         "VERIFICATION": {
-            "tradingAccount": wallet,
+            "tradingAccount": WALLET,
             "depositChain": "Arbitrum",
             "depositToken": "USDC",
         }
     }
-    
-    # 写入文件
-    output_path = Path(__file__).parent.parent / "frontend" / "dist" / "realtime-data.json"
-    with open(output_path, 'w') as f:
-        json.dump(data, f, indent=2)
-    
+
+def content_digest(data):
+    """不含 timestamp 的内容摘要，用来判断要不要重写文件"""
+    body = {k: v for k, v in data.items() if k != "timestamp"}
+    return hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+def write_data(data, output_path=OUTPUT_PATH):
+    """原子写入：先写临时文件再 rename，前端不会读到写了一半的 JSON"""
+    tmp = output_path.with_suffix(".json.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, output_path)
+
+def generate_data():
+    """生成网站数据（单次）"""
+
+    # 价格、账户、成交并发请求
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        prices_future = pool.submit(get_prices)
+        account_future = pool.submit(get_account_state, WALLET)
+        fills_future = pool.submit(get_fill_stats)
+        robots = get_robot_states()
+        prices = prices_future.result()
+        account = account_future.result()
+        fills = fills_future.result()
+
+    write_data(build_data(prices, account, robots, fills))
+
     print(f"[{datetime.now()}] 实时数据已更新")
     print(f"  BTC: ${prices['BTC']}")
     print(f"  ETH: ${prices['ETH']}")
     if account:
         print(f"  账户价值: ${account['account_value']:.2f}")
         print(f"  持仓数量: {len(account['positions'])}")
+    if fills:
+        print(f"  净盈亏: ${fills['net_pnl']:.2f} ({fills['trades']} 笔成交)")
     print(f"  机器人状态: {len([r for r in robots if r['status'] == 'running'])}/{len(robots)} 运行中")
+    print(f"  耗时: {time.time() - STARTED:.2f}s")
+
+class RealtimeService:
+    """常驻服务：复用连接、到期的数据源并发刷新、日志增量读取、内容变化才写文件"""
+
+    def __init__(self, intervals=None, output_path=OUTPUT_PATH):
+        import requests
+
+        self.session = requests.Session()
+        self.intervals = dict(REFRESH_INTERVALS, **(intervals or {}))
+        self.pool = ThreadPoolExecutor(max_workers=len(self.intervals))
+        self.output_path = output_path
+        self.tails = {}
+        self.next_due = {name: 0.0 for name in self.intervals}
+        self.values = {"prices": {"BTC": 0.0, "ETH": 0.0}, "account": None, "robots": [], "fills": None}
+        self.fetchers = {
+            "prices": lambda: get_prices(self.session),
+            "account": lambda: get_account_state(WALLET, self.session),
+            "robots": lambda: get_robot_states(self.tails),
+            "fills": lambda: get_fill_stats(self.session),
+        }
+        self.last_digest = None
+        self.last_write = 0.0
+        self.writes = 0
+
+    def refresh_due(self):
+        """并发刷新到期的数据源，返回本轮刷新的名字"""
+        now = time.time()
+        due = [name for name, t in self.next_due.items() if t <= now]
+        futures = {name: self.pool.submit(self.fetchers[name]) for name in due}
+        for name, future in futures.items():
+            try:
+                value = future.result()
+                # 接口失败时保留上一次的数据，页面不会被刷成 0
+                if name == "prices" and not any(value.values()):
+                    value = None
+                if value is not None:
+                    self.values[name] = value
+            except Exception as e:
+                print(f"刷新 {name} 失败: {e}")
+            self.next_due[name] = now + self.intervals[name]
+        return due
+
+    def write_if_changed(self):
+        data = build_data(self.values["prices"], self.values["account"], self.values["robots"],
+                          self.values["fills"])
+        digest = content_digest(data)
+        if digest == self.last_digest and time.time() - self.last_write < HEARTBEAT_INTERVAL:
+            return False
+        write_data(data, self.output_path)
+        self.last_digest = digest
+        self.last_write = time.time()
+        self.writes += 1
+        return True
+
+    def serve_forever(self):
+        print(f"[{datetime.now()}] 实时数据服务启动，刷新间隔: {self.intervals}")
+        while True:
+            self.refresh_due()
+            self.write_if_changed()
+            wait = min(self.next_due.values()) - time.time()
+            time.sleep(min(max(wait, 0.5), HEARTBEAT_INTERVAL))
+
+def main():
+    parser = argparse.ArgumentParser(description="生成网站实时数据")
+    parser.add_argument("--serve", action="store_true", help="常驻运行，各数据源按自己的节奏刷新")
+    args = parser.parse_args()
+    if args.serve:
+        RealtimeService().serve_forever()
+    else:
+        generate_data()
 
 if __name__ == "__main__":
-    generate_data()
+    main()
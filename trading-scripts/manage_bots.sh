@@ -32,8 +32,16 @@ case "$1" in
     echo "启动NFI机器人..."
     pm2 start auto_trader_nostalgia_for_infinity.py --name auto-trader
     ;;
+  start-runtime)
+    echo "启动多策略运行时(单进程托管 NFI/BOLL+MACD/SuperTrend/ADX)..."
+    pm2 start ecosystem.runtime.json
+    ;;
+  stop-runtime)
+    echo "停止多策略运行时..."
+    pm2 stop ecosystem.runtime.json
+    ;;
   *)
-    echo "用法: $0 {start|stop|restart|delete|status|logs|start-nfi}"
+    echo "用法: $0 {start|stop|restart|delete|status|logs|start-nfi|start-runtime|stop-runtime}"
     echo ""
     echo "命令说明:"
     echo "  start      - 启动6个新交易机器人"
@@ -43,6 +51,8 @@ case "$1" in
     echo "  status     - 查看所有PM2进程状态"
     echo "  logs       - 查看实时日志"
     echo "  start-nfi  - 启动NFI机器人(如果未运行)"
+    echo "  start-runtime - 单进程运行时托管全部策略(替代各自独立进程，勿与独立进程同时运行)"
+    echo "  stop-runtime  - 停止多策略运行时"
     echo ""
     echo "现有的7个机器人:"
     echo "  1. auto-trader              - NFI策略(原版)"
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+通用参数扫描框架 — 六个非 NFI 策略回测共用
+
+- 每个策略模块声明自己的 PARAM_SPACE（参数空间）和 INDICATOR_PARAMS（影响指标的参数）
+- 多维网格（笛卡尔积）扫描，多进程并行
+- 指标参数相同的组合分到同一批任务，指标在进程内缓存复用
+- 多进程时K线列放进共享内存（shared_arrays），子进程挂同一份数据，不再每个进程 pickle 一份K线
+- 输出列式结果表（参数列 + 结果列），可直接 pivot 成热力图
+
+用法:
+  python param_sweep.py --strategy adx --symbol BTC
+  python param_sweep.py --strategy boll_macd --set bb_period=15,20,25 --set macd_fast=10,12 --out sweep.csv
+  python param_sweep.py --strategy supertrend --workers 4 --pivot atr_period,atr_multiplier
+  python param_sweep.py --strategy adx --profile          # 每个进程一份 cProfile 报告，写到 logs/profiles/
+"""
+
+import argparse
+import csv
+import importlib
+import itertools
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+import profiling  # noqa: E402
+import shared_arrays  # noqa: E402
+import synthetic_market  # noqa: E402
+
+# 策略名 -> 回测模块 / 入口函数 / 默认参数 / 默认热力图指标
+STRATEGIES = {
+    "boll_macd": {"module": "backtest_boll_macd", "runner": "run_with_params", "defaults": "DEFAULT_PARAMS", "metric": "total_return"},
+    "rsi_macd": {"module": "backtest_rsi_macd", "runner": "backtest", "defaults": "PARAMS", "metric": "总收益"},
+    "vwap": {"module": "backtest_vwap", "runner": "backtest_vwap", "defaults": "PARAMS", "metric": "总收益"},
+    "supertrend": {"module": "backtest_supertrend", "runner": "backtest_supertrend", "defaults": "PARAMS", "metric": "总收益"},
+    "adx": {"module": "backtest_adx", "runner": "backtest_adx", "defaults": "PARAMS", "metric": "总收益"},
+    "bb_mean_reversion": {"module": "backtest_bb_mean_reversion", "runner": "backtest_bb_mean_reversion", "defaults": "PARAMS", "metric": "总收益"},
+}
+
+# 放进共享内存的K线列；后四列和各回测里 backtest_cache.cached(cache, ("c",), ...) 的缓存键一致
+CANDLE_COLUMNS = ("t", "o", "h", "l", "c", "v")
+CACHED_COLUMNS = ("h", "l", "c", "v")
+
+
+def expand_grid(space: Dict[str, List]) -> List[Dict]:
+    """参数空间 -> 全部组合（笛卡尔积），保持声明顺序"""
+    keys = list(space)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+
+
+def group_by_indicators(combos: List[Dict], indicator_params: List[str]) -> List[List[Tuple[int, Dict]]]:
+    """把指标参数相同的组合分到一批，同批组合共享一次指标计算"""
+    groups: Dict[Tuple, List[Tuple[int, Dict]]] = {}
+    for idx, combo in enumerate(combos):
+        key = tuple(combo.get(k) for k in indicator_params)
+        groups.setdefault(key, []).append((idx, combo))
+    return list(groups.values())
+
+
+_WORKER: Dict = {}
+
+
+def _init_worker(strategy: str, candles: List[Dict], symbol: str) -> None:
+    spec = STRATEGIES[strategy]
+    module = importlib.import_module(spec["module"])
+    _WORKER["runner"] = getattr(module, spec["runner"])
+    _WORKER["defaults"] = dict(getattr(module, spec["defaults"]))
+    _WORKER["candles"] = candles
+    _WORKER["symbol"] = symbol
+    _WORKER["cache"] = {}
+
+
+def _init_shared_worker(strategy: str, symbol: str) -> None:
+    """子进程: K线从共享内存按行读；高/低/收/量四列直接转成列表放进指标缓存"""
+    columns = shared_arrays.tables()["candles"]
+    _init_worker(strategy, shared_arrays.Rows(columns), symbol)
+    for col in CACHED_COLUMNS:
+        _WORKER["cache"][(col,)] = list(columns[col])
+
+
+def candle_columns(candles: List[Dict]) -> Dict[str, List]:
+    """K线行 -> 列（时间戳为整数，价格/成交量为浮点），给共享内存用"""
+    columns = {"t": [int(x["t"]) for x in candles]}
+    for col in CANDLE_COLUMNS[1:]:
+        columns[col] = [float(x[col]) for x in candles]
+    return columns
+
+
+@profiling.profiled("sweep_batch")
+def _run_batch(batch: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+    out = []
+    for idx, combo in batch:
+        params = dict(_WORKER["defaults"])
+        params.update(combo)
+        result = _WORKER["runner"](_WORKER["candles"], _WORKER["symbol"], params, _WORKER["cache"])
+        out.append((idx, result))
+    return out
+
+
+@profiling.profiled()
+def sweep(
+    strategy: str,
+    candles: List[Dict],
+    symbol: str = "TEST",
+    space: Optional[Dict[str, List]] = None,
+    workers: int = 1,
+) -> Dict[str, List]:
+    """对一个策略做网格扫描，返回列式结果表 {列名: [值, ...]}"""
+    spec = STRATEGIES[strategy]
+    module = importlib.import_module(spec["module"])
+    space = space or module.PARAM_SPACE
+    combos = expand_grid(space)
+    batches = group_by_indicators(combos, getattr(module, "INDICATOR_PARAMS", []))
+
+    results: List[Optional[Dict]] = [None] * len(combos)
+    if workers <= 1:
+        _init_worker(strategy, candles, symbol)
+        for batch in batches:
+            for idx, result in _run_batch(batch):
+                results[idx] = result
+    else:
+        with shared_arrays.SharedArrays({"candles": candle_columns(candles)}) as shared:
+            for batch_result in shared_arrays.map_tasks(
+                _run_batch, batches, shared, workers,
+                initializer=_init_shared_worker, initargs=(strategy, symbol),
+            ):
+                for idx, result in batch_result:
+                    results[idx] = result
+
+    return to_columns(list(space), combos, results)
+
+
+def to_columns(param_names: List[str], combos: List[Dict], results: List[Dict]) -> Dict[str, List]:
+    """组合 + 结果 -> 列式表；只保留标量结果（去掉交易明细等列表）"""
+    metric_names: List[str] = []
+    for r in results:
+        for k, v in r.items():
+            if k not in metric_names and not isinstance(v, (list, dict)):
+                metric_names.append(k)
+    table: Dict[str, List] = {name: [c[name] for c in combos] for name in param_names}
+    for name in metric_names:
+        table[name] = [r.get(name) for r in results]
+    return table
+
+
+def pivot(table: Dict[str, List], x: str, y: str, metric: str, agg: str = "max") -> Tuple[List, List, List[List]]:
+    """列式表 -> 热力图矩阵 (xs, ys, grid[y][x])；其余维度按 agg（max/mean）聚合"""
+    cells: Dict[Tuple, List[float]] = {}
+    for xv, yv, mv in zip(table[x], table[y], table.get(metric, [])):
+        if isinstance(mv, (int, float)):
+            cells.setdefault((xv, yv), []).append(float(mv))
+    xs = sorted(set(table[x]))
+    ys = sorted(set(table[y]))
+    grid: List[List] = []
+    for yv in ys:
+        row = []
+        for xv in xs:
+            vals = cells.get((xv, yv))
+            if not vals:
+                row.append(None)
+            elif agg == "mean":
+                row.append(sum(vals) / len(vals))
+            else:
+                row.append(max(vals))
+        grid.append(row)
+    return xs, ys, grid
+
+
+def write_table(table: Dict[str, List], path: str) -> None:
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(table, f, ensure_ascii=False)
+        return
+    columns = list(table)
+    rows = len(next(iter(table.values()))) if table else 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for i in range(rows):
+            writer.writerow([table[c][i] for c in columns])
+
+
+def _parse_value(text: str):
+    lowered = text.strip().lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            continue
+    return text.strip()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="策略参数网格扫描")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), required=True, help="策略名")
+    parser.add_argument("--symbol", default="BTC", help="币种，如 BTC / ETH")
+    parser.add_argument("--days", type=int, default=180, help="回测天数")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2",
+                        help="覆盖参数空间中的某一维，可重复")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行进程数，1=串行")
+    parser.add_argument("--out", default="", help="结果输出路径（.csv 或 .json）")
+    parser.add_argument("--pivot", default="", metavar="X,Y[,METRIC]", help="打印热力图矩阵")
+    parser.add_argument("--top", type=int, default=10, help="打印前 N 组（按默认指标）")
+    profiling.add_argument(parser)
+    synthetic_market.add_argument(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    profiling.configure(args.profile)
+    spec = STRATEGIES[args.strategy]
+    module = importlib.import_module(spec["module"])
+
+    space = dict(module.PARAM_SPACE)
+    for item in args.set:
+        name, _, values = item.partition("=")
+        space[name.strip()] = [_parse_value(v) for v in values.split(",") if v.strip()]
+
+    end = int(datetime.now().timestamp() * 1000)
+    start = int((datetime.now() - timedelta(days=args.days)).timestamp() * 1000)
+    if args.synthetic is not None:
+        candles = synthetic_market.candle_snapshot(args.symbol, start, end, "1h", args.synthetic)
+    else:
+        candles = module.get_candles(args.symbol, start, end)
+    print(f"数据: {args.symbol} {len(candles)} 根K线")
+    if len(candles) < 50:
+        print("数据不足")
+        return
+
+    total = 1
+    for values in space.values():
+        total *= len(values)
+    print(f"扫描 {args.strategy}: {total} 组参数, {args.workers} 进程")
+
+    started = datetime.now()
+    table = sweep(args.strategy, candles, args.symbol, space, args.workers)
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"完成, 耗时 {elapsed:.1f}s ({total / elapsed if elapsed > 0 else 0:.1f} 组/秒)")
+
+    if args.out:
+        write_table(table, args.out)
+        print(f"结果已写入 {args.out}")
+
+    metric = spec["metric"]
+    values = table.get(metric, [])
+    ranked = sorted(
+        (i for i, v in enumerate(values) if isinstance(v, (int, float))),
+        key=lambda i: values[i],
+        reverse=True,
+    )
+    print(f"\nTop {args.top}（按 {metric}）:")
+    for i in ranked[: args.top]:
+        cfg = " ".join(f"{k}={table[k][i]}" for k in space)
+        print(f"  {cfg} -> {metric}={values[i]}")
+
+    if args.pivot:
+        parts = args.pivot.split(",")
+        x, y = parts[0], parts[1]
+        pm = parts[2] if len(parts) > 2 else metric
+        xs, ys, grid = pivot(table, x, y, pm)
+        print(f"\n热力图 {pm}（行={y}, 列={x}, 其余维度取最大值）:")
+        print(f"{'':>10}" + "".join(f"{str(xv):>10}" for xv in xs))
+        for yv, row in zip(ys, grid):
+            print(f"{str(yv):>10}" + "".join(f"{v:>10.2f}" if v is not None else f"{'-':>10}" for v in row))
+
+
+if __name__ == "__main__":
+    main()
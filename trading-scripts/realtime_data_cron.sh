@@ -1,10 +1,11 @@
 #!/bin/bash
-# 实时数据更新定时任务
-# 每30秒更新一次网站实时数据
+# 实时数据服务
+# 常驻运行 generate_realtime_data.py --serve：价格约 5 秒、机器人状态 15 秒、账户 30 秒刷新一次
+# 进程意外退出时 5 秒后重新拉起
 
 SCRIPT_DIR="$(cd -- "$(dirname -- "${BASH_SOURCE[0]}")" && pwd)"
 
 while true; do
-    cd "$SCRIPT_DIR" && .venv/bin/python generate_realtime_data.py > /dev/null 2>&1
-    sleep 30
+    cd "$SCRIPT_DIR" && .venv/bin/python generate_realtime_data.py --serve > /dev/null 2>&1
+    sleep 5
 done
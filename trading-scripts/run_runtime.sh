@@ -0,0 +1,5 @@
+#!/bin/bash
+# 多策略运行时：一个进程托管 NFI / BOLL+MACD / SuperTrend / ADX
+cd -- "$(dirname -- "${BASH_SOURCE[0]}")" || exit 1
+source .venv/bin/activate
+exec python scripts/strategy_runtime.py --strategies "${STRATEGIES:-nfi,boll_macd,supertrend,adx}"
@@ -0,0 +1,4 @@
+#!/bin/bash
+cd -- "$(dirname -- "${BASH_SOURCE[0]}")" || exit 1
+source .venv/bin/activate
+exec python scripts/trailing_stop.py --serve
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+资产元数据缓存 — szDecimals / 价格精度 / 最大杠杆
+
+- 从 meta / spotMeta 加载一次，落盘到 memory/trading/asset_meta.json，超过 TTL 自动刷新
+- 遇到未知币种（新上线）时提前刷新一次
+- 每个资产预先算好下单数量、价格的舍入精度:
+  数量保留 szDecimals 位；价格最多 5 位有效数字、最多 (6 - szDecimals) 位小数（现货 8 - szDecimals），整数价格总是合法
+- create_info / create_exchange 复用缓存的 meta，构造 Info 时不再重复请求元数据
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict
+
+from hyperliquid.utils import constants
+
+from trade_state import STATE_DIR
+
+logger = logging.getLogger("AssetMeta")
+
+CACHE_PATH = STATE_DIR / "asset_meta.json"
+META_TTL = 6 * 3600
+# 未知币种触发刷新的最小间隔，避免拼错的币种名反复打接口
+MISS_REFRESH_INTERVAL = 60
+
+# 默认 API 地址；HL_API_URL 可以把所有脚本指向测试网或本地模拟交易所（exchange_sim.py）
+API_URL = os.getenv("HL_API_URL", constants.MAINNET_API_URL)
+
+PERP_MAX_DECIMALS = 6
+SPOT_MAX_DECIMALS = 8
+
+
+class AssetInfo:
+    """单个资产的精度信息和舍入函数"""
+
+    def __init__(self, name: str, sz_decimals: int, max_leverage: int = 0, is_spot: bool = False):
+        self.name = name
+        self.sz_decimals = sz_decimals
+        self.max_leverage = max_leverage
+        self.is_spot = is_spot
+        self.px_decimals = max((SPOT_MAX_DECIMALS if is_spot else PERP_MAX_DECIMALS) - sz_decimals, 0)
+
+    def round_size(self, size: float) -> float:
+        return round(size, self.sz_decimals)
+
+    def round_price(self, price: float) -> float:
+        if price >= 100_000:
+            return float(round(price))
+        return round(float(f"{price:.5g}"), self.px_decimals)
+
+    def __repr__(self) -> str:
+        return f"AssetInfo({self.name}, sz={self.sz_decimals}, px={self.px_decimals}, lev={self.max_leverage})"
+
+
+class AssetMetaCache:
+    def __init__(self, base_url: str = API_URL, path=CACHE_PATH, ttl: int = META_TTL):
+        self.base_url = base_url
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._raw: Dict = {}
+        self._assets: Dict[str, AssetInfo] = {}
+        self._last_miss_refresh = 0.0
+
+    @property
+    def meta(self) -> Dict:
+        self._ensure_loaded()
+        return self._raw["meta"]
+
+    @property
+    def spot_meta(self) -> Dict:
+        self._ensure_loaded()
+        return self._raw["spot_meta"]
+
+    def _fresh(self, raw: Dict) -> bool:
+        return (
+            raw.get("base_url") == self.base_url
+            and time.time() - raw.get("fetched_at", 0) < self.ttl
+            and "meta" in raw
+            and "spot_meta" in raw
+        )
+
+    def _ensure_loaded(self) -> None:
+        with self._lock:
+            if self._raw and self._fresh(self._raw):
+                return
+            if not self._raw and self.path.exists():
+                try:
+                    with open(self.path, "r") as f:
+                        raw = json.load(f)
+                    if raw.get("base_url") == self.base_url:
+                        self._apply(raw)
+                except Exception as e:
+                    logger.warning("读取元数据缓存失败: %s", e)
+                if self._raw and self._fresh(self._raw):
+                    return
+            try:
+                self._refresh_locked()
+            except Exception as e:
+                if not self._raw:
+                    raise
+                # 接口不可用时继续用旧缓存，过一会儿再试
+                self._raw["fetched_at"] = time.time() - self.ttl + MISS_REFRESH_INTERVAL
+                logger.warning("刷新元数据失败，继续使用旧缓存: %s", e)
+
+    def refresh(self) -> None:
+        with self._lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        from hyperliquid.api import API
+
+        api = API(self.base_url)
+        raw = {
+            "base_url": self.base_url,
+            "fetched_at": time.time(),
+            "meta": api.post("/info", {"type": "meta"}),
+            "spot_meta": api.post("/info", {"type": "spotMeta"}),
+        }
+        self._apply(raw)
+        try:
+            tmp = self.path.with_suffix(".json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(raw, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning("保存元数据缓存失败: %s", e)
+        logger.info("资产元数据已刷新: %s 个资产", len(self._assets))
+
+    def _apply(self, raw: Dict) -> None:
+        assets: Dict[str, AssetInfo] = {}
+        tokens = {t["index"]: t for t in raw["spot_meta"].get("tokens", [])}
+        for pair in raw["spot_meta"].get("universe", []):
+            base, quote = pair["tokens"]
+            info = AssetInfo(pair["name"], int(tokens[base]["szDecimals"]), is_spot=True)
+            assets[pair["name"]] = info
+            assets.setdefault(f"{tokens[base]['name']}/{tokens[quote]['name']}", info)
+        for asset in raw["meta"].get("universe", []):
+            assets[asset["name"]] = AssetInfo(
+                asset["name"], int(asset["szDecimals"]), int(asset.get("maxLeverage", 0))
+            )
+        self._raw = raw
+        self._assets = assets
+
+    def get(self, name: str) -> AssetInfo:
+        self._ensure_loaded()
+        asset = self._assets.get(name)
+        if asset is None and time.time() - self._last_miss_refresh > MISS_REFRESH_INTERVAL:
+            self._last_miss_refresh = time.time()
+            logger.info("未知资产 %s，刷新元数据", name)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("刷新元数据失败: %s", e)
+            asset = self._assets.get(name)
+        if asset is None:
+            raise KeyError(f"未知资产: {name}")
+        return asset
+
+    def round_size(self, name: str, size: float) -> float:
+        return self.get(name).round_size(size)
+
+    def round_price(self, name: str, price: float) -> float:
+        return self.get(name).round_price(price)
+
+    def max_leverage(self, name: str) -> int:
+        return self.get(name).max_leverage
+
+
+_caches: Dict[str, AssetMetaCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_asset_meta(base_url: str = API_URL) -> AssetMetaCache:
+    """进程内共享的元数据缓存（按 API 地址区分）"""
+    with _caches_lock:
+        if base_url not in _caches:
+            path = CACHE_PATH
+            if base_url != constants.MAINNET_API_URL:
+                host = re.sub(r"\W+", "_", base_url.split("//")[-1]).strip("_")
+                path = CACHE_PATH.with_name(f"asset_meta_{host}.json")
+            _caches[base_url] = AssetMetaCache(base_url, path)
+        return _caches[base_url]
+
+
+def round_size(name: str, size: float) -> float:
+    return get_asset_meta().round_size(name, size)
+
+
+def round_price(name: str, price: float) -> float:
+    return get_asset_meta().round_price(name, price)
+
@@ -9,24 +9,27 @@ Notes:
 - It is NOT a byte-for-byte port of the original Freqtrade strategy.
 """
 
-import json
-import logging
 import os
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Tuple
 
-import requests
-from eth_account import Account
-from hyperliquid.exchange import Exchange
-from hyperliquid.info import Info
-from hyperliquid.utils import constants
+from asset_meta import round_price, round_size
+from bot_logging import setup_logger
+from fill_sync import register_order
+from hl_client import SharedExchange, create_exchange, create_info
+import indicator_graph
+from indicator_graph import bollinger_nodes, ema_node, node, sma_node
+from kline_buffer import KlineBuffer
+import metrics
+from startup import report_startup
+from status_board import heartbeat, record_position, record_signal
+from trade_state import load_kline_snapshot, load_state, save_kline_snapshot, save_state
+from symbol_runner import SYMBOL_TIMEOUT, run_symbols
+from trade_journal import record_trade
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-WORKSPACE_ROOT = PROJECT_ROOT.parent
-LOG_DIR = WORKSPACE_ROOT / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 CONFIG = {
     "main_wallet": "",
@@ -45,6 +48,10 @@ CONFIG = {
     "maker_fee": 0.0001,
     "taker_fee": 0.00035,
     "min_profit_after_fee": 0.005,
+    # Universe mode: scan every liquid Hyperliquid perp instead of only `symbols`
+    # (options: see universe.UNIVERSE_DEFAULTS; requires numpy)
+    "universe_mode": False,
+    "universe": {},
 }
 
 # NFI-style parameters (default + optional per-symbol overrides)
@@ -87,60 +94,23 @@ NFI_SYMBOL_OVERRIDES = {
     }
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trader_nfi.log"),
-        logging.StreamHandler(),
-    ],
+# Parameters that change indicator values; symbols sharing them are scanned as one batch
+NFI_INDICATOR_PARAMS = (
+    "ema_fast",
+    "ema_trend",
+    "ema_long",
+    "rsi_fast",
+    "rsi_main",
+    "atr_period",
+    "bb_period",
+    "bb_stddev",
+    "volume_sma_period",
 )
-logger = logging.getLogger("NFITrader")
 
+# Status board uses the same LONG/SHORT/HOLD vocabulary as the other traders
+SIGNAL_SIDES = {"BUY": "LONG", "SELL": "SHORT"}
 
-def ema(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    multiplier = 2 / (period + 1)
-    out = [values[0]]
-    for price in values[1:]:
-        out.append(price * multiplier + out[-1] * (1 - multiplier))
-    return out
-
-
-def sma(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    out: List[float] = []
-    running = 0.0
-    for idx, v in enumerate(values):
-        running += v
-        if idx >= period:
-            running -= values[idx - period]
-        count = period if idx >= period - 1 else (idx + 1)
-        out.append(running / count)
-    return out
-
-
-def rolling_std(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    out: List[float] = []
-    for idx in range(len(values)):
-        start = max(0, idx - period + 1)
-        window = values[start : idx + 1]
-        mean = sum(window) / len(window)
-        variance = sum((x - mean) ** 2 for x in window) / len(window)
-        out.append(variance ** 0.5)
-    return out
-
-
-def bollinger_bands(values: List[float], period: int, std_mult: float) -> Tuple[List[float], List[float], List[float]]:
-    mid = sma(values, period)
-    std = rolling_std(values, period)
-    upper = [m + std_mult * s for m, s in zip(mid, std)]
-    lower = [m - std_mult * s for m, s in zip(mid, std)]
-    return mid, upper, lower
+logger = setup_logger("NFITrader", "trader_nfi.log")
 
 
 def rsi_wilder(values: List[float], period: int) -> List[float]:
@@ -196,6 +166,70 @@ def atr_wilder(highs: List[float], lows: List[float], closes: List[float], perio
     return out
 
 
+def nfi_entry_masks(arrays: Dict, params_list: List[Dict], allow_long, allow_short):
+    """Entry conditions of analyze_symbol on the last bar, vectorized over symbols.
+
+    `arrays` holds (symbols x bars) OHLCV matrices; all rows must share the
+    NFI_INDICATOR_PARAMS values. Thresholds may differ per symbol. Returns the
+    (long_ok, short_ok) boolean arrays.
+    """
+    import numpy as np
+    from universe import atr_wilder_2d, bollinger_bands_2d, ema_2d, rsi_wilder_2d, sma_2d
+
+    def col(name: str):
+        return np.array([float(p[name]) for p in params_list])
+
+    p0 = params_list[0]
+    closes = arrays["close"]
+    volumes = arrays["volume"]
+    price = closes[:, -1]
+    prev_close = closes[:, -2]
+
+    ema_fast = ema_2d(closes, int(p0["ema_fast"]))[:, -1]
+    ema_trend = ema_2d(closes, int(p0["ema_trend"]))[:, -1]
+    ema_long = ema_2d(closes, int(p0["ema_long"]))[:, -1]
+    rsi_fast_all = rsi_wilder_2d(closes, int(p0["rsi_fast"]))
+    rsi_fast, rsi_fast_prev = rsi_fast_all[:, -1], rsi_fast_all[:, -2]
+    rsi_main = rsi_wilder_2d(closes, int(p0["rsi_main"]))[:, -1]
+    atr_now = atr_wilder_2d(arrays["high"], arrays["low"], closes, int(p0["atr_period"]))[:, -1]
+    _, bb_upper, bb_lower = bollinger_bands_2d(closes, int(p0["bb_period"]), float(p0["bb_stddev"]))
+    bb_upper, bb_lower = bb_upper[:, -1], bb_lower[:, -1]
+    volume_sma = sma_2d(volumes, int(p0["volume_sma_period"]))[:, -1]
+
+    volume_ok = (volume_sma > 0) & (volumes[:, -1] >= volume_sma * col("min_volume_ratio"))
+    long_ok = (
+        np.asarray(allow_long, dtype=bool)
+        & (ema_trend > ema_long)
+        & (price > ema_long * col("regime_price_floor"))
+        & (
+            (price <= bb_lower * col("bb_touch_buffer"))
+            | (price <= ema_fast * col("ema_pullback_buffer"))
+        )
+        & (rsi_fast <= col("rsi_fast_buy"))
+        & (rsi_main <= col("rsi_main_buy"))
+        & volume_ok
+        & (price >= ema_long * (1.0 - col("max_breakdown_pct")))
+        & ((price >= prev_close) | (rsi_fast > rsi_fast_prev))
+    )
+    short_ok = (
+        np.asarray(allow_short, dtype=bool)
+        & col("enable_short").astype(bool)
+        & (ema_trend < ema_long)
+        & (price < ema_long * col("regime_price_ceiling"))
+        & (
+            (price >= bb_upper * col("bb_reject_buffer"))
+            | (price >= ema_fast * col("ema_bounce_buffer"))
+        )
+        & (rsi_fast >= col("rsi_fast_sell"))
+        & (rsi_main >= col("rsi_main_sell"))
+        & volume_ok
+        & (price <= ema_long * (1.0 + col("max_breakout_pct")))
+        & ((price <= prev_close) | (rsi_fast < rsi_fast_prev))
+    )
+    tradable = atr_now > 0
+    return long_ok & tradable, short_ok & tradable
+
+
 def load_hl_config() -> None:
     config_path = PROJECT_ROOT / "config" / ".hl_config"
     if not config_path.exists():
@@ -222,30 +256,40 @@ def load_hl_config() -> None:
 
 
 class NostalgiaForInfinityTrader:
-    def __init__(self) -> None:
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    def __init__(self, info=None, exchange=None) -> None:
+        # info/exchange may be shared instances injected by the multi-strategy runtime
+        self.info = info or create_info()
+        self.klines = KlineBuffer(self.info)
+        load_kline_snapshot("nfi", self.klines)
         self.account = None
-        self.exchange = None
+        self.exchange = exchange
         key = (CONFIG.get("api_private_key") or "").strip()
-        if key:
-            self.account = Account.from_key(key)
-            self.exchange = Exchange(
-                self.account,
-                constants.MAINNET_API_URL,
-                account_address=CONFIG["main_wallet"],
-            )
-        else:
+        if self.exchange is None and key:
+            self.exchange = SharedExchange(create_exchange(key, CONFIG["main_wallet"]))
+            self.account = self.exchange.wallet
+        elif self.exchange is None:
             logger.warning(
                 "API_PRIVATE_KEY 未配置：仅拉取行情与信号日志，不会向 Hyperliquid 下单"
             )
         self.last_loss_time = None
-        self.peak_balance = 0.0
+        # peak balance drives the drawdown guard, keep it across restarts
+        self.peak_balance = float(load_state("nfi").get("peak_balance", 0.0))
+        # klines fetched by the universe scan, consumed by process_symbol
+        self._prefetched: Dict[str, List[Dict]] = {}
 
     def _get_nfi_params(self, symbol: str) -> Dict[str, float]:
         params = dict(NFI_DEFAULTS)
         params.update(NFI_SYMBOL_OVERRIDES.get(symbol.upper(), {}))
         return params
 
+    def _allowed_sides(self, symbol: str) -> Tuple[bool, bool]:
+        by_symbol = CONFIG.get("trade_side_by_symbol") or {}
+        trade_side = str(by_symbol.get(symbol, CONFIG.get("trade_side", "both"))).lower()
+        return trade_side in {"both", "long_only", "long"}, trade_side in {"both", "short_only", "short"}
+
+    def _lookback(self, symbol: str) -> int:
+        return int(max(self._get_nfi_params(symbol)["ema_long"] + 40, 260))
+
     def _calc_position_size(self, confidence: float) -> float:
         max_size = CONFIG["max_position_usd"]
         size = round(max_size * confidence, 2)
@@ -338,26 +382,12 @@ class NostalgiaForInfinityTrader:
 
     def get_klines(self, symbol: str, interval: str = "1h", limit: int = 260) -> List[Dict]:
         try:
-            url = "https://api.hyperliquid.xyz/info"
             end_time = int(time.time() * 1000)
             hours = max(limit, 100)
             start_time = end_time - (hours * 60 * 60 * 1000)
 
-            payload = {
-                "type": "candleSnapshot",
-                "req": {
-                    "coin": symbol,
-                    "interval": interval,
-                    "startTime": start_time,
-                    "endTime": end_time,
-                },
-            }
-
-            resp = requests.post(url, json=payload, timeout=10)
-            if resp.status_code != 200:
-                return []
-
-            data = resp.json()
+            # rolling buffer: only bars since the last seen one are requested
+            data = self.klines.get(symbol, interval, start_time, end_time)
             candles = []
             for c in data:
                 candles.append(
@@ -375,10 +405,74 @@ class NostalgiaForInfinityTrader:
             logger.error("failed to fetch klines %s: %s", symbol, exc)
             return []
 
-    def analyze_symbol(self, symbol: str) -> Dict:
+    def scan_universe(self) -> List[str]:
+        """Universe mode: prefilter all perps by liquidity with one metaAndAssetCtxs
+        call, fetch candles for the survivors through a bounded pool and evaluate the
+        entry conditions for every symbol at once. Returns the symbols with a signal."""
+        from universe import UNIVERSE_DEFAULTS, fetch_candles_bulk, fetch_universe, stack_klines
+
+        opts = {**UNIVERSE_DEFAULTS, **(CONFIG.get("universe") or {})}
+        started = time.time()
+        try:
+            liquid = fetch_universe(
+                self.info,
+                float(opts["min_day_volume_usd"]),
+                float(opts["min_open_interest_usd"]),
+                int(opts["max_symbols"]),
+            )
+        except Exception as exc:
+            logger.error("failed to fetch universe, fall back to configured symbols: %s", exc)
+            return list(CONFIG["symbols"])
+
+        symbols = list(dict.fromkeys(list(CONFIG["symbols"]) + liquid))
+        klines = fetch_candles_bulk(
+            lambda s: self.get_klines(s, interval=CONFIG["timeframe"], limit=self._lookback(s)),
+            symbols,
+            int(opts["fetch_workers"]),
+        )
+        klines = {
+            s: k for s, k in klines.items() if len(k) >= self._get_nfi_params(s)["ema_long"] + 5
+        }
+
+        hits = set()
+        for batch, arrays in stack_klines(klines, min_bars=2):
+            groups: Dict[tuple, List[int]] = {}
+            for row, symbol in enumerate(batch):
+                params = self._get_nfi_params(symbol)
+                groups.setdefault(tuple(params[k] for k in NFI_INDICATOR_PARAMS), []).append(row)
+            for rows in groups.values():
+                names = [batch[r] for r in rows]
+                sides = [self._allowed_sides(s) for s in names]
+                long_ok, short_ok = nfi_entry_masks(
+                    {field: values[rows] for field, values in arrays.items()},
+                    [self._get_nfi_params(s) for s in names],
+                    [a for a, _ in sides],
+                    [b for _, b in sides],
+                )
+                hits.update(s for s, hit in zip(names, long_ok | short_ok) if hit)
+
+        selected = [s for s in symbols if s in hits][: int(opts["max_signals"])]
+        self._prefetched = {s: klines[s] for s in selected}
+        logger.info(
+            "universe scan: %d liquid perps, %d evaluated, %d signals (%s) in %.2fs",
+            len(liquid),
+            len(klines),
+            len(hits),
+            ",".join(selected) or "-",
+            time.time() - started,
+        )
+        return selected
+
+    def cycle_symbols(self) -> List[str]:
+        """Symbols to run through process_symbol this cycle."""
+        if CONFIG.get("universe_mode"):
+            return self.scan_universe()
+        return list(CONFIG["symbols"])
+
+    def analyze_symbol(self, symbol: str, klines: List[Dict] = None) -> Dict:
         params = self._get_nfi_params(symbol)
-        lookback = int(max(params["ema_long"] + 40, 260))
-        klines = self.get_klines(symbol, interval=CONFIG["timeframe"], limit=lookback)
+        if klines is None:
+            klines = self.get_klines(symbol, interval=CONFIG["timeframe"], limit=self._lookback(symbol))
 
         if len(klines) < params["ema_long"] + 5:
             return {"action": "HOLD", "reason": f"{symbol} not enough candles"}
@@ -388,14 +482,18 @@ class NostalgiaForInfinityTrader:
         lows = [k["low"] for k in klines]
         volumes = [k["volume"] for k in klines]
 
-        ema_fast = ema(closes, int(params["ema_fast"]))
-        ema_trend = ema(closes, int(params["ema_trend"]))
-        ema_long = ema(closes, int(params["ema_long"]))
-        rsi_fast = rsi_wilder(closes, int(params["rsi_fast"]))
-        rsi_main = rsi_wilder(closes, int(params["rsi_main"]))
-        atr_vals = atr_wilder(highs, lows, closes, int(params["atr_period"]))
-        _, bb_upper, bb_lower = bollinger_bands(closes, int(params["bb_period"]), float(params["bb_stddev"]))
-        volume_sma = sma(volumes, int(params["volume_sma_period"]))
+        # Indicators come from the shared graph: a node identical to another strategy's (same function, params, candles) is computed once
+        src = indicator_graph.source(close=closes, high=highs, low=lows, volume=volumes)
+        ema_fast, ema_trend, ema_long = src.get(
+            ema_node("close", int(params["ema_fast"])),
+            ema_node("close", int(params["ema_trend"])),
+            ema_node("close", int(params["ema_long"])),
+        )
+        rsi_fast = src.get(node(rsi_wilder, ("close",), int(params["rsi_fast"])))
+        rsi_main = src.get(node(rsi_wilder, ("close",), int(params["rsi_main"])))
+        atr_vals = src.get(node(atr_wilder, ("high", "low", "close"), int(params["atr_period"])))
+        _, bb_upper, bb_lower = src.get(*bollinger_nodes("close", int(params["bb_period"]), float(params["bb_stddev"])))
+        volume_sma = src.get(sma_node("volume", int(params["volume_sma_period"])))
 
         i = len(closes) - 1
         price = closes[i]
@@ -404,10 +502,7 @@ class NostalgiaForInfinityTrader:
             return {"action": "HOLD", "reason": f"{symbol} ATR is zero"}
 
         short_enabled = bool(params.get("enable_short", True))
-        by_symbol = CONFIG.get("trade_side_by_symbol") or {}
-        trade_side = str(by_symbol.get(symbol, CONFIG.get("trade_side", "both"))).lower()
-        allow_long = trade_side in {"both", "long_only", "long"}
-        allow_short = trade_side in {"both", "short_only", "short"}
+        allow_long, allow_short = self._allowed_sides(symbol)
         regime_ok = (
             ema_trend[i] > ema_long[i]
             and price > ema_long[i] * float(params["regime_price_floor"])
@@ -558,12 +653,15 @@ class NostalgiaForInfinityTrader:
             return []
 
     def cancel_all_orders(self, symbol: str) -> None:
+        """Cancel every open order on the symbol in one batched request."""
         if not self.exchange:
             return
         try:
-            for order in self.get_open_orders():
-                if order.get("coin") == symbol:
-                    self.exchange.cancel(symbol, order.get("oid"))
+            cancels = [{"coin": symbol, "oid": order["oid"]}
+                       for order in self.get_open_orders() if order.get("coin") == symbol]
+            if cancels:
+                result = self.exchange.bulk_cancel(cancels)
+                logger.info("cancelled %d orders %s: %s", len(cancels), symbol, result)
         except Exception as exc:
             logger.error("failed to cancel orders %s: %s", symbol, exc)
 
@@ -580,6 +678,8 @@ class NostalgiaForInfinityTrader:
             logger.info("monitor-only mode, skip order %s", symbol)
             return {"status": "skipped", "message": "no signing key"}
         try:
+            size = round_size(symbol, size)
+            price = round_price(symbol, price)
             result = self.exchange.order(
                 symbol,
                 is_buy,
@@ -615,53 +715,86 @@ class NostalgiaForInfinityTrader:
         return True
 
     def log_trade(self, signal: Dict, result: Dict) -> None:
-        log_entry = {
-            "time": datetime.now().isoformat(),
-            "signal": signal,
-            "result": result,
-        }
-        log_file = LOG_DIR / "trades_nfi.jsonl"
-        with log_file.open("a") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        register_order("nfi", result, signal["symbol"])
+        record_trade(
+            "nfi",
+            signal["symbol"],
+            SIGNAL_SIDES.get(signal["action"], signal["action"]),
+            size=signal["size"] / signal["entry_price"],
+            price=signal["entry_price"],
+            status=result.get("status", "unknown"),
+            reason=signal["reason"],
+            confidence=signal["confidence"],
+            stop_loss=signal["stop_loss"],
+            take_profit=signal["take_profit"],
+        )
 
-    def run_cycle(self) -> None:
+    def prepare_cycle(self) -> bool:
+        """Account-level checks shared by every symbol in this cycle."""
         logger.info("=" * 50)
         logger.info("start NFI cycle")
 
         if not self.can_trade():
             logger.info("risk guard blocked this cycle")
+            heartbeat("nfi")
+            return False
+        return True
+
+    def run_cycle(self) -> None:
+        if not self.prepare_cycle():
+            return
+        try:
+            # Symbols are evaluated concurrently; each has its own timeout.
+            run_symbols("nfi", self.process_symbol, self.cycle_symbols(),
+                        CONFIG.get("symbol_timeout", SYMBOL_TIMEOUT), logger)
+        finally:
+            self.finish_cycle()
+
+    def finish_cycle(self) -> None:
+        """Checkpoint candle buffers and the drawdown peak for a warm restart."""
+        save_kline_snapshot("nfi", self.klines)
+        save_state("nfi", peak_balance=self.peak_balance)
+
+    def process_symbol(self, symbol: str) -> None:
+        with metrics.span("nfi", "position", symbol):
+            in_position = self.has_position(symbol)
+        record_position("nfi", symbol, in_position)
+        if in_position:
+            logger.info("%s already has position, skip", symbol)
             return
 
-        for symbol in CONFIG["symbols"]:
-            if self.has_position(symbol):
-                logger.info("%s already has position, skip", symbol)
-                continue
-
-            signal = self.analyze_symbol(symbol)
-            if signal["action"] == "HOLD":
-                logger.info("%s", signal["reason"])
-                continue
-
-            if signal["size"] < CONFIG["min_order_value"]:
-                logger.info("%s position too small %.2f, skip", symbol, signal["size"])
-                continue
-
-            logger.info("NFI signal %s: %s", symbol, signal["reason"])
-            logger.info("  confidence: %.1f%%", signal["confidence"] * 100)
-            logger.info("  position: $%.2f", signal["size"])
-            logger.info("  entry: $%.2f", signal["entry_price"])
-            logger.info("  stop: $%.2f", signal["stop_loss"])
-            logger.info("  take profit: $%.2f", signal["take_profit"])
-
-            fee = signal.get("fees", {})
-            if fee:
-                logger.info(
-                    "  net: $%.2f (%.2f%%) fee: $%.2f",
-                    fee.get("net_profit", 0.0),
-                    fee.get("net_profit_pct", 0.0),
-                    fee.get("total_fees", 0.0),
-                )
+        klines = self._prefetched.pop(symbol, None)
+        if klines is None:
+            with metrics.span("nfi", "klines", symbol):
+                klines = self.get_klines(symbol, interval=CONFIG["timeframe"], limit=self._lookback(symbol))
+        with metrics.span("nfi", "indicators", symbol):
+            signal = self.analyze_symbol(symbol, klines)
+        record_signal("nfi", symbol, SIGNAL_SIDES.get(signal["action"], signal["action"]), signal["reason"])
+        if signal["action"] == "HOLD":
+            logger.info("%s", signal["reason"])
+            return
 
+        if signal["size"] < CONFIG["min_order_value"]:
+            logger.info("%s position too small %.2f, skip", symbol, signal["size"])
+            return
+
+        logger.info("NFI signal %s: %s", symbol, signal["reason"])
+        logger.info("  confidence: %.1f%%", signal["confidence"] * 100)
+        logger.info("  position: $%.2f", signal["size"])
+        logger.info("  entry: $%.2f", signal["entry_price"])
+        logger.info("  stop: $%.2f", signal["stop_loss"])
+        logger.info("  take profit: $%.2f", signal["take_profit"])
+
+        fee = signal.get("fees", {})
+        if fee:
+            logger.info(
+                "  net: $%.2f (%.2f%%) fee: $%.2f",
+                fee.get("net_profit", 0.0),
+                fee.get("net_profit_pct", 0.0),
+                fee.get("total_fees", 0.0),
+            )
+
+        with metrics.span("nfi", "order", symbol):
             self.cancel_all_orders(symbol)
             is_buy = signal["action"] == "BUY"
             result = self.place_order(
@@ -670,12 +803,12 @@ class NostalgiaForInfinityTrader:
                 signal["size"] / signal["entry_price"],
                 signal["entry_price"],
             )
-            self.log_trade(signal, result)
+        self.log_trade(signal, result)
 
-            if result.get("status") == "ok":
-                logger.info("%s order submitted", symbol)
-            else:
-                logger.error("%s order failed: %s", symbol, result)
+        if result.get("status") == "ok":
+            logger.info("%s order submitted", symbol)
+        else:
+            logger.error("%s order failed: %s", symbol, result)
 
     def run(self) -> None:
         logger.info("NostalgiaForInfinity-inspired trader started")
@@ -724,6 +857,7 @@ def main() -> None:
         )
 
     trader = NostalgiaForInfinityTrader()
+    report_startup(logger, "nfi")
     trader.run()
 
 
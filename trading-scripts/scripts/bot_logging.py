@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+交易机器人日志配置
+
+每个策略使用独立的命名 logger 和独立日志文件（logs/<log_file>），
+多个策略在同一进程运行时互不串写（不再依赖 logging.basicConfig 的全局配置）。
+
+日志是异步写的：
+- 交易线程里 logger 只把 LogRecord 放进无界队列（不阻塞），格式化和写文件 / 控制台都在后台线程
+- %-style 参数在后台线程才格式化（参数是可变对象时在入队前格式化，避免写出的是被改过的值）
+- 日志文件按大小轮转，旧文件 gzip 压缩（trader_nfi.log.1.gz ...），不再无限增长
+- 每个策略的日志级别可单独配置，低于级别的日志在入队前就被丢弃:
+    LOG_LEVEL=INFO                                    # 全局默认
+    LOG_LEVELS="NFITrader=DEBUG,trader_05_adx=WARNING"  # 按 logger 名或日志文件名（不含 .log）
+- 没有自己日志文件的模块 logger（trade_state、KlineBuffer、Execution、AssetMeta、StatusBoard ...）
+  经根 logger 进同一个队列，写到本进程的主日志：单独运行时是机器人自己的日志，运行时里是 strategy_runtime.log
+- 进程退出时（atexit）把队列里剩余的日志写完
+"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+WORKSPACE_ROOT = PROJECT_ROOT.parent
+# TRADING_LOG_DIR: 模拟盘等独立运行的日志目录
+LOG_DIR = Path(os.getenv("TRADING_LOG_DIR") or WORKSPACE_ROOT / "logs")
+LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# 单个日志文件上限和保留的压缩备份数
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+# 入队时可以留到后台再格式化的参数类型（不可变）
+_LAZY_ARG_TYPES = (str, int, float, bool, type(None))
+
+_log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_targets: Dict[str, List[logging.Handler]] = {}
+_listener = None
+_listener_lock = threading.Lock()
+# 模块 logger 的日志写到哪个 logger 的 handler（进程的主日志）
+_default_target: Optional[str] = None
+_root_handler: Optional[logging.Handler] = None
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _parse_levels(value: str) -> Dict[str, int]:
+    levels = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        key, level = item.split("=", 1)
+        levels[key.strip()] = logging.getLevelName(level.strip().upper())
+    return {k: v for k, v in levels.items() if isinstance(v, int)}
+
+
+def resolve_level(name: str, log_file: str, default: int = logging.INFO) -> int:
+    """按 LOG_LEVELS / LOG_LEVEL 环境变量决定某个策略的日志级别"""
+    levels = _parse_levels(os.getenv("LOG_LEVELS", ""))
+    for key in (name, Path(log_file).stem):
+        if key in levels:
+            return levels[key]
+    global_level = logging.getLevelName(os.getenv("LOG_LEVEL", "").upper())
+    return global_level if isinstance(global_level, int) else default
+
+
+def _args_tuple(args) -> tuple:
+    return tuple(args.values()) if isinstance(args, dict) else tuple(args)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """只做入队前必须在调用线程完成的事（异常堆栈、可变参数），其余留给后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args and not all(isinstance(a, _LAZY_ARG_TYPES) for a in _args_tuple(record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _fallback_handlers() -> List[logging.Handler]:
+    """模块 logger 的去处：主日志的 handler；根 logger 已经有别人配的 handler（如 basicConfig）时不再重复打到控制台"""
+    handlers = _targets.get(_default_target, [])
+    if any(h is not _root_handler for h in logging.root.handlers):
+        handlers = [h for h in handlers if isinstance(h, logging.FileHandler)]
+    return handlers
+
+
+class _RoutingHandler(logging.Handler):
+    """后台线程里把记录分发给对应 logger 的文件 / 控制台 handler；没有自己 handler 的发到主日志"""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        handlers = _targets.get(record.name)
+        if handlers is None:
+            handlers = _fallback_handlers()
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+def _ensure_listener() -> None:
+    global _listener, _root_handler
+    with _listener_lock:
+        if _listener is None:
+            _listener = logging.handlers.QueueListener(_log_queue, _RoutingHandler())
+            _listener.start()
+            atexit.register(flush_logs)
+        if _root_handler is None:
+            # 根 logger 没人配置时（默认 WARNING）放到 LOG_LEVEL，模块 logger 的 INFO 才不会被丢掉
+            if not logging.root.handlers:
+                logging.root.setLevel(resolve_level("root", "root"))
+            _root_handler = _LazyQueueHandler(_log_queue)
+            logging.root.addHandler(_root_handler)
+
+
+def flush_logs() -> None:
+    """停止后台线程并写完队列里的日志（进程退出时自动调用）"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            for handlers in _targets.values():
+                for handler in handlers:
+                    handler.flush()
+
+
+def setup_logger(name: str, log_file: str, level: int = None, default: bool = False) -> logging.Logger:
+    """返回写入 logs/<log_file> 和控制台的命名 logger，重复调用不会重复挂 handler
+
+    进程里第一个建的 logger（或 default=True 的）是主日志，模块 logger 的日志也写到这里
+    """
+    global _default_target
+    logger = logging.getLogger(name)
+    if default or _default_target is None:
+        _default_target = name
+    if logger.handlers:
+        return logger
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_DIR / log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.namer = lambda path: f"{path}.gz"
+    file_handler.rotator = _gzip_rotator
+    handlers = [file_handler, logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    _targets[name] = handlers
+
+    _ensure_listener()
+    logger.addHandler(_LazyQueueHandler(_log_queue))
+    logger.setLevel(level if level is not None else resolve_level(name, log_file))
+    logger.propagate = False
+    return logger
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+接口录制 / 回放 — 把 /info 查询的请求和返回存成压缩的 cassette，本地回放做离线压测
+
+录制（不改代码，设置环境变量）:
+- HL_RECORD=1 写到 memory/cassettes/<脚本>-<时间>-<pid>.jsonl.gz；HL_RECORD=<目录> 写到该目录，
+  HL_RECORD=<文件>.jsonl.gz 追加到该文件
+- 经过 hl_client 创建的 Info / Exchange（所有机器人）和 generate_realtime_data.py 的请求都会录制
+- 默认录制 candleSnapshot / clearinghouseState / spotClearinghouseState / allMids / openOrders /
+  frontendOpenOrders，HL_RECORD_TYPES=逗号分隔 可以改；meta / spotMeta 取自本地元数据缓存，
+  每个文件录一份（回放时 SDK 和 asset_meta 要用）
+- 每行一条 {"t", "elapsed", "request", "response"}，gzip 压缩；每 FLUSH_EVERY 条刷一次盘，另外每 FLUSH_SECONDS 秒定时刷
+
+回放（replay 子命令）:
+- 本地 HTTP 服务，HL_API_URL 指过去即可（机器人、generate_realtime_data.py 都认这个变量）
+- 请求按 去掉 startTime / endTime（和空的 dex）后的请求体 匹配，同一个请求按录制顺序依次返回，用完后一直返回最后一条
+  （--loop 从头循环）
+- K线时间戳整体平移 (回放开始 − 录制开始)（取整到K线周期），去掉请求 startTime 之前的，机器人看到的是
+  当前时间的行情，不会因为录制得早被当成过期数据丢掉，增量拉取也能接上；--keep-timestamps 保持录制时的值
+- 没录到的请求返回 404；/exchange 只读，返回 err；--latency-ms / --jitter-ms 注入延迟，
+  --recorded-latency 按录制时的耗时（× 倍数）延迟
+- GET /stats 返回各类请求的命中 / 未命中次数
+
+检查（check 子命令）:
+- 在本进程起回放服务，每个录到的 币种 / 周期 用 KlineBuffer 按录制时的窗口连拉两轮（全量 + 增量），
+  K线不少于 --min-bars（机器人的"数据不足"门槛）才算能跑到指标计算，否则退出码 1
+
+用法:
+  HL_RECORD=1 python generate_realtime_data.py
+  HL_RECORD=1 python scripts/strategy_runtime.py --strategies all
+  python scripts/cassette.py stats memory/cassettes
+  python scripts/cassette.py check memory/cassettes
+  python scripts/cassette.py replay memory/cassettes --latency-ms 30 --jitter-ms 20
+  HL_API_URL=http://127.0.0.1:8898 python scripts/strategy_runtime.py --strategies all
+"""
+
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("Cassette")
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_DIR = WORKSPACE_ROOT / "memory" / "cassettes"
+SUFFIX = ".jsonl.gz"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8898
+
+RECORD_TYPES = ("candleSnapshot", "clearinghouseState", "spotClearinghouseState", "allMids", "openOrders",
+                "frontendOpenOrders")
+# 匹配请求时忽略的字段（随当前时间变化，candleSnapshot 的在 req 里）
+IGNORED_FIELDS = ("startTime", "endTime")
+FLUSH_EVERY = 50
+FLUSH_SECONDS = 5.0
+# 机器人 len(klines["close"]) < 50 时记"数据不足"并跳过
+MIN_BARS = 50
+
+
+def _strip(body: Dict) -> Dict:
+    # dex="" 是默认值，SDK 会带上，直接请求的脚本不带
+    return {k: _strip(v) if isinstance(v, dict) else v for k, v in body.items()
+            if k not in IGNORED_FIELDS and not (k == "dex" and v == "")}
+
+
+def request_key(body: Dict) -> str:
+    return json.dumps(_strip(body or {}), sort_keys=True)
+
+
+# ========== 录制 ==========
+
+class Recorder:
+    """线程安全地把请求 / 返回追加到一个 gzip 文件"""
+
+    def __init__(self, path: Path, types: Tuple[str, ...] = RECORD_TYPES):
+        self.path = path
+        self.types = frozenset(types)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._meta_recorded = False
+
+    def wants(self, body: Optional[Dict]) -> bool:
+        return isinstance(body, dict) and body.get("type") in self.types
+
+    def record(self, body: Dict, response, seconds: float = 0.0, force: bool = False) -> None:
+        if not force and not self.wants(body):
+            return
+        line = json.dumps({"t": int(time.time() * 1000), "elapsed": round(seconds, 6), "request": body,
+                           "response": response}, separators=(",", ":"))
+        with self._lock:
+            try:
+                if self._file is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._file = gzip.open(self.path, "at", encoding="utf-8")
+                    threading.Thread(target=self._flush_loop, name="cassette", daemon=True).start()
+                self._file.write(line + "\n")
+                self.count += 1
+                self._pending += 1
+                if self._pending >= FLUSH_EVERY or time.monotonic() - self._last_flush >= FLUSH_SECONDS:
+                    self._flush_locked()
+            except OSError as e:
+                logger.warning("写入 cassette 失败 %s: %s", self.path, e)
+
+    def record_meta(self, meta: Dict, spot_meta: Dict) -> None:
+        """每个文件录一份元数据（SDK 构造时走本地缓存，不会经过 post）"""
+        if self._meta_recorded:
+            return
+        self._meta_recorded = True
+        self.record({"type": "meta"}, meta, force=True)
+        self.record({"type": "spotMeta"}, spot_meta, force=True)
+
+    def _flush_locked(self) -> None:
+        self._file.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _flush_loop(self) -> None:
+        # 被 SIGTERM 杀掉时不走 atexit，定时刷盘最多丢 FLUSH_SECONDS 秒
+        stop = threading.Event()
+        while not stop.wait(FLUSH_SECONDS):
+            with self._lock:
+                if self._file is None:
+                    return
+                if self._pending:
+                    self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_recorder: Optional[Recorder] = None
+_recorder_lock = threading.Lock()
+
+
+def _record_path(target: str) -> Path:
+    if target.lower() in ("1", "true", "yes"):
+        directory = DEFAULT_DIR
+    elif target.endswith(".gz"):
+        return Path(target)
+    else:
+        directory = Path(target)
+    script = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] not in ("", "-c") else "python"
+    return directory / f"{script}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}{SUFFIX}"
+
+
+def recorder() -> Optional[Recorder]:
+    """HL_RECORD 设置时返回进程内共享的录制器，否则 None"""
+    global _recorder
+    target = os.getenv("HL_RECORD", "").strip()
+    if not target or target.lower() in ("0", "false", "no"):
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            types = tuple(t.strip() for t in os.getenv("HL_RECORD_TYPES", "").split(",") if t.strip())
+            _recorder = Recorder(_record_path(target), types or RECORD_TYPES)
+            atexit.register(_recorder.close)
+            logger.info("接口录制到 %s", _recorder.path)
+        return _recorder
+
+
+def record_api(client, meta: Optional[Dict] = None, spot_meta: Optional[Dict] = None):
+    """给 SDK 的 Info / Exchange 实例的 post 加录制（只录 /info）；没开启录制时原样返回"""
+    rec = recorder()
+    if rec is None:
+        return client
+    if meta is not None and spot_meta is not None:
+        rec.record_meta(meta, spot_meta)
+    post = client.post
+
+    def recorded_post(url_path: str, payload=None):
+        if url_path != "/info" or not rec.wants(payload):
+            return post(url_path, payload)
+        started = time.perf_counter()
+        result = post(url_path, payload)
+        rec.record(payload, result, time.perf_counter() - started)
+        return result
+
+    client.post = recorded_post
+    return client
+
+
+# ========== 回放 ==========
+
+def cassette_files(paths: List[str]) -> List[Path]:
+    files: List[Path] = []
+    for p in map(Path, paths):
+        files.extend(sorted(p.glob(f"*{SUFFIX}")) if p.is_dir() else [p])
+    return files
+
+
+def entries(path: Path) -> Iterator[Dict]:
+    """逐条读取；录制进程被杀时文件结尾可能不完整，读到哪算哪"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for raw in f:
+                try:
+                    yield json.loads(raw)
+                except ValueError:
+                    logger.warning("%s: 跳过损坏的一行", path.name)
+    except (EOFError, OSError) as e:
+        logger.warning("%s: 文件不完整，只读到这里 (%s)", path.name, e)
+
+
+Tape = Dict[str, List[Tuple[int, float, object]]]
+
+
+def load(paths: List[str]) -> Tape:
+    """请求 -> [(录制时刻 ms, 录制耗时, 返回), ...]（按录制顺序）"""
+    tape: Tape = defaultdict(list)
+    for path in cassette_files(paths):
+        for entry in entries(path):
+            tape[request_key(entry["request"])].append((entry.get("t", 0), entry.get("elapsed", 0.0),
+                                                        entry["response"]))
+    return dict(tape)
+
+
+def shift_candles(body: Dict, response, offset_ms: int):
+    """candleSnapshot 的返回整体平移 offset_ms（取整到K线周期），去掉请求 startTime 之前的；其他请求原样返回"""
+    if body.get("type") != "candleSnapshot" or not isinstance(response, list) or not response:
+        return response
+    step = max(int(response[0]["T"]) - int(response[0]["t"]) + 1, 1)
+    shift = offset_ms - offset_ms % step
+    start = (body.get("req") or {}).get("startTime")
+    # 不按 endTime 截：回放比录制跑得快时，后面的记录会落在"未来"，截掉反而让机器人缺最新的K线
+    return [dict(c, t=int(c["t"]) + shift, T=int(c["T"]) + shift) for c in response
+            if start is None or int(c["t"]) + shift >= start]
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, tape: Tape, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 recorded_latency: float = 0.0, loop: bool = False, shift_times: bool = True):
+        super().__init__(address, ReplayHandler)
+        self.tape = tape
+        self.shift_times = shift_times
+        recorded = [t for items in tape.values() for t, _, _ in items if t]
+        # 平移量 = 回放开始 − 录制开始；--loop 每转一圈再加一段录制时长，K线时间不会倒退
+        self.recorded_start = min(recorded, default=0)
+        self.recorded_span = max(recorded, default=0) - self.recorded_start
+        self.started_ms = int(time.time() * 1000)
+        self.laps: Dict[str, int] = defaultdict(int)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.recorded_latency = recorded_latency
+        self.loop = loop
+        self.cursors: Dict[str, int] = defaultdict(int)
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def lookup(self, body: Dict) -> Tuple[bool, float, object]:
+        key = request_key(body)
+        kind = str(body.get("type", "unknown"))
+        entries = self.tape.get(key)
+        with self._lock:
+            if not entries:
+                self.misses[kind] += 1
+                return False, 0.0, None
+            i = self.cursors[key]
+            lap = self.laps[key]
+            if self.loop:
+                self.cursors[key] = (i + 1) % len(entries)
+                self.laps[key] += self.cursors[key] == 0
+            else:
+                self.cursors[key] = min(i + 1, len(entries) - 1)
+            self.hits[kind] += 1
+        _, elapsed, response = entries[i]
+        if self.shift_times and self.recorded_start:
+            offset = self.started_ms - self.recorded_start + lap * (self.recorded_span + 1)
+            response = shift_candles(body, response, offset)
+        return True, elapsed, response
+
+    def delay(self, recorded: float) -> None:
+        seconds = (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000 + recorded * self.recorded_latency
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": dict(self.hits), "misses": dict(self.misses)}
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: ReplayServer
+
+    def log_message(self, fmt, *args) -> None:
+        logger.debug(fmt, *args)
+
+    def _reply(self, code: int, payload) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, code: int, msg: str) -> None:
+        # SDK 的 API._handle_exception 按 code / msg / data 解析 4xx
+        self._reply(code, {"code": None, "msg": msg, "data": None})
+
+    def do_POST(self) -> None:
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            self._error(400, "invalid json body")
+            return
+        if self.path == "/exchange":
+            self.server.delay(0.0)
+            self._reply(200, {"status": "err", "response": "replay server is read-only"})
+            return
+        if self.path != "/info" or not isinstance(body, dict):
+            self._error(404, f"unknown path {self.path}")
+            return
+        found, elapsed, response = self.server.lookup(body)
+        self.server.delay(elapsed)
+        if not found:
+            self._error(404, f"not in cassette: {request_key(body)}")
+            return
+        self._reply(200, response)
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/stats"):
+            self._reply(200, self.server.stats())
+        else:
+            self._error(404, f"unknown path {self.path}")
+
+
+def replay(args) -> int:
+    tape = load(args.cassettes)
+    if not tape:
+        print(f"没有可回放的记录: {' '.join(args.cassettes)}")
+        return 1
+    server = ReplayServer((args.host, args.port), tape, args.latency_ms, args.jitter_ms, args.recorded_latency,
+                          args.loop, not args.keep_timestamps)
+    logger.info("回放 http://%s:%d | %d 种请求, %d 条记录 | 延迟 %.0fms + 抖动 %.0fms + 录制耗时 ×%g%s",
+                args.host, args.port, len(tape), sum(len(v) for v in tape.values()), args.latency_ms,
+                args.jitter_ms, args.recorded_latency, " | 循环" if args.loop else "")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats(), ensure_ascii=False, indent=2))
+    return 0
+
+
+def check(args) -> int:
+    """本进程起回放服务，每个 币种 / 周期 按录制窗口走两轮 KlineBuffer，看K线够不够算指标"""
+    from hyperliquid.info import Info
+
+    from kline_buffer import KlineBuffer
+
+    tape = load(args.cassettes)
+    windows: Dict[Tuple[str, str], int] = {}
+    for path in cassette_files(args.cassettes):
+        for entry in entries(path):
+            req = entry["request"].get("req") or {}
+            if entry["request"].get("type") != "candleSnapshot" or "startTime" not in req:
+                continue
+            key = (req["coin"], req["interval"])
+            windows[key] = max(windows.get(key, 0), int(req.get("endTime") or entry["t"]) - int(req["startTime"]))
+    if not windows:
+        print(f"没有录到 candleSnapshot: {' '.join(args.cassettes)}")
+        return 1
+
+    server = ReplayServer((DEFAULT_HOST, 0), tape)
+    threading.Thread(target=server.serve_forever, name="cassette-check", daemon=True).start()
+    meta = tape.get(request_key({"type": "meta"}), [(0, 0.0, None)])[0][2]
+    spot_meta = tape.get(request_key({"type": "spotMeta"}), [(0, 0.0, None)])[0][2]
+    try:
+        info = Info(f"http://{DEFAULT_HOST}:{server.server_address[1]}", skip_ws=True, meta=meta,
+                    spot_meta=spot_meta)
+        buffer = KlineBuffer(info)
+        failed = 0
+        for (coin, interval), window in sorted(windows.items()):
+            bars = []
+            for _ in range(2):
+                end_time = int(time.time() * 1000)
+                try:
+                    bars.append(len(buffer.get(coin, interval, end_time - window, end_time)))
+                except Exception as e:
+                    logger.warning("%s %s 拉取K线失败: %s", coin, interval, e)
+                    bars.append(0)
+            ok = min(bars) >= args.min_bars
+            failed += not ok
+            print(f"{'OK ' if ok else 'BAD'} {coin:<8}{interval:<5} 窗口 {window / 3_600_000:.0f}h | "
+                  f"K线 全量 {bars[0]} / 增量 {bars[1]}（至少 {args.min_bars}）")
+        print(f"KlineBuffer {dict(buffer.stats)} | 回放 {json.dumps(server.stats(), ensure_ascii=False)}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 1 if failed else 0
+
+
+def stats(args) -> int:
+    files = cassette_files(args.cassettes)
+    counts: Dict[str, int] = defaultdict(int)
+    elapsed: Dict[str, float] = defaultdict(float)
+    keys: Dict[str, set] = defaultdict(set)
+    for path in files:
+        for entry in entries(path):
+            kind = entry["request"].get("type", "unknown")
+            counts[kind] += 1
+            elapsed[kind] += entry.get("elapsed", 0.0)
+            keys[kind].add(request_key(entry["request"]))
+    size = sum(p.stat().st_size for p in files)
+    print(f"{len(files)} 个文件, {size / 1e6:.1f} MB")
+    print(f"{'请求':<24}{'条数':>8}{'不同请求':>10}{'平均耗时':>12}")
+    for kind in sorted(counts):
+        print(f"{kind:<24}{counts[kind]:>8}{len(keys[kind]):>10}{elapsed[kind] / counts[kind] * 1000:>10.0f}ms")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="接口录制回放")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_replay = sub.add_parser("replay", help="启动回放服务")
+    p_replay.add_argument("cassettes", nargs="+", help="cassette 文件或目录")
+    p_replay.add_argument("--host", default=DEFAULT_HOST)
+    p_replay.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_replay.add_argument("--latency-ms", type=float, default=0.0, help="每个请求的固定延迟")
+    p_replay.add_argument("--jitter-ms", type=float, default=0.0, help="每个请求额外的随机延迟上限")
+    p_replay.add_argument("--recorded-latency", type=float, default=0.0, metavar="X",
+                          help="再加上录制时的耗时 × X（1 = 按原样重现网络延迟）")
+    p_replay.add_argument("--loop", action="store_true", help="同一请求的记录用完后从头循环")
+    p_replay.add_argument("--keep-timestamps", action="store_true", help="K线时间戳保持录制时的值，不平移到当前")
+
+    p_check = sub.add_parser("check", help="检查回放的K线够不够机器人算指标")
+    p_check.add_argument("cassettes", nargs="+", help="cassette 文件或目录")
+    p_check.add_argument("--min-bars", type=int, default=MIN_BARS)
+
+    p_stats = sub.add_parser("stats", help="统计 cassette 内容")
+    p_stats.add_argument("cassettes", nargs="+", help="cassette 文件或目录")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.command == "replay":
+        return replay(args)
+    if args.command == "check":
+        return check(args)
+    return stats(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1091 @@
+#!/usr/bin/env python3
+"""
+本地模拟交易所 — 实现机器人用到的 Info / Exchange 接口，离线压测和跑机器人
+
+test_*_order.py 只能对主网挂离谱价格的单，没法离线压测。这里用标准库起一个 HTTP + WebSocket 服务，
+SDK 的 Info / Exchange 直接连（HL_API_URL=http://127.0.0.1:8899）:
+- /info: meta / spotMeta / metaAndAssetCtxs / allMids / clearinghouseState / openOrders /
+  frontendOpenOrders / candleSnapshot / userFills / userFillsByTime / orderStatus
+- /exchange: order（限价 Gtc / Ioc / Alo、止损止盈触发单、normalTpsl 成组）/ cancel / cancelByCloid /
+  batchModify / updateLeverage；不校验签名，所有地址共用一个全仓模拟账户，不模拟资金费
+- /ws: allMids、userFills 推送（SDK 的 WebsocketManager 可以直接订阅）
+- 行情来自录制的K线（candleSnapshot 返回格式的 JSON）或合成行情（synthetic_market）；模拟时钟按 --speed 倍速前进，
+  每根K线内价格按 开 → 低/高 → 高/低 → 收 走完，撮合线程按两次检查之间走过的最高 / 最低价成交
+  限价单和触发单；吃单按中间价成交，费率 taker 0.035% / maker 0.01%
+- --latency-ms / --jitter-ms 给每个 HTTP 请求加固定延迟和随机抖动（真实时间）
+
+run 子命令在本进程里跑多策略运行时: time.time / time.sleep / asyncio.sleep / datetime.now 跟随模拟时钟，
+状态和日志写到单独目录（memory/sim/<时间>、logs/sim/<时间>），行情跑完后打印账户汇总。
+
+用法:
+  python exchange_sim.py serve --coins BTC,ETH --days 60 --speed 100         # 合成行情
+  python exchange_sim.py serve --candles btc_eth_5m.json --speed 100          # 录制的K线
+  python exchange_sim.py run --strategies all                                 # 另开一个终端跑机器人
+"""
+
+import _thread
+import argparse
+import asyncio
+import base64
+import bisect
+import datetime
+import hashlib
+import importlib
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import secrets
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger("ExchangeSim")
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8899
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "8h": 28_800_000, "12h": 43_200_000,
+    "1d": 86_400_000,
+}
+
+TAKER_FEE = 0.00035
+MAKER_FEE = 0.0001
+DEFAULT_BALANCE = 1000.0
+DEFAULT_LEVERAGE = 20
+MAX_LEVERAGE = 20
+# 账户价值低于 已用保证金 × 该比例 时强平所有持仓
+MAINTENANCE_RATIO = 0.5
+
+# candleSnapshot / userFillsByTime 单次最多返回的条数（与实盘一致）
+MAX_CANDLES = 5000
+MAX_FILLS = 2000
+# WebSocket userFills 订阅时先推送的最近成交条数
+FILL_SNAPSHOT = 100
+# 撮合 / 推送间隔、allMids 推送间隔（真实秒）
+TICK_INTERVAL = 0.05
+MIDS_PUSH_INTERVAL = 0.5
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# run 子命令打补丁前的真实时间函数
+_real_time = time.time
+_real_sleep = time.sleep
+_real_async_sleep = asyncio.sleep
+
+
+def _num(x: float) -> str:
+    """数字转成接口里的字符串格式（去掉多余的 0）"""
+    s = f"{x:.8f}".rstrip("0").rstrip(".")
+    return "0" if s in ("", "-0") else s
+
+
+# ========== 行情 ==========
+
+def load_candles(path) -> Tuple[int, Dict[str, List[tuple]]]:
+    """读取录制的K线: {"BTC": [candleSnapshot 返回的K线...], ...}（也可以包一层 {"candles": {...}}）
+
+    返回 (K线周期毫秒, {币种: [(t, o, h, l, c, v), ...]})，所有币种的周期必须一致
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    data = data.get("candles", data)
+    interval = 0
+    series = {}
+    for coin, rows in data.items():
+        by_time = {int(r["t"]): (int(r["t"]), float(r["o"]), float(r["h"]), float(r["l"]), float(r["c"]),
+                                 float(r.get("v", 0))) for r in rows}
+        rows = [by_time[t] for t in sorted(by_time)]
+        if len(rows) < 2:
+            raise ValueError(f"{coin} K线不足 2 根")
+        step = min(b[0] - a[0] for a, b in zip(rows, rows[1:]))
+        if interval and step != interval:
+            raise ValueError(f"{coin} 的K线周期与其他币种不一致")
+        interval = step
+        series[coin] = rows
+    if not series:
+        raise ValueError(f"{path} 里没有K线")
+    return interval, series
+
+
+def synthetic_candles(coins: List[str], interval_ms: int, bars: int, end_ms: int,
+                      seed: int = 0) -> Dict[str, List[tuple]]:
+    """合成K线（synthetic_market: 状态切换 + 波动聚集 + 跳空），同样的 seed 生成同样的行情"""
+    from synthetic_market import generate_rows
+
+    interval = next(name for name, ms in INTERVAL_MS.items() if ms == interval_ms)
+    start = end_ms - end_ms % interval_ms - bars * interval_ms
+    return {coin: generate_rows(coin, bars, interval, seed, start) for coin in coins}
+
+
+class SimMarket:
+    """K线行情: 任意时刻的价格、区间内走过的高低点、按请求周期聚合的K线"""
+
+    def __init__(self, interval_ms: int, series: Dict[str, List[tuple]]):
+        from asset_meta import AssetInfo
+
+        self.interval_ms = interval_ms
+        self.series = series
+        self.coins = sorted(series)
+        self.times = {coin: [row[0] for row in rows] for coin, rows in series.items()}
+        self.assets = {}
+        for coin in self.coins:
+            # 按价格量级估一个 szDecimals（BTC 5、ETH 4、百元币 2~3、小币 0）
+            price = series[coin][0][1]
+            sz_decimals = max(0, min(5, math.ceil(math.log10(max(price, 1e-9)))))
+            self.assets[coin] = AssetInfo(coin, sz_decimals, MAX_LEVERAGE)
+        self.start_ms = min(rows[0][0] for rows in series.values())
+        self.end_ms = max(rows[-1][0] for rows in series.values()) + interval_ms
+        # 已经走完的聚合K线不会再变，按 (币种, 周期) 缓存
+        self._buckets: Dict[Tuple[str, int], Dict[int, tuple]] = {}
+
+    def coin_of(self, asset: int) -> str:
+        if not 0 <= asset < len(self.coins):
+            raise KeyError(f"unknown asset {asset}")
+        return self.coins[asset]
+
+    def meta(self) -> Dict:
+        return {"universe": [{"name": coin, "szDecimals": self.assets[coin].sz_decimals,
+                              "maxLeverage": self.assets[coin].max_leverage} for coin in self.coins]}
+
+    def round_price(self, coin: str, price: float) -> float:
+        return self.assets[coin].round_price(price)
+
+    @staticmethod
+    def _path(row) -> List[float]:
+        _, o, h, l, c, _ = row
+        return [o, l, h, c] if c >= o else [o, h, l, c]
+
+    def _path_price(self, row, f: float) -> float:
+        path = self._path(row)
+        seg = min(int(f * 3), 2)
+        return path[seg] + (path[seg + 1] - path[seg]) * (f * 3 - seg)
+
+    def _index(self, coin: str, ms: float) -> int:
+        return bisect.bisect_right(self.times[coin], ms) - 1
+
+    def price_at(self, coin: str, ms: float) -> float:
+        rows = self.series[coin]
+        i = self._index(coin, ms)
+        if i < 0:
+            return rows[0][1]
+        f = (ms - rows[i][0]) / self.interval_ms
+        # 数据结束后、K线缺口里停在收盘价
+        return rows[i][4] if f >= 1 else self._path_price(rows[i], f)
+
+    def price_range(self, coin: str, t0: float, t1: float) -> Tuple[float, float]:
+        """(t0, t1] 内价格走过的最低、最高点；两次撮合之间跳过的影线也能触发挂单"""
+        prices = [self.price_at(coin, t0), self.price_at(coin, t1)]
+        rows = self.series[coin]
+        third = self.interval_ms / 3
+        for i in range(max(self._index(coin, t0), 0), self._index(coin, t1) + 1):
+            row = rows[i]
+            for k, price in enumerate(self._path(row)):
+                if t0 < row[0] + k * third < t1:
+                    prices.append(price)
+        return min(prices), max(prices)
+
+    def mids(self, now: float) -> Dict[str, str]:
+        return {coin: _num(self.round_price(coin, self.price_at(coin, now))) for coin in self.coins}
+
+    def _partial(self, row, now: float) -> tuple:
+        """还没走完的K线: 只包含到 now 为止走过的价格"""
+        f = (now - row[0]) / self.interval_ms
+        price = self._path_price(row, f)
+        visited = [p for k, p in enumerate(self._path(row)) if k / 3 <= f] + [price]
+        return row[0], row[1], max(visited), min(visited), price, row[5] * f
+
+    def _bucket(self, coin: str, iv: int, start: int, now: float) -> Optional[tuple]:
+        complete = start + iv <= now
+        cache = self._buckets.setdefault((coin, iv), {})
+        if complete and start in cache:
+            return cache[start]
+        times = self.times[coin]
+        rows = self.series[coin][bisect.bisect_left(times, start):bisect.bisect_right(times, min(start + iv - 1, now))]
+        if not rows:
+            return None
+        if now < rows[-1][0] + self.interval_ms:
+            rows = rows[:-1] + [self._partial(rows[-1], now)]
+        bucket = (start, rows[0][1], max(r[2] for r in rows), min(r[3] for r in rows), rows[-1][4],
+                  sum(r[5] for r in rows), len(rows))
+        if complete:
+            cache[start] = bucket
+        return bucket
+
+    def candles(self, coin: str, interval: str, start: int, end: int, now: float) -> List[Dict]:
+        iv = INTERVAL_MS.get(interval)
+        if not iv or iv % self.interval_ms:
+            raise ValueError(f"unsupported interval {interval} (data interval {self.interval_ms // 60_000}m)")
+        if coin not in self.series:
+            return []
+        end = min(end, int(now))
+        first, last = start - start % iv, end - end % iv
+        first = max(first, last - (MAX_CANDLES - 1) * iv)
+        out = []
+        for t in range(first, last + 1, iv):
+            bucket = self._bucket(coin, iv, t, now)
+            if bucket is None:
+                continue
+            _, o, h, l, c, v, n = bucket
+            rp = self.assets[coin].round_price
+            out.append({"t": t, "T": t + iv - 1, "s": coin, "i": interval, "o": _num(rp(o)), "c": _num(rp(c)),
+                        "h": _num(rp(h)), "l": _num(rp(l)), "v": _num(v), "n": n})
+        return out
+
+    def asset_ctxs(self, now: float) -> List[Dict]:
+        ctxs = []
+        for coin in self.coins:
+            rows = self.series[coin]
+            times = self.times[coin]
+            day = rows[bisect.bisect_left(times, now - 86_400_000):bisect.bisect_right(times, now)]
+            volume = sum(r[4] * r[5] for r in day)
+            mark = _num(self.round_price(coin, self.price_at(coin, now)))
+            ctxs.append({
+                "dayNtlVlm": _num(volume), "markPx": mark, "midPx": mark, "oraclePx": mark,
+                "prevDayPx": _num(self.round_price(coin, self.price_at(coin, now - 86_400_000))),
+                "openInterest": _num(sum(r[5] for r in day) / 2), "funding": "0", "premium": "0",
+            })
+        return ctxs
+
+
+class SimClock:
+    """模拟时钟: 模拟时间 = 起点 + 真实流逝时间 × speed"""
+
+    def __init__(self, start_ms: int, end_ms: int, speed: float):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.speed = speed
+        self.wall = _real_time()
+
+    def now_ms(self) -> float:
+        return self.start_ms + (_real_time() - self.wall) * 1000 * self.speed
+
+    def snapshot(self) -> Dict:
+        wall = _real_time()
+        return {"now": self.start_ms + (wall - self.wall) * 1000 * self.speed, "wall": wall,
+                "speed": self.speed, "start": self.start_ms, "end": self.end_ms}
+
+
+# ========== 撮合和账户 ==========
+
+class SimExchange:
+    """单账户撮合引擎: 限价单、触发单、normalTpsl 成组、全仓持仓、已实现盈亏和手续费"""
+
+    def __init__(self, market: SimMarket, clock: SimClock, balance: float = DEFAULT_BALANCE):
+        self.market = market
+        self.clock = clock
+        self.balance = balance
+        self.cash = balance
+        self.realized = 0.0
+        self.fees = 0.0
+        self.positions: Dict[str, List[float]] = {}  # coin -> [szi, entry_px]
+        self.leverage: Dict[str, int] = {}
+        self.orders: Dict[int, Dict] = {}  # 挂着的限价单和已生效的触发单
+        self.history: Dict[int, Tuple[str, Dict, int]] = {}  # oid -> (状态, 订单, 时间)
+        self.fills: List[Dict] = []
+        self.lock = threading.RLock()
+        self._oids = itertools.count(1_000_000)
+        self._tids = itertools.count(1)
+        self._outbox: List[Dict] = []
+        self._last_tick = clock.now_ms()
+
+    # ----- 下单 / 撤单 / 改单 -----
+
+    def _parse(self, wire: Dict, now: float) -> Dict:
+        coin = self.market.coin_of(int(wire["a"]))
+        kind = wire.get("t") or {}
+        trigger = None
+        if "trigger" in kind:
+            spec = kind["trigger"]
+            trigger = {"px": float(spec["triggerPx"]), "is_market": bool(spec.get("isMarket")),
+                       "tpsl": spec.get("tpsl", "sl")}
+        size = float(wire["s"])
+        return {
+            "oid": None, "coin": coin, "is_buy": bool(wire["b"]), "px": float(wire["p"]), "sz": size,
+            "orig_sz": size, "reduce_only": bool(wire.get("r")), "tif": (kind.get("limit") or {}).get("tif", "Gtc"),
+            "trigger": trigger, "timestamp": int(now), "cloid": wire.get("c"), "children": [], "group": None,
+        }
+
+    def place(self, wires: List[Dict], grouping: str = "na") -> List:
+        """order 动作；normalTpsl 时第一笔非触发单是入场单，后面的触发单在它成交后才生效"""
+        with self.lock:
+            now = self.clock.now_ms()
+            statuses = []
+            parent = None
+            for wire in wires:
+                try:
+                    order = self._parse(wire, now)
+                except (KeyError, TypeError, ValueError) as e:
+                    statuses.append({"error": f"Invalid order: {e}"})
+                    continue
+                if grouping == "normalTpsl" and order["trigger"] and parent is not None:
+                    order["group"] = parent["oid"]
+                    if parent["status"] == "open":
+                        parent["children"].append(order)
+                        statuses.append("waitingForFill")
+                        continue
+                    if parent["status"] != "filled":
+                        statuses.append({"error": "Entry order was not placed."})
+                        continue
+                    order["sz"] = order["orig_sz"] = parent["orig_sz"]
+                status = self._submit(order, now)
+                if parent is None and not order["trigger"]:
+                    parent = order
+                statuses.append(status)
+            return statuses
+
+    def _submit(self, order: Dict, now: float):
+        order["oid"] = next(self._oids)
+        coin = order["coin"]
+        if order["sz"] <= 0 or order["px"] <= 0:
+            return self._reject(order, "Order has zero size or price.", now)
+        if order["trigger"]:
+            return self._rest(order, now)
+        mid = self.market.round_price(coin, self.market.price_at(coin, now))
+        if order["reduce_only"]:
+            order["sz"] = self._reducible(order)
+            if order["sz"] <= 0:
+                return self._reject(order, "Reduce only order would increase position.", now)
+        elif not self._margin_ok(order, mid, now):
+            return self._reject(order, "Insufficient margin to place order.", now)
+        marketable = order["px"] >= mid if order["is_buy"] else order["px"] <= mid
+        if marketable:
+            if order["tif"] == "Alo":
+                return self._reject(order, f"Post only order would have immediately matched, bbo was {_num(mid)}.", now)
+            self._fill(order, mid, now, taker=True)
+            return {"filled": {"totalSz": _num(order["sz"]), "avgPx": _num(mid), "oid": order["oid"]}}
+        if order["tif"] == "Ioc":
+            return self._reject(order, "Order could not immediately match against any resting orders.", now)
+        return self._rest(order, now)
+
+    def _rest(self, order: Dict, now: float) -> Dict:
+        order["status"] = "open"
+        self.orders[order["oid"]] = order
+        self.history[order["oid"]] = ("open", order, int(now))
+        return {"resting": {"oid": order["oid"]}}
+
+    def _reject(self, order: Dict, error: str, now: float) -> Dict:
+        order["status"] = "rejected"
+        self.history[order["oid"]] = ("rejected", order, int(now))
+        return {"error": error}
+
+    def _close(self, order: Dict, status: str, now: float) -> None:
+        """订单结束（撤单 / 成交 / 系统撤销），没生效的成组止盈止损一起撤"""
+        order["status"] = status
+        self.orders.pop(order["oid"], None)
+        self.history[order["oid"]] = (status, order, int(now))
+        if status != "filled":
+            order["children"] = []
+
+    def cancel(self, cancels: List[Dict], by_cloid: bool = False) -> List:
+        with self.lock:
+            now = self.clock.now_ms()
+            statuses = []
+            for item in cancels:
+                if by_cloid:
+                    order = next((o for o in self.orders.values() if o["cloid"] == item.get("cloid")), None)
+                else:
+                    order = self.orders.get(int(item.get("o", -1)))
+                if order is None:
+                    statuses.append({"error": "Order was never placed, already canceled, or filled."})
+                    continue
+                self._close(order, "canceled", now)
+                statuses.append("success")
+            return statuses
+
+    def modify(self, modifies: List[Dict]) -> List:
+        """batchModify: 撤掉旧单，按新参数重新下（新 oid），成组关系和未生效的止盈止损保留"""
+        with self.lock:
+            now = self.clock.now_ms()
+            statuses = []
+            for item in modifies:
+                ref = item.get("oid")
+                if isinstance(ref, str):
+                    old = next((o for o in self.orders.values() if o["cloid"] == ref), None)
+                else:
+                    old = self.orders.get(int(ref))
+                if old is None:
+                    statuses.append({"error": "Cannot modify canceled or filled order"})
+                    continue
+                try:
+                    order = self._parse(item["order"], now)
+                except (KeyError, TypeError, ValueError) as e:
+                    statuses.append({"error": f"Invalid order: {e}"})
+                    continue
+                order["group"], order["children"] = old["group"], old["children"]
+                self._close(old, "canceled", now)
+                statuses.append(self._submit(order, now))
+            return statuses
+
+    def update_leverage(self, asset: int, leverage: int) -> Optional[str]:
+        coin = self.market.coin_of(asset)
+        if not 1 <= leverage <= self.market.assets[coin].max_leverage:
+            return f"Invalid leverage value: {leverage}"
+        with self.lock:
+            self.leverage[coin] = leverage
+        return None
+
+    # ----- 成交 -----
+
+    def _reducible(self, order: Dict) -> float:
+        szi = self.positions.get(order["coin"], [0.0, 0.0])[0]
+        if szi == 0 or (szi > 0) == order["is_buy"]:
+            return 0.0
+        return min(order["sz"], abs(szi))
+
+    def _account(self, now: float) -> Tuple[float, float, float]:
+        """(账户价值, 已用保证金, 持仓名义价值)"""
+        value, used, notional = self.cash, 0.0, 0.0
+        for coin, (szi, entry) in self.positions.items():
+            mid = self.market.price_at(coin, now)
+            value += (mid - entry) * szi
+            used += abs(szi) * mid / self.leverage.get(coin, DEFAULT_LEVERAGE)
+            notional += abs(szi) * mid
+        return value, used, notional
+
+    def _margin_ok(self, order: Dict, px: float, now: float) -> bool:
+        szi = self.positions.get(order["coin"], [0.0, 0.0])[0]
+        reducing = szi != 0 and (szi > 0) != order["is_buy"]
+        opening = max(order["sz"] - abs(szi), 0.0) if reducing else order["sz"]
+        value, used, _ = self._account(now)
+        return opening * px / self.leverage.get(order["coin"], DEFAULT_LEVERAGE) <= value - used + 1e-9
+
+    def _fill(self, order: Dict, px: float, now: float, taker: bool) -> None:
+        coin, sz = order["coin"], order["sz"]
+        szi, entry = self.positions.get(coin, [0.0, 0.0])
+        signed = sz if order["is_buy"] else -sz
+        new = szi + signed
+        closed = 0.0
+        if szi == 0 or (szi > 0) == (signed > 0):
+            entry = (entry * abs(szi) + px * sz) / abs(new)
+            direction = "Open Long" if order["is_buy"] else "Open Short"
+        else:
+            closed = (px - entry) * min(sz, abs(szi)) * (1 if szi > 0 else -1)
+            if abs(new) < 1e-12:
+                new = 0.0
+            if new == 0 or (new > 0) == (szi > 0):
+                direction = "Close Long" if szi > 0 else "Close Short"
+            else:
+                direction = "Long > Short" if szi > 0 else "Short > Long"
+                entry = px
+        fee = px * sz * (TAKER_FEE if taker else MAKER_FEE)
+        self.cash += closed - fee
+        self.realized += closed
+        self.fees += fee
+        if new == 0:
+            self.positions.pop(coin, None)
+        else:
+            self.positions[coin] = [new, entry]
+        tid = next(self._tids)
+        fill = {
+            "coin": coin, "px": _num(px), "sz": _num(sz), "side": "B" if order["is_buy"] else "A",
+            "time": int(now), "startPosition": _num(szi), "dir": direction, "closedPnl": _num(closed),
+            "hash": "0x" + hashlib.sha256(str(tid).encode()).hexdigest(), "oid": order["oid"],
+            "crossed": taker, "fee": _num(fee), "tid": tid, "feeToken": "USDC",
+        }
+        if order["cloid"]:
+            fill["cloid"] = order["cloid"]
+        self.fills.append(fill)
+        self._outbox.append(fill)
+        self._close(order, "filled", now)
+        # 成组的止盈止损: 入场成交后生效，其中一个成交后另一个撤销
+        for child in order["children"]:
+            child["sz"] = child["orig_sz"] = sz
+            self._submit(child, now)
+        order["children"] = []
+        if order["group"] is not None:
+            for other in list(self.orders.values()):
+                if other["group"] == order["group"]:
+                    self._close(other, "siblingFilledCanceled", now)
+
+    def tick(self) -> List[Dict]:
+        """撮合一轮，返回上一轮以来的新成交（包括下单时立即成交的）"""
+        with self.lock:
+            now = self.clock.now_ms()
+            t0, self._last_tick = self._last_tick, now
+            if now > t0:
+                ranges: Dict[str, Tuple[float, float, float]] = {}
+                for oid in sorted(self.orders):
+                    order = self.orders.get(oid)
+                    if order is None:
+                        continue
+                    coin = order["coin"]
+                    if coin not in ranges:
+                        ranges[coin] = (self.market.price_at(coin, t0),) + self.market.price_range(coin, t0, now)
+                    if order["trigger"]:
+                        self._check_trigger(order, *ranges[coin], now)
+                    else:
+                        self._check_limit(order, *ranges[coin], now)
+                self._check_liquidation(now)
+            fills, self._outbox = self._outbox, []
+            return fills
+
+    def _check_limit(self, order: Dict, start: float, low: float, high: float, now: float) -> None:
+        if (low <= order["px"]) if order["is_buy"] else (high >= order["px"]):
+            if order["reduce_only"]:
+                order["sz"] = self._reducible(order)
+                if order["sz"] <= 0:
+                    self._close(order, "reduceOnlyCanceled", now)
+                    return
+            self._fill(order, order["px"], now, taker=False)
+
+    def _check_trigger(self, order: Dict, start: float, low: float, high: float, now: float) -> None:
+        trigger = order["trigger"]
+        # 止损: 平多(卖)向下穿、平空(买)向上穿；止盈相反；跳空越过触发价时按跳空后的价格成交
+        triggers_above = (trigger["tpsl"] == "sl") == order["is_buy"]
+        if triggers_above:
+            if high < trigger["px"]:
+                return
+            px = max(trigger["px"], start)
+        else:
+            if low > trigger["px"]:
+                return
+            px = min(trigger["px"], start)
+        if order["reduce_only"]:
+            order["sz"] = self._reducible(order)
+            if order["sz"] <= 0:
+                self._close(order, "reduceOnlyCanceled", now)
+                return
+        if trigger["is_market"]:
+            self._fill(order, self.market.round_price(order["coin"], px), now, taker=True)
+            return
+        # 限价触发单触发后变成普通限价单
+        self.history[order["oid"]] = ("triggered", order, int(now))
+        order["trigger"] = None
+        if (order["px"] >= px) if order["is_buy"] else (order["px"] <= px):
+            self._fill(order, order["px"], now, taker=True)
+
+    def _check_liquidation(self, now: float) -> None:
+        if not self.positions:
+            return
+        value, used, _ = self._account(now)
+        if value >= used * MAINTENANCE_RATIO:
+            return
+        logger.warning("账户价值 %.2f 低于维持保证金 %.2f，强平所有持仓", value, used * MAINTENANCE_RATIO)
+        for order in list(self.orders.values()):
+            self._close(order, "marginCanceled", now)
+        for coin, (szi, _) in list(self.positions.items()):
+            order = {"oid": next(self._oids), "coin": coin, "is_buy": szi < 0, "px": 0.0, "sz": abs(szi),
+                     "orig_sz": abs(szi), "reduce_only": True, "tif": "Ioc", "trigger": None,
+                     "timestamp": int(now), "cloid": None, "children": [], "group": None}
+            self._fill(order, self.market.round_price(coin, self.market.price_at(coin, now)), now, taker=True)
+
+    # ----- 查询 -----
+
+    def _order_json(self, order: Dict, frontend: bool = False) -> Dict:
+        data = {
+            "coin": order["coin"], "side": "B" if order["is_buy"] else "A", "limitPx": _num(order["px"]),
+            "sz": _num(order["sz"]), "oid": order["oid"], "timestamp": order["timestamp"],
+            "origSz": _num(order["orig_sz"]),
+        }
+        if order["cloid"]:
+            data["cloid"] = order["cloid"]
+        if not frontend:
+            return data
+        trigger = order["trigger"]
+        if trigger:
+            kind = "Stop" if trigger["tpsl"] == "sl" else "Take Profit"
+            above = (trigger["tpsl"] == "sl") == order["is_buy"]
+            data.update({
+                "isTrigger": True, "triggerPx": _num(trigger["px"]),
+                "triggerCondition": f"Price {'above' if above else 'below'} {_num(trigger['px'])}",
+                "orderType": f"{kind} {'Market' if trigger['is_market'] else 'Limit'}", "tif": None,
+            })
+        else:
+            data.update({"isTrigger": False, "triggerPx": "0.0", "triggerCondition": "N/A",
+                         "orderType": "Limit", "tif": order["tif"]})
+        data.update({"reduceOnly": order["reduce_only"], "isPositionTpsl": False,
+                     "children": [self._order_json(child, True) for child in order["children"]]})
+        return data
+
+    def open_orders(self, frontend: bool = False) -> List[Dict]:
+        with self.lock:
+            orders = sorted(self.orders.values(), key=lambda o: o["oid"], reverse=True)
+            return [self._order_json(o, frontend) for o in orders]
+
+    def order_status(self, oid) -> Dict:
+        with self.lock:
+            if isinstance(oid, str):
+                entry = next((e for e in self.history.values() if e[1]["cloid"] == oid), None)
+            else:
+                entry = self.history.get(int(oid))
+            if entry is None:
+                return {"status": "unknownOid"}
+            status, order, ts = entry
+            return {"status": "order", "order": {"order": self._order_json(order, True), "status": status,
+                                                 "statusTimestamp": ts}}
+
+    def user_state(self) -> Dict:
+        with self.lock:
+            now = self.clock.now_ms()
+            value, used, notional = self._account(now)
+            positions = []
+            for coin, (szi, entry) in sorted(self.positions.items()):
+                mid = self.market.price_at(coin, now)
+                lev = self.leverage.get(coin, DEFAULT_LEVERAGE)
+                upnl = (mid - entry) * szi
+                margin = abs(szi) * mid / lev
+                positions.append({"type": "oneWay", "position": {
+                    "coin": coin, "szi": _num(szi), "entryPx": _num(entry), "positionValue": _num(abs(szi) * mid),
+                    "unrealizedPnl": _num(upnl), "returnOnEquity": _num(upnl / (abs(szi) * entry / lev)),
+                    "liquidationPx": None, "leverage": {"type": "cross", "value": lev}, "marginUsed": _num(margin),
+                    "maxLeverage": self.market.assets[coin].max_leverage,
+                    "cumFunding": {"allTime": "0", "sinceOpen": "0", "sinceChange": "0"},
+                }})
+            summary = {"accountValue": _num(value), "totalNtlPos": _num(notional),
+                       "totalRawUsd": _num(value - sum(p[0] * self.market.price_at(c, now)
+                                                       for c, p in self.positions.items())),
+                       "totalMarginUsed": _num(used)}
+            return {"marginSummary": summary, "crossMarginSummary": dict(summary),
+                    "crossMaintenanceMarginUsed": _num(used * MAINTENANCE_RATIO),
+                    "withdrawable": _num(max(value - used, 0.0)), "assetPositions": positions, "time": int(now)}
+
+    def user_fills(self, start: Optional[int] = None, end: Optional[int] = None) -> List[Dict]:
+        with self.lock:
+            if start is None:
+                return list(reversed(self.fills[-MAX_FILLS:]))
+            end = end if end is not None else float("inf")
+            return [f for f in self.fills if start <= f["time"] <= end][:MAX_FILLS]
+
+    def summary(self) -> Dict:
+        with self.lock:
+            value, _, _ = self._account(self.clock.now_ms())
+            return {"start_balance": self.balance, "account_value": round(value, 4),
+                    "realized_pnl": round(self.realized, 4), "fees": round(self.fees, 4),
+                    "fills": len(self.fills), "open_orders": len(self.orders),
+                    "positions": {coin: {"szi": szi, "entry_px": entry} for coin, (szi, entry) in self.positions.items()}}
+
+    # ----- 接口分发 -----
+
+    def info(self, body: Dict):
+        kind = body.get("type")
+        now = self.clock.now_ms()
+        if kind == "meta":
+            return self.market.meta()
+        if kind == "spotMeta":
+            return {"universe": [], "tokens": []}
+        if kind == "metaAndAssetCtxs":
+            return [self.market.meta(), self.market.asset_ctxs(now)]
+        if kind == "allMids":
+            return self.market.mids(now)
+        if kind == "clearinghouseState":
+            return self.user_state()
+        if kind == "spotClearinghouseState":
+            return {"balances": []}
+        if kind == "openOrders":
+            return self.open_orders()
+        if kind == "frontendOpenOrders":
+            return self.open_orders(frontend=True)
+        if kind == "candleSnapshot":
+            req = body.get("req") or {}
+            return self.market.candles(req.get("coin", ""), req.get("interval", ""), int(req.get("startTime", 0)),
+                                       int(req.get("endTime") or now), now)
+        if kind == "userFills":
+            return self.user_fills()
+        if kind == "userFillsByTime":
+            return self.user_fills(int(body.get("startTime") or 0), body.get("endTime"))
+        if kind == "orderStatus":
+            return self.order_status(body.get("oid"))
+        if kind == "simClock":
+            return self.clock.snapshot()
+        if kind == "simSummary":
+            return self.summary()
+        raise ValueError(f"info type {kind!r} is not supported by the simulator")
+
+    def act(self, action: Dict) -> Dict:
+        kind = action.get("type")
+        if kind == "order":
+            statuses = self.place(action.get("orders") or [], action.get("grouping", "na"))
+            return {"status": "ok", "response": {"type": "order", "data": {"statuses": statuses}}}
+        if kind in ("cancel", "cancelByCloid"):
+            statuses = self.cancel(action.get("cancels") or [], by_cloid=kind == "cancelByCloid")
+            return {"status": "ok", "response": {"type": "cancel", "data": {"statuses": statuses}}}
+        if kind == "batchModify":
+            statuses = self.modify(action.get("modifies") or [])
+            return {"status": "ok", "response": {"type": "order", "data": {"statuses": statuses}}}
+        if kind == "updateLeverage":
+            error = self.update_leverage(int(action["asset"]), int(action["leverage"]))
+            if error:
+                return {"status": "err", "response": error}
+            return {"status": "ok", "response": {"type": "default"}}
+        return {"status": "err", "response": f"Action {kind!r} is not supported by the simulator"}
+
+
+# ========== HTTP / WebSocket 服务 ==========
+
+def _read_frame(rfile) -> Optional[Tuple[int, bytes]]:
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b""
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return head[0] & 0x0F, payload
+
+
+class WsClient:
+    """一条 WebSocket 连接（只发不分片的帧）"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.subscriptions: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def send_frame(self, opcode: int, payload: bytes) -> None:
+        n = len(payload)
+        if n < 126:
+            header = struct.pack(">BB", 0x80 | opcode, n)
+        elif n < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, n)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, n)
+        with self._lock:
+            self.wfile.write(header + payload)
+            self.wfile.flush()
+
+    def send(self, message) -> None:
+        self.send_frame(1, message.encode() if isinstance(message, str) else json.dumps(message).encode())
+
+
+class SimServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, sim: SimExchange, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        super().__init__(address, SimHandler)
+        self.sim = sim
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.clients: List[WsClient] = []
+        self._clients_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def delay(self) -> None:
+        if self.latency_ms or self.jitter_ms:
+            time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+    def add_client(self, client: WsClient) -> None:
+        with self._clients_lock:
+            self.clients.append(client)
+
+    def remove_client(self, client: WsClient) -> None:
+        with self._clients_lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def on_ws_message(self, client: WsClient, text: str) -> None:
+        msg = json.loads(text)
+        method = msg.get("method")
+        if method == "ping":
+            client.send({"channel": "pong"})
+            return
+        sub = msg.get("subscription") or {}
+        if method == "subscribe":
+            if sub.get("type") not in ("allMids", "userFills"):
+                client.send({"channel": "error", "data": f"Subscription not supported by the simulator: {text}"})
+                return
+            client.subscriptions.append(sub)
+            client.send({"channel": "subscriptionResponse", "data": msg})
+            if sub["type"] == "userFills":
+                fills = self.sim.user_fills()[:FILL_SNAPSHOT]
+                client.send({"channel": "userFills",
+                             "data": {"isSnapshot": True, "user": sub["user"], "fills": list(reversed(fills))}})
+        elif method == "unsubscribe":
+            if sub in client.subscriptions:
+                client.subscriptions.remove(sub)
+            client.send({"channel": "subscriptionResponse", "data": msg})
+
+    def _push(self, fills: List[Dict], mids: Optional[Dict]) -> None:
+        with self._clients_lock:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                for sub in client.subscriptions:
+                    if sub["type"] == "userFills" and fills:
+                        client.send({"channel": "userFills", "data": {"user": sub["user"], "fills": fills}})
+                    elif sub["type"] == "allMids" and mids is not None:
+                        client.send({"channel": "allMids", "data": {"mids": mids}})
+            except OSError:
+                self.remove_client(client)
+
+    def pump(self) -> None:
+        """撮合 + 推送线程"""
+        last_mids = 0.0
+        while not self._stop.is_set():
+            try:
+                fills = self.sim.tick()
+                mids = None
+                if _real_time() - last_mids >= MIDS_PUSH_INTERVAL:
+                    last_mids = _real_time()
+                    mids = self.sim.market.mids(self.sim.clock.now_ms())
+                self._push(fills, mids)
+            except Exception as e:
+                logger.error("撮合线程出错: %s", e, exc_info=True)
+            self._stop.wait(TICK_INTERVAL)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.shutdown()
+
+
+class SimHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: SimServer
+
+    def log_message(self, fmt, *args) -> None:
+        logger.debug(fmt, *args)
+
+    def _reply(self, code: int, payload) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, code: int, msg: str) -> None:
+        # SDK 的 API._handle_exception 按 code / msg / data 解析 4xx
+        self._reply(code, {"code": None, "msg": msg, "data": None})
+
+    def do_POST(self) -> None:
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            self._error(400, "invalid json body")
+            return
+        self.server.delay()
+        try:
+            if self.path == "/info":
+                payload = self.server.sim.info(body)
+            elif self.path == "/exchange":
+                payload = self.server.sim.act(body.get("action") or {})
+            else:
+                self._error(404, f"unknown path {self.path}")
+                return
+        except (KeyError, TypeError, ValueError) as e:
+            self._error(422, str(e))
+            return
+        self._reply(200, payload)
+
+    def do_GET(self) -> None:
+        if self.path != "/ws" or self.headers.get("Upgrade", "").lower() != "websocket":
+            self._error(404, f"unknown path {self.path}")
+            return
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept",
+                         base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode())
+        self.end_headers()
+        self.close_connection = True
+        client = WsClient(self.wfile)
+        self.server.add_client(client)
+        try:
+            client.send("Websocket connection established.")
+            while True:
+                frame = _read_frame(self.rfile)
+                if frame is None:
+                    break
+                opcode, payload = frame
+                if opcode == 8:
+                    client.send_frame(8, payload[:2])
+                    break
+                if opcode == 9:
+                    client.send_frame(10, payload)
+                elif opcode == 1:
+                    self.server.on_ws_message(client, payload.decode())
+        except (OSError, ValueError) as e:
+            logger.debug("WebSocket 连接断开: %s", e)
+        finally:
+            self.server.remove_client(client)
+
+
+def build_exchange(args) -> SimExchange:
+    if args.candles:
+        interval_ms, series = load_candles(args.candles)
+    else:
+        interval_ms = INTERVAL_MS[args.interval]
+        bars = int(args.days * 86_400_000 // interval_ms)
+        coins = [c.strip().upper() for c in args.coins.split(",") if c.strip()]
+        series = synthetic_candles(coins, interval_ms, bars, int(_real_time() * 1000), args.seed)
+    market = SimMarket(interval_ms, series)
+    start = market.start_ms + int(args.warmup_hours * 3_600_000)
+    if start >= market.end_ms:
+        raise SystemExit(f"K线只有 {(market.end_ms - market.start_ms) / 3_600_000:.0f} 小时，"
+                         f"不够 --warmup-hours {args.warmup_hours}")
+    return SimExchange(market, SimClock(start, market.end_ms, args.speed), args.balance)
+
+
+def _fmt_ms(ms: float) -> str:
+    return datetime.datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M")
+
+
+def serve(args) -> int:
+    sim = build_exchange(args)
+    server = SimServer((args.host, args.port), sim, args.latency_ms, args.jitter_ms)
+    threading.Thread(target=server.pump, name="sim-pump", daemon=True).start()
+    market, clock = sim.market, sim.clock
+    logger.info("模拟交易所 http://%s:%d | %s | K线 %s ~ %s (%dm) | 从 %s 开始 %.0fx 倍速 | 余额 $%.2f",
+                args.host, args.port, ",".join(market.coins), _fmt_ms(market.start_ms), _fmt_ms(market.end_ms),
+                market.interval_ms // 60_000, _fmt_ms(clock.start_ms), clock.speed, sim.balance)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(sim.summary(), ensure_ascii=False, indent=2))
+    return 0
+
+
+# ========== 连模拟交易所跑机器人 ==========
+
+class SimDatetime(datetime.datetime):
+    """datetime.now() 跟随模拟时钟（date.today 内部调用 time.time，打补丁后自动跟随）"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(time.time(), tz)
+
+
+def install_clock(clock: Dict) -> None:
+    """让 time.time / time.sleep / asyncio.sleep / datetime.now 跟随模拟时钟；要在导入机器人模块之前调用"""
+    speed = float(clock["speed"])
+    now, wall = float(clock["now"]), float(clock["wall"])
+
+    def sim_time() -> float:
+        return (now + (_real_time() - wall) * 1000 * speed) / 1000
+
+    def sim_sleep(seconds: float) -> None:
+        _real_sleep(max(seconds, 0) / speed)
+
+    async def sim_async_sleep(delay: float, result=None):
+        return await _real_async_sleep(max(delay, 0) / speed, result)
+
+    time.time = sim_time
+    time.sleep = sim_sleep
+    asyncio.sleep = sim_async_sleep
+    datetime.datetime = SimDatetime
+
+
+def _post(url: str, body: Dict):
+    request = Request(url + "/info", data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def run_bots(args) -> int:
+    url = args.url.rstrip("/")
+    try:
+        clock = _post(url, {"type": "simClock"})
+    except OSError as e:
+        raise SystemExit(f"连不上模拟交易所 {url}（先运行 exchange_sim.py serve）: {e}")
+    end_ms = float(clock["end"])
+    if args.hours:
+        end_ms = min(end_ms, float(clock["now"]) + args.hours * 3_600_000)
+
+    run_id = time.strftime("%Y%m%d-%H%M%S")
+    state_dir = Path(args.state_dir or WORKSPACE_ROOT / "memory" / "sim" / run_id)
+    log_dir = Path(args.log_dir or WORKSPACE_ROOT / "logs" / "sim" / run_id)
+    # 模拟账户用随机私钥，交易所不校验签名
+    private_key = "0x" + secrets.token_hex(32)
+    os.environ.update({"HL_API_URL": url, "TRADING_STATE_DIR": str(state_dir), "TRADING_LOG_DIR": str(log_dir),
+                       "HL_API_KEY": private_key})
+
+    # 第三方库先用真实 datetime 导入，之后只有机器人模块拿到模拟时钟
+    for name in ("numpy", "pandas", "requests", "eth_account", "hyperliquid.info", "hyperliquid.exchange"):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    from eth_account import Account
+
+    wallet = Account.from_key(private_key).address
+    install_clock(clock)
+
+    import strategy_runtime
+
+    names = strategy_runtime.parse_strategies(args.strategies)
+    for name in names:
+        module = importlib.import_module(strategy_runtime.STRATEGY_PLUGINS[name][0])
+        config = getattr(module, "CONFIG", {})
+        for key, value in (("main_wallet", wallet), ("api_wallet", wallet), ("api_private_key", private_key)):
+            if not config.get(key):
+                config[key] = value
+
+    def stop_at_end() -> None:
+        while time.time() * 1000 < end_ms:
+            _real_sleep(0.5)
+        logger.info("模拟行情已跑完 (%s)", _fmt_ms(end_ms))
+        _thread.interrupt_main()
+
+    threading.Thread(target=stop_at_end, name="sim-end", daemon=True).start()
+    print(f"模拟运行 {','.join(names)} | {_fmt_ms(clock['now'])} → {_fmt_ms(end_ms)} | {clock['speed']:.0f}x | "
+          f"状态 {state_dir} | 日志 {log_dir}")
+    started = _real_time()
+    try:
+        strategy_runtime.StrategyRuntime(names).run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        from execution import close_fill_streams
+
+        close_fill_streams()
+    summary = _post(url, {"type": "simSummary"})
+    summary["wall_seconds"] = round(_real_time() - started, 1)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地模拟交易所")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="启动模拟交易所")
+    p_serve.add_argument("--host", default=DEFAULT_HOST)
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--candles", help="录制的K线 JSON（{币种: candleSnapshot 返回的列表}），不给则合成")
+    p_serve.add_argument("--coins", default="BTC,ETH", help="合成行情的币种")
+    p_serve.add_argument("--days", type=float, default=60, help="合成行情的天数")
+    p_serve.add_argument("--interval", default="5m", choices=sorted(INTERVAL_MS), help="合成行情的K线周期")
+    p_serve.add_argument("--seed", type=int, default=0)
+    p_serve.add_argument("--warmup-hours", type=float, default=300, help="从数据开始后多少小时起跑（留给指标的历史）")
+    p_serve.add_argument("--speed", type=float, default=100.0, help="模拟时钟倍速")
+    p_serve.add_argument("--balance", type=float, default=DEFAULT_BALANCE)
+    p_serve.add_argument("--latency-ms", type=float, default=0.0, help="每个请求的固定延迟")
+    p_serve.add_argument("--jitter-ms", type=float, default=0.0, help="每个请求额外的随机延迟上限")
+
+    p_run = sub.add_parser("run", help="连模拟交易所跑多策略运行时")
+    p_run.add_argument("--url", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    p_run.add_argument("--strategies", default="", help="逗号分隔的策略名，或 all")
+    p_run.add_argument("--hours", type=float, default=0, help="最多跑多少模拟小时（默认跑到行情结束）")
+    p_run.add_argument("--state-dir", help="状态目录，默认 memory/sim/<时间>")
+    p_run.add_argument("--log-dir", help="日志目录，默认 logs/sim/<时间>")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.command == "serve":
+        return serve(args)
+    return run_bots(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
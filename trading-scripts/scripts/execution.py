@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+下单执行 — 开仓和止盈止损一次提交，成交由交易所推送
+
+以前开仓是一笔 ±1% 的 GTC 限价单，止盈止损要么在内存里每 60 秒轮询一次（check_exit），要么根本不挂:
+- submit_bracket: 入场限价单 + reduce-only 止损 / 止盈触发单放在同一个 bulk_orders 请求里
+  （grouping=normalTpsl），入场成交后 TP/SL 自动生效，触发即在交易所成交，没有轮询空档
+- move_stop: 跟踪止损上移时原子改单（batchModify）
+- 成交来自 WebSocket userFills 订阅（每个钱包一个连接，进程内共享）；连接不可用时每轮用
+  userFillsByTime 增量查询
+- 每笔订单记录 提交 → 确认(ack) → 成交 的时间，latency_stats() 给出 p50 / p95 / max（毫秒）
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from asset_meta import API_URL, get_asset_meta, round_price, round_size
+from fill_sync import register_order
+
+logger = logging.getLogger("Execution")
+
+# 入场限价相对信号价的偏移（与原来的 ±1% 一致，保证能立即成交）
+ENTRY_SLIPPAGE = 0.01
+# 延迟统计保留最近多少笔
+LATENCY_WINDOW = 200
+# 已结束的订单最多保留多少条
+MAX_TRACKED_ORDERS = 500
+
+
+def limit_order_request(coin: str, is_buy: bool, size: float, price: float,
+                        reduce_only: bool = False, tif: str = "Gtc") -> Dict:
+    """限价单请求（bulk_orders 用），数量和价格按币种精度舍入"""
+    return {
+        "coin": coin,
+        "is_buy": is_buy,
+        "sz": round_size(coin, size),
+        "limit_px": round_price(coin, price),
+        "order_type": {"limit": {"tif": tif}},
+        "reduce_only": reduce_only,
+    }
+
+
+def trigger_order_request(coin: str, size: float, trigger_price: float, is_long: bool = True,
+                          tpsl: str = "sl") -> Dict:
+    """reduce-only 市价触发单（止损 sl / 止盈 tp）；多头用卖单平仓，空头用买单"""
+    trigger_price = round_price(coin, trigger_price)
+    return {
+        "coin": coin,
+        "is_buy": not is_long,
+        "sz": round_size(coin, size),
+        "limit_px": trigger_price,
+        "order_type": {"trigger": {"triggerPx": trigger_price, "isMarket": True, "tpsl": tpsl}},
+        "reduce_only": True,
+    }
+
+
+def order_statuses(result) -> List:
+    try:
+        return result["response"]["data"]["statuses"]
+    except (KeyError, TypeError):
+        return []
+
+
+def _status_oid(status) -> Optional[int]:
+    if isinstance(status, dict):
+        for key in ("resting", "filled"):
+            if isinstance(status.get(key), dict) and "oid" in status[key]:
+                return int(status[key]["oid"])
+    return None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+class FillStream:
+    """一个钱包一条 userFills 订阅，成交分发给所有监听者（同进程的多个策略共用）"""
+
+    def __init__(self, wallet: str, base_url: str = API_URL):
+        self.wallet = wallet
+        self.base_url = base_url
+        self.listeners: List[Callable[[List[Dict]], None]] = []
+        self._info = None
+
+    def start(self) -> bool:
+        try:
+            from hyperliquid.info import Info
+
+            cache = get_asset_meta(self.base_url)
+            self._info = Info(self.base_url, skip_ws=False, meta=cache.meta, spot_meta=cache.spot_meta)
+            # 连接建立前订阅会排队，连上后自动发送
+            self._info.subscribe({"type": "userFills", "user": self.wallet}, self._on_message)
+            logger.info("成交推送已启动 (userFills)")
+            return True
+        except Exception as e:
+            logger.warning("成交推送启动失败，改为每轮查询: %s", e)
+            self._info = None
+            return False
+
+    @property
+    def connected(self) -> bool:
+        """连接已建立且线程还活着；断线后 SDK 不会重连，由各策略回到每轮查询"""
+        manager = getattr(self._info, "ws_manager", None)
+        return bool(manager and manager.ws_ready and manager.is_alive())
+
+    def stop(self) -> None:
+        if self._info is not None:
+            try:
+                self._info.disconnect_websocket()
+            except Exception as e:
+                logger.warning("关闭成交推送失败: %s", e)
+            self._info = None
+
+    def _on_message(self, message: Dict) -> None:
+        data = message.get("data") or {}
+        # 首条是最近成交的快照，只会匹配到已登记的订单，照常分发
+        fills = data.get("fills") or []
+        for listener in list(self.listeners):
+            try:
+                listener(fills)
+            except Exception as e:
+                logger.warning("处理成交推送失败: %s", e)
+
+
+_streams: Dict[str, FillStream] = {}
+_streams_lock = threading.Lock()
+
+
+def get_fill_stream(wallet: str) -> FillStream:
+    with _streams_lock:
+        if wallet not in _streams:
+            stream = FillStream(wallet)
+            stream.start()
+            _streams[wallet] = stream
+        return _streams[wallet]
+
+
+def close_fill_streams() -> None:
+    """关闭所有成交推送连接（SDK 的 WebSocket 线程不是守护线程，不关进程退不出）"""
+    with _streams_lock:
+        for stream in _streams.values():
+            stream.stop()
+        _streams.clear()
+
+
+class ExecutionEngine:
+    """一个策略的下单执行器
+
+    exchange / info 与策略共用（多策略运行时是共享的 SharedExchange / SharedInfo）；
+    exchange 为空时是仅监控模式，submit_bracket 直接返回失败。
+    """
+
+    def __init__(self, strategy: str, exchange, info, wallet: str, stream: bool = True):
+        self.strategy = strategy
+        self.exchange = exchange
+        self.info = info
+        self.wallet = wallet
+        self._lock = threading.Lock()
+        self.orders: Dict[int, Dict] = {}
+        self.brackets: Dict[str, Dict] = {}
+        self.exits: Dict[str, List[Dict]] = {}
+        self.latency = {"ack": deque(maxlen=LATENCY_WINDOW), "fill": deque(maxlen=LATENCY_WINDOW)}
+        # 累计延迟样本数 / 上次 latency_updated() 时的样本数
+        self._latency_samples = 0
+        self._latency_reported = 0
+        self._last_fill_ms = int(time.time() * 1000)
+        self.stream = get_fill_stream(wallet) if (stream and exchange and wallet) else None
+        if self.stream:
+            self.stream.listeners.append(self.on_fills)
+
+    # ---- 下单 ----
+
+    def submit_bracket(self, coin: str, is_buy: bool, size: float, price: float,
+                       stop_loss: Optional[float] = None, take_profit: Optional[float] = None,
+                       slippage: float = ENTRY_SLIPPAGE) -> Dict:
+        """入场 + 止损 + 止盈一次提交，返回 {ok, error, oid, limit_price, result}"""
+        if not self.exchange:
+            return {"ok": False, "error": "monitor-only mode", "oid": None, "limit_price": 0.0, "result": None}
+        limit_price = round_price(coin, price * (1 + slippage) if is_buy else price * (1 - slippage))
+        is_long = is_buy
+        orders = [limit_order_request(coin, is_buy, size, limit_price)]
+        kinds = ["entry"]
+        if take_profit:
+            orders.append(trigger_order_request(coin, size, take_profit, is_long, "tp"))
+            kinds.append("tp")
+        if stop_loss:
+            orders.append(trigger_order_request(coin, size, stop_loss, is_long, "sl"))
+            kinds.append("sl")
+
+        submitted = time.time()
+        result = self.exchange.bulk_orders(orders, grouping="normalTpsl" if len(orders) > 1 else "na")
+        acked = time.time()
+
+        statuses = order_statuses(result)
+        if not isinstance(result, dict) or result.get("status") != "ok":
+            return {"ok": False, "error": str(result), "oid": None, "limit_price": limit_price, "result": result}
+        entry = statuses[0] if statuses else {}
+        if isinstance(entry, dict) and "error" in entry:
+            return {"ok": False, "error": entry["error"], "oid": None, "limit_price": limit_price, "result": result}
+        oid = _status_oid(entry)
+        if oid is None:
+            return {"ok": False, "error": f"unexpected status {entry}", "oid": None,
+                    "limit_price": limit_price, "result": result}
+
+        with self._lock:
+            self.latency["ack"].append((acked - submitted) * 1000)
+            self._latency_samples += 1
+            for kind, status, order in zip(kinds, statuses, orders):
+                child_oid = _status_oid(status)
+                if child_oid is not None:
+                    self._track(child_oid, coin, kind, order["sz"], submitted, acked)
+            if isinstance(entry, dict) and "filled" in entry:
+                self._mark_filled(oid, acked, float(entry["filled"].get("totalSz", orders[0]["sz"])))
+            self.brackets[coin] = {
+                "oid": oid, "is_long": is_long, "size": orders[0]["sz"], "stop_loss": stop_loss,
+                "take_profit": take_profit, "opened": submitted, "closed_sz": 0.0,
+                "oids": [o for o in map(_status_oid, statuses) if o is not None],
+            }
+        register_order(self.strategy, result, coin)
+        return {"ok": True, "error": None, "oid": oid, "limit_price": limit_price, "result": result}
+
+    def move_stop(self, coin: str, is_long: bool, size: float, trigger_price: float):
+        """把交易所上的止损单改到新触发价；找不到止损单时补挂一张"""
+        if not self.exchange:
+            return None
+        req = trigger_order_request(coin, size, trigger_price, is_long, "sl")
+        stop = self._find_stop(coin, is_long)
+        if stop is None:
+            result = self.exchange.bulk_orders([req])
+        else:
+            result = self.exchange.modify_order(stop, coin, req["is_buy"], req["sz"], req["limit_px"],
+                                                req["order_type"], reduce_only=True)
+        # 改单是撤旧挂新（新 oid），新止损单的平仓成交也要认作这个 bracket 的出场
+        new_oids = [o for o in map(_status_oid, order_statuses(result)) if o is not None]
+        if stop is not None and not new_oids:
+            new_stop = self._find_stop(coin, is_long)
+            new_oids = [new_stop] if new_stop is not None else []
+        with self._lock:
+            bracket = self.brackets.get(coin)
+            if bracket:
+                bracket["stop_loss"] = trigger_price
+                if bracket.get("oids") is not None:
+                    bracket["oids"].extend(new_oids)
+        return result
+
+    def cancel_bracket(self, coin: str):
+        """撤掉 bracket 还挂着的单: 记下的入场 / 止盈 / 止损单，以及该币种的 reduce-only 单
+
+        只在链上该币种已经没有仓位时调用（reduce-only 单此时对谁都没用）；
+        重启恢复的 bracket 没有记录订单号，靠后者撤掉残留的止盈止损
+        """
+        if not self.exchange:
+            return None
+        with self._lock:
+            oids = set((self.brackets.get(coin) or {}).get("oids") or [])
+        cancels = []
+        for order in self.info.frontend_open_orders(self.wallet):
+            if order.get("coin") == coin and (int(order["oid"]) in oids or order.get("reduceOnly")):
+                cancels.append({"coin": coin, "oid": int(order["oid"])})
+        if not cancels:
+            return None
+        return self.exchange.bulk_cancel(cancels)
+
+    def _find_stop(self, coin: str, is_long: bool) -> Optional[int]:
+        for order in self.info.frontend_open_orders(self.wallet):
+            if (order.get("coin") == coin and order.get("isTrigger") and order.get("reduceOnly")
+                    and order.get("side") == ("A" if is_long else "B")
+                    and "Stop" in order.get("orderType", "")):
+                return int(order["oid"])
+        return None
+
+    # ---- 成交 ----
+
+    def _track(self, oid: int, coin: str, kind: str, size: float, submitted: float, acked: float) -> None:
+        self.orders[oid] = {"coin": coin, "kind": kind, "size": size, "submitted": submitted,
+                            "acked": acked, "filled_sz": 0.0, "filled": None}
+        while len(self.orders) > MAX_TRACKED_ORDERS:
+            self.orders.pop(next(iter(self.orders)))
+
+    def _mark_filled(self, oid: int, ts: float, size: float) -> None:
+        order = self.orders.get(oid)
+        if not order or order["filled"]:
+            return
+        order["filled_sz"] += size
+        if order["filled_sz"] >= order["size"] * 0.999:
+            order["filled"] = ts
+            self.latency["fill"].append((ts - order["submitted"]) * 1000)
+            self._latency_samples += 1
+
+    def on_fills(self, fills: List[Dict]) -> None:
+        """处理一批成交（推送或查询）：登记过的订单更新成交进度，bracket 币种的平仓成交记为出场"""
+        with self._lock:
+            for fill in fills:
+                ts = int(fill.get("time", 0))
+                self._last_fill_ms = max(self._last_fill_ms, ts + 1)
+                oid = fill.get("oid")
+                if oid in self.orders:
+                    self._mark_filled(oid, ts / 1000, float(fill.get("sz", 0)))
+                coin = fill.get("coin")
+                bracket = self.brackets.get(coin)
+                if (bracket and str(fill.get("dir", "")).startswith("Close")
+                        and self._is_bracket_exit(bracket, oid, ts)):
+                    self.exits.setdefault(coin, []).append(fill)
+                    bracket["closed_sz"] += float(fill.get("sz", 0))
+
+    @staticmethod
+    def _is_bracket_exit(bracket: Dict, oid, ts: int) -> bool:
+        """平仓成交是不是这个 bracket 的止盈止损单成交的（同钱包手动平仓、其他策略的成交不算）
+
+        重启恢复的 bracket 没有订单号，只能按币种 + 时间认
+        """
+        if bracket.get("oids") is None:
+            return ts / 1000 >= bracket["opened"]
+        return oid in bracket["oids"]
+
+    def poll_fills(self) -> None:
+        """没有推送连接时，每轮开始查一次上次之后的成交"""
+        if self.stream and self.stream.connected:
+            return
+        if not self.wallet:
+            return
+        try:
+            fills = self.info.user_fills_by_time(self.wallet, self._last_fill_ms)
+        except Exception as e:
+            logger.warning("[%s] 查询成交失败: %s", self.strategy, e)
+            return
+        if fills:
+            self.on_fills(fills)
+
+    def pop_exit(self, coin: str) -> Optional[Dict]:
+        """bracket 仓位已在交易所全部平掉时返回出场汇总 {price, size, pnl, fee, reason}，否则 None"""
+        with self._lock:
+            bracket = self.brackets.get(coin)
+            if not bracket or bracket["closed_sz"] < bracket["size"] * 0.999:
+                return None
+            fills = self.exits.pop(coin, [])
+            del self.brackets[coin]
+        size = sum(float(f["sz"]) for f in fills) or bracket["size"]
+        price = sum(float(f["px"]) * float(f["sz"]) for f in fills) / size
+        pnl = sum(float(f.get("closedPnl", 0)) for f in fills)
+        # 出场价离哪个触发价近就算哪个（跟踪止损上移后止损也可能是盈利的）
+        if bracket["stop_loss"] and bracket["take_profit"]:
+            hit_tp = abs(price - bracket["take_profit"]) < abs(price - bracket["stop_loss"])
+        else:
+            hit_tp = pnl > 0
+        return {
+            "price": price,
+            "size": size,
+            "pnl": pnl,
+            "fee": sum(float(f.get("fee", 0)) for f in fills),
+            "reason": "TAKE_PROFIT" if hit_tp else "STOP_LOSS",
+        }
+
+    def forget(self, coin: str) -> None:
+        """仓位在别处平掉（手动 / 没收到成交）时丢弃 bracket 记录"""
+        with self._lock:
+            self.brackets.pop(coin, None)
+            self.exits.pop(coin, None)
+
+    def restore_bracket(self, coin: str, is_long: bool, size: float, opened: float,
+                        stop_loss: Optional[float] = None, take_profit: Optional[float] = None) -> None:
+        """重启后按持久化的持仓记录恢复 bracket，之后的平仓成交照常识别"""
+        with self._lock:
+            self.brackets[coin] = {"oid": None, "is_long": is_long, "size": size, "stop_loss": stop_loss,
+                                   "take_profit": take_profit, "opened": opened, "closed_sz": 0.0,
+                                   "oids": None}
+            self._last_fill_ms = min(self._last_fill_ms, int(opened * 1000))
+
+    # ---- 统计 ----
+
+    def latency_updated(self) -> bool:
+        """上次调用之后有没有新的 ack / 成交延迟样本（日志只在有变化时打）"""
+        with self._lock:
+            updated = self._latency_samples != self._latency_reported
+            self._latency_reported = self._latency_samples
+        return updated
+
+    def latency_stats(self) -> Dict[str, Dict]:
+        """提交→确认（ack）、提交→完全成交（fill）的延迟，毫秒"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self.latency.items()}
+        stats = {}
+        for name, values in samples.items():
+            if values:
+                stats[name] = {
+                    "count": len(values),
+                    "p50": round(_percentile(values, 0.5), 1),
+                    "p95": round(_percentile(values, 0.95), 1),
+                    "max": round(max(values), 1),
+                }
+        return stats
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+成交同步与盈亏统计
+
+从上次保存的游标开始分页拉取 userFillsByTime，写入本地库（memory/trading/fills.db），
+同时增量维护按策略 / 币种的已实现盈亏、手续费、成交笔数和成交额:
+- 每次同步通常只是一个小请求（游标之后的新成交）；按 tid 去重，重复拉取不会重复计数
+- 成交按订单 oid 归属到策略（机器人下单成功后调用 register_order 登记）；
+  止盈止损等未登记的平仓单归属到该币种最近一次开仓的策略，其余记为 manual
+
+用法:
+  python fill_sync.py                 # 同步后打印汇总
+  python fill_sync.py --json          # JSON 输出（日报 / 网站用）
+  python fill_sync.py --no-sync       # 只读本地统计
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from trade_state import STATE_DIR
+
+FILLS_DB = STATE_DIR / "fills.db"
+
+# userFillsByTime 单次最多返回的条数，满页时继续翻页
+PAGE_LIMIT = 2000
+MAX_PAGES = 20
+
+# 没有策略登记的成交
+MANUAL = "manual"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fills (
+    tid        INTEGER PRIMARY KEY,
+    time       INTEGER NOT NULL,
+    coin       TEXT NOT NULL,
+    side       TEXT NOT NULL,
+    dir        TEXT NOT NULL,
+    px         REAL NOT NULL,
+    sz         REAL NOT NULL,
+    fee        REAL NOT NULL,
+    closed_pnl REAL NOT NULL,
+    oid        INTEGER,
+    strategy   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fills_by_time ON fills (time);
+CREATE TABLE IF NOT EXISTS stats (
+    strategy     TEXT NOT NULL,
+    symbol       TEXT NOT NULL,
+    realized_pnl REAL NOT NULL DEFAULT 0,
+    fees         REAL NOT NULL DEFAULT 0,
+    trades       INTEGER NOT NULL DEFAULT 0,
+    volume       REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (strategy, symbol)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS orders (
+    oid      INTEGER PRIMARY KEY,
+    strategy TEXT NOT NULL,
+    coin     TEXT,
+    created  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS owners (
+    coin     TEXT PRIMARY KEY,
+    strategy TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 写事务在进程内串行；连接每个线程一个（同 trade_state），读不会落进别的线程未提交的写事务
+_lock = threading.RLock()
+_local = threading.local()
+_schema_ready = set()
+
+
+def _db(path=FILLS_DB) -> sqlite3.Connection:
+    key = str(path)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(key)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _lock:
+            if key not in _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _schema_ready.add(key)
+        conns[key] = conn
+    return conn
+
+
+def order_oid(result: Dict) -> Optional[int]:
+    """从 exchange.order 的返回里取 oid（resting 或 filled）"""
+    try:
+        status = result["response"]["data"]["statuses"][0]
+    except (KeyError, IndexError, TypeError):
+        return None
+    for key in ("resting", "filled"):
+        if isinstance(status.get(key), dict) and "oid" in status[key]:
+            return int(status[key]["oid"])
+    return None
+
+
+def register_order(strategy: str, result: Dict, coin: str = None, path=FILLS_DB) -> Optional[int]:
+    """登记某个策略的订单，之后同步到的成交按 oid 归属到该策略；失败不影响交易"""
+    oid = order_oid(result)
+    if oid is None:
+        return None
+    try:
+        with _lock:
+            _db(path).execute(
+                "INSERT OR REPLACE INTO orders (oid, strategy, coin, created) VALUES (?, ?, ?, ?)",
+                (oid, strategy, coin, time.time()),
+            )
+    except Exception as e:
+        print(f"登记订单失败 {strategy} {oid}: {e}", file=sys.stderr)
+    return oid
+
+
+class FillSync:
+    """post: 发送 /info 请求的函数（body -> JSON），机器人传 info.post 包装，网站数据服务传 hl_request"""
+
+    def __init__(self, post: Callable[[Dict], List[Dict]], wallet: str, path=FILLS_DB):
+        self.post = post
+        self.wallet = wallet
+        self.path = path
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        return _db(self.path)
+
+    def cursor(self) -> int:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (f"cursor:{self.wallet}",)).fetchone()
+        return int(row[0]) if row else 0
+
+    def sync(self) -> int:
+        """拉取游标之后的新成交，返回新增条数"""
+        added = 0
+        start = self.cursor()
+        for _ in range(MAX_PAGES):
+            page = self.post({"type": "userFillsByTime", "user": self.wallet,
+                              "startTime": start, "aggregateByTime": False})
+            if not isinstance(page, list) or not page:
+                break
+            added += self._ingest(page)
+            last = max(int(f["time"]) for f in page)
+            # 游标停在最后一条成交的毫秒上（包含），同一毫秒的成交靠 tid 去重
+            if len(page) < PAGE_LIMIT or last <= start:
+                break
+            start = last
+        return added
+
+    def _strategy_for(self, fill: Dict) -> str:
+        row = self.db.execute("SELECT strategy FROM orders WHERE oid = ?", (fill.get("oid"),)).fetchone()
+        if row:
+            return row[0]
+        if str(fill.get("dir", "")).startswith("Close"):
+            owner = self.db.execute("SELECT strategy FROM owners WHERE coin = ?", (fill["coin"],)).fetchone()
+            if owner:
+                return owner[0]
+        return MANUAL
+
+    def _ingest(self, fills: List[Dict]) -> int:
+        added = 0
+        with _lock:
+            db = self.db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self.cursor()
+                for f in sorted(fills, key=lambda f: int(f["time"])):
+                    strategy = self._strategy_for(f)
+                    px, sz = float(f["px"]), float(f["sz"])
+                    fee, pnl = float(f.get("fee", 0)), float(f.get("closedPnl", 0))
+                    inserted = db.execute(
+                        "INSERT OR IGNORE INTO fills (tid, time, coin, side, dir, px, sz, fee, closed_pnl, oid, strategy) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (int(f["tid"]), int(f["time"]), f["coin"], f.get("side", ""), f.get("dir", ""),
+                         px, sz, fee, pnl, f.get("oid"), strategy),
+                    ).rowcount
+                    cursor = max(cursor, int(f["time"]))
+                    if not inserted:
+                        continue
+                    added += 1
+                    db.execute(
+                        "INSERT INTO stats (strategy, symbol, realized_pnl, fees, trades, volume) "
+                        "VALUES (?, ?, ?, ?, 1, ?) ON CONFLICT (strategy, symbol) DO UPDATE SET "
+                        "realized_pnl = realized_pnl + excluded.realized_pnl, fees = fees + excluded.fees, "
+                        "trades = trades + 1, volume = volume + excluded.volume",
+                        (strategy, f["coin"], pnl, fee, px * sz),
+                    )
+                    if str(f.get("dir", "")).startswith("Open") and strategy != MANUAL:
+                        db.execute("INSERT OR REPLACE INTO owners (coin, strategy) VALUES (?, ?)",
+                                   (f["coin"], strategy))
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                           (f"cursor:{self.wallet}", str(cursor)))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return added
+
+    def stats(self, by: str = "strategy") -> Dict[str, Dict]:
+        """按 strategy / symbol 汇总：realized_pnl / fees / net_pnl / trades / volume"""
+        column = "symbol" if by == "symbol" else "strategy"
+        rows = self.db.execute(
+            f"SELECT {column}, SUM(realized_pnl), SUM(fees), SUM(trades), SUM(volume) FROM stats GROUP BY {column}"
+        ).fetchall()
+        return {key: _stat_row(pnl, fees, trades, volume) for key, pnl, fees, trades, volume in rows}
+
+    def totals(self) -> Dict:
+        pnl, fees, trades, volume = self.db.execute(
+            "SELECT COALESCE(SUM(realized_pnl), 0), COALESCE(SUM(fees), 0), "
+            "COALESCE(SUM(trades), 0), COALESCE(SUM(volume), 0) FROM stats"
+        ).fetchone()
+        return _stat_row(pnl, fees, trades, volume)
+
+
+def _stat_row(pnl: float, fees: float, trades: int, volume: float) -> Dict:
+    return {
+        "realized_pnl": round(pnl, 6),
+        "fees": round(fees, 6),
+        "net_pnl": round(pnl - fees, 6),
+        "trades": int(trades),
+        "volume": round(volume, 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="同步成交并输出盈亏统计")
+    parser.add_argument("--wallet", default=os.getenv("MAIN_WALLET", ""))
+    parser.add_argument("--no-sync", action="store_true", help="不请求接口，只读本地统计")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    sync = FillSync(None, args.wallet)
+    if not args.no_sync:
+        from hl_client import create_info, load_hl_config
+
+        sync.wallet = args.wallet or load_hl_config().get("MAIN_WALLET", "")
+        if not sync.wallet:
+            parser.error("缺少钱包地址（--wallet / MAIN_WALLET / config/.hl_config）")
+        info = create_info()
+        sync.post = lambda body: info.post("/info", body)
+        try:
+            added = sync.sync()
+            if not args.json:
+                print(f"新增成交 {added} 条")
+        except Exception as e:
+            print(f"同步成交失败，使用本地统计: {e}", file=sys.stderr)
+
+    report = {"totals": sync.totals(), "by_strategy": sync.stats("strategy"), "by_symbol": sync.stats("symbol")}
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    t = report["totals"]
+    print(f"合计: 已实现 ${t['realized_pnl']:.2f} | 手续费 ${t['fees']:.2f} | 净盈亏 ${t['net_pnl']:.2f} | "
+          f"{t['trades']} 笔 | 成交额 ${t['volume']:.2f}")
+    for name, s in sorted(report["by_strategy"].items()):
+        print(f"  {name:<18} 净盈亏 ${s['net_pnl']:>9.2f}  手续费 ${s['fees']:>7.2f}  {s['trades']:>4} 笔")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Hyperliquid 客户端共享层
+
+- 统一读取 config/.hl_config
+- Info / Exchange 复用本地缓存的 meta / spotMeta（asset_meta），构造时不再请求元数据
+- 多策略同进程运行时共享一个 Info 和一个签名 Exchange
+- SharedInfo: 同一轮循环内缓存账户快照、挂单、中间价和K线，下单后账户类缓存自动失效
+- SharedExchange: 串行化签名请求（nonce 取毫秒时间戳，并发下单会撞 nonce）
+- 每个请求按接口记录延迟（metrics）；HL_RECORD 设置时录制 /info 查询（cassette）
+- SDK 延迟导入：仅监控模式（无私钥）不会加载 eth_account / hyperliquid.exchange
+"""
+
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from asset_meta import API_URL, get_asset_meta
+from cassette import record_api
+from metrics import instrument_api
+
+if TYPE_CHECKING:
+    from hyperliquid.exchange import Exchange
+    from hyperliquid.info import Info
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CONFIG_PATH = PROJECT_ROOT / "config" / ".hl_config"
+
+# 账户相关查询：任何下单/撤单后都要重新拉取
+ACCOUNT_QUERIES = ("user_state", "open_orders", "frontend_open_orders")
+
+
+def load_hl_config() -> Dict[str, str]:
+    """读取 .hl_config（KEY=VALUE），API_PRIVATE_KEY 缺失时回退到环境变量 HL_API_KEY"""
+    cfg: Dict[str, str] = {}
+    if CONFIG_PATH.exists():
+        for raw in CONFIG_PATH.read_text().splitlines():
+            line = raw.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            cfg[key.strip()] = value.strip()
+    if not cfg.get("API_PRIVATE_KEY") and os.getenv("HL_API_KEY"):
+        cfg["API_PRIVATE_KEY"] = os.getenv("HL_API_KEY", "")
+    return cfg
+
+
+@lru_cache(maxsize=4)
+def load_account(private_key: str):
+    """签名账户；同一私钥只解析一次"""
+    from eth_account import Account
+
+    return Account.from_key(private_key)
+
+
+def create_info(base_url: str = API_URL) -> "Info":
+    from hyperliquid.info import Info
+
+    cache = get_asset_meta(base_url)
+    info = Info(base_url, skip_ws=True, meta=cache.meta, spot_meta=cache.spot_meta)
+    return instrument_api(record_api(info, cache.meta, cache.spot_meta))
+
+
+def create_exchange(private_key: str, main_wallet: str,
+                    base_url: str = API_URL) -> Optional["Exchange"]:
+    """没有私钥时返回 None（仅监控模式）"""
+    if not private_key:
+        return None
+    from hyperliquid.exchange import Exchange
+
+    account = load_account(private_key)
+    cache = get_asset_meta(base_url)
+    exchange = Exchange(account, base_url, meta=cache.meta, account_address=main_wallet or None,
+                        spot_meta=cache.spot_meta)
+    instrument_api(record_api(exchange.info, cache.meta, cache.spot_meta))
+    return instrument_api(exchange)
+
+
+class SharedInfo:
+    """Info 代理：同一轮循环内多个策略共享查询结果
+
+    - user_state / open_orders / frontend_open_orders / all_mids 按参数缓存到本轮结束
+    - candles_snapshot 按 (币种, 周期) 缓存本轮拉到的最长区间，更短的请求直接切片返回
+    - 其余方法原样透传给底层 Info
+    - 多个币种并发请求同一个 key 时只有一个线程去拉取，其余等待后直接命中缓存
+    """
+
+    def __init__(self, info: "Info"):
+        self._info = info
+        self._lock = threading.Lock()
+        self._cache: Dict[tuple, Any] = {}
+        self._candles: Dict[tuple, Dict] = {}
+        self._fetch_locks: Dict[tuple, threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def begin_cycle(self) -> None:
+        """新一轮循环开始，清空全部缓存"""
+        with self._lock:
+            self._cache.clear()
+            self._candles.clear()
+
+    def invalidate_account(self) -> None:
+        with self._lock:
+            for key in [k for k in self._cache if k[0] in ACCOUNT_QUERIES]:
+                del self._cache[key]
+
+    def _fetch_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def _cached_call(self, name: str, *args) -> Any:
+        key = (name,) + args
+        with self._fetch_lock(key):
+            with self._lock:
+                if key in self._cache:
+                    self.stats["hits"] += 1
+                    return self._cache[key]
+            result = getattr(self._info, name)(*args)
+            with self._lock:
+                self._cache[key] = result
+                self.stats["misses"] += 1
+            return result
+
+    def user_state(self, address: str, dex: str = "") -> Any:
+        return self._cached_call("user_state", address, dex)
+
+    def open_orders(self, address: str, dex: str = "") -> Any:
+        return self._cached_call("open_orders", address, dex)
+
+    def frontend_open_orders(self, address: str, dex: str = "") -> Any:
+        return self._cached_call("frontend_open_orders", address, dex)
+
+    def all_mids(self, dex: str = "") -> Any:
+        return self._cached_call("all_mids", dex)
+
+    def candles_snapshot(self, name: str, interval: str, startTime: int, endTime: int) -> Any:
+        key = (name, interval)
+        with self._fetch_lock(("candles",) + key):
+            with self._lock:
+                entry = self._candles.get(key)
+                if entry and startTime >= entry["start"]:
+                    self.stats["hits"] += 1
+                    return [c for c in entry["candles"] if c["T"] >= startTime]
+            candles = self._info.candles_snapshot(name, interval, startTime, endTime)
+            with self._lock:
+                self._candles[key] = {"start": startTime, "candles": candles}
+                self.stats["misses"] += 1
+            return candles
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._info, name)
+
+
+class SharedExchange:
+    """Exchange 代理：所有策略共用一个签名客户端，调用串行化，写操作后让账户缓存失效
+
+    单独运行的机器人也用它包一层（info 为 None）：SymbolRunner 的多个币种线程共用一个 Exchange
+    """
+
+    def __init__(self, exchange: "Exchange", info: Optional[SharedInfo] = None):
+        self._exchange = exchange
+        self._info = info
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._exchange, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    if self._info is not None:
+                        self._info.invalidate_account()
+
+        return call
@@ -7,10 +7,9 @@ import os
 import json
 import argparse
 from pathlib import Path
-from hyperliquid.info import Info
-from hyperliquid.exchange import Exchange
-from hyperliquid.utils import constants
-from eth_account import Account
+from asset_meta import get_asset_meta, round_price, round_size
+from execution import trigger_order_request
+from hl_client import create_exchange, create_info
 
 def load_config():
     """Load config from .hl_config file"""
@@ -37,7 +36,7 @@ API_PRIVATE_KEY = _config["API_PRIVATE_KEY"]
 
 def get_account_info():
     """Get account balance and positions"""
-    info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    info = create_info()
     state = info.user_state(MAIN_WALLET)
     return {
         "account_value": state["marginSummary"]["accountValue"],
@@ -47,20 +46,21 @@ def get_account_info():
 
 def get_market_price(coin: str):
     """Get current market price for a coin"""
-    info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    info = create_info()
     mids = info.all_mids()
     return float(mids.get(coin, 0))
 
 def get_meta():
-    """Get exchange metadata (coin indices etc)"""
-    info = Info(constants.MAINNET_API_URL, skip_ws=True)
-    return info.meta()
+    """Get exchange metadata (coin indices etc), served from the local cache"""
+    return get_asset_meta().meta
 
 def place_order(coin: str, is_buy: bool, size: float, price: float, reduce_only: bool = False):
     """Place a limit order"""
-    account = Account.from_key(API_PRIVATE_KEY)
-    exchange = Exchange(account, constants.MAINNET_API_URL, account_address=MAIN_WALLET)
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
     
+    # round to the coin's szDecimals / price precision, otherwise the order is rejected
+    size = round_size(coin, size)
+    price = round_price(coin, price)
     order_result = exchange.order(
         coin,
         is_buy,
@@ -73,8 +73,7 @@ def place_order(coin: str, is_buy: bool, size: float, price: float, reduce_only:
 
 def place_market_order(coin: str, is_buy: bool, size: float):
     """Place a market order"""
-    account = Account.from_key(API_PRIVATE_KEY)
-    exchange = Exchange(account, constants.MAINNET_API_URL, account_address=MAIN_WALLET)
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
     
     # Get current price and add slippage
     current_price = get_market_price(coin)
@@ -83,6 +82,8 @@ def place_market_order(coin: str, is_buy: bool, size: float):
         price = current_price * (1 + slippage)
     else:
         price = current_price * (1 - slippage)
+    size = round_size(coin, size)
+    price = round_price(coin, price)
     
     order_result = exchange.order(
         coin,
@@ -95,27 +96,35 @@ def place_market_order(coin: str, is_buy: bool, size: float):
 
 def cancel_order(coin: str, oid: int):
     """Cancel an order"""
-    account = Account.from_key(API_PRIVATE_KEY)
-    exchange = Exchange(account, constants.MAINNET_API_URL, account_address=MAIN_WALLET)
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
     return exchange.cancel(coin, oid)
 
-def place_stop_loss(coin: str, size: float, trigger_price: float, is_long: bool = True):
-    """Place a stop loss order (trigger order)
-    
-    For LONG position: stop loss triggers when price DROPS to trigger_price (sell)
-    For SHORT position: stop loss triggers when price RISES to trigger_price (buy)
-    """
-    # 验证触发价合理性
-    current_price = get_market_price(coin)
+def _check_stop_trigger(trigger_price: float, current_price: float, is_long: bool):
     if is_long:
         if trigger_price >= current_price:
             raise ValueError(f"LONG stop-loss trigger ({trigger_price}) must be BELOW current price ({current_price})")
     else:
         if trigger_price <= current_price:
             raise ValueError(f"SHORT stop-loss trigger ({trigger_price}) must be ABOVE current price ({current_price})")
+
+def place_stop_loss(coin: str, size: float, trigger_price: float, is_long: bool = True,
+                    current_price: float = None):
+    """Place a stop loss order (trigger order)
     
-    account = Account.from_key(API_PRIVATE_KEY)
-    exchange = Exchange(account, constants.MAINNET_API_URL, account_address=MAIN_WALLET)
+    For LONG position: stop loss triggers when price DROPS to trigger_price (sell)
+    For SHORT position: stop loss triggers when price RISES to trigger_price (buy)
+
+    current_price: caller's latest mid (e.g. from a snapshot); fetched when omitted
+    """
+    # 验证触发价合理性
+    if current_price is None:
+        current_price = get_market_price(coin)
+    _check_stop_trigger(trigger_price, current_price, is_long)
+    
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
+    
+    size = round_size(coin, size)
+    trigger_price = round_price(coin, trigger_price)
     
     # For a long position, stop loss is a sell order triggered when price drops
     # For a short position, stop loss is a buy order triggered when price rises
@@ -131,14 +140,18 @@ def place_stop_loss(coin: str, size: float, trigger_price: float, is_long: bool
     )
     return order_result
 
-def place_take_profit(coin: str, size: float, trigger_price: float, is_long: bool = True):
+def place_take_profit(coin: str, size: float, trigger_price: float, is_long: bool = True,
+                      current_price: float = None):
     """Place a take profit order (trigger order)
     
     For LONG position: take profit triggers when price RISES to trigger_price (sell)
     For SHORT position: take profit triggers when price DROPS to trigger_price (buy)
+
+    current_price: caller's latest mid (e.g. from a snapshot); fetched when omitted
     """
     # 验证触发价合理性
-    current_price = get_market_price(coin)
+    if current_price is None:
+        current_price = get_market_price(coin)
     if is_long:
         if trigger_price <= current_price:
             raise ValueError(f"LONG take-profit trigger ({trigger_price}) must be ABOVE current price ({current_price})")
@@ -146,8 +159,10 @@ def place_take_profit(coin: str, size: float, trigger_price: float, is_long: boo
         if trigger_price >= current_price:
             raise ValueError(f"SHORT take-profit trigger ({trigger_price}) must be BELOW current price ({current_price})")
     
-    account = Account.from_key(API_PRIVATE_KEY)
-    exchange = Exchange(account, constants.MAINNET_API_URL, account_address=MAIN_WALLET)
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
+    
+    size = round_size(coin, size)
+    trigger_price = round_price(coin, trigger_price)
     
     # For a long position, take profit is a sell order triggered when price rises
     # For a short position, take profit is a buy order triggered when price drops
@@ -163,24 +178,64 @@ def place_take_profit(coin: str, size: float, trigger_price: float, is_long: boo
     )
     return order_result
 
+def modify_stop_loss(coin: str, oid: int, size: float, trigger_price: float, is_long: bool = True,
+                     current_price: float = None):
+    """Move an existing stop loss to a new trigger price (and size) in one request
+
+    The exchange replaces the order atomically (batchModify), so unlike cancel + place
+    the position is never left without a stop in between.
+    """
+    if current_price is None:
+        current_price = get_market_price(coin)
+    _check_stop_trigger(trigger_price, current_price, is_long)
+
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
+    req = trigger_order_request(coin, size, trigger_price, is_long, "sl")
+    return exchange.modify_order(oid, coin, req["is_buy"], req["sz"], req["limit_px"], req["order_type"],
+                                 reduce_only=True)
+
+def bulk_place(order_requests: list, grouping: str = "na"):
+    """Place several orders in one signed request
+
+    order_requests: built with limit_order_request / trigger_order_request
+    grouping: "normalTpsl" attaches the trailing TP/SL orders to the first (entry) order
+    """
+    if not order_requests:
+        return None
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
+    return exchange.bulk_orders(order_requests, grouping=grouping)
+
+def bulk_cancel(cancels: list):
+    """Cancel several orders in one request; cancels: [{"coin": "BTC", "oid": 123}, ...]"""
+    if not cancels:
+        return None
+    exchange = create_exchange(API_PRIVATE_KEY, MAIN_WALLET)
+    return exchange.bulk_cancel([{"coin": c["coin"], "oid": int(c["oid"])} for c in cancels])
+
+def cancel_all_orders(coin: str = None):
+    """Cancel every open order (optionally only one coin's) in a single request"""
+    orders = get_open_orders()
+    return bulk_cancel([o for o in orders if coin is None or o.get("coin") == coin])
+
 def get_open_orders():
     """Get open orders (basic info only)"""
-    info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    info = create_info()
     return info.open_orders(MAIN_WALLET)
 
 def get_open_orders_detailed():
     """Get open orders with full details (including isTrigger, orderType, etc.)"""
-    info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    info = create_info()
     return info.frontend_open_orders(MAIN_WALLET)
 
 def main():
     parser = argparse.ArgumentParser(description="Hyperliquid Trading CLI")
-    parser.add_argument("action", choices=["status", "price", "meta", "orders", "buy", "sell", "cancel", "stop-loss", "take-profit"])
+    parser.add_argument("action", choices=["status", "price", "meta", "orders", "buy", "sell", "cancel", "cancel-all",
+                                           "stop-loss", "move-stop", "take-profit"])
     parser.add_argument("--coin", default="BTC", help="Coin to trade")
     parser.add_argument("--size", type=float, help="Order size")
     parser.add_argument("--price", type=float, help="Limit price (optional for market)")
     parser.add_argument("--trigger", type=float, help="Trigger price for stop-loss/take-profit")
-    parser.add_argument("--oid", type=int, help="Order ID for cancel")
+    parser.add_argument("--oid", type=int, help="Order ID for cancel / move-stop")
     parser.add_argument("--reduce", action="store_true", help="Reduce only")
     parser.add_argument("--short", action="store_true", help="For short position (default is long)")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be done without executing")
@@ -241,6 +296,24 @@ def main():
             result = cancel_order(args.coin, args.oid)
             print(json.dumps(result, indent=2))
     
+    elif args.action == "cancel-all":
+        if args.dry_run:
+            orders = [o for o in get_open_orders() if o.get("coin") == args.coin]
+            print(f"🧪 DRY RUN - Would cancel {len(orders)} {args.coin} orders in one request")
+        else:
+            result = cancel_all_orders(args.coin)
+            print(json.dumps(result, indent=2))
+    
+    elif args.action == "move-stop":
+        if not args.oid or not args.size or not args.trigger:
+            print("Error: --oid, --size and --trigger required")
+            sys.exit(1)
+        if args.dry_run:
+            print(f"🧪 DRY RUN - Would move stop {args.oid} on {args.coin} to ${args.trigger:,.2f}")
+        else:
+            result = modify_stop_loss(args.coin, args.oid, args.size, args.trigger, not args.short)
+            print(json.dumps(result, indent=2))
+    
     elif args.action == "stop-loss":
         if not args.size or not args.trigger:
             print("Error: --size and --trigger required")
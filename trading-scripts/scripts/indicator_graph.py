@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+指标图 — 多个策略共用一份指标计算
+
+各策略在分析函数里声明要用的指标（节点 = 计算函数 + 参数 + 输入），由图负责计算和去重：
+- 输入是K线列（close/high/low/volume...）或其他节点：MACD = EMA快 − EMA慢，布林带 = SMA ± k·STD，
+  中间节点（EMA、SMA、STD）也是节点，别的策略单独要 EMA26 时直接复用
+- K线列按内容去重：同一币种同一周期同一窗口的K线，不管是哪个策略拉的，都是同一个源
+- 同一 (函数, 参数, 输入) 只算一次，结果给所有消费者；结果只读，调用方不要修改返回的列表
+- 按函数本身去重，不按名字：各策略里同名但算法不同的指标（ATR 有好几种写法、RSI 有两种）各算各的，
+  只有这里的公共实现（sma / ema / rolling_std / bollinger / macd / calculate_atr）会跨策略合并
+- 结果保留到下一根K线：运行时每轮调用 begin_cycle()，上一轮算过、这一轮K线没变的节点直接命中，
+  这一轮没再用到的丢弃；单独运行的机器人不调用，缓存条目超过 MAX_ENTRIES 时自动轮换
+
+用法:
+  src = indicator_graph.source(close=closes, high=highs, low=lows)
+  bb_mid, bb_upper, bb_lower = src.get(*bollinger_nodes("close", 20, 2.0))
+  macd_line, signal_line, _ = src.get(*macd_nodes("close", 12, 26, 9))
+  rsi = src.get(node(rsi_wilder, ("close",), 14))     # 策略自己的实现也能挂进图里
+"""
+
+import functools
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# 单代缓存的条目上限（节点结果 + K线列），超过后轮换一代
+MAX_ENTRIES = 2048
+
+
+# ========== 公共实现（与各机器人原来的逐币种实现逐位一致） ==========
+
+def sma(values: List[float], period: int) -> List[float]:
+    if not values:
+        return []
+    out = []
+    running = 0.0
+    for idx, v in enumerate(values):
+        running += v
+        if idx >= period:
+            running -= values[idx - period]
+        count = period if idx >= period - 1 else (idx + 1)
+        out.append(running / count)
+    return out
+
+
+def rolling_std(values: List[float], period: int) -> List[float]:
+    if not values:
+        return []
+    out = []
+    for idx in range(len(values)):
+        start = max(0, idx - period + 1)
+        window = values[start:idx+1]
+        mean = sum(window) / len(window)
+        variance = sum((x - mean) ** 2 for x in window) / len(window)
+        out.append(variance ** 0.5)
+    return out
+
+
+def bollinger_bands(values: List[float], period: int, std_mult: float):
+    mid = sma(values, period)
+    std = rolling_std(values, period)
+    upper = [m + std_mult * s for m, s in zip(mid, std)]
+    lower = [m - std_mult * s for m, s in zip(mid, std)]
+    return mid, upper, lower
+
+
+def ema(values: List[float], period: int) -> List[float]:
+    if not values:
+        return []
+    mult = 2 / (period + 1)
+    out = [values[0]]
+    for price in values[1:]:
+        out.append(price * mult + out[-1] * (1 - mult))
+    return out
+
+
+def macd_calc(values: List[float], fast: int, slow: int, signal: int):
+    ema_fast = ema(values, fast)
+    ema_slow = ema(values, slow)
+    macd_line = [f - s for f, s in zip(ema_fast, ema_slow)]
+    signal_line = ema(macd_line, signal)
+    histogram = [m - s for m, s in zip(macd_line, signal_line)]
+    return macd_line, signal_line, histogram
+
+
+def calculate_atr(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> List[float]:
+    """前 period 根简单平均真实波幅，之后 Wilder 平滑"""
+    if len(highs) < 2:
+        return [0.0] * len(highs)
+
+    tr_list = []
+    for i in range(len(highs)):
+        if i == 0:
+            tr = highs[i] - lows[i]
+        else:
+            tr1 = highs[i] - lows[i]
+            tr2 = abs(highs[i] - closes[i-1])
+            tr3 = abs(lows[i] - closes[i-1])
+            tr = max(tr1, tr2, tr3)
+        tr_list.append(tr)
+
+    atr = []
+    for i in range(len(tr_list)):
+        if i < period - 1:
+            atr.append(sum(tr_list[:i+1]) / (i+1))
+        elif i == period - 1:
+            atr.append(sum(tr_list[:period]) / period)
+        else:
+            atr.append((atr[-1] * (period-1) + tr_list[i]) / period)
+    return atr
+
+
+def _diff(a: List[float], b: List[float]) -> List[float]:
+    return [x - y for x, y in zip(a, b)]
+
+
+def _band_upper(mid: List[float], std: List[float], std_mult: float) -> List[float]:
+    return [m + std_mult * s for m, s in zip(mid, std)]
+
+
+def _band_lower(mid: List[float], std: List[float], std_mult: float) -> List[float]:
+    return [m - std_mult * s for m, s in zip(mid, std)]
+
+
+# ========== 节点 ==========
+
+class Node(NamedTuple):
+    """fn(*输入的值, *params)；输入是K线列名或其他节点"""
+    fn: Callable
+    params: Tuple
+    inputs: Tuple
+
+
+Input = Union[str, Node]
+
+
+def node(fn: Callable, inputs: Sequence[Input], *params) -> Node:
+    return Node(fn, tuple(params), tuple(inputs))
+
+
+# 节点构造带缓存：同样的参数拿到同一个节点对象，每根K线每个策略不用重新拼一遍
+@functools.lru_cache(maxsize=None)
+def sma_node(src: Input, period: int) -> Node:
+    return node(sma, (src,), period)
+
+
+@functools.lru_cache(maxsize=None)
+def ema_node(src: Input, period: int) -> Node:
+    return node(ema, (src,), period)
+
+
+@functools.lru_cache(maxsize=None)
+def std_node(src: Input, period: int) -> Node:
+    return node(rolling_std, (src,), period)
+
+
+@functools.lru_cache(maxsize=None)
+def bollinger_nodes(src: Input, period: int, std_mult: float) -> Tuple[Node, Node, Node]:
+    """(中轨, 上轨, 下轨)；中轨就是 SMA 节点"""
+    mid = sma_node(src, period)
+    std = std_node(src, period)
+    return mid, node(_band_upper, (mid, std), std_mult), node(_band_lower, (mid, std), std_mult)
+
+
+@functools.lru_cache(maxsize=None)
+def macd_nodes(src: Input, fast: int, slow: int, signal: int) -> Tuple[Node, Node, Node]:
+    """(MACD线, 信号线, 柱)；快慢 EMA 是独立节点"""
+    line = node(_diff, (ema_node(src, fast), ema_node(src, slow)))
+    signal_line = ema_node(line, signal)
+    return line, signal_line, node(_diff, (line, signal_line))
+
+
+@functools.lru_cache(maxsize=None)
+def atr_node(period: int = 14) -> Node:
+    return node(calculate_atr, ("high", "low", "close"), period)
+
+
+# ========== 图 ==========
+
+
+class IndicatorGraph:
+    """按内容去重的指标缓存；线程安全（SymbolRunner 的多个币种线程同时取）
+
+    每个K线列和节点结果都有一个整数编号：K线列按内容编号，节点按 (函数, 参数, 输入编号) 编号，
+    节点的缓存键因此是扁平的小元组，查一次缓存不用重新哈希整棵子树
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        # 指标都是纯 Python 计算，受 GIL 限制本来就不能并行；一把锁保证同一节点不会被两个线程重复算
+        self.lock = threading.RLock()
+        # 键 -> (编号, 值)；K线列的值为 None
+        self._current: Dict[Any, Tuple[int, Any]] = {}
+        self._previous: Dict[Any, Tuple[int, Any]] = {}
+        self._next_id = 0
+        self.stats = {"requests": 0, "computed": 0}
+
+    def begin_cycle(self) -> None:
+        """新一轮开始：上一轮的结果降为旧代，这一轮还用得到的在命中时提回来，其余下一轮丢弃"""
+        with self.lock:
+            self._previous = self._current
+            self._current = {}
+
+    def _lookup(self, key) -> Optional[Tuple[int, Any]]:
+        entry = self._current.get(key)
+        if entry is None:
+            entry = self._previous.pop(key, None)
+            if entry is not None:
+                self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry: Tuple[int, Any]) -> Tuple[int, Any]:
+        if len(self._current) >= self.max_entries:
+            self.begin_cycle()
+        self._current[key] = entry
+        return entry
+
+    def _new_entry(self, key, value: Any) -> Tuple[int, Any]:
+        self._next_id += 1
+        return self._store(key, (self._next_id, value))
+
+    def column_id(self, values: Sequence[float]) -> int:
+        """K线列按内容换成编号；内容相同的列编号相同"""
+        key = tuple(values)
+        with self.lock:
+            entry = self._lookup(key) or self._new_entry(key, None)
+            return entry[0]
+
+    def evaluate(self, item: Node, source: "Source", seen: Dict[int, Tuple[int, Any]]) -> Tuple[int, Any]:
+        """返回 (编号, 值)；seen 是本次 get 已经求过的节点（按对象），调用方持有 lock"""
+        entry = seen.get(id(item))
+        if entry is not None:
+            return entry
+        args = []
+        ids = []
+        for inp in item.inputs:
+            if inp.__class__ is str:
+                ids.append(source.column_id(inp))
+                args.append(source.columns[inp])
+            else:
+                nid, value = self.evaluate(inp, source, seen)
+                ids.append(nid)
+                args.append(value)
+        self.stats["requests"] += 1
+        key = (item.fn, item.params, tuple(ids))
+        entry = self._lookup(key)
+        if entry is None:
+            self.stats["computed"] += 1
+            entry = self._new_entry(key, item.fn(*args, *item.params))
+        seen[id(item)] = entry
+        return entry
+
+
+class Source:
+    """一组K线列（同一币种同一窗口），在它上面取节点"""
+
+    def __init__(self, graph: IndicatorGraph, columns: Dict[str, List[float]]):
+        self.graph = graph
+        self.columns = columns
+        self.ids: Dict[str, int] = {}
+
+    def column_id(self, name: str) -> int:
+        cid = self.ids.get(name)
+        if cid is None:
+            cid = self.ids[name] = self.graph.column_id(self.columns[name])
+        return cid
+
+    def get(self, *nodes: Node):
+        """取一个节点返回它的值，取多个返回元组"""
+        seen: Dict[int, Tuple[int, Any]] = {}
+        with self.graph.lock:
+            values = tuple(self.graph.evaluate(n, self, seen)[1] for n in nodes)
+        return values[0] if len(values) == 1 else values
+
+
+# 进程内共用一张图（多策略运行时里所有策略共用）
+GRAPH = IndicatorGraph()
+
+
+def source(**columns: List[float]) -> Source:
+    return Source(GRAPH, columns)
+
+
+def begin_cycle() -> None:
+    GRAPH.begin_cycle()
+
+
+def stats() -> Dict[str, int]:
+    return dict(GRAPH.stats)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+K线增量缓冲区
+
+机器人每分钟都要最近 100~260 根K线，但两次检查之间最多只有最后一根在变。
+KlineBuffer 为每个 (币种, 周期) 保留一份滚动缓冲区：
+- 首次请求 / 重启后 / 请求区间超出缓冲区 / 出现缺口 → 全量拉取
+- 其余情况只请求 [最后一根的开盘时间, now]，替换正在形成的那根，追加新K线
+返回值与 Info.candles_snapshot 相同（原始 dict 列表），调用方无需改动解析逻辑。
+"""
+
+import logging
+import threading
+from typing import Dict, List
+
+logger = logging.getLogger("KlineBuffer")
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 60 * 60_000,
+    "2h": 2 * 60 * 60_000,
+    "4h": 4 * 60 * 60_000,
+    "8h": 8 * 60 * 60_000,
+    "12h": 12 * 60 * 60_000,
+    "1d": 24 * 60 * 60_000,
+}
+
+
+class KlineBuffer:
+    def __init__(self, info):
+        self.info = info
+        self._lock = threading.Lock()
+        self._buffers: Dict[tuple, Dict] = {}
+        self.stats = {"full": 0, "delta": 0}
+
+    def reset(self, symbol: str = None) -> None:
+        """清空缓冲区（symbol 为空时清空全部），下次请求全量拉取"""
+        with self._lock:
+            if symbol is None:
+                self._buffers.clear()
+            else:
+                for key in [k for k in self._buffers if k[0] == symbol]:
+                    del self._buffers[key]
+
+    def export(self) -> List[Dict]:
+        """导出为紧凑格式（每根K线一行数组），用于重启快照"""
+        with self._lock:
+            items = list(self._buffers.items())
+        return [
+            {
+                "symbol": symbol,
+                "interval": interval,
+                "start": entry["start"],
+                "bars": [[c["t"], c["T"], c["o"], c["h"], c["l"], c["c"], c["v"], c.get("n", 0)]
+                         for c in entry["candles"]],
+            }
+            for (symbol, interval), entry in items
+        ]
+
+    def restore(self, entries: List[Dict]) -> int:
+        """从快照恢复缓冲区，返回恢复的 (币种, 周期) 数量；之后的请求只补拉缺口"""
+        restored = 0
+        for item in entries or []:
+            try:
+                symbol, interval = item["symbol"], item["interval"]
+                candles = [
+                    {"t": b[0], "T": b[1], "o": b[2], "h": b[3], "l": b[4], "c": b[5], "v": b[6],
+                     "n": b[7], "s": symbol, "i": interval}
+                    for b in item["bars"]
+                ]
+            except (KeyError, IndexError, TypeError):
+                continue
+            with self._lock:
+                self._buffers[(symbol, interval)] = {"start": item.get("start", 0), "candles": candles}
+            restored += 1
+        return restored
+
+    def get(self, symbol: str, interval: str, start_time: int, end_time: int) -> List[Dict]:
+        key = (symbol, interval)
+        with self._lock:
+            entry = self._buffers.get(key)
+
+        candles = self._delta(symbol, interval, entry, start_time, end_time) if entry else None
+        mode = "delta"
+        if candles is None:
+            candles = self.info.candles_snapshot(symbol, interval, start_time, end_time)
+            mode = "full"
+
+        # 只保留本次请求的窗口，下次窗口右移后仍然被覆盖
+        candles = [c for c in candles if c["T"] >= start_time]
+        with self._lock:
+            self._buffers[key] = {"start": start_time, "candles": candles}
+            self.stats[mode] += 1
+        return list(candles)
+
+    def _delta(self, symbol: str, interval: str, entry: Dict, start_time: int, end_time: int):
+        """增量更新；需要全量重拉时返回 None"""
+        step = INTERVAL_MS.get(interval)
+        buffered = entry["candles"]
+        if not step or not buffered or start_time < entry["start"]:
+            return None
+        last_open = buffered[-1]["t"]
+        if last_open < start_time:
+            return None
+
+        fresh = self.info.candles_snapshot(symbol, interval, last_open, end_time)
+        if not fresh or fresh[0]["t"] != last_open:
+            logger.warning("%s %s K线增量不连续，全量重拉", symbol, interval)
+            return None
+        for prev, cur in zip(fresh, fresh[1:]):
+            if cur["t"] - prev["t"] != step:
+                logger.warning("%s %s K线出现缺口，全量重拉", symbol, interval)
+                return None
+        return buffered[:-1] + fresh
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+运行指标 — 每轮各阶段耗时和接口延迟，本机 HTTP 导出
+
+- span(strategy, stage, symbol): 给一个阶段计时（klines / indicators / position / order / exit ...），
+  按 (策略, 阶段, 币种) 聚合成直方图；SymbolRunner 自动记录每个币种的流水线（symbol）和整轮（cycle）
+- hl_client 创建的 Info / Exchange 每个请求按接口记录延迟（info.candleSnapshot / exchange.order ...）
+- 一轮超过 METRICS_SLOW_CYCLE 秒（默认 10）时，把这一轮各阶段和接口的耗时写进 logs/slow_cycles.log
+- 127.0.0.1:METRICS_PORT 上 /metrics（Prometheus 文本）和 /metrics.json（count / p50 / p90 / p99 / max）；
+  多策略运行时默认端口 9108，独立运行的机器人设置了 METRICS_PORT 才启动
+
+计时用 time.perf_counter（不受模拟盘的时钟补丁影响）。
+
+用法:
+  curl -s 127.0.0.1:9108/metrics.json | python -m json.tool
+  python metrics.py                   # 同上，格式化输出
+"""
+
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PORT = 9108
+SLOW_CYCLE = float(os.getenv("METRICS_SLOW_CYCLE", "10"))
+# 分位数按每个序列最近多少次观测计算
+WINDOW = 1000
+# 直方图桶上限（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "recent")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.recent)
+        data = {"count": self.count, "sum": round(self.total, 6), "max": round(self.max, 6)}
+        for q in QUANTILES:
+            value = ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
+            data[f"p{int(q * 100)}"] = round(value, 6)
+        return data
+
+
+_lock = threading.Lock()
+_stages: Dict[Tuple[str, str, str], Histogram] = defaultdict(Histogram)
+_api: Dict[str, Histogram] = defaultdict(Histogram)
+_api_errors: Dict[str, int] = defaultdict(int)
+# 正在进行的一轮: 策略 -> {阶段: 累计秒数}，慢轮日志用
+_cycles: Dict[str, Dict[str, float]] = {}
+_local = threading.local()
+_started = time.perf_counter()
+_slow_logger = None
+
+
+def observe(strategy: str, stage: str, seconds: float, symbol: str = "") -> None:
+    with _lock:
+        _stages[(strategy, stage, symbol)].observe(seconds)
+        cycle = _cycles.get(strategy)
+        if cycle is not None and stage != "symbol":
+            cycle[f"{symbol}/{stage}" if symbol else stage] += seconds
+
+
+@contextmanager
+def span(strategy: str, stage: str, symbol: str = ""):
+    """给一个阶段计时；接口请求在 span 里发出时同时计入该策略这一轮的接口耗时"""
+    previous = getattr(_local, "strategy", None)
+    _local.strategy = strategy
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(strategy, stage, time.perf_counter() - started, symbol)
+        _local.strategy = previous
+
+
+def observe_api(endpoint: str, seconds: float, error: bool = False) -> None:
+    strategy = getattr(_local, "strategy", None)
+    with _lock:
+        _api[endpoint].observe(seconds)
+        if error:
+            _api_errors[endpoint] += 1
+        cycle = _cycles.get(strategy) if strategy else None
+        if cycle is not None:
+            cycle[f"api:{endpoint}"] += seconds
+
+
+def _endpoint(url_path: str, payload) -> str:
+    payload = payload or {}
+    if url_path == "/exchange":
+        return "exchange." + str((payload.get("action") or {}).get("type", "unknown"))
+    return url_path.strip("/") + "." + str(payload.get("type", "unknown"))
+
+
+def instrument_api(client):
+    """给 SDK 的 Info / Exchange 实例的 post 加计时（所有查询和下单都经过 post）"""
+    post = client.post
+
+    def timed_post(url_path: str, payload=None):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = post(url_path, payload)
+            ok = True
+            return result
+        finally:
+            observe_api(_endpoint(url_path, payload), time.perf_counter() - started, error=not ok)
+
+    client.post = timed_post
+    return client
+
+
+def begin_cycle(strategy: str) -> None:
+    with _lock:
+        _cycles[strategy] = defaultdict(float)
+
+
+def end_cycle(strategy: str, seconds: float) -> None:
+    """一轮结束: 记录整轮耗时，超过 SLOW_CYCLE 时写慢轮日志（最耗时的阶段在前）"""
+    with _lock:
+        _stages[(strategy, "cycle", "")].observe(seconds)
+        breakdown = _cycles.pop(strategy, None) or {}
+    if seconds < SLOW_CYCLE:
+        return
+    top = sorted(breakdown.items(), key=lambda kv: kv[1], reverse=True)[:12]
+    _slow_log().warning("%s 一轮耗时 %.2fs (>%gs): %s", strategy, seconds, SLOW_CYCLE,
+                        ", ".join(f"{name} {value:.2f}s" for name, value in top) or "无阶段数据")
+
+
+def _slow_log():
+    global _slow_logger
+    if _slow_logger is None:
+        from bot_logging import setup_logger
+
+        _slow_logger = setup_logger("SlowCycles", "slow_cycles.log")
+    return _slow_logger
+
+
+def snapshot() -> Dict:
+    with _lock:
+        stages = [dict(strategy=s, stage=st, symbol=sym, **h.summary())
+                  for (s, st, sym), h in sorted(_stages.items())]
+        api = [dict(endpoint=e, errors=_api_errors.get(e, 0), **h.summary()) for e, h in sorted(_api.items())]
+    return {"uptime": round(time.perf_counter() - _started, 1), "stages": stages, "api": api}
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in labels.items() if v != "")
+
+
+def _histogram_lines(name: str, labels: str, hist: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    sep = "," if labels else ""
+    for bound, count in zip(BUCKETS, hist.counts):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {hist.total:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+
+def render_prometheus() -> str:
+    lines = ["# HELP trader_stage_seconds Time spent in each stage of a bot cycle",
+             "# TYPE trader_stage_seconds histogram"]
+    with _lock:
+        for (strategy, stage, symbol), hist in sorted(_stages.items()):
+            lines += _histogram_lines("trader_stage_seconds", _labels(strategy=strategy, stage=stage, symbol=symbol),
+                                      hist)
+        lines += ["# HELP hl_api_seconds Hyperliquid API request latency by endpoint",
+                  "# TYPE hl_api_seconds histogram"]
+        for endpoint, hist in sorted(_api.items()):
+            lines += _histogram_lines("hl_api_seconds", _labels(endpoint=endpoint), hist)
+        lines += ["# HELP hl_api_errors_total Hyperliquid API requests that raised",
+                  "# TYPE hl_api_errors_total counter"]
+        for endpoint, count in sorted(_api_errors.items()):
+            lines.append(f"hl_api_errors_total{{{_labels(endpoint=endpoint)}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+_server = None
+
+
+def serve(port: Optional[int] = None, host: str = "127.0.0.1"):
+    """后台线程里启动导出服务；端口为 0 或被占用时不启动（不影响交易）"""
+    global _server
+    if _server is not None:
+        return _server
+    port = int(os.getenv("METRICS_PORT", DEFAULT_PORT) if port is None else port)
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, kind = json.dumps(snapshot()).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, kind = render_prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"指标服务启动失败 {host}:{port}: {e}", file=sys.stderr)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    _server = server
+    return server
+
+
+def main() -> int:
+    from urllib.request import urlopen
+
+    port = int(os.getenv("METRICS_PORT", DEFAULT_PORT))
+    with urlopen(f"http://127.0.0.1:{port}/metrics.json", timeout=5) as response:
+        data = json.loads(response.read())
+    print(f"运行 {data['uptime']:.0f}s")
+    print(f"{'策略':<18}{'阶段':<12}{'币种':<8}{'次数':>7}{'p50':>9}{'p99':>9}{'max':>9}")
+    for row in data["stages"]:
+        print(f"{row['strategy']:<18}{row['stage']:<12}{row['symbol']:<8}{row['count']:>7}"
+              f"{row['p50']:>9.3f}{row['p99']:>9.3f}{row['max']:>9.3f}")
+    print(f"\n{'接口':<34}{'次数':>7}{'错误':>6}{'p50':>9}{'p99':>9}{'max':>9}")
+    for row in data["api"]:
+        print(f"{row['endpoint']:<34}{row['count']:>7}{row['errors']:>6}{row['p50']:>9.3f}{row['p99']:>9.3f}"
+              f"{row['max']:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+按需性能剖析 — cProfile / tracemalloc，不用改代码
+
+- 环境变量 TRADING_PROFILE=cpu | mem | all 开启（命令行脚本也可以用 --profile [cpu|mem|all]）；
+  没开启时 profiled / section 只多一次全局变量判断
+- 已经挂好的热点: 机器人每个币种的流水线和 prepare / finish（cycle:<策略>）、run_backtest、
+  scan_configs、walk-forward 循环、param_sweep 的每批任务
+- 嵌套调用只由最外层计时（scan_configs 里的 run_backtest 算在 scan_configs 里）；
+  每次最外层调用用一个新的 cProfile.Profile，结束后按标签合并，多线程安全
+- Python 3.12 起 cProfile 基于 sys.monitoring，一个进程同时只能开一个 profiler，而且它记录所有线程：
+  并发的区间共用一个进程级 profiler（第一个进入时打开，最后一个离开时关闭），
+  重叠的区间标签不同时 CPU 数据记在 "concurrent" 下，调用次数和耗时仍按各自标签统计；
+  profiler 被别的工具占着（python -m cProfile、调试器）时只计时
+- mem: 首次进入剖析区间时启动 tracemalloc（对整个进程生效），报告当前占用最多的代码行和相对上次导出的增长
+- 报告写到 logs/profiles/<脚本>-<时间>-<pid>.txt，每个标签另存一份 .prof（python -m pstats / snakeviz 打开）；
+  进程退出时导出，设置 TRADING_PROFILE_INTERVAL=秒 时另外定时覆盖导出；多进程的子进程各自导出
+- TRADING_PROFILE_TOP 控制每张表的行数（默认 30）
+
+用法:
+  TRADING_PROFILE=cpu python scripts/strategy_runtime.py --strategies all
+  TRADING_PROFILE=all TRADING_PROFILE_INTERVAL=600 pm2 restart trader-runtime --update-env
+  python test/optimize.py --mode walk_forward --profile
+  python param_sweep.py --strategy adx --profile mem
+"""
+
+import atexit
+import functools
+import io
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+MODES = {"cpu": {"cpu"}, "mem": {"mem"}, "all": {"cpu", "mem"}, "1": {"cpu"}, "true": {"cpu"}}
+TOP_N = int(os.getenv("TRADING_PROFILE_TOP", "30"))
+INTERVAL = float(os.getenv("TRADING_PROFILE_INTERVAL", "0"))
+# tracemalloc 每次分配保存的栈深度（按行汇总只用最内层一帧）
+MEM_FRAMES = 1
+
+
+def _parse(mode: Optional[str]) -> frozenset:
+    return frozenset(MODES.get((mode or "").strip().lower(), ()))
+
+
+_mode = _parse(os.getenv("TRADING_PROFILE"))
+_lock = threading.Lock()
+_local = threading.local()
+# 标签 -> 合并后的 pstats.Stats / 调用次数 / 累计秒数
+_stats: Dict[str, object] = {}
+_calls: Dict[str, int] = {}
+_seconds: Dict[str, float] = {}
+_state = {"registered": False, "report": None, "last_snapshot": None, "started": time.perf_counter()}
+
+# 3.12+ 进程级共用的 profiler：当前打开的 Profile、在用的区间数、这段时间里出现过的标签
+SHARED_CPU = sys.version_info >= (3, 12)
+CONCURRENT_LABEL = "concurrent"
+_shared = {"profile": None, "users": 0, "labels": set()}
+
+
+def enabled() -> bool:
+    return bool(_mode)
+
+
+def configure(mode: Optional[str]) -> None:
+    """打开剖析（命令行 --profile 用）；写回环境变量，多进程的子进程也跟着打开"""
+    global _mode
+    if not mode:
+        return
+    _mode = _parse(mode)
+    if _mode:
+        os.environ["TRADING_PROFILE"] = mode
+
+
+def add_argument(parser) -> None:
+    parser.add_argument("--profile", nargs="?", const="cpu", choices=["cpu", "mem", "all"], default="",
+                        help="性能剖析: cpu=cProfile, mem=tracemalloc, all=两者；报告写到 logs/profiles/")
+
+
+def _start() -> None:
+    """第一次进入剖析区间: 启动 tracemalloc、注册退出导出和定时导出"""
+    with _lock:
+        if _state["registered"]:
+            return
+        _state["registered"] = True
+    if "mem" in _mode:
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEM_FRAMES)
+    import multiprocessing
+
+    if multiprocessing.parent_process() is None:
+        atexit.register(dump)
+    else:
+        # ProcessPoolExecutor 的子进程不走 atexit，退出时只跑 multiprocessing 的 finalizer
+        from multiprocessing import util
+
+        util.Finalize(None, dump, exitpriority=10)
+    if INTERVAL > 0:
+        threading.Thread(target=_dump_loop, name="profiling", daemon=True).start()
+
+
+def _dump_loop() -> None:
+    # Event.wait 不走 time.sleep（模拟盘会替换 time.sleep）
+    stop = threading.Event()
+    while not stop.wait(INTERVAL):
+        dump()
+
+
+@contextmanager
+def section(label: str):
+    """在剖析区间里执行；没开启或已经在外层区间里时直接执行"""
+    if not _mode or getattr(_local, "active", False):
+        yield
+        return
+    _start()
+    _local.active = True
+    profile = _cpu_enter(label) if "cpu" in _mode else None
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _local.active = False
+        _cpu_exit(label, profile)
+        _record(label, seconds)
+
+
+def _cpu_enter(label: str):
+    """打开 CPU 剖析，返回这个区间用的 Profile；打不开时返回 None（只计时）"""
+    import cProfile
+
+    if not SHARED_CPU:
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+    with _lock:
+        if _shared["profile"] is None:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # Another profiling tool is already active
+                return None
+            _shared["profile"] = profile
+        _shared["users"] += 1
+        _shared["labels"].add(label)
+        return _shared["profile"]
+
+
+def _cpu_exit(label: str, profile) -> None:
+    if profile is None:
+        return
+    if not SHARED_CPU:
+        profile.disable()
+        _merge_stats(label, profile)
+        return
+    with _lock:
+        _shared["users"] -= 1
+        if _shared["users"]:
+            return
+        profile.disable()
+        labels = _shared["labels"]
+        _shared.update(profile=None, labels=set())
+    _merge_stats(labels.pop() if len(labels) == 1 else CONCURRENT_LABEL, profile)
+
+
+def profiled(label: Optional[str] = None) -> Callable:
+    """装饰器版 section；标签默认是函数名"""
+    def decorate(fn: Callable) -> Callable:
+        name = label or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _mode or getattr(_local, "active", False):
+                return fn(*args, **kwargs)
+            with section(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _record(label: str, seconds: float) -> None:
+    with _lock:
+        _calls[label] = _calls.get(label, 0) + 1
+        _seconds[label] = _seconds.get(label, 0.0) + seconds
+
+
+def _merge_stats(label: str, profile) -> None:
+    import pstats
+
+    try:
+        stats = pstats.Stats(profile)
+    except TypeError:  # 区间里没有任何 Python 调用
+        return
+    with _lock:
+        if label in _stats:
+            _stats[label].add(stats)
+        else:
+            _stats[label] = stats
+
+
+def _report_path() -> Path:
+    if _state["report"] is None:
+        from bot_logging import LOG_DIR
+
+        script = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else "python"
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        directory = LOG_DIR / "profiles"
+        directory.mkdir(parents=True, exist_ok=True)
+        _state["report"] = directory / f"{script}-{stamp}-{os.getpid()}"
+    return _state["report"]
+
+
+def _cpu_section(label: str, stats, buf: io.StringIO) -> None:
+    if label in _calls:
+        buf.write(f"\n## cpu: {label}  调用 {_calls[label]} 次, 共 {_seconds[label]:.2f}s\n")
+    else:  # CONCURRENT_LABEL: 不同标签重叠期间的合并数据，调用次数和耗时记在各自标签下
+        buf.write(f"\n## cpu: {label}\n")
+    stats.stream = buf
+    for key in ("cumulative", "tottime"):
+        buf.write(f"\n### 按 {key} 排序\n")
+        stats.sort_stats(key).print_stats(TOP_N)
+
+
+def _mem_section(buf: io.StringIO) -> None:
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    buf.write(f"\n## mem: 当前 {current / 1e6:.1f} MB, 峰值 {peak / 1e6:.1f} MB\n\n### 占用最多的代码行\n")
+    for stat in snapshot.statistics("lineno")[:TOP_N]:
+        buf.write(f"{stat}\n")
+    previous = _state["last_snapshot"]
+    if previous is not None:
+        buf.write("\n### 相对上次导出的增长\n")
+        for stat in snapshot.compare_to(previous, "lineno")[:TOP_N]:
+            if stat.size_diff > 0:
+                buf.write(f"{stat}\n")
+    _state["last_snapshot"] = snapshot
+
+
+def dump() -> Optional[Path]:
+    """把目前为止的剖析结果写到 logs/profiles/（同一进程重复导出会覆盖同一份报告）"""
+    if not _state["registered"]:
+        return None
+    try:
+        base = _report_path()
+        buf = io.StringIO()
+        buf.write(f"# {base.name}  运行 {time.perf_counter() - _state['started']:.0f}s  "
+                  f"模式 {','.join(sorted(_mode))}  导出于 {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+        with _lock:
+            for label in sorted(set(_calls) | set(_stats)):
+                stats = _stats.get(label)
+                if stats is None:
+                    buf.write(f"\n## {label}  调用 {_calls[label]} 次, 共 {_seconds[label]:.2f}s\n")
+                    continue
+                _cpu_section(label, stats, buf)
+                stats.dump_stats(str(base) + "." + re.sub(r"\W+", "_", label) + ".prof")
+        _mem_section(buf)
+        path = base.with_suffix(".txt")
+        path.write_text(buf.getvalue(), encoding="utf-8")
+        return path
+    except Exception as e:
+        print(f"性能剖析报告写入失败: {e}", file=sys.stderr)
+        return None
+
+
+def _after_fork() -> None:
+    """fork 出的子进程不带父进程的剖析数据，各自导出"""
+    if getattr(_local, "active", False):
+        # 在剖析区间里 fork（进程池在 section 里创建）时，子进程继承了父进程线程上的 profiler
+        sys.setprofile(None)
+    if _shared["profile"] is not None:
+        _shared["profile"].disable()
+    _shared.update(profile=None, users=0, labels=set())
+    _stats.clear()
+    _calls.clear()
+    _seconds.clear()
+    _state.update(registered=False, report=None, last_snapshot=None, started=time.perf_counter())
+    _local.active = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+共享内存数组 — 多进程优化时K线列和预先算好的指标只放一份
+
+- 父进程把若干张表（{表名: {列名: 数值序列}}）写进一块命名共享内存（multiprocessing.shared_memory），
+  子进程按 handle 挂上去，拿到的是直接指向共享内存的 memoryview（按下标取值得到 Python float / int，
+  切片不复制），不用把 K 线列表 pickle 给每个进程，进程数再多也只有一份数据
+- 整数列（时间戳）存成 int64，其余 float64；列数据只读
+- map_tasks: 用进程池在共享表上跑任务，任务函数在子进程里通过 tables() 取表
+- 释放: SharedArrays 用完（with 退出）立即 unlink；异常退出时 weakref.finalize 在解释器退出时 unlink，
+  进程被杀时 multiprocessing 的 resource_tracker 兜底清理
+
+用法:
+  with SharedArrays({"all": {"close": closes, "atr": atr_vals}}) as shared:
+      results = map_tasks(run_chunk, chunks, shared, workers=4)
+"""
+
+import array
+import os
+import sys
+import weakref
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 表名 -> 列名 -> (字节偏移, 类型码, 长度)
+Layout = Dict[str, Dict[str, Tuple[int, str, int]]]
+Tables = Dict[str, Dict[str, memoryview]]
+
+ITEM_SIZE = 8
+
+
+def _typecode(values) -> str:
+    if isinstance(values, array.array) and values.typecode in ("q", "d"):
+        return values.typecode
+    for v in values:
+        return "q" if isinstance(v, int) and not isinstance(v, bool) else "d"
+    return "d"
+
+
+def _release(shm: shared_memory.SharedMemory) -> None:
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        shm.close()
+    except BufferError:
+        # 还有 memoryview 指着这块内存；已经 unlink，进程退出时映射自然释放
+        pass
+
+
+class SharedArrays:
+    """创建并持有一块共享内存；handle 可以 pickle 传给子进程"""
+
+    def __init__(self, tables: Dict[str, Dict[str, Iterable]]):
+        columns: List[Tuple[str, str, array.array]] = []
+        layout: Layout = {}
+        offset = 0
+        for table, cols in tables.items():
+            layout[table] = {}
+            for col, values in cols.items():
+                data = array.array(_typecode(values), values)
+                layout[table][col] = (offset, data.typecode, len(data))
+                columns.append((table, col, data))
+                offset += len(data) * ITEM_SIZE
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self._finalizer = weakref.finalize(self, _release, self._shm)
+        for table, col, data in columns:
+            start = layout[table][col][0]
+            self._shm.buf[start:start + len(data) * ITEM_SIZE] = data.tobytes()
+        self.handle = (self._shm.name, layout)
+        self.nbytes = offset
+
+    def tables(self) -> Tables:
+        return _views(self._shm, self.handle[1])
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _views(shm: shared_memory.SharedMemory, layout: Layout) -> Tables:
+    buf = shm.buf
+    return {
+        table: {col: buf[off:off + n * ITEM_SIZE].cast(code).toreadonly() for col, (off, code, n) in cols.items()}
+        for table, cols in layout.items()
+    }
+
+
+def attach(handle) -> Tables:
+    """按 handle 挂上共享内存（只读视图）"""
+    name, layout = handle
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        # 3.13 之前挂载也会登记到 resource_tracker；池子的子进程和父进程共用一个 tracker，登记是集合，不会重复清理
+        shm = shared_memory.SharedMemory(name=name)
+    _ATTACHED.append(shm)
+    return _views(shm, layout)
+
+
+class Rows(Sequence):
+    """把列视图当成 [{列名: 值}, ...] 用（给按行读K线的回测函数）；切片不复制"""
+
+    def __init__(self, columns: Dict[str, memoryview], start: int = 0, stop: Optional[int] = None):
+        self.columns = columns
+        self.start = start
+        length = len(next(iter(columns.values()))) if columns else 0
+        self.stop = length if stop is None else stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return Rows(self.columns, self.start + start, self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Rows index out of range")
+        i = self.start + index
+        return {col: values[i] for col, values in self.columns.items()}
+
+
+# ========== 子进程 ==========
+
+_ATTACHED: List[shared_memory.SharedMemory] = []
+_TABLES: Tables = {}
+
+
+def _init_worker(handle, initializer: Optional[Callable], initargs: Tuple) -> None:
+    _TABLES.clear()
+    _TABLES.update(attach(handle))
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def tables() -> Tables:
+    """子进程里（map_tasks 的任务函数中）取共享表"""
+    return _TABLES
+
+
+def map_tasks(fn: Callable, tasks: List, shared: SharedArrays, workers: int = 0,
+              initializer: Optional[Callable] = None, initargs: Tuple = ()) -> List:
+    """进程池跑 fn(task)，按 tasks 顺序返回结果；initializer 在每个子进程挂上共享表之后执行。
+    workers<=1 时在本进程里直接跑（同样通过 tables() 取表）"""
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        previous = dict(_TABLES)
+        _TABLES.clear()
+        _TABLES.update(shared.tables())
+        try:
+            if initializer is not None:
+                initializer(*initargs)
+            return [fn(task) for task in tasks]
+        finally:
+            _TABLES.clear()
+            _TABLES.update(previous)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(shared.handle, initializer, initargs)) as pool:
+        return list(pool.map(fn, tasks))
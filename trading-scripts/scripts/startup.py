@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+启动耗时统计与导入预算检查
+
+pm2 崩溃重启的机器人和每 30 秒拉起一次的 generate_realtime_data.py 都很在意冷启动时间:
+- report_startup(logger, name): 机器人就绪时记录「进程启动 → 就绪」耗时，超出预算打警告
+- python scripts/startup.py: 逐个在新解释器里导入入口模块，报告导入耗时，
+  并检查仅监控模式下是否加载了签名相关代码（eth_account / hyperliquid.exchange）；
+  超预算或加载了签名代码时退出码为 1
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# 进程就绪（拉取行情前）的耗时预算，秒
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "2.0"))
+# 单个入口模块的导入耗时预算，秒
+IMPORT_BUDGET = float(os.getenv("IMPORT_BUDGET", "0.8"))
+
+# 仅监控模式不应加载的模块
+SIGNING_MODULES = ("eth_account", "hyperliquid.exchange")
+
+ENTRY_MODULES = [
+    "strategy_runtime",
+    "auto_trader_nostalgia_for_infinity",
+    "trader_01_boll_macd",
+    "trader_02_rsi_macd",
+    "trader_03_vwap",
+    "trader_04_supertrend",
+    "trader_05_adx",
+    "trader_06_bb_mean_reversion",
+]
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+_MODULE_LOADED = time.time()
+
+
+def process_start_time() -> float:
+    """当前进程的启动时间（epoch 秒），读不到 /proc 时退化为本模块导入时间"""
+    try:
+        with open("/proc/self/stat") as f:
+            # 第 22 个字段是启动时刻（开机后的时钟节拍数）；comm 字段可能含空格，从右括号后切分
+            fields = f.read().rsplit(")", 1)[1].split()
+        started_after_boot = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - started_after_boot)
+    except Exception:
+        return _MODULE_LOADED
+
+
+def report_startup(logger, name: str) -> float:
+    elapsed = time.time() - process_start_time()
+    loaded = [m for m in SIGNING_MODULES if m in sys.modules]
+    logger.info("%s 启动耗时 %.2fs（签名模块: %s）", name, elapsed, ", ".join(loaded) or "未加载")
+    if elapsed > STARTUP_BUDGET:
+        logger.warning("%s 启动耗时 %.2fs 超出预算 %.1fs", name, elapsed, STARTUP_BUDGET)
+    return elapsed
+
+
+def measure_import(module: str) -> dict:
+    """在干净的解释器里导入模块（不带私钥），返回导入耗时和是否加载了签名代码"""
+    code = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps({'seconds': time.perf_counter() - t, "
+        f"'signing': [m for m in {SIGNING_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = {k: v for k, v in os.environ.items() if k != "HL_API_KEY"}
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["module"] = module
+    return result
+
+
+def main() -> int:
+    failed = False
+    print(f"{'模块':<40} {'导入耗时':>8}  签名模块")
+    for module in sys.argv[1:] or ENTRY_MODULES:
+        r = measure_import(module)
+        if "error" in r:
+            print(f"{module:<40} {'失败':>8}  {r['error']}")
+            failed = True
+            continue
+        over = r["seconds"] > IMPORT_BUDGET
+        failed = failed or over or bool(r["signing"])
+        flag = " ⚠️ 超预算" if over else ""
+        print(f"{module:<40} {r['seconds']:>7.3f}s  {', '.join(r['signing']) or '-'}{flag}")
+    print(f"预算: 导入 {IMPORT_BUDGET:.1f}s / 就绪 {STARTUP_BUDGET:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
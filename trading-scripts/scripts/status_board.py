@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+机器人状态板 — 每个策略一份固定大小的状态记录
+
+以前网站要判断机器人是否在跑，得看日志修改时间、读完整个日志找最后一行和信号，再 pgrep。
+现在每个策略在每轮结束时把状态原子写入 memory/trading/status/<策略>.json:
+- pid、启动时间、最近一轮的开始时间 / 耗时 / 各币种结果
+- 每个币种最近一次信号（action / reason / time）和持仓
+- 下单延迟（提交 → 确认 → 成交）
+- 累计错误数、最近一次错误、最近几条事件
+记录条数和字符串长度都有上限，不论日志多大，读取都是一次小文件读取。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from trade_state import STATE_DIR
+
+logger = logging.getLogger("StatusBoard")
+
+STATUS_DIR = STATE_DIR / "status"
+STATUS_DIR.mkdir(parents=True, exist_ok=True)
+
+# 固定大小：最多保留的币种数 / 事件数 / 字符串长度
+MAX_SYMBOLS = 20
+MAX_EVENTS = 5
+MAX_TEXT = 160
+
+_boards: Dict[str, "StatusBoard"] = {}
+_boards_lock = threading.Lock()
+
+
+def _now_str(ts: Optional[float] = None) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts or time.time()))
+
+
+class StatusBoard:
+    def __init__(self, name: str):
+        self.name = name
+        self.path = STATUS_DIR / f"{name}.json"
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.cycles = 0
+        self.error_count = 0
+        self.last_error = None
+        self.cycle_started = None
+        self.last_cycle = None
+        self.signals: Dict[str, Dict] = {}
+        self.positions: Dict[str, object] = {}
+        self.execution: Optional[Dict] = None
+        self.events = deque(maxlen=MAX_EVENTS)
+
+    def _event(self, text: str) -> None:
+        self.events.append(f"{_now_str()} {text}"[:MAX_TEXT])
+
+    def record_signal(self, symbol: str, action: str, reason: str) -> None:
+        with self._lock:
+            self.signals.pop(symbol, None)
+            self.signals[symbol] = {
+                "action": action,
+                "reason": str(reason)[:MAX_TEXT],
+                "time": _now_str(),
+            }
+            # 全市场扫描时币种很多，只留最近的
+            while len(self.signals) > MAX_SYMBOLS:
+                self.signals.pop(next(iter(self.signals)))
+            if action != "HOLD":
+                self._event(f"{symbol} {action}: {reason}")
+
+    def record_position(self, symbol: str, position) -> None:
+        """position 为空 / 0 表示无持仓"""
+        with self._lock:
+            if position:
+                self.positions[symbol] = position
+                while len(self.positions) > MAX_SYMBOLS:
+                    self.positions.pop(next(iter(self.positions)))
+            else:
+                self.positions.pop(symbol, None)
+
+    def record_execution(self, stats: Dict) -> None:
+        """下单延迟统计（execution.ExecutionEngine.latency_stats）"""
+        with self._lock:
+            self.execution = stats or None
+
+    def record_error(self, message: str) -> None:
+        with self._lock:
+            self.error_count += 1
+            self.last_error = {"message": str(message)[:MAX_TEXT], "time": _now_str()}
+            self._event(f"ERROR {message}")
+
+    def begin_cycle(self) -> None:
+        with self._lock:
+            self.cycle_started = time.time()
+
+    def end_cycle(self, results: Dict[str, str]) -> None:
+        """一轮结束：记录耗时和各币种结果（ok / timeout / skipped / error），写入状态文件"""
+        with self._lock:
+            started = self.cycle_started or time.time()
+            self.cycles += 1
+            counts: Dict[str, int] = {}
+            for result in results.values():
+                counts[result] = counts.get(result, 0) + 1
+            self.last_cycle = {
+                "started": started,
+                "duration": round(time.time() - started, 3),
+                "results": counts,
+            }
+        self.publish()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "pid": os.getpid(),
+                "started_at": self.started_at,
+                "updated_at": time.time(),
+                "cycles": self.cycles,
+                "last_cycle": self.last_cycle,
+                "signals": dict(self.signals),
+                "positions": dict(self.positions),
+                "execution": self.execution,
+                "error_count": self.error_count,
+                "last_error": self.last_error,
+                "events": list(self.events),
+            }
+
+    def publish(self) -> None:
+        """原子写入状态文件；写失败只打警告，不影响交易"""
+        try:
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning("写入状态板失败 [%s]: %s", self.name, e)
+
+
+def get_board(name: str) -> StatusBoard:
+    with _boards_lock:
+        if name not in _boards:
+            _boards[name] = StatusBoard(name)
+        return _boards[name]
+
+
+def record_signal(name: str, symbol: str, action: str, reason: str) -> None:
+    get_board(name).record_signal(symbol, action, reason)
+
+
+def record_position(name: str, symbol: str, position) -> None:
+    get_board(name).record_position(symbol, position)
+
+
+def record_execution(name: str, stats: Dict) -> None:
+    get_board(name).record_execution(stats)
+
+
+def record_error(name: str, message: str) -> None:
+    get_board(name).record_error(message)
+
+
+def heartbeat(name: str) -> None:
+    """本轮没有跑币种（比如风控拦截）时也刷新一下状态文件"""
+    get_board(name).publish()
+
+
+def read_status(name: str) -> Optional[Dict]:
+    """读取某个策略的状态记录，不存在或损坏时返回 None"""
+    try:
+        with open(STATUS_DIR / f"{name}.json", "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
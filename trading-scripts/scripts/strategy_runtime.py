@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+多策略运行时 — 一个进程托管全部交易机器人
+
+- 策略以插件形式加载（STRATEGY_PLUGINS: 名称 -> 模块 / 交易类）
+- 所有策略共享一个 Info（SharedInfo，同一轮共享账户快照与K线）和一个签名 Exchange
+- 所有策略共享一张指标图（indicator_graph）：相同 (指标, 参数, K线) 只算一次，指标计算量随不同指标数增长而不是策略数
+- 每个策略保留自己的状态、日志文件和调度节奏；单个策略异常只影响它自己
+- asyncio 调度：到期的策略并发运行，各策略的币种流水线在共享线程池里并发执行（SymbolRunner）
+- 每个策略每轮各阶段耗时和接口延迟在 127.0.0.1:9108/metrics 导出（metrics，METRICS_PORT=0 关闭）
+
+用法:
+  python scripts/strategy_runtime.py                              # 默认: nfi,boll_macd,supertrend,adx
+  python scripts/strategy_runtime.py --strategies all
+  python scripts/strategy_runtime.py --strategies adx,boll_macd
+  python scripts/strategy_runtime.py --profile all                # cProfile + tracemalloc，退出时写 logs/profiles/
+"""
+
+import argparse
+import asyncio
+import importlib
+import time
+from typing import List, Optional
+
+from bot_logging import setup_logger
+from execution import close_fill_streams
+import metrics
+import profiling
+from hl_client import SharedExchange, SharedInfo, create_exchange, create_info, load_hl_config
+import indicator_graph
+from startup import report_startup
+import status_board
+from symbol_runner import SYMBOL_TIMEOUT, SymbolRunner
+
+logger = setup_logger("StrategyRuntime", "strategy_runtime.log", default=True)
+
+# 策略名 -> (模块, 交易类)；名称与 server.js /api/traders-status 的 id 一致
+STRATEGY_PLUGINS = {
+    "nfi": ("auto_trader_nostalgia_for_infinity", "NostalgiaForInfinityTrader"),
+    "boll_macd": ("trader_01_boll_macd", "BollMacdTrader"),
+    "rsi_macd": ("trader_02_rsi_macd", "RsiMacdTrader"),
+    "vwap": ("trader_03_vwap", "VwapTrader"),
+    "supertrend": ("trader_04_supertrend", "SuperTrendTrader"),
+    "adx": ("trader_05_adx", "AdxTrader"),
+    "bb_mean_reversion": ("trader_06_bb_mean_reversion", "BbMeanReversionTrader"),
+}
+
+# 与 ecosystem.army.json 实际在跑的机器人一致
+DEFAULT_STRATEGIES = ["nfi", "boll_macd", "supertrend", "adx"]
+
+# 策略一轮出错后的等待时间，与各机器人 run() 里的 sleep(300) 一致
+ERROR_BACKOFF = 300
+
+
+class StrategySlot:
+    """一个已加载的策略: 交易实例 + 调度状态"""
+
+    def __init__(self, name: str, module, trader):
+        self.name = name
+        self.module = module
+        self.trader = trader
+        self.next_run = 0.0
+        self.errors = 0
+        self.last_error = ""
+
+    @property
+    def interval(self) -> int:
+        return int(self.module.CONFIG.get("check_interval", 60))
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.module.CONFIG["symbols"])
+
+    @property
+    def timeout(self) -> float:
+        return float(self.module.CONFIG.get("symbol_timeout", SYMBOL_TIMEOUT))
+
+
+class StrategyRuntime:
+    def __init__(self, names: List[str]):
+        cfg = load_hl_config()
+        self.info = SharedInfo(create_info())
+        exchange = create_exchange(cfg.get("API_PRIVATE_KEY", ""), cfg.get("MAIN_WALLET", ""))
+        self.exchange = SharedExchange(exchange, self.info) if exchange else None
+        if not self.exchange:
+            logger.warning("API_PRIVATE_KEY 未配置：所有策略仅监控，不会下单")
+
+        self.slots: List[StrategySlot] = []
+        for name in names:
+            slot = self._load(name)
+            if slot:
+                self.slots.append(slot)
+
+        # 所有策略的全部币种同时在跑时也不排队
+        workers = sum(len(s.symbols) for s in self.slots) + 2
+        self.runner = SymbolRunner(max_workers=max(8, workers))
+
+    def _load(self, name: str) -> Optional[StrategySlot]:
+        module_name, class_name = STRATEGY_PLUGINS[name]
+        try:
+            module = importlib.import_module(module_name)
+            if hasattr(module, "load_hl_config"):
+                # NFI 在 main() 里才读取配置
+                module.load_hl_config()
+                if not module.CONFIG.get("main_wallet"):
+                    raise RuntimeError("MAIN_WALLET missing in trading-scripts/config/.hl_config")
+            # 只给本身配置了私钥的策略注入签名客户端，保持各策略原有的实盘/模拟模式
+            exchange = self.exchange if module.CONFIG.get("api_private_key") else None
+            trader = getattr(module, class_name)(info=self.info, exchange=exchange)
+        except Exception as e:
+            logger.error("[%s] 加载失败: %s", name, e, exc_info=True)
+            return None
+        logger.info("[%s] 已加载 %s.%s (%s, 间隔 %ss)",
+                    name, module_name, class_name, "实盘" if exchange else "模拟",
+                    int(module.CONFIG.get("check_interval", 60)))
+        return StrategySlot(name, module, trader)
+
+    async def run_slot(self, slot: StrategySlot) -> None:
+        started = time.time()
+        in_symbols = False
+        try:
+            prepare = getattr(slot.trader, "prepare_cycle", None)
+            if prepare:
+                stage_started = time.perf_counter()
+                ready = await self.runner.call(profiling.profiled(f"cycle:{slot.name}")(prepare))
+                metrics.observe(slot.name, "prepare", time.perf_counter() - stage_started)
+                if not ready:
+                    slot.next_run = started + slot.interval
+                    return
+            # 支持全市场扫描的策略（NFI universe_mode）自己决定本轮币种
+            cycle_symbols = getattr(slot.trader, "cycle_symbols", None)
+            symbols = await self.runner.call(cycle_symbols) if cycle_symbols else slot.symbols
+            # 从这里开始的币种异常由 run_async 记入状态板
+            in_symbols = True
+            try:
+                await self.runner.run_async(slot.name, slot.trader.process_symbol, symbols,
+                                            slot.timeout, slot.module.logger)
+            finally:
+                finish = getattr(slot.trader, "finish_cycle", None)
+                if finish:
+                    stage_started = time.perf_counter()
+                    await self.runner.call(profiling.profiled(f"cycle:{slot.name}")(finish))
+                    metrics.observe(slot.name, "finish", time.perf_counter() - stage_started)
+            slot.errors = 0
+            slot.next_run = started + slot.interval
+        except Exception as e:
+            slot.errors += 1
+            slot.last_error = str(e)
+            slot.next_run = started + ERROR_BACKOFF
+            if not in_symbols:
+                status_board.record_error(slot.name, str(e))
+                status_board.heartbeat(slot.name)
+            logger.error("[%s] 交易循环错误(%s): %s", slot.name, slot.errors, e, exc_info=True)
+
+    async def run_due(self) -> None:
+        """并发跑一轮到期的策略；同一轮内共享行情和账户快照"""
+        now = time.time()
+        due = [s for s in self.slots if s.next_run <= now]
+        if not due:
+            return
+        self.info.begin_cycle()
+        indicator_graph.begin_cycle()
+        # 两边的计数都是进程累计值，本轮的数字按差值算
+        cache_before = dict(self.info.stats)
+        graph_before = indicator_graph.stats()
+        started = time.time()
+        await asyncio.gather(*(self.run_slot(slot) for slot in due))
+        graph = indicator_graph.stats()
+        logger.info(
+            "本轮 %s 耗时 %.2fs (缓存命中 %d / 请求 %d, 指标计算 %d / 引用 %d)",
+            ",".join(s.name for s in due), time.time() - started,
+            self.info.stats["hits"] - cache_before["hits"], self.info.stats["misses"] - cache_before["misses"],
+            graph["computed"] - graph_before["computed"], graph["requests"] - graph_before["requests"],
+        )
+
+    async def run_forever(self) -> None:
+        while True:
+            await self.run_due()
+            wait = min(s.next_run for s in self.slots) - time.time()
+            await asyncio.sleep(min(max(wait, 1.0), 60.0))
+
+    def run(self) -> None:
+        logger.info("=" * 50)
+        logger.info("多策略运行时启动: %s", ", ".join(s.name for s in self.slots))
+        logger.info("=" * 50)
+        if not self.slots:
+            logger.error("没有可运行的策略，退出")
+            raise SystemExit(1)
+
+        server = metrics.serve()
+        if server:
+            logger.info("运行指标: http://127.0.0.1:%s/metrics", server.server_address[1])
+        try:
+            asyncio.run(self.run_forever())
+        finally:
+            # 成交推送的 WebSocket 线程不是守护线程，不关掉进程退不出（pm2 重启会卡住）
+            close_fill_streams()
+
+
+def parse_strategies(value: str) -> List[str]:
+    if not value:
+        return list(DEFAULT_STRATEGIES)
+    if value == "all":
+        return list(STRATEGY_PLUGINS)
+    names = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [n for n in names if n not in STRATEGY_PLUGINS]
+    if unknown:
+        raise SystemExit(f"未知策略: {', '.join(unknown)}（可选: {', '.join(STRATEGY_PLUGINS)}）")
+    return names
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多策略运行时")
+    parser.add_argument("--strategies", default="", help="逗号分隔的策略名，或 all")
+    profiling.add_argument(parser)
+    args = parser.parse_args()
+    profiling.configure(args.profile)
+
+    runtime = StrategyRuntime(parse_strategies(args.strategies))
+    report_startup(logger, "strategy_runtime")
+    runtime.run()
+
+
+if __name__ == "__main__":
+    main()
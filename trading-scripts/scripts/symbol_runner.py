@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+币种并发执行器 — asyncio + 线程池
+
+每个币种的「拉K线 → 分析 → 下单」流水线作为一个任务并发执行：
+- SDK / requests 都是阻塞调用，放进线程池，由 asyncio 统一等待
+- 每个任务有超时，一轮耗时取决于最慢的币种而不是所有币种之和
+- 超时的任务线程无法被打断，会继续在后台跑完；在它结束前同一策略同一币种不会重复提交
+- 每轮的耗时、各币种结果和异常写入状态板（status_board），网站不用再扫日志
+- 每个币种流水线和整轮的耗时记入 metrics（慢轮写 logs/slow_cycles.log）
+- TRADING_PROFILE 开启时每个币种流水线在 cProfile / tracemalloc 下执行（profiling）
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+import metrics
+import profiling
+import status_board
+
+# 单个币种流水线的默认超时（秒），小于各机器人 60s 的检查间隔
+SYMBOL_TIMEOUT = 45
+
+default_logger = logging.getLogger("SymbolRunner")
+
+
+class SymbolRunner:
+    def __init__(self, max_workers: int = 8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="symbol")
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    async def call(self, fn: Callable, *args):
+        """在线程池里执行一个阻塞函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, fn, *args)
+
+    def _run_guarded(self, key: tuple, fn: Callable, symbol: str) -> None:
+        try:
+            with metrics.span(key[0], "symbol", symbol), profiling.section(f"cycle:{key[0]}"):
+                fn(symbol)
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    async def _run_symbol(self, owner: str, fn: Callable, symbol: str, timeout: float,
+                          logger: logging.Logger) -> str:
+        key = (owner, symbol)
+        with self._lock:
+            if key in self._inflight:
+                logger.warning("%s 上一轮任务仍在执行，本轮跳过", symbol)
+                return "skipped"
+            self._inflight.add(key)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, self._run_guarded, key, fn, symbol)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return "ok"
+        except asyncio.TimeoutError:
+            logger.warning("%s 处理超时(>%gs)，任务转入后台继续执行", symbol, timeout)
+            return "timeout"
+
+    async def run_async(self, owner: str, process_symbol: Callable, symbols: Iterable[str],
+                        timeout: float = SYMBOL_TIMEOUT,
+                        logger: Optional[logging.Logger] = None) -> Dict[str, str]:
+        """并发处理全部币种；全部结束后若有币种抛异常，重新抛出第一个"""
+        logger = logger or default_logger
+        symbols = list(symbols)
+        board = status_board.get_board(owner)
+        board.begin_cycle()
+        metrics.begin_cycle(owner)
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._run_symbol(owner, process_symbol, s, timeout, logger) for s in symbols),
+            return_exceptions=True,
+        )
+        metrics.end_cycle(owner, time.perf_counter() - started)
+        status: Dict[str, str] = {}
+        first_error = None
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.error("%s 处理失败: %s", symbol, result)
+                board.record_error(f"{symbol}: {result}")
+                status[symbol] = "error"
+                first_error = first_error or result
+            else:
+                status[symbol] = result
+        board.end_cycle(status)
+        if first_error:
+            raise first_error
+        return status
+
+    def run(self, owner: str, process_symbol: Callable, symbols: Iterable[str],
+            timeout: float = SYMBOL_TIMEOUT, logger: Optional[logging.Logger] = None) -> Dict[str, str]:
+        """同步入口（独立运行的机器人在 run_cycle 里使用）"""
+        return asyncio.run(self.run_async(owner, process_symbol, symbols, timeout, logger))
+
+
+_default_runner: Optional[SymbolRunner] = None
+
+
+def run_symbols(owner: str, process_symbol: Callable, symbols: Iterable[str],
+                timeout: float = SYMBOL_TIMEOUT, logger: Optional[logging.Logger] = None) -> Dict[str, str]:
+    """用进程内共享的执行器并发处理一个策略的全部币种"""
+    global _default_runner
+    if _default_runner is None:
+        _default_runner = SymbolRunner()
+        # 独立运行的机器人设置了 METRICS_PORT 才开指标服务（多个机器人不抢同一个端口）
+        metrics.serve(int(os.getenv("METRICS_PORT", "0")))
+    return _default_runner.run(owner, process_symbol, symbols, timeout, logger)
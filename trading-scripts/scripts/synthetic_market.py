@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+合成行情 — 固定 seed 的 OHLCV 生成器，离线回测 / 基准 / 模拟交易所用
+
+模型（逐根K线）:
+- 几何布朗运动，漂移和波动率随市场状态切换（bull / bear / range / panic，马尔可夫切换，平均持续天数见 REGIMES）
+- GARCH(1,1) 波动聚集：大波动后面跟着大波动，半衰期 VOL_HALF_LIFE_HOURS，与K线周期无关
+- 偶尔跳空：开盘价相对上一根收盘价跳 GAP_SIZE 倍当前波动（概率按小时折算）；可选随机缺K线（drop_prob）
+- 上下影线按当前波动生成；成交量 = 基准名义成交额 × 日内节奏（欧美开盘放量）× 周末折扣 × 波动放量 × 对数正态噪声
+
+- 同样的 (币种, 周期, seed, 起始时间) 得到完全相同的序列，和分块大小无关（随机数按固定 BLOCK 根一块抽取）
+- 随机数和向量运算用 numpy，1m / 1h 都能快速生成任意长度；stream_* 按块产出，长序列不用整段放进内存
+- 输出格式: fetch_historical_klines 的 {"timestamp", "open", "high", "low", "close", "volume"}（klines），
+  candleSnapshot 的 {"t", "o", "h", "l", "c", "v", ...}（candles，backtest_*.py / exchange_sim 用），或元组 rows
+
+用法:
+  python synthetic_market.py --symbol BTC --interval 1h --days 365 --seed 7 --out btc_1h.jsonl
+  python synthetic_market.py --symbol BTC,ETH --interval 5m --days 60 --format candles --out sim.json
+  python exchange_sim.py serve --candles sim.json
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from kline_buffer import INTERVAL_MS
+
+HOUR_MS = 3_600_000
+DAY_MS = 86_400_000
+YEAR_MS = 365 * DAY_MS
+# 2025-01-01 00:00 UTC
+DEFAULT_START_MS = 1_735_689_600_000
+# 每次从随机数发生器抽取的K线数（改了会改变同一 seed 生成的序列）
+BLOCK = 4096
+DEFAULT_CHUNK = 10_000
+
+START_PRICES = {"BTC": 65000.0, "ETH": 3400.0, "SOL": 150.0}
+DEFAULT_START_PRICE = 100.0
+# 年化波动率
+ANNUAL_VOL = {"BTC": 0.55, "ETH": 0.7, "SOL": 0.9}
+DEFAULT_VOL = 0.8
+# 市场状态: 年化漂移 / 波动率倍数 / 平均持续天数 / 切换时被选中的权重
+REGIMES = {
+    "bull": {"drift": 0.8, "vol": 0.9, "days": 40.0, "weight": 3.0},
+    "bear": {"drift": -0.7, "vol": 1.2, "days": 25.0, "weight": 2.0},
+    "range": {"drift": 0.0, "vol": 0.7, "days": 30.0, "weight": 4.0},
+    "panic": {"drift": -4.0, "vol": 2.5, "days": 2.0, "weight": 0.5},
+}
+# 波动聚集: 冲击衰减一半的小时数；α = (1 - 持续度) × GARCH_ALPHA_RATIO，最多 GARCH_ALPHA_MAX
+VOL_HALF_LIFE_HOURS = 24.0
+GARCH_ALPHA_RATIO = 4.0
+GARCH_ALPHA_MAX = 0.1
+# 跳空: 平均每多少小时一次、大小（倍数 × 当前单根波动）
+GAP_EVERY_HOURS = 500.0
+GAP_SIZE = 6.0
+# 影线长度（倍数 × 当前单根波动 × |N(0,1)|）
+WICK = 0.6
+# 成交量: 每小时基准名义成交额（USD）、周末倍数、成交量噪声（对数正态 σ）
+NOTIONAL_PER_HOUR = {"BTC": 8e7, "ETH": 4e7, "SOL": 1.5e7}
+DEFAULT_NOTIONAL_PER_HOUR = 5e6
+WEEKEND_VOLUME = 0.6
+VOLUME_NOISE = 0.35
+
+
+def _hour_profile() -> np.ndarray:
+    """UTC 小时 -> 成交量倍数（欧洲 08:00、美国 14:30 开盘放量），均值为 1"""
+    hours = np.arange(24) + 0.5
+    profile = 0.7 + 0.3 * np.exp(-((hours - 8.0) / 2.5) ** 2) + 0.7 * np.exp(-((hours - 14.5) / 3.0) ** 2)
+    return profile / profile.mean()
+
+
+HOUR_PROFILE = _hour_profile()
+
+
+class SyntheticMarket:
+    """一个币种的合成行情；blocks() 无限产出，rows() / klines() / candles() 按需截断和分块"""
+
+    def __init__(self, symbol: str = "BTC", interval: str = "1h", seed: int = 0,
+                 start_ms: int = DEFAULT_START_MS, start_price: Optional[float] = None,
+                 annual_vol: Optional[float] = None, drop_prob: float = 0.0):
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"不支持的K线周期 {interval}（可选: {', '.join(INTERVAL_MS)}）")
+        self.symbol = symbol.upper()
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.seed = seed
+        self.start_ms = start_ms - start_ms % self.interval_ms
+        self.start_price = start_price or START_PRICES.get(self.symbol, DEFAULT_START_PRICE)
+        self.annual_vol = annual_vol or ANNUAL_VOL.get(self.symbol, DEFAULT_VOL)
+        self.drop_prob = drop_prob
+
+    def _params(self) -> Dict:
+        hours = self.interval_ms / HOUR_MS
+        dt = self.interval_ms / YEAR_MS
+        names = list(REGIMES)
+        persistence = 0.5 ** (hours / VOL_HALF_LIFE_HOURS)
+        alpha = min(GARCH_ALPHA_MAX, (1 - persistence) * GARCH_ALPHA_RATIO)
+        return {
+            "names": names,
+            "drift": [REGIMES[n]["drift"] * dt for n in names],
+            "var": [(self.annual_vol * REGIMES[n]["vol"]) ** 2 * dt for n in names],
+            "switch": [min(1.0, hours / (REGIMES[n]["days"] * 24)) for n in names],
+            "weights": [REGIMES[n]["weight"] for n in names],
+            "alpha": alpha,
+            "beta": persistence - alpha,
+            "gap_prob": min(1.0, hours / GAP_EVERY_HOURS),
+            "notional": NOTIONAL_PER_HOUR.get(self.symbol, DEFAULT_NOTIONAL_PER_HOUR) * hours,
+        }
+
+    @staticmethod
+    def _pick(weights: List[float], current: int, u: float) -> int:
+        """按权重选一个和当前不同的状态"""
+        total = sum(w for i, w in enumerate(weights) if i != current)
+        acc = 0.0
+        for i, w in enumerate(weights):
+            if i == current:
+                continue
+            acc += w / total
+            if u < acc:
+                return i
+        return len(weights) - 1 if current != len(weights) - 1 else 0
+
+    def blocks(self) -> Iterator[Tuple[np.ndarray, ...]]:
+        """无限产出 (t, o, h, l, c, v) 数组块，每块 BLOCK 根（drop_prob > 0 时会少几根）"""
+        p = self._params()
+        rng = np.random.default_rng([self.seed, zlib.crc32(self.symbol.encode())])
+        drift, var, switch, weights = p["drift"], p["var"], p["switch"], p["weights"]
+        regime_vol = [REGIMES[n]["vol"] for n in p["names"]]
+        alpha, beta = p["alpha"], p["beta"]
+        regime = p["names"].index("range")
+        h = var[regime]
+        eps = 0.0
+        log_close = math.log(self.start_price)
+        t0 = self.start_ms
+        while True:
+            z = rng.standard_normal(BLOCK).tolist()
+            u_switch = rng.random(BLOCK).tolist()
+            u_pick = rng.random(BLOCK).tolist()
+            u_gap = rng.random(BLOCK)
+            z_gap = rng.standard_normal(BLOCK)
+            z_high = np.abs(rng.standard_normal(BLOCK))
+            z_low = np.abs(rng.standard_normal(BLOCK))
+            z_volume = rng.standard_normal(BLOCK)
+            u_drop = rng.random(BLOCK)
+
+            # 状态切换和 GARCH 是递推的，逐根算；其余向量化
+            rets = [0.0] * BLOCK
+            sigmas = [0.0] * BLOCK
+            shocks = [0.0] * BLOCK
+            vol_mult = [0.0] * BLOCK
+            for i in range(BLOCK):
+                if u_switch[i] < switch[regime]:
+                    regime = self._pick(weights, regime, u_pick[i])
+                h = (1 - alpha - beta) * var[regime] + alpha * eps * eps + beta * h
+                sigma = math.sqrt(h)
+                eps = sigma * z[i]
+                rets[i] = drift[regime] - 0.5 * h + eps
+                sigmas[i] = sigma
+                shocks[i] = abs(z[i])
+                vol_mult[i] = regime_vol[regime]
+            rets_a = np.asarray(rets)
+            sigma_a = np.asarray(sigmas)
+
+            gaps = np.where(u_gap < p["gap_prob"], z_gap * GAP_SIZE * sigma_a, 0.0)
+            closes_log = log_close + np.cumsum(gaps + rets_a)
+            opens_log = np.concatenate(([log_close], closes_log[:-1])) + gaps
+            log_close = float(closes_log[-1])
+            opens = np.exp(opens_log)
+            closes = np.exp(closes_log)
+            highs = np.maximum(opens, closes) * np.exp(z_high * sigma_a * WICK)
+            lows = np.minimum(opens, closes) * np.exp(-z_low * sigma_a * WICK)
+
+            times = t0 + np.arange(BLOCK, dtype=np.int64) * self.interval_ms
+            t0 += BLOCK * self.interval_ms
+            season = np.where((times // DAY_MS + 3) % 7 >= 5, WEEKEND_VOLUME, 1.0)
+            if self.interval_ms < DAY_MS:
+                season = season * HOUR_PROFILE[(times // HOUR_MS) % 24]
+            notional = (p["notional"] * season * np.asarray(vol_mult) * (0.6 + 0.4 * np.asarray(shocks))
+                        * np.exp(VOLUME_NOISE * z_volume - 0.5 * VOLUME_NOISE ** 2))
+            volumes = notional / closes
+
+            if self.drop_prob > 0:
+                keep = u_drop >= self.drop_prob
+                yield times[keep], opens[keep], highs[keep], lows[keep], closes[keep], volumes[keep]
+            else:
+                yield times, opens, highs, lows, closes, volumes
+
+    def rows(self, bars: Optional[int] = None, end_ms: Optional[int] = None,
+             chunk_bars: int = DEFAULT_CHUNK) -> Iterator[List[tuple]]:
+        """按块产出 [(t, o, h, l, c, v), ...]，到 bars 根或开盘时间到 end_ms（不含）为止；都不给时无限产出"""
+        produced = 0
+        pending: List[tuple] = []
+        for block in self.blocks():
+            rows = list(zip(*(a.tolist() for a in block)))
+            finished = False
+            if end_ms is not None and rows and rows[-1][0] >= end_ms:
+                rows = [r for r in rows if r[0] < end_ms]
+                finished = True
+            if bars is not None and produced + len(rows) >= bars:
+                rows = rows[:bars - produced]
+                finished = True
+            produced += len(rows)
+            pending.extend(rows)
+            while len(pending) >= chunk_bars:
+                yield pending[:chunk_bars]
+                pending = pending[chunk_bars:]
+            if finished:
+                break
+        if pending:
+            yield pending
+
+    def klines(self, bars: Optional[int] = None, end_ms: Optional[int] = None,
+               chunk_bars: int = DEFAULT_CHUNK) -> Iterator[List[Dict]]:
+        for chunk in self.rows(bars, end_ms, chunk_bars):
+            yield rows_to_klines(chunk)
+
+    def candles(self, bars: Optional[int] = None, end_ms: Optional[int] = None,
+                chunk_bars: int = DEFAULT_CHUNK) -> Iterator[List[Dict]]:
+        for chunk in self.rows(bars, end_ms, chunk_bars):
+            yield rows_to_candles(chunk, self.symbol, self.interval)
+
+
+def rows_to_klines(rows: List[tuple]) -> List[Dict]:
+    """元组 -> fetch_historical_klines 格式"""
+    return [{"timestamp": t, "open": o, "high": h, "low": l, "close": c, "volume": v} for t, o, h, l, c, v in rows]
+
+
+def _num(x: float) -> str:
+    s = f"{x:.8f}".rstrip("0").rstrip(".")
+    return "0" if s in ("", "-0") else s
+
+
+def rows_to_candles(rows: List[tuple], symbol: str, interval: str) -> List[Dict]:
+    """元组 -> candleSnapshot 格式（数值是字符串，和接口返回一致）"""
+    step = INTERVAL_MS[interval]
+    return [{"t": t, "T": t + step - 1, "s": symbol, "i": interval, "o": _num(o), "h": _num(h), "l": _num(l),
+             "c": _num(c), "v": _num(v), "n": 1} for t, o, h, l, c, v in rows]
+
+
+def generate_rows(symbol: str, bars: int, interval: str = "1h", seed: int = 0,
+                  start_ms: int = DEFAULT_START_MS) -> List[tuple]:
+    out: List[tuple] = []
+    for chunk in SyntheticMarket(symbol, interval, seed, start_ms).rows(bars=bars, chunk_bars=max(bars, 1)):
+        out.extend(chunk)
+    return out
+
+
+def generate_klines(symbol: str, bars: int, interval: str = "1h", seed: int = 0,
+                    start_ms: int = DEFAULT_START_MS) -> List[Dict]:
+    return rows_to_klines(generate_rows(symbol, bars, interval, seed, start_ms))
+
+
+def stream_klines(symbol: str, interval: str = "1h", seed: int = 0, start_ms: int = DEFAULT_START_MS,
+                  end_ms: Optional[int] = None, bars: Optional[int] = None,
+                  chunk_bars: int = DEFAULT_CHUNK) -> Iterator[List[Dict]]:
+    """按块产出 fetch_historical_klines 格式的K线，内存只占一块"""
+    return SyntheticMarket(symbol, interval, seed, start_ms).klines(bars, end_ms, chunk_bars)
+
+
+def fetch_historical_klines(symbol: str, start_date: datetime, end_date: datetime, interval: str = "1h",
+                            seed: int = 0) -> List[Dict]:
+    """test/ 下回测脚本同名函数的离线替代：同样的参数和返回格式，数据是合成的"""
+    start_ms = int(start_date.timestamp() * 1000)
+    end_ms = int(end_date.timestamp() * 1000) + 1
+    out: List[Dict] = []
+    for chunk in stream_klines(symbol, interval, seed, start_ms, end_ms=end_ms):
+        out.extend(chunk)
+    return out
+
+
+def candle_snapshot(symbol: str, start_ms: int, end_ms: int, interval: str = "1h", seed: int = 0) -> List[Dict]:
+    """backtest_*.py 里 get_candles 的离线替代（candleSnapshot 格式）"""
+    out: List[Dict] = []
+    for chunk in SyntheticMarket(symbol, interval, seed, start_ms).candles(end_ms=end_ms + 1):
+        out.extend(chunk)
+    return out
+
+
+def add_argument(parser) -> None:
+    parser.add_argument("--synthetic", type=int, default=None, metavar="SEED",
+                        help="不联网，用合成行情（synthetic_market）回测，同一个 SEED 结果可复现")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="生成合成K线")
+    parser.add_argument("--symbol", default="BTC", help="币种，逗号分隔可以生成多个")
+    parser.add_argument("--interval", default="1h", choices=list(INTERVAL_MS))
+    parser.add_argument("--days", type=float, default=180, help="天数（给了 --bars 时忽略）")
+    parser.add_argument("--bars", type=int, default=0, help="每个币种的K线数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2025-01-01", help="起始日期 YYYY-MM-DD（UTC）")
+    parser.add_argument("--drop-prob", type=float, default=0.0, help="随机缺K线的概率")
+    parser.add_argument("--format", choices=["jsonl", "candles"], default="jsonl",
+                        help="jsonl=每行一根 klines 格式（流式写出）；candles={币种: [candleSnapshot...]}（exchange_sim --candles）")
+    parser.add_argument("--out", default="-", help="输出文件，- 为标准输出")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="每块K线数")
+    args = parser.parse_args()
+
+    start_ms = int(datetime.strptime(args.start, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+    bars = args.bars or int(args.days * DAY_MS // INTERVAL_MS[args.interval])
+    symbols = [s.strip().upper() for s in args.symbol.split(",") if s.strip()]
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    started = time.perf_counter()
+    total = 0
+    try:
+        if args.format == "candles":
+            data = {}
+            for symbol in symbols:
+                market = SyntheticMarket(symbol, args.interval, args.seed, start_ms, drop_prob=args.drop_prob)
+                data[symbol] = [c for chunk in market.candles(bars, chunk_bars=args.chunk) for c in chunk]
+                total += len(data[symbol])
+            json.dump(data, out)
+        else:
+            for symbol in symbols:
+                market = SyntheticMarket(symbol, args.interval, args.seed, start_ms, drop_prob=args.drop_prob)
+                for chunk in market.klines(bars, chunk_bars=args.chunk):
+                    out.write("".join(json.dumps(dict(k, symbol=symbol)) + "\n" for k in chunk))
+                    total += len(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"生成 {total} 根 {args.interval} K线（{', '.join(symbols)}），耗时 {elapsed:.2f}s "
+          f"({total / elapsed if elapsed > 0 else 0:,.0f} 根/秒)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+交易日志（所有策略共用）
+
+代替各自追加的 trades_*.jsonl：
+- 按天分段写入 logs/trades/YYYY-MM-DD.jsonl，一行一笔
+- logs/trades/index.json 记录每天的笔数、时间范围、涉及的策略和币种
+- 查询先看索引，只打开时间范围内、包含目标策略 / 币种的那几天，和历史总量无关
+- record_trade 只把记录放进队列就返回，写文件、跨进程加锁、更新索引都在后台线程里批量做，
+  下单线程不等磁盘也不等别的机器人进程；同进程内查询前和进程退出时（atexit）先把队列写完
+
+用法:
+  python trade_journal.py                              # 今天的交易和汇总
+  python trade_journal.py --date 2026-03-01 --strategy nfi
+  python trade_journal.py --days 7 --json
+  python trade_journal.py --import ../../logs/trades_nfi.jsonl --strategy nfi   # 导入旧文件
+"""
+
+import argparse
+import atexit
+import fcntl
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[1].parent
+JOURNAL_DIR = Path(os.getenv("TRADING_LOG_DIR") or WORKSPACE_ROOT / "logs") / "trades"
+INDEX_PATH = JOURNAL_DIR / "index.json"
+
+_lock = threading.Lock()
+
+# 后台写入: 队列里是交易记录，或者 flush() 放进去等待写完的 Event
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+# flush() 最多等多久（秒）
+FLUSH_TIMEOUT = 10.0
+
+
+@contextmanager
+def _journal_lock():
+    """进程内线程锁 + 跨进程文件锁（多个机器人进程共用一个日志目录）"""
+    JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    with _lock, open(JOURNAL_DIR / "index.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def _segment(day: str) -> Path:
+    return JOURNAL_DIR / f"{day}.jsonl"
+
+
+def load_index() -> Dict[str, Dict]:
+    try:
+        with open(INDEX_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(index: Dict) -> None:
+    tmp = INDEX_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp, INDEX_PATH)
+
+
+def _index_entry(index: Dict, entry: Dict) -> None:
+    day = index.setdefault(_day(entry["ts"]), {"count": 0, "first": entry["ts"], "last": entry["ts"],
+                                                "strategies": {}, "symbols": {}})
+    day["count"] += 1
+    day["first"] = min(day["first"], entry["ts"])
+    day["last"] = max(day["last"], entry["ts"])
+    day["strategies"][entry["strategy"]] = day["strategies"].get(entry["strategy"], 0) + 1
+    day["symbols"][entry["symbol"]] = day["symbols"].get(entry["symbol"], 0) + 1
+
+
+def _append(entries: List[Dict]) -> None:
+    with _journal_lock():
+        index = load_index()
+        by_day: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            by_day.setdefault(_day(entry["ts"]), []).append(entry)
+            _index_entry(index, entry)
+        for day, items in by_day.items():
+            with open(_segment(day), "a") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in items))
+        _write_index(index)
+
+
+def _write_loop() -> None:
+    while True:
+        batch: List[Dict] = []
+        waiters: List[threading.Event] = []
+        item = _queue.get()
+        while True:
+            (waiters if isinstance(item, threading.Event) else batch).append(item)
+            try:
+                item = _queue.get_nowait()
+            except queue.Empty:
+                break
+        if batch:
+            try:
+                _append(batch)
+            except Exception as e:
+                print(f"写入交易日志失败: {e}", file=sys.stderr)
+        for event in waiters:
+            event.set()
+
+
+def _ensure_writer() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name="trade-journal", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+
+
+def flush(timeout: float = FLUSH_TIMEOUT) -> bool:
+    """等后台线程把已提交的记录写完；没有后台线程时直接返回"""
+    if _writer is None or not _writer.is_alive():
+        return True
+    done = threading.Event()
+    _queue.put(done)
+    return done.wait(timeout)
+
+
+def record_trade(strategy: str, symbol: str, action: str, size: float = 0.0, price: float = 0.0,
+                 status: str = "submitted", reason: str = "", pnl: Optional[float] = None,
+                 **extra) -> Dict:
+    """记录一笔交易（后台写入）；写失败只打印警告，不影响下单流程"""
+    ts = time.time()
+    entry = {
+        "ts": ts,
+        "time": datetime.fromtimestamp(ts).isoformat(),
+        "strategy": strategy,
+        "symbol": symbol,
+        "action": action,
+        "size": size,
+        "price": price,
+        "notional": round(abs(size * price), 6),
+        "status": status,
+        "reason": reason,
+    }
+    if pnl is not None:
+        entry["pnl"] = pnl
+    if extra:
+        entry["extra"] = extra
+    _ensure_writer()
+    _queue.put(entry)
+    return entry
+
+
+def query_trades(strategy: Optional[str] = None, symbol: Optional[str] = None,
+                 start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+    """按策略 / 币种 / 时间范围（epoch 秒，含 start 不含 end）查询，按时间排序"""
+    flush()
+    index = load_index()
+    start_day = _day(start) if start is not None else None
+    end_day = _day(end) if end is not None else None
+    trades: List[Dict] = []
+    for day in sorted(index):
+        meta = index[day]
+        if (start_day and day < start_day) or (end_day and day > end_day):
+            continue
+        if (strategy and strategy not in meta["strategies"]) or (symbol and symbol not in meta["symbols"]):
+            continue
+        try:
+            with open(_segment(day), "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    t = json.loads(line)
+                    if strategy and t["strategy"] != strategy:
+                        continue
+                    if symbol and t["symbol"] != symbol:
+                        continue
+                    if (start is not None and t["ts"] < start) or (end is not None and t["ts"] >= end):
+                        continue
+                    trades.append(t)
+        except OSError:
+            continue
+    trades.sort(key=lambda t: t["ts"])
+    return trades
+
+
+def summarize(trades: Iterable[Dict]) -> Dict:
+    """汇总：笔数、按策略 / 币种 / 方向 / 状态计数、成交额、已实现盈亏"""
+    summary = {"count": 0, "notional": 0.0, "pnl": 0.0, "wins": 0, "losses": 0,
+               "by_strategy": {}, "by_symbol": {}, "by_action": {}, "by_status": {}}
+    for t in trades:
+        summary["count"] += 1
+        summary["notional"] += t.get("notional", 0.0)
+        for key, field in (("by_strategy", "strategy"), ("by_symbol", "symbol"),
+                           ("by_action", "action"), ("by_status", "status")):
+            value = t.get(field, "")
+            summary[key][value] = summary[key].get(value, 0) + 1
+        if t.get("pnl") is not None:
+            summary["pnl"] += t["pnl"]
+            if t["pnl"] > 0:
+                summary["wins"] += 1
+            elif t["pnl"] < 0:
+                summary["losses"] += 1
+    summary["notional"] = round(summary["notional"], 2)
+    summary["pnl"] = round(summary["pnl"], 4)
+    return summary
+
+
+def day_range(day: str, days: int = 1):
+    """YYYY-MM-DD 开始的 days 天 → (start, end) epoch 秒"""
+    start = datetime.strptime(day, "%Y-%m-%d")
+    return start.timestamp(), (start + timedelta(days=days)).timestamp()
+
+
+def import_jsonl(path: Path, strategy: str) -> int:
+    """导入旧格式 {"time", "signal", "result"} 的 jsonl 文件，返回导入笔数"""
+    entries = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            old = json.loads(line)
+            signal = old.get("signal", {})
+            ts = datetime.fromisoformat(old["time"]).timestamp()
+            price = float(signal.get("entry_price", signal.get("price", 0)) or 0)
+            size = float(signal.get("size", 0) or 0) / price if price else 0.0
+            entries.append({
+                "ts": ts,
+                "time": old["time"],
+                "strategy": strategy,
+                "symbol": signal.get("symbol", ""),
+                "action": {"BUY": "LONG", "SELL": "SHORT"}.get(signal.get("action"), signal.get("action", "")),
+                "size": size,
+                "price": price,
+                "notional": round(abs(size * price), 6),
+                "status": (old.get("result") or {}).get("status", "unknown"),
+                "reason": signal.get("reason", ""),
+            })
+    if entries:
+        _append(entries)
+    return len(entries)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="查询交易日志")
+    parser.add_argument("--date", default=date.today().isoformat(), help="起始日期 YYYY-MM-DD，默认今天")
+    parser.add_argument("--days", type=int, default=1, help="天数")
+    parser.add_argument("--strategy")
+    parser.add_argument("--symbol")
+    parser.add_argument("--json", action="store_true", help="输出 JSON（trades + summary）")
+    parser.add_argument("--markdown", action="store_true", help="输出 Markdown 表格行（日报用）")
+    parser.add_argument("--import", dest="import_path", help="导入旧的 trades_*.jsonl")
+    args = parser.parse_args()
+
+    if args.import_path:
+        if not args.strategy:
+            parser.error("--import 需要同时指定 --strategy")
+        print(f"已导入 {import_jsonl(Path(args.import_path), args.strategy)} 笔")
+        return 0
+
+    start, end = day_range(args.date, args.days)
+    trades = query_trades(args.strategy, args.symbol, start, end)
+    summary = summarize(trades)
+    if args.json:
+        print(json.dumps({"trades": trades, "summary": summary}, ensure_ascii=False, indent=2))
+    elif args.markdown:
+        for t in trades:
+            print(f"| {t['time'][:19].replace('T', ' ')} | {t['strategy']} | {t['symbol']} | {t['action']} | {t['status']} |")
+    else:
+        for t in trades:
+            print(f"{t['time'][:19]}  {t['strategy']:<18} {t['symbol']:<6} {t['action']:<6} "
+                  f"{t['size']:<10g} @ {t['price']:<10g} {t['status']}")
+        print(f"共 {summary['count']} 笔 | 成交额 ${summary['notional']:.2f} | 已实现盈亏 ${summary['pnl']:.2f} | "
+              f"按策略 {summary['by_strategy']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,217 @@
-"""交易状态持久化 — 重启后恢复冷却时间"""
+"""交易状态持久化 — 重启后恢复冷却时间、持仓记录和K线缓冲
+
+冷却时间、持仓、移动止损高水位、权益峰值等都存在同一个 SQLite 库（memory/trading/state.db，WAL 模式）:
+- 每个 (策略, 字段, 币种) 一行，主键即索引，按策略 / 币种查询不用读整个文件
+- 每次保存是一个事务，进程中途崩溃不会留下写了一半的状态；多个机器人进程可以同时读写
+- 旧版本的 <策略>_state.json 在第一次读取时自动导入
+K线快照体积大、只给本策略自己用，仍然是单独的 JSON 文件。
+"""
 
 import json
 import logging
+import os
+import sqlite3
+import threading
+import time
 from pathlib import Path
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
-STATE_DIR = Path(__file__).resolve().parents[1].parent / "memory" / "trading"
+# 同一策略的多个币种会在线程池里并发保存状态；写事务在进程内串行，读不用等
+_save_lock = threading.RLock()
+
+# TRADING_STATE_DIR: 模拟盘等独立运行的状态目录，不和实盘状态混在一起
+STATE_DIR = Path(os.getenv("TRADING_STATE_DIR") or Path(__file__).resolve().parents[1].parent / "memory" / "trading")
 STATE_DIR.mkdir(parents=True, exist_ok=True)
+STATE_DB = STATE_DIR / "state.db"
 
+# 非字典字段（如 peak_balance）存在 symbol 为空串的行里
+SCALAR = ""
 
-def load_trade_times(strategy_name: str) -> dict:
-    path = STATE_DIR / f"{strategy_name}_state.json"
-    if path.exists():
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    strategy   TEXT NOT NULL,
+    section    TEXT NOT NULL,
+    symbol     TEXT NOT NULL DEFAULT '',
+    value      TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (strategy, section, symbol)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS state_by_symbol ON state (symbol, section);
+"""
+
+# 每个线程一个连接：读不会落进别的线程正在进行的写事务里（看到未提交的数据、出错打断事务），
+# WAL 模式下读连接互不阻塞，也不阻塞写
+_local = threading.local()
+_schema_ready = False
+
+
+def _db() -> sqlite3.Connection:
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(STATE_DB, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not _schema_ready:
+            with _save_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _schema_ready = True
+        _local.conn = conn
+    return conn
+
+
+def _write_json(path: Path, data, indent=None):
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp, path)
+
+
+def _section_rows(section: str, value) -> List[tuple]:
+    if isinstance(value, dict):
+        return [(section, str(symbol), json.dumps(v)) for symbol, v in value.items()]
+    return [(section, SCALAR, json.dumps(value))]
+
+
+def _replace_sections(strategy_name: str, sections: Dict) -> None:
+    db = _db()
+    now = time.time()
+    with _save_lock:
+        db.execute("BEGIN IMMEDIATE")
         try:
-            with open(path, "r") as f:
-                data = json.load(f)
-            times = data.get("last_trade_time", {})
-            logger.info(f"已恢复交易状态 [{strategy_name}]: {times}")
-            return times
-        except Exception as e:
-            logger.warning(f"读取状态文件失败 [{strategy_name}]: {e}")
-    return {}
+            for section, value in sections.items():
+                db.execute("DELETE FROM state WHERE strategy = ? AND section = ?", (strategy_name, section))
+                db.executemany(
+                    "INSERT INTO state (strategy, section, symbol, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    [(strategy_name, s, sym, v, now) for s, sym, v in _section_rows(section, value)],
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
 
 
-def save_trade_times(strategy_name: str, last_trade_time: dict):
+def _migrate_json(strategy_name: str) -> None:
+    """把旧版本的 <策略>_state.json 导入数据库，导入后改名保留"""
     path = STATE_DIR / f"{strategy_name}_state.json"
+    if not path.exists():
+        return
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data:
+            _replace_sections(strategy_name, data)
+        path.rename(path.with_suffix(".json.migrated"))
+        logger.info("已导入旧状态文件 [%s]", strategy_name)
+    except Exception as e:
+        logger.warning("导入旧状态文件失败 [%s]: %s", strategy_name, e)
+
+
+def load_state(strategy_name: str) -> dict:
+    """读取策略状态（last_trade_time / positions 等），不存在或读取失败时返回空 dict"""
+    try:
+        with _save_lock:
+            _migrate_json(strategy_name)
+            rows = _db().execute(
+                "SELECT section, symbol, value FROM state WHERE strategy = ?", (strategy_name,)
+            ).fetchall()
+    except Exception as e:
+        logger.warning("读取状态失败 [%s]: %s", strategy_name, e)
+        return {}
+    data: Dict = {}
+    for section, symbol, value in rows:
+        if symbol == SCALAR:
+            data[section] = json.loads(value)
+        else:
+            data.setdefault(section, {})[symbol] = json.loads(value)
+    return data
+
+
+def save_state(strategy_name: str, **sections):
+    """在一个事务里替换若干字段，其余字段保持不变"""
+    try:
+        _replace_sections(strategy_name, sections)
+    except Exception as e:
+        logger.warning("保存状态失败 [%s]: %s", strategy_name, e)
+
+
+def get_symbol_state(strategy_name: str, section: str, symbol: str = SCALAR):
+    """按主键读取单个值，不存在时返回 None"""
+    try:
+        row = _db().execute(
+            "SELECT value FROM state WHERE strategy = ? AND section = ? AND symbol = ?",
+            (strategy_name, section, symbol),
+        ).fetchone()
+    except Exception as e:
+        logger.warning("读取状态失败 [%s.%s.%s]: %s", strategy_name, section, symbol, e)
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def set_symbol_state(strategy_name: str, section: str, symbol: str, value) -> None:
+    """写入单个值；value 为 None 时删除该行"""
+    try:
+        with _save_lock:
+            if value is None:
+                _db().execute(
+                    "DELETE FROM state WHERE strategy = ? AND section = ? AND symbol = ?",
+                    (strategy_name, section, symbol),
+                )
+            else:
+                _db().execute(
+                    "INSERT OR REPLACE INTO state (strategy, section, symbol, value, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (strategy_name, section, symbol, json.dumps(value), time.time()),
+                )
+    except Exception as e:
+        logger.warning("保存状态失败 [%s.%s.%s]: %s", strategy_name, section, symbol, e)
+
+
+def query_state(section: str, symbol: Optional[str] = None) -> Dict[str, Dict]:
+    """跨策略查询某个字段，例如 query_state("positions", "BTC") → {策略: {币种: 值}}"""
+    sql = "SELECT strategy, symbol, value FROM state WHERE section = ?"
+    params = [section]
+    if symbol is not None:
+        sql = "SELECT strategy, symbol, value FROM state WHERE symbol = ? AND section = ?"
+        params = [symbol, section]
+    result: Dict[str, Dict] = {}
+    for strategy, sym, value in _db().execute(sql, params).fetchall():
+        result.setdefault(strategy, {})[sym] = json.loads(value)
+    return result
+
+
+def load_trade_times(strategy_name: str) -> dict:
+    times = load_state(strategy_name).get("last_trade_time", {})
+    if times:
+        logger.info("已恢复交易状态 [%s]: %s", strategy_name, times)
+    return times
+
+
+def save_trade_times(strategy_name: str, last_trade_time: dict):
+    save_state(strategy_name, last_trade_time=dict(last_trade_time))
+
+
+def load_kline_snapshot(strategy_name: str, buffer) -> int:
+    """把上次保存的K线缓冲恢复到 buffer（KlineBuffer），返回恢复的序列数"""
+    path = STATE_DIR / f"{strategy_name}_klines.json"
+    if not path.exists():
+        return 0
+    try:
+        with open(path, "r") as f:
+            restored = buffer.restore(json.load(f))
+        logger.info("已恢复K线快照 [%s]: %s 个序列", strategy_name, restored)
+        return restored
+    except Exception as e:
+        logger.warning("读取K线快照失败 [%s]: %s", strategy_name, e)
+        return 0
+
+
+def save_kline_snapshot(strategy_name: str, buffer):
+    path = STATE_DIR / f"{strategy_name}_klines.json"
     try:
-        with open(path, "w") as f:
-            json.dump({"last_trade_time": last_trade_time}, f, indent=2)
+        with _save_lock:
+            _write_json(path, buffer.export())
     except Exception as e:
-        logger.warning(f"保存状态文件失败 [{strategy_name}]: {e}")
+        logger.warning("保存K线快照失败 [%s]: %s", strategy_name, e)
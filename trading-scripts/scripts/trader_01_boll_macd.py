@@ -9,24 +9,27 @@
 """
 
 import json
-import logging
 import os
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List
 
-import requests
-from eth_account import Account
-from hyperliquid.exchange import Exchange
-from hyperliquid.info import Info
-from hyperliquid.utils import constants
-from trade_state import load_trade_times, save_trade_times
+from bot_logging import setup_logger
+from symbol_runner import SYMBOL_TIMEOUT, run_symbols
+from asset_meta import round_price, round_size
+from execution import ExecutionEngine, close_fill_streams
+from fill_sync import register_order
+from hl_client import SharedExchange, create_exchange, create_info
+import indicator_graph
+from indicator_graph import atr_node, bollinger_nodes, macd_nodes
+from kline_buffer import KlineBuffer
+import metrics
+from startup import report_startup
+from status_board import record_execution, record_position, record_signal
+from trade_journal import record_trade
+from trade_state import load_kline_snapshot, load_state, load_trade_times, save_kline_snapshot, save_state
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-WORKSPACE_ROOT = PROJECT_ROOT.parent
-LOG_DIR = WORKSPACE_ROOT / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 # 读取配置文件
 def load_config():
@@ -84,107 +87,20 @@ SYMBOL_PARAMS = {
     }
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trader_01_boll_macd.log"),
-        logging.StreamHandler(),
-    ],
-)
-logger = logging.getLogger("BollMacdTrader")
-
-
-def sma(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    out = []
-    running = 0.0
-    for idx, v in enumerate(values):
-        running += v
-        if idx >= period:
-            running -= values[idx - period]
-        count = period if idx >= period - 1 else (idx + 1)
-        out.append(running / count)
-    return out
-
-
-def rolling_std(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    out = []
-    for idx in range(len(values)):
-        start = max(0, idx - period + 1)
-        window = values[start:idx+1]
-        mean = sum(window) / len(window)
-        variance = sum((x - mean) ** 2 for x in window) / len(window)
-        out.append(variance ** 0.5)
-    return out
-
-
-def bollinger_bands(values: List[float], period: int, std_mult: float):
-    mid = sma(values, period)
-    std = rolling_std(values, period)
-    upper = [m + std_mult * s for m, s in zip(mid, std)]
-    lower = [m - std_mult * s for m, s in zip(mid, std)]
-    return mid, upper, lower
-
-
-def ema(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    mult = 2 / (period + 1)
-    out = [values[0]]
-    for price in values[1:]:
-        out.append(price * mult + out[-1] * (1 - mult))
-    return out
-
-
-def macd_calc(values: List[float], fast: int, slow: int, signal: int):
-    ema_fast = ema(values, fast)
-    ema_slow = ema(values, slow)
-    macd_line = [f - s for f, s in zip(ema_fast, ema_slow)]
-    signal_line = ema(macd_line, signal)
-    histogram = [m - s for m, s in zip(macd_line, signal_line)]
-    return macd_line, signal_line, histogram
-
-
-def calculate_atr(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> List[float]:
-    if len(highs) < 2:
-        return [0.0] * len(highs)
-    
-    tr_list = []
-    for i in range(len(highs)):
-        if i == 0:
-            tr = highs[i] - lows[i]
-        else:
-            tr1 = highs[i] - lows[i]
-            tr2 = abs(highs[i] - closes[i-1])
-            tr3 = abs(lows[i] - closes[i-1])
-            tr = max(tr1, tr2, tr3)
-        tr_list.append(tr)
-    
-    atr = []
-    for i in range(len(tr_list)):
-        if i < period - 1:
-            atr.append(sum(tr_list[:i+1]) / (i+1))
-        elif i == period - 1:
-            atr.append(sum(tr_list[:period]) / period)
-        else:
-            atr.append((atr[-1] * (period-1) + tr_list[i]) / period)
-    return atr
+logger = setup_logger("BollMacdTrader", "trader_01_boll_macd.log")
 
 
 def analyze_boll_macd(symbol: str, closes: List[float], highs: List[float], lows: List[float]) -> Dict:
     """BOLL + MACD 共振分析 V3稳健版"""
     p = SYMBOL_PARAMS.get(symbol, SYMBOL_PARAMS["BTC"])
     
-    # 计算指标
-    bb_mid, bb_upper, bb_lower = bollinger_bands(closes, p["bb_period"], p["bb_stddev"])
-    macd_line, signal_line, histogram = macd_calc(
-        closes, p["macd_fast"], p["macd_slow"], p["macd_signal"]
+    # 计算指标（指标图去重，和其他策略相同的指标只算一次）
+    src = indicator_graph.source(close=closes, high=highs, low=lows)
+    bb_mid, bb_upper, bb_lower = src.get(*bollinger_nodes("close", p["bb_period"], p["bb_stddev"]))
+    macd_line, signal_line, histogram = src.get(
+        *macd_nodes("close", p["macd_fast"], p["macd_slow"], p["macd_signal"])
     )
-    atr_values = calculate_atr(highs, lows, closes)
+    atr_values = src.get(atr_node(14))
     
     if len(closes) < 2:
         return {"action": "HOLD", "reason": "insufficient_data"}
@@ -232,17 +148,29 @@ def analyze_boll_macd(symbol: str, closes: List[float], highs: List[float], lows
 
 
 class BollMacdTrader:
-    def __init__(self):
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=True)
-        self.exchange = None
+    def __init__(self, info=None, exchange=None):
+        """info/exchange 可由多策略运行时注入共享实例，缺省时自行创建"""
+        self.info = info or create_info()
+        self.klines = KlineBuffer(self.info)  # K线增量缓冲
+        load_kline_snapshot("boll_macd", self.klines)
+        self.exchange = exchange
         self.last_trade_time = load_trade_times("boll_macd")
-        self.positions = {}
-        self._setup_exchange()
+        # 持仓记录（跟踪止损位、开仓 ATR）随状态文件持久化，重启不丢失
+        self.positions = load_state("boll_macd").get("positions", {})
+        if self.positions:
+            logger.info("已恢复持仓记录: %s", ", ".join(self.positions))
+        if self.exchange is None:
+            self._setup_exchange()
+        # 开仓和止盈止损一次提交，出场由交易所触发
+        self.execution = ExecutionEngine("boll_macd", self.exchange, self.info, CONFIG["main_wallet"])
+        for symbol, p in self.positions.items():
+            if p.get("bracket"):
+                self.execution.restore_bracket(symbol, p["type"] == "LONG", p["size"], p["entry_time"],
+                                               p["stop_loss"], p["take_profit"])
         
     def _setup_exchange(self):
         if CONFIG["api_private_key"]:
-            account = Account.from_key(CONFIG["api_private_key"])
-            self.exchange = Exchange(account, constants.MAINNET_API_URL, account_address=CONFIG["main_wallet"])
+            self.exchange = SharedExchange(create_exchange(CONFIG["api_private_key"], CONFIG["main_wallet"]))
 
     def get_position(self, symbol: str) -> Dict:
         """获取当前持仓"""
@@ -257,14 +185,14 @@ class BollMacdTrader:
                     }
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
         except Exception as e:
-            logger.error(f"获取持仓失败 {symbol}: {e}")
+            logger.error("获取持仓失败 %s: %s", symbol, e)
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
 
     def get_klines(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> Dict:
         try:
             end_time = int(datetime.now().timestamp() * 1000)
             start_time = end_time - (limit * 60 * 60 * 1000)
-            candles = self.info.candles_snapshot(symbol, timeframe, start_time, end_time)
+            candles = self.klines.get(symbol, timeframe, start_time, end_time)
             return {
                 "open": [float(c["o"]) for c in candles],
                 "high": [float(c["h"]) for c in candles],
@@ -273,26 +201,43 @@ class BollMacdTrader:
                 "volume": [float(c["v"]) for c in candles],
             }
         except Exception as e:
-            logger.error(f"获取K线失败 {symbol}: {e}")
+            logger.error("获取K线失败 %s: %s", symbol, e)
             return None
     
-    def check_exit(self, symbol: str, current_price: float) -> tuple:
-        """检查止盈止损，返回(should_exit, exit_type, pnl_pct)"""
-        if symbol not in self.positions:
-            return False, None, 0
-        
+    def update_trailing_stop(self, symbol: str, current_price: float) -> bool:
+        """按 trail_atr 移动跟踪止损（只朝有利方向），返回是否移动"""
         pos = self.positions[symbol]
         p = SYMBOL_PARAMS.get(symbol, SYMBOL_PARAMS["BTC"])
         atr = pos.get("atr", current_price * 0.01)
         
-        # 更新跟踪止损
         if pos["type"] == "LONG":
             # 价格涨了，上移止损
             new_sl = max(pos["stop_loss"], current_price - p["trail_atr"] * atr)
             if new_sl > pos["stop_loss"]:
-                logger.info(f"{symbol} 跟踪止损上移: {pos['stop_loss']:.2f} -> {new_sl:.2f}")
+                logger.info("%s 跟踪止损上移: %.2f -> %.2f", symbol, pos["stop_loss"], new_sl)
                 pos["stop_loss"] = new_sl
-            
+                return True
+        else:
+            # 价格跌了，下移止损
+            new_sl = min(pos["stop_loss"], current_price + p["trail_atr"] * atr)
+            if new_sl < pos["stop_loss"]:
+                logger.info("%s 跟踪止损下移: %.2f -> %.2f", symbol, pos["stop_loss"], new_sl)
+                pos["stop_loss"] = new_sl
+                return True
+        return False
+
+    def check_exit(self, symbol: str, current_price: float) -> tuple:
+        """检查止盈止损，返回(should_exit, exit_type, pnl_pct)
+
+        只用于没有挂交易所止盈止损的旧持仓记录；bracket 持仓见 manage_bracket
+        """
+        if symbol not in self.positions:
+            return False, None, 0
+        
+        pos = self.positions[symbol]
+        self.update_trailing_stop(symbol, current_price)
+        
+        if pos["type"] == "LONG":
             # 检查止损
             if current_price <= pos["stop_loss"]:
                 pnl_pct = (current_price - pos["entry"]) / pos["entry"]
@@ -304,12 +249,6 @@ class BollMacdTrader:
                 return True, "TAKE_PROFIT", pnl_pct
         
         else:  # SHORT
-            # 价格跌了，下移止损
-            new_sl = min(pos["stop_loss"], current_price + p["trail_atr"] * atr)
-            if new_sl < pos["stop_loss"]:
-                logger.info(f"{symbol} 跟踪止损下移: {pos['stop_loss']:.2f} -> {new_sl:.2f}")
-                pos["stop_loss"] = new_sl
-            
             if current_price >= pos["stop_loss"]:
                 pnl_pct = (pos["entry"] - current_price) / pos["entry"]
                 return True, "STOP_LOSS", pnl_pct
@@ -324,8 +263,41 @@ class BollMacdTrader:
         last_time = self.last_trade_time.get(symbol, 0)
         return time.time() - last_time > CONFIG["trade_cooldown"]
     
-    def execute_exit(self, symbol: str, exit_type: str, pnl_pct: float):
-        """执行平仓"""
+    def manage_bracket(self, symbol: str, current_price: float) -> bool:
+        """bracket 持仓: 交易所已平仓就记账（返回 True），否则把移动后的跟踪止损同步到交易所"""
+        pos = self.positions[symbol]
+        exit_fill = self.execution.pop_exit(symbol)
+        if exit_fill:
+            sign = 1 if pos["type"] == "LONG" else -1
+            pnl_pct = sign * (exit_fill["price"] - pos["entry"]) / pos["entry"]
+            self._close_position(symbol, exit_fill["reason"], pnl_pct, exit_fill["price"], exit_fill["pnl"])
+            return True
+        
+        if self.update_trailing_stop(symbol, current_price):
+            try:
+                result = self.execution.move_stop(symbol, pos["type"] == "LONG", pos["size"], pos["stop_loss"])
+                logger.info("【移动止损】%s -> %.2f 结果: %s", symbol, pos["stop_loss"], result)
+            except Exception as e:
+                logger.error("移动止损失败 %s: %s", symbol, e)
+            return False
+        
+        # 没收到平仓成交但链上已经没有仓位（手动平仓等），开仓一轮之后才判断，避免入场单还没成交
+        if time.time() - pos["entry_time"] > CONFIG["check_interval"] and self.get_position(symbol)["size"] == 0:
+            # 入场单可能还挂着没成交，连同止盈止损一起撤掉，免得之后成交成没人管的仓位
+            try:
+                result = self.execution.cancel_bracket(symbol)
+                if result is not None:
+                    logger.info("【撤销挂单】%s bracket 残留订单 结果: %s", symbol, result)
+            except Exception as e:
+                logger.error("撤销 bracket 残留订单失败 %s: %s", symbol, e)
+                return False
+            self.execution.forget(symbol)
+            self._close_position(symbol, "CLOSED", 0.0, current_price, None)
+            return True
+        return False
+    
+    def execute_exit(self, symbol: str, exit_type: str, pnl_pct: float, current_price: float):
+        """执行平仓（旧持仓记录：机器人发 reduce-only 单）"""
         if symbol not in self.positions:
             return
         
@@ -337,19 +309,29 @@ class BollMacdTrader:
                 # 平掉当前仓位
                 is_buy = pos["type"] == "SHORT"  # 空头平仓用买单
                 size = abs(pos.get("size", 0))
-                if size > 0:
-                    current_price = signal["price"]
                 limit_price = current_price * 1.01 if is_buy else current_price * 0.99
-                limit_price = round(limit_price, 1)
+                limit_price = round_price(symbol, limit_price)
                 result = self.exchange.order(
                     symbol, is_buy, size, limit_price, {"limit": {"tif": "Gtc"}}, reduce_only=True
                 )
-                logger.info(f"【实盘平仓】{symbol} 结果: {result}")
+                logger.info("【实盘平仓】%s 结果: %s", symbol, result)
+                register_order("boll_macd", result, symbol)
             except Exception as e:
-                logger.error(f"平仓失败 {symbol}: {e}")
+                logger.error("平仓失败 %s: %s", symbol, e)
         
-        logger.info(f"【平仓】{symbol} {pos['type']} | 原因: {exit_type} | 盈亏: {pnl_pct*100:.2f}%")
+        self._close_position(symbol, exit_type, pnl_pct, current_price,
+                             pnl_pct * pos["entry"] * abs(pos.get("size", 0)))
+    
+    def _close_position(self, symbol: str, exit_type: str, pnl_pct: float, exit_price: float, pnl):
+        """平仓记账: 交易日志、持仓记录、状态板"""
+        pos = self.positions[symbol]
+        logger.info("【平仓】%s %s | 原因: %s | 盈亏: %.2f%%", symbol, pos["type"], exit_type, pnl_pct * 100)
+        record_trade("boll_macd", symbol, "CLOSE", pos.get("size", 0), exit_price, reason=exit_type,
+                     pnl=pnl, pnl_pct=pnl_pct, side=pos["type"], entry=pos["entry"])
         del self.positions[symbol]
+        save_state("boll_macd", positions=dict(self.positions))
+        record_position("boll_macd", symbol, None)
+        record_signal("boll_macd", symbol, "EXIT", f"{pos['type']} {exit_type} {pnl_pct*100:.2f}%")
     
     def execute_entry(self, symbol: str, signal: Dict):
         """执行开仓"""
@@ -357,10 +339,10 @@ class BollMacdTrader:
         action = signal["action"]
         
         if action == "LONG" and side_limit == "short_only":
-            logger.info(f"{symbol} 多头信号被过滤")
+            logger.info("%s 多头信号被过滤", symbol)
             return
         if action == "SHORT" and side_limit == "long_only":
-            logger.info(f"{symbol} 空头信号被过滤")
+            logger.info("%s 空头信号被过滤", symbol)
             return
         
         # 计算仓位大小 (使用账户余额的30%)
@@ -370,48 +352,37 @@ class BollMacdTrader:
                 position_value = 30.0  # 固定仓位
                 # 不查询余额，使用固定仓位
                 # position_value = 30.0 已设置
-                size = position_value / signal["price"]
+                size = round_size(symbol, position_value / signal["price"])
                 if size * signal["price"] < CONFIG["min_order_value"]:
-                    logger.warning(f"{symbol} 订单金额太小，跳过")
+                    logger.warning("%s 订单金额太小，跳过", symbol)
                     return
             except Exception as e:
-                logger.error(f"获取账户信息失败: {e}")
+                logger.error("获取账户信息失败: %s", e)
                 return
         
-        # 实盘开仓
+        # 实盘开仓: 入场单 + 止损 + 止盈一次提交（入场成交后止盈止损在交易所生效）
         if self.exchange and size > 0:
             try:
-                is_buy = action == "LONG"
-                current_price = signal["price"]
-                limit_price = current_price * 1.01 if is_buy else current_price * 0.99
-                limit_price = round(limit_price, 1)
-                result = self.exchange.order(
-                    symbol, is_buy, size, limit_price, {"limit": {"tif": "Gtc"}}
+                outcome = self.execution.submit_bracket(
+                    symbol, action == "LONG", size, signal["price"],
+                    stop_loss=signal["stop_loss"], take_profit=signal["take_profit"],
                 )
-                logger.info(f"【实盘开仓】{symbol} {action} 结果: {result}")
+                logger.info("【实盘开仓】%s %s 结果: %s", symbol, action, outcome["result"])
                 
-                # 检查订单是否真正成功
-                if result.get("status") != "ok":
-                    logger.error(f"开仓失败: {result}")
+                if not outcome["ok"]:
+                    logger.error("开仓失败: %s", outcome["error"])
                     return
                 
-                # 检查内部statuses是否有错误
-                statuses = result.get("response", {}).get("data", {}).get("statuses", [])
-                if statuses and len(statuses) > 0:
-                    if "error" in statuses[0]:
-                        logger.error(f"开仓被拒绝: {statuses[0]['error']}")
-                        return
-                    if "resting" not in statuses[0] and "filled" not in statuses[0]:
-                        logger.error(f"开仓异常: {statuses[0]}")
-                        return
-                
-                logger.info(f"【成功】{symbol} {action} 订单已提交")
+                limit_price = outcome["limit_price"]
+                logger.info("【成功】%s %s 订单已提交 (oid=%s，含止盈止损)", symbol, action, outcome["oid"])
+                record_trade("boll_macd", symbol, action, size, limit_price, reason=signal["reason"],
+                             stop_loss=signal["stop_loss"], take_profit=signal["take_profit"])
                 
             except Exception as e:
-                logger.error(f"开仓失败 {symbol}: {e}")
+                logger.error("开仓失败 %s: %s", symbol, e)
                 return
         else:
-            logger.warning(f"【模拟开仓】{symbol} {action}")
+            logger.warning("【模拟开仓】%s %s", symbol, action)
             return
         
         # 记录持仓
@@ -422,13 +393,95 @@ class BollMacdTrader:
             "atr": signal["atr"],
             "stop_loss": signal["stop_loss"],
             "take_profit": signal["take_profit"],
-            "entry_time": time.time()
+            "entry_time": time.time(),
+            "bracket": True,
         }
         
-        logger.info(f"【开仓】{symbol} {action} @ {signal['price']:.2f} | 数量: {size:.4f} | "
-                   f"止损: {signal['stop_loss']:.2f} | 止盈: {signal['take_profit']:.2f}")
+        logger.info("【开仓】%s %s @ %.2f | 数量: %.4f | 止损: %.2f | 止盈: %.2f",
+                    symbol, action, signal["price"], size, signal["stop_loss"], signal["take_profit"])
         self.last_trade_time[symbol] = time.time()
-        save_trade_times("boll_macd", self.last_trade_time)
+        save_state("boll_macd", last_trade_time=dict(self.last_trade_time), positions=dict(self.positions))
+    
+    def process_symbol(self, symbol: str):
+        """单个币种: 止盈止损检查 → 分析 → 开仓"""
+        with metrics.span("boll_macd", "klines", symbol):
+            klines = self.get_klines(symbol, CONFIG["timeframe"])
+        if not klines or len(klines["close"]) < 50:
+            logger.warning("%s 数据不足", symbol)
+            return
+        
+        current_price = klines["close"][-1]
+        
+        # 1. 先检查止盈止损（bracket 持仓由交易所触发，这里只同步跟踪止损和记账）
+        with metrics.span("boll_macd", "exit", symbol):
+            if symbol in self.positions and self.positions[symbol].get("bracket"):
+                if self.manage_bracket(symbol, current_price):
+                    return
+            elif symbol in self.positions:
+                should_exit, exit_type, pnl_pct = self.check_exit(symbol, current_price)
+                if should_exit:
+                    self.execute_exit(symbol, exit_type, pnl_pct, current_price)
+                    return
+        
+        # 2. 检查是否有持仓（内存 + 链上）
+        if symbol in self.positions:
+            logger.info("%s 持仓中: %s | 当前价: %.2f | 跟踪止损: %.2f",
+                        symbol, self.positions[symbol]["type"], current_price,
+                        self.positions[symbol]["stop_loss"])
+            return
+        
+        with metrics.span("boll_macd", "position", symbol):
+            pos = self.get_position(symbol)
+        record_position("boll_macd", symbol, pos["size"])
+        if pos["size"] != 0:
+            logger.info("%s 链上已有持仓(size=%s), 跳过开仓", symbol, pos["size"])
+            return
+        
+        # 3. 检查冷却
+        if not self.can_trade(symbol):
+            logger.info("%s 冷却中...", symbol)
+            return
+        
+        # 4. 分析信号
+        with metrics.span("boll_macd", "indicators", symbol):
+            signal = analyze_boll_macd(
+                symbol, klines["close"], klines["high"], klines["low"]
+            )
+        record_signal("boll_macd", symbol, signal["action"], signal["reason"])
+        
+        # 5. 执行开仓
+        if signal["action"] != "HOLD":
+            with metrics.span("boll_macd", "order", symbol):
+                self.execute_entry(symbol, signal)
+        else:
+            logger.info("%s %s: %s", symbol, signal["action"], signal["reason"])
+    
+    def prepare_cycle(self) -> bool:
+        """本轮开始: 没有成交推送时补查一次成交（识别交易所触发的止盈止损）"""
+        self.execution.poll_fills()
+        return True
+
+    def run_cycle(self):
+        """跑一轮全部币种（各币种并发执行，单币种超时不阻塞其它币种）"""
+        self.prepare_cycle()
+        try:
+            run_symbols("boll_macd", self.process_symbol, CONFIG["symbols"],
+                        CONFIG.get("symbol_timeout", SYMBOL_TIMEOUT), logger)
+        finally:
+            self.finish_cycle()
+
+    def finish_cycle(self):
+        """本轮结束: 保存K线快照和持仓记录（跟踪止损可能已移动）"""
+        save_kline_snapshot("boll_macd", self.klines)
+        # 超时的币种任务还在后台跑，可能增删持仓；只遍历一份快照
+        positions = dict(self.positions)
+        save_state("boll_macd", positions=positions)
+        latency = self.execution.latency_stats()
+        if latency and self.execution.latency_updated():
+            logger.info("下单延迟(ms): %s", latency)
+        record_execution("boll_macd", latency)
+        for symbol, p in positions.items():
+            record_position("boll_macd", symbol, {"type": p["type"], "entry": p["entry"], "stop_loss": p["stop_loss"]})
     
     def run(self):
         logger.info("=" * 50)
@@ -437,58 +490,23 @@ class BollMacdTrader:
         logger.info("目标: 回撤<5%, 稳健收益")
         logger.info("=" * 50)
         
-        while True:
-            try:
-                for symbol in CONFIG["symbols"]:
-                    klines = self.get_klines(symbol, CONFIG["timeframe"])
-                    if not klines or len(klines["close"]) < 50:
-                        logger.warning(f"{symbol} 数据不足")
-                        continue
-                    
-                    current_price = klines["close"][-1]
-                    
-                    # 1. 先检查止盈止损
-                    if symbol in self.positions:
-                        should_exit, exit_type, pnl_pct = self.check_exit(symbol, current_price)
-                        if should_exit:
-                            self.execute_exit(symbol, exit_type, pnl_pct)
-                            continue
-                    
-                    # 2. 检查是否有持仓（内存 + 链上）
-                    if symbol in self.positions:
-                        logger.info(f"{symbol} 持仓中: {self.positions[symbol]['type']} | "
-                                   f"当前价: {current_price:.2f} | 跟踪止损: {self.positions[symbol]['stop_loss']:.2f}")
-                        continue
-                    
-                    pos = self.get_position(symbol)
-                    if pos["size"] != 0:
-                        logger.info(f"{symbol} 链上已有持仓(size={pos['size']}), 跳过开仓")
-                        continue
-                    
-                    # 3. 检查冷却
-                    if not self.can_trade(symbol):
-                        logger.info(f"{symbol} 冷却中...")
-                        continue
+        try:
+            while True:
+                try:
+                    self.run_cycle()
                     
-                    # 4. 分析信号
-                    signal = analyze_boll_macd(
-                        symbol, klines["close"], klines["high"], klines["low"]
-                    )
+                    logger.info("Sleep %ss", CONFIG["check_interval"])
+                    time.sleep(CONFIG["check_interval"])
                     
-                    # 5. 执行开仓
-                    if signal["action"] != "HOLD":
-                        self.execute_entry(symbol, signal)
-                    else:
-                        logger.info(f"{symbol} {signal['action']}: {signal['reason']}")
-                
-                logger.info(f"Sleep {CONFIG['check_interval']}s")
-                time.sleep(CONFIG["check_interval"])
-                
-            except Exception as e:
-                logger.error(f"交易循环错误: {e}")
-                time.sleep(300)
+                except Exception as e:
+                    logger.error("交易循环错误: %s", e)
+                    time.sleep(300)
+        finally:
+            # 成交推送的 WebSocket 线程不是守护线程，不关掉进程退不出（pm2 重启会卡住）
+            close_fill_streams()
 
 
 if __name__ == "__main__":
     trader = BollMacdTrader()
+    report_startup(logger, "boll_macd")
     trader.run()
@@ -9,24 +9,20 @@
 """
 
 import json
-import logging
 import os
 import time
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import Dict, List, Tuple
 
-import requests
-from eth_account import Account
-from hyperliquid.exchange import Exchange
-from hyperliquid.info import Info
-from hyperliquid.utils import constants
+from bot_logging import setup_logger
+from hl_client import SharedExchange, create_exchange, create_info
+from kline_buffer import KlineBuffer
+import metrics
+import profiling
+from startup import report_startup
+from trade_journal import record_trade
 from trade_state import load_trade_times, save_trade_times
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-WORKSPACE_ROOT = PROJECT_ROOT.parent
-LOG_DIR = WORKSPACE_ROOT / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 CONFIG = {
     "main_wallet": "",
@@ -75,15 +71,7 @@ SYMBOL_PARAMS = {
     }
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trader_01_boll_macd_v2.log"),
-        logging.StreamHandler(),
-    ],
-)
-logger = logging.getLogger("BollMacdTraderV2")
+logger = setup_logger("BollMacdTraderV2", "trader_01_boll_macd_v2.log")
 
 
 def sma(values: List[float], period: int) -> List[float]:
@@ -324,7 +312,8 @@ def analyze_boll_macd_v2(symbol: str, closes: List[float], highs: List[float],
 
 class BollMacdTraderV2:
     def __init__(self):
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=True)
+        self.info = create_info()
+        self.klines = KlineBuffer(self.info)  # K线增量缓冲
         self.exchange = None
         self.last_trade_time = load_trade_times("boll_macd_v2")
         self.positions = {}
@@ -332,8 +321,7 @@ class BollMacdTraderV2:
         
     def _setup_exchange(self):
         if CONFIG["api_private_key"]:
-            account = Account.from_key(CONFIG["api_private_key"])
-            self.exchange = Exchange(account, constants.MAINNET_API_URL, account_address=CONFIG["main_wallet"])
+            self.exchange = SharedExchange(create_exchange(CONFIG["api_private_key"], CONFIG["main_wallet"]))
             
     def get_klines(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> Dict:
         """获取K线数据"""
@@ -342,7 +330,7 @@ class BollMacdTraderV2:
             end_time = int(datetime.now().timestamp() * 1000)
             start_time = end_time - (limit * 60 * 60 * 1000 if timeframe == "1h" else limit * 60 * 1000)
             
-            candles = self.info.candles_snapshot(symbol, timeframe, start_time, end_time)
+            candles = self.klines.get(symbol, timeframe, start_time, end_time)
             
             return {
                 "open": [float(c["o"]) for c in candles],
@@ -352,7 +340,7 @@ class BollMacdTraderV2:
                 "volume": [float(c["v"]) for c in candles],
             }
         except Exception as e:
-            logger.error(f"获取K线失败 {symbol}: {e}")
+            logger.error("获取K线失败 %s: %s", symbol, e)
             return None
     
     def get_position(self, symbol: str) -> Dict:
@@ -368,7 +356,7 @@ class BollMacdTraderV2:
                     }
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
         except Exception as e:
-            logger.error(f"获取持仓失败 {symbol}: {e}")
+            logger.error("获取持仓失败 %s: %s", symbol, e)
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
     
     def check_exit_conditions(self, symbol: str, current_price: float, signal: Dict) -> bool:
@@ -382,17 +370,17 @@ class BollMacdTraderV2:
         
         if pos["type"] == "LONG":
             if current_price <= stop_loss:
-                logger.info(f"{symbol} 触发止损: {current_price} <= {stop_loss}")
+                logger.info("%s 触发止损: %s <= %s", symbol, current_price, stop_loss)
                 return True
             if current_price >= take_profit:
-                logger.info(f"{symbol} 触发止盈: {current_price} >= {take_profit}")
+                logger.info("%s 触发止盈: %s >= %s", symbol, current_price, take_profit)
                 return True
         else:  # SHORT
             if current_price >= stop_loss:
-                logger.info(f"{symbol} 触发止损: {current_price} >= {stop_loss}")
+                logger.info("%s 触发止损: %s >= %s", symbol, current_price, stop_loss)
                 return True
             if current_price <= take_profit:
-                logger.info(f"{symbol} 触发止盈: {current_price} <= {take_profit}")
+                logger.info("%s 触发止盈: %s <= %s", symbol, current_price, take_profit)
                 return True
         
         return False
@@ -405,7 +393,7 @@ class BollMacdTraderV2:
     def execute_trade(self, symbol: str, signal: Dict):
         """执行交易"""
         if not self.exchange:
-            logger.warning(f"[模拟] {symbol} {signal['action']}: {signal['reason']}")
+            logger.warning("[模拟] %s %s: %s", symbol, signal["action"], signal["reason"])
             # 模拟持仓跟踪
             if signal['action'] != "HOLD":
                 self.positions[symbol] = {
@@ -417,19 +405,21 @@ class BollMacdTraderV2:
                 }
                 self.last_trade_time[symbol] = time.time()
                 save_trade_times("boll_macd_v2", self.last_trade_time)
+                record_trade("boll_macd_v2", symbol, signal['action'], price=signal['price'],
+                             status="simulated", reason=signal['reason'])
             return
             
         side_limit = CONFIG["trade_side_by_symbol"].get(symbol, CONFIG["trade_side"])
         
         action = signal["action"]
         if action == "LONG" and side_limit == "short_only":
-            logger.info(f"{symbol} 多头信号被过滤 (仅做空)")
+            logger.info("%s 多头信号被过滤 (仅做空)", symbol)
             return
         if action == "SHORT" and side_limit == "long_only":
-            logger.info(f"{symbol} 空头信号被过滤 (仅做多)")
+            logger.info("%s 空头信号被过滤 (仅做多)", symbol)
             return
             
-        logger.info(f"[下单] {symbol} {action}: {signal['reason']}")
+        logger.info("[下单] %s %s: %s", symbol, action, signal["reason"])
         
         # 记录持仓
         if action != "HOLD":
@@ -442,6 +432,55 @@ class BollMacdTraderV2:
             }
             self.last_trade_time[symbol] = time.time()
             save_trade_times("boll_macd_v2", self.last_trade_time)
+            record_trade("boll_macd_v2", symbol, action, price=signal['price'], status="signal",
+                         reason=signal['reason'])
+    
+    def process_symbol(self, symbol: str):
+        """单个币种: 拉K线 → 平仓检查 → 分析 → 下单"""
+        # 获取数据
+        with metrics.span("boll_macd_v2", "klines", symbol):
+            klines = self.get_klines(symbol, CONFIG["timeframe"])
+        if not klines or len(klines["close"]) < 50:
+            logger.warning("%s 数据不足，跳过", symbol)
+            return
+        
+        current_price = klines["close"][-1]
+        
+        # 检查是否需要平仓（内存中的持仓）
+        if self.check_exit_conditions(symbol, current_price, {}):
+            logger.info("%s 执行平仓", symbol)
+            if symbol in self.positions:
+                del self.positions[symbol]
+            return
+        
+        # 检查链上持仓
+        with metrics.span("boll_macd_v2", "position", symbol):
+            pos = self.get_position(symbol)
+        if pos["size"] != 0:
+            logger.info("%s 已有持仓(size=%s), 跳过开仓", symbol, pos["size"])
+            return
+        
+        # 分析信号
+        with metrics.span("boll_macd_v2", "indicators", symbol):
+            signal = analyze_boll_macd_v2(
+                symbol,
+                klines["close"], 
+                klines["high"], 
+                klines["low"],
+                klines["volume"]
+            )
+        
+        # 检查冷却
+        if not self.can_trade(symbol):
+            signal["action"] = "HOLD"
+            signal["reason"] += " (cooldown)"
+        
+        # 执行交易
+        if signal["action"] != "HOLD":
+            with metrics.span("boll_macd_v2", "order", symbol):
+                self.execute_trade(symbol, signal)
+        else:
+            logger.info("%s %s: %s", symbol, signal["action"], signal["reason"])
     
     def run(self):
         """主循环"""
@@ -449,59 +488,26 @@ class BollMacdTraderV2:
         logger.info("BOLL + MACD 共振交易机器人V2启动")
         logger.info("优化: MACD快周期14, 布林带15(ETH), ADX过滤, 成交量确认")
         logger.info("=" * 50)
+        metrics.serve(int(os.getenv("METRICS_PORT", "0")))
         
         while True:
             try:
+                metrics.begin_cycle("boll_macd_v2")
+                cycle_started = time.perf_counter()
                 for symbol in CONFIG["symbols"]:
-                    # 获取数据
-                    klines = self.get_klines(symbol, CONFIG["timeframe"])
-                    if not klines or len(klines["close"]) < 50:
-                        logger.warning(f"{symbol} 数据不足，跳过")
-                        continue
-                    
-                    current_price = klines["close"][-1]
-                    
-                    # 检查是否需要平仓（内存中的持仓）
-                    if self.check_exit_conditions(symbol, current_price, {}):
-                        logger.info(f"{symbol} 执行平仓")
-                        if symbol in self.positions:
-                            del self.positions[symbol]
-                        continue
-                    
-                    # 检查链上持仓
-                    pos = self.get_position(symbol)
-                    if pos["size"] != 0:
-                        logger.info(f"{symbol} 已有持仓(size={pos['size']}), 跳过开仓")
-                        continue
-                    
-                    # 分析信号
-                    signal = analyze_boll_macd_v2(
-                        symbol,
-                        klines["close"], 
-                        klines["high"], 
-                        klines["low"],
-                        klines["volume"]
-                    )
-                    
-                    # 检查冷却
-                    if not self.can_trade(symbol):
-                        signal["action"] = "HOLD"
-                        signal["reason"] += " (cooldown)"
-                    
-                    # 执行交易
-                    if signal["action"] != "HOLD":
-                        self.execute_trade(symbol, signal)
-                    else:
-                        logger.info(f"{symbol} {signal['action']}: {signal['reason']}")
+                    with metrics.span("boll_macd_v2", "symbol", symbol), profiling.section("cycle:boll_macd_v2"):
+                        self.process_symbol(symbol)
+                metrics.end_cycle("boll_macd_v2", time.perf_counter() - cycle_started)
                 
-                logger.info(f"Sleep {CONFIG['check_interval']}s")
+                logger.info("Sleep %ss", CONFIG["check_interval"])
                 time.sleep(CONFIG["check_interval"])
                 
             except Exception as e:
-                logger.error(f"交易循环错误: {e}")
+                logger.error("交易循环错误: %s", e)
                 time.sleep(300)
 
 
 if __name__ == "__main__":
     trader = BollMacdTraderV2()
+    report_startup(logger, "boll_macd_v2")
     trader.run()
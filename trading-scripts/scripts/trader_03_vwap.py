@@ -5,24 +5,23 @@
 """
 
 import json
-import logging
 import os
 import time
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import Dict, List
 
-import requests
-from eth_account import Account
-from hyperliquid.exchange import Exchange
-from hyperliquid.info import Info
-from hyperliquid.utils import constants
-from trade_state import load_trade_times, save_trade_times
+from bot_logging import setup_logger
+from symbol_runner import SYMBOL_TIMEOUT, run_symbols
+from hl_client import SharedExchange, create_exchange, create_info
+import indicator_graph
+from indicator_graph import node, sma_node
+from kline_buffer import KlineBuffer
+import metrics
+from startup import report_startup
+from status_board import record_position, record_signal
+from trade_journal import record_trade
+from trade_state import load_kline_snapshot, load_trade_times, save_kline_snapshot, save_trade_times
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-WORKSPACE_ROOT = PROJECT_ROOT.parent
-LOG_DIR = WORKSPACE_ROOT / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 CONFIG = {
     "main_wallet": "",
@@ -51,15 +50,7 @@ STRATEGY_PARAMS = {
     "min_volume_ratio": 1.2,  # 成交量需大于均量1.2倍
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trader_03_vwap.log"),
-        logging.StreamHandler(),
-    ],
-)
-logger = logging.getLogger("VwapTrader")
+logger = setup_logger("VwapTrader", "trader_03_vwap.log")
 
 
 def calculate_vwap(prices: List[float], volumes: List[float], period: int) -> List[float]:
@@ -76,29 +67,17 @@ def calculate_vwap(prices: List[float], volumes: List[float], period: int) -> Li
     return vwap
 
 
-def sma(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    out = []
-    running = 0.0
-    for idx, v in enumerate(values):
-        running += v
-        if idx >= period:
-            running -= values[idx - period]
-        count = period if idx >= period - 1 else (idx + 1)
-        out.append(running / count)
-    return out
-
-
 def analyze_vwap_breakout(closes: List[float], volumes: List[float]) -> Dict:
     """VWAP突破分析"""
     p = STRATEGY_PARAMS
     
+    src = indicator_graph.source(close=closes, volume=volumes)
+    
     # 计算VWAP
-    vwap = calculate_vwap(closes, volumes, p["vwap_period"])
+    vwap = src.get(node(calculate_vwap, ("close", "volume"), p["vwap_period"]))
     
     # 计算成交量均线
-    vol_sma = sma(volumes, p["vwap_period"])
+    vol_sma = src.get(sma_node("volume", p["vwap_period"]))
     
     if len(closes) < 2 or len(vwap) < 2:
         return {"action": "HOLD", "reason": "insufficient_data"}
@@ -146,16 +125,19 @@ def analyze_vwap_breakout(closes: List[float], volumes: List[float]) -> Dict:
 
 
 class VwapTrader:
-    def __init__(self):
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=True)
-        self.exchange = None
+    def __init__(self, info=None, exchange=None):
+        """info/exchange 可由多策略运行时注入共享实例，缺省时自行创建"""
+        self.info = info or create_info()
+        self.klines = KlineBuffer(self.info)  # K线增量缓冲
+        load_kline_snapshot("vwap", self.klines)
+        self.exchange = exchange
         self.last_trade_time = load_trade_times("vwap")
-        self._setup_exchange()
+        if self.exchange is None:
+            self._setup_exchange()
         
     def _setup_exchange(self):
         if CONFIG["api_private_key"]:
-            account = Account.from_key(CONFIG["api_private_key"])
-            self.exchange = Exchange(account, constants.MAINNET_API_URL, account_address=CONFIG["main_wallet"])
+            self.exchange = SharedExchange(create_exchange(CONFIG["api_private_key"], CONFIG["main_wallet"]))
             
     def get_klines(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> Dict:
         """获取K线数据"""
@@ -164,7 +146,7 @@ class VwapTrader:
             end_time = int(datetime.now().timestamp() * 1000)
             start_time = end_time - (limit * 60 * 60 * 1000 if timeframe == "1h" else limit * 60 * 1000)
             
-            candles = self.info.candles_snapshot(symbol, timeframe, start_time, end_time)
+            candles = self.klines.get(symbol, timeframe, start_time, end_time)
             
             return {
                 "open": [float(c["o"]) for c in candles],
@@ -174,7 +156,7 @@ class VwapTrader:
                 "volume": [float(c["v"]) for c in candles],
             }
         except Exception as e:
-            logger.error(f"获取K线失败 {symbol}: {e}")
+            logger.error("获取K线失败 %s: %s", symbol, e)
             return None
     
     def get_position(self, symbol: str) -> Dict:
@@ -190,7 +172,7 @@ class VwapTrader:
                     }
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
         except Exception as e:
-            logger.error(f"获取持仓失败 {symbol}: {e}")
+            logger.error("获取持仓失败 %s: %s", symbol, e)
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
     
     def can_trade(self, symbol: str) -> bool:
@@ -201,23 +183,67 @@ class VwapTrader:
     def execute_trade(self, symbol: str, signal: Dict):
         """执行交易"""
         if not self.exchange:
-            logger.warning(f"[模拟] {symbol} {signal['action']}: {signal['reason']}")
+            logger.warning("[模拟] %s %s: %s", symbol, signal["action"], signal["reason"])
             return
             
         side_limit = CONFIG["trade_side_by_symbol"].get(symbol, CONFIG["trade_side"])
         
         action = signal["action"]
         if action == "LONG" and side_limit == "short_only":
-            logger.info(f"{symbol} 多头信号被过滤 (仅做空)")
+            logger.info("%s 多头信号被过滤 (仅做空)", symbol)
             return
         if action == "SHORT" and side_limit == "long_only":
-            logger.info(f"{symbol} 空头信号被过滤 (仅做多)")
+            logger.info("%s 空头信号被过滤 (仅做多)", symbol)
             return
             
-        logger.info(f"[下单] {symbol} {action}: {signal['reason']}")
+        logger.info("[下单] %s %s: %s", symbol, action, signal["reason"])
+        record_trade("vwap", symbol, action, price=signal.get("price", 0.0), status="signal", reason=signal["reason"])
         self.last_trade_time[symbol] = time.time()
         save_trade_times("vwap", self.last_trade_time)
     
+    def process_symbol(self, symbol: str):
+        """单个币种: 拉K线 → 分析 → 下单"""
+        with metrics.span("vwap", "klines", symbol):
+            klines = self.get_klines(symbol, CONFIG["timeframe"])
+        if not klines or len(klines["close"]) < 50:
+            logger.warning("%s 数据不足，跳过", symbol)
+            return
+        
+        with metrics.span("vwap", "indicators", symbol):
+            signal = analyze_vwap_breakout(
+                klines["close"], 
+                klines["volume"]
+            )
+        
+        if not self.can_trade(symbol):
+            signal["action"] = "HOLD"
+            signal["reason"] += " (cooldown)"
+        record_signal("vwap", symbol, signal["action"], signal["reason"])
+        
+        if signal["action"] != "HOLD":
+            with metrics.span("vwap", "position", symbol):
+                pos = self.get_position(symbol)
+            record_position("vwap", symbol, pos["size"])
+            if pos["size"] != 0:
+                logger.info("%s 已有持仓(size=%s), 跳过开仓", symbol, pos["size"])
+                return
+            with metrics.span("vwap", "order", symbol):
+                self.execute_trade(symbol, signal)
+        else:
+            logger.info("%s %s: %s", symbol, signal["action"], signal["reason"])
+    
+    def run_cycle(self):
+        """跑一轮全部币种（各币种并发执行，单币种超时不阻塞其它币种）"""
+        try:
+            run_symbols("vwap", self.process_symbol, CONFIG["symbols"],
+                        CONFIG.get("symbol_timeout", SYMBOL_TIMEOUT), logger)
+        finally:
+            self.finish_cycle()
+
+    def finish_cycle(self):
+        """本轮结束: 保存K线快照，重启后只补拉缺口"""
+        save_kline_snapshot("vwap", self.klines)
+    
     def run(self):
         """主循环"""
         logger.info("=" * 50)
@@ -226,38 +252,17 @@ class VwapTrader:
         
         while True:
             try:
-                for symbol in CONFIG["symbols"]:
-                    klines = self.get_klines(symbol, CONFIG["timeframe"])
-                    if not klines or len(klines["close"]) < 50:
-                        logger.warning(f"{symbol} 数据不足，跳过")
-                        continue
-                    
-                    signal = analyze_vwap_breakout(
-                        klines["close"], 
-                        klines["volume"]
-                    )
-                    
-                    if not self.can_trade(symbol):
-                        signal["action"] = "HOLD"
-                        signal["reason"] += " (cooldown)"
-                    
-                    if signal["action"] != "HOLD":
-                        pos = self.get_position(symbol)
-                        if pos["size"] != 0:
-                            logger.info(f"{symbol} 已有持仓(size={pos['size']}), 跳过开仓")
-                            continue
-                        self.execute_trade(symbol, signal)
-                    else:
-                        logger.info(f"{symbol} {signal['action']}: {signal['reason']}")
+                self.run_cycle()
                 
-                logger.info(f"Sleep {CONFIG['check_interval']}s")
+                logger.info("Sleep %ss", CONFIG["check_interval"])
                 time.sleep(CONFIG["check_interval"])
                 
             except Exception as e:
-                logger.error(f"交易循环错误: {e}")
+                logger.error("交易循环错误: %s", e)
                 time.sleep(300)
 
 
 if __name__ == "__main__":
     trader = VwapTrader()
+    report_startup(logger, "vwap")
     trader.run()
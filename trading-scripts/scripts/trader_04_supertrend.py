@@ -5,24 +5,26 @@
 """
 
 import json
-import logging
 import os
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List
 
-import requests
-from eth_account import Account
-from hyperliquid.exchange import Exchange
-from hyperliquid.info import Info
-from hyperliquid.utils import constants
-from trade_state import load_trade_times, save_trade_times
+from bot_logging import setup_logger
+from symbol_runner import SYMBOL_TIMEOUT, run_symbols
+from asset_meta import round_price, round_size
+from fill_sync import register_order
+from hl_client import SharedExchange, create_exchange, create_info
+import indicator_graph
+from indicator_graph import node
+from kline_buffer import KlineBuffer
+import metrics
+from startup import report_startup
+from status_board import record_position, record_signal
+from trade_journal import record_trade
+from trade_state import load_kline_snapshot, load_trade_times, save_kline_snapshot, save_trade_times
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-WORKSPACE_ROOT = PROJECT_ROOT.parent
-LOG_DIR = WORKSPACE_ROOT / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 # 读取配置文件
 def load_config():
@@ -63,15 +65,7 @@ STRATEGY_PARAMS = {
     "atr_multiplier": 4.0,  # 优化：从3.0改为4.0，过滤假信号
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trader_04_supertrend.log"),
-        logging.StreamHandler(),
-    ],
-)
-logger = logging.getLogger("SuperTrendTrader")
+logger = setup_logger("SuperTrendTrader", "trader_04_supertrend.log")
 
 
 def calculate_atr(highs: List[float], lows: List[float], closes: List[float], period: int) -> List[float]:
@@ -159,8 +153,9 @@ def analyze_supertrend(highs: List[float], lows: List[float], closes: List[float
     """SuperTrend趋势跟随分析"""
     p = STRATEGY_PARAMS
     
-    supertrend, trend, upper_band, lower_band = calculate_supertrend(
-        highs, lows, closes, p["atr_period"], p["atr_multiplier"]
+    src = indicator_graph.source(close=closes, high=highs, low=lows)
+    supertrend, trend, upper_band, lower_band = src.get(
+        node(calculate_supertrend, ("high", "low", "close"), p["atr_period"], p["atr_multiplier"])
     )
     
     if len(closes) < 2:
@@ -194,16 +189,19 @@ def analyze_supertrend(highs: List[float], lows: List[float], closes: List[float
 
 
 class SuperTrendTrader:
-    def __init__(self):
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=True)
-        self.exchange = None
+    def __init__(self, info=None, exchange=None):
+        """info/exchange 可由多策略运行时注入共享实例，缺省时自行创建"""
+        self.info = info or create_info()
+        self.klines = KlineBuffer(self.info)  # K线增量缓冲
+        load_kline_snapshot("supertrend", self.klines)
+        self.exchange = exchange
         self.last_trade_time = load_trade_times("supertrend")
-        self._setup_exchange()
+        if self.exchange is None:
+            self._setup_exchange()
         
     def _setup_exchange(self):
         if CONFIG["api_private_key"]:
-            account = Account.from_key(CONFIG["api_private_key"])
-            self.exchange = Exchange(account, constants.MAINNET_API_URL, account_address=CONFIG["main_wallet"])
+            self.exchange = SharedExchange(create_exchange(CONFIG["api_private_key"], CONFIG["main_wallet"]))
             
     def get_klines(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> Dict:
         """获取K线数据"""
@@ -212,7 +210,7 @@ class SuperTrendTrader:
             end_time = int(datetime.now().timestamp() * 1000)
             start_time = end_time - (limit * 60 * 60 * 1000 if timeframe == "1h" else limit * 60 * 1000)
             
-            candles = self.info.candles_snapshot(symbol, timeframe, start_time, end_time)
+            candles = self.klines.get(symbol, timeframe, start_time, end_time)
             
             return {
                 "open": [float(c["o"]) for c in candles],
@@ -222,7 +220,7 @@ class SuperTrendTrader:
                 "volume": [float(c["v"]) for c in candles],
             }
         except Exception as e:
-            logger.error(f"获取K线失败 {symbol}: {e}")
+            logger.error("获取K线失败 %s: %s", symbol, e)
             return None
     
     def get_position(self, symbol: str) -> Dict:
@@ -238,7 +236,7 @@ class SuperTrendTrader:
                     }
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
         except Exception as e:
-            logger.error(f"获取持仓失败 {symbol}: {e}")
+            logger.error("获取持仓失败 %s: %s", symbol, e)
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
     
     def can_trade(self, symbol: str) -> bool:
@@ -252,10 +250,10 @@ class SuperTrendTrader:
         
         action = signal["action"]
         if action == "LONG" and side_limit == "short_only":
-            logger.info(f"{symbol} 多头信号被过滤 (仅做空)")
+            logger.info("%s 多头信号被过滤 (仅做空)", symbol)
             return
         if action == "SHORT" and side_limit == "long_only":
-            logger.info(f"{symbol} 空头信号被过滤 (仅做多)")
+            logger.info("%s 空头信号被过滤 (仅做多)", symbol)
             return
         
         # 实盘交易
@@ -265,48 +263,94 @@ class SuperTrendTrader:
                 position_value = 30.0  # 固定仓位
                 # 不查询余额，使用固定仓位
                 # position_value = 30.0 已设置
-                size = position_value / signal["price"]
+                size = round_size(symbol, position_value / signal["price"])
                 
                 if size * signal["price"] < CONFIG["min_order_value"]:
-                    logger.warning(f"{symbol} 订单金额太小，跳过")
+                    logger.warning("%s 订单金额太小，跳过", symbol)
                     return
                 
                 is_buy = action == "LONG"
                 current_price = signal["price"]
                 limit_price = current_price * 1.01 if is_buy else current_price * 0.99
-                limit_price = round(limit_price, 1)
+                limit_price = round_price(symbol, limit_price)
                 result = self.exchange.order(
                     symbol, is_buy, size, limit_price, {"limit": {"tif": "Gtc"}}
                 )
-                logger.info(f"【实盘】{symbol} {action} 结果: {result}")
+                logger.info("【实盘】%s %s 结果: %s", symbol, action, result)
                 
                 # 检查订单是否真正成功（不仅外层status，还要检查内部statuses）
                 if result.get("status") != "ok":
-                    logger.error(f"下单失败: {result}")
+                    logger.error("下单失败: %s", result)
                     return
                 
                 # 检查内部statuses是否有错误
                 statuses = result.get("response", {}).get("data", {}).get("statuses", [])
                 if statuses and len(statuses) > 0:
                     if "error" in statuses[0]:
-                        logger.error(f"下单被拒绝: {statuses[0]['error']}")
+                        logger.error("下单被拒绝: %s", statuses[0]["error"])
                         return
                     if "resting" not in statuses[0] and "filled" not in statuses[0]:
-                        logger.error(f"下单异常: {statuses[0]}")
+                        logger.error("下单异常: %s", statuses[0])
                         return
                 
-                logger.info(f"【成功】{symbol} {action} 订单已提交")
+                logger.info("【成功】%s %s 订单已提交", symbol, action)
+                record_trade("supertrend", symbol, action, size, limit_price, reason=signal["reason"])
+                register_order("supertrend", result, symbol)
                 
             except Exception as e:
-                logger.error(f"下单失败 {symbol}: {e}")
+                logger.error("下单失败 %s: %s", symbol, e)
                 return
         else:
-            logger.warning(f"【模拟】{symbol} {action}: {signal['reason']}")
+            logger.warning("【模拟】%s %s: %s", symbol, action, signal["reason"])
             return
         
         self.last_trade_time[symbol] = time.time()
         save_trade_times("supertrend", self.last_trade_time)
     
+    def process_symbol(self, symbol: str):
+        """单个币种: 拉K线 → 分析 → 下单"""
+        with metrics.span("supertrend", "klines", symbol):
+            klines = self.get_klines(symbol, CONFIG["timeframe"])
+        if not klines or len(klines["close"]) < 50:
+            logger.warning("%s 数据不足，跳过", symbol)
+            return
+        
+        with metrics.span("supertrend", "indicators", symbol):
+            signal = analyze_supertrend(
+                klines["high"],
+                klines["low"],
+                klines["close"]
+            )
+        
+        if not self.can_trade(symbol):
+            signal["action"] = "HOLD"
+            signal["reason"] += " (cooldown)"
+        record_signal("supertrend", symbol, signal["action"], signal["reason"])
+        
+        if signal["action"] != "HOLD":
+            with metrics.span("supertrend", "position", symbol):
+                pos = self.get_position(symbol)
+            record_position("supertrend", symbol, pos["size"])
+            if pos["size"] != 0:
+                logger.info("%s 已有持仓(size=%s), 跳过开仓", symbol, pos["size"])
+                return
+            with metrics.span("supertrend", "order", symbol):
+                self.execute_trade(symbol, signal)
+        else:
+            logger.info("%s %s: %s", symbol, signal["action"], signal["reason"])
+    
+    def run_cycle(self):
+        """跑一轮全部币种（各币种并发执行，单币种超时不阻塞其它币种）"""
+        try:
+            run_symbols("supertrend", self.process_symbol, CONFIG["symbols"],
+                        CONFIG.get("symbol_timeout", SYMBOL_TIMEOUT), logger)
+        finally:
+            self.finish_cycle()
+
+    def finish_cycle(self):
+        """本轮结束: 保存K线快照，重启后只补拉缺口"""
+        save_kline_snapshot("supertrend", self.klines)
+    
     def run(self):
         """主循环"""
         logger.info("=" * 50)
@@ -315,39 +359,17 @@ class SuperTrendTrader:
         
         while True:
             try:
-                for symbol in CONFIG["symbols"]:
-                    klines = self.get_klines(symbol, CONFIG["timeframe"])
-                    if not klines or len(klines["close"]) < 50:
-                        logger.warning(f"{symbol} 数据不足，跳过")
-                        continue
-                    
-                    signal = analyze_supertrend(
-                        klines["high"],
-                        klines["low"],
-                        klines["close"]
-                    )
-                    
-                    if not self.can_trade(symbol):
-                        signal["action"] = "HOLD"
-                        signal["reason"] += " (cooldown)"
-                    
-                    if signal["action"] != "HOLD":
-                        pos = self.get_position(symbol)
-                        if pos["size"] != 0:
-                            logger.info(f"{symbol} 已有持仓(size={pos['size']}), 跳过开仓")
-                            continue
-                        self.execute_trade(symbol, signal)
-                    else:
-                        logger.info(f"{symbol} {signal['action']}: {signal['reason']}")
+                self.run_cycle()
                 
-                logger.info(f"Sleep {CONFIG['check_interval']}s")
+                logger.info("Sleep %ss", CONFIG["check_interval"])
                 time.sleep(CONFIG["check_interval"])
                 
             except Exception as e:
-                logger.error(f"交易循环错误: {e}")
+                logger.error("交易循环错误: %s", e)
                 time.sleep(300)
 
 
 if __name__ == "__main__":
     trader = SuperTrendTrader()
+    report_startup(logger, "supertrend")
     trader.run()
@@ -5,24 +5,26 @@
 """
 
 import json
-import logging
 import os
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List
 
-import requests
-from eth_account import Account
-from hyperliquid.exchange import Exchange
-from hyperliquid.info import Info
-from hyperliquid.utils import constants
-from trade_state import load_trade_times, save_trade_times
+from bot_logging import setup_logger
+from symbol_runner import SYMBOL_TIMEOUT, run_symbols
+from asset_meta import round_size
+from execution import ExecutionEngine, close_fill_streams
+from hl_client import SharedExchange, create_exchange, create_info
+import indicator_graph
+from indicator_graph import ema_node, node
+from kline_buffer import KlineBuffer
+import metrics
+from startup import report_startup
+from status_board import record_execution, record_position, record_signal
+from trade_journal import record_trade
+from trade_state import load_kline_snapshot, load_trade_times, save_kline_snapshot, save_trade_times
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-WORKSPACE_ROOT = PROJECT_ROOT.parent
-LOG_DIR = WORKSPACE_ROOT / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 # 读取配置文件
 def load_config():
@@ -61,6 +63,10 @@ CONFIG = {
 STRATEGY_PARAMS = {
     "adx_strong_trend": 25,
     "adx_weak_trend": 20,
+    # 止损 / 止盈（ATR 倍数，与 backtest_adx.py 默认参数一致），随入场单一起挂到交易所
+    "atr_period": 14,
+    "stop_loss_atr": 2.5,
+    "take_profit_atr": 3.0,
 }
 
 COIN_PARAMS = {
@@ -68,15 +74,7 @@ COIN_PARAMS = {
     "ETH": {"ema_fast": 25, "ema_slow": 30, "cooldown": 14400},  # 4h冷却: 3月+34.41% 6月+44.46% 评分41.81
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trader_05_adx.log"),
-        logging.StreamHandler(),
-    ],
-)
-logger = logging.getLogger("AdxTrader")
+logger = setup_logger("AdxTrader", "trader_05_adx.log")
 
 
 def calculate_adx(highs: List[float], lows: List[float], closes: List[float], period: int):
@@ -165,14 +163,14 @@ def calculate_adx(highs: List[float], lows: List[float], closes: List[float], pe
     return adx, plus_di, minus_di
 
 
-def ema(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    mult = 2 / (period + 1)
-    out = [values[0]]
-    for price in values[1:]:
-        out.append(price * mult + out[-1] * (1 - mult))
-    return out
+def calculate_atr(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> float:
+    """最近一根的 ATR（简单平均真实波幅）"""
+    trs = [highs[0] - lows[0]] + [
+        max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1]))
+        for i in range(1, len(highs))
+    ]
+    recent = trs[-period:]
+    return sum(recent) / len(recent) if recent else 0.0
 
 
 def analyze_adx_trend(symbol: str, highs: List[float], lows: List[float], closes: List[float]) -> Dict:
@@ -181,10 +179,10 @@ def analyze_adx_trend(symbol: str, highs: List[float], lows: List[float], closes
     cp = COIN_PARAMS.get(symbol, {"ema_fast": 25, "ema_slow": 30})
     adx_period = 10
     
-    adx, plus_di, minus_di = calculate_adx(highs, lows, closes, adx_period)
+    src = indicator_graph.source(close=closes, high=highs, low=lows)
+    adx, plus_di, minus_di = src.get(node(calculate_adx, ("high", "low", "close"), adx_period))
     
-    ema_fast_vals = ema(closes, cp["ema_fast"])
-    ema_slow_vals = ema(closes, cp["ema_slow"])
+    ema_fast_vals, ema_slow_vals = src.get(ema_node("close", cp["ema_fast"]), ema_node("close", cp["ema_slow"]))
     
     if len(closes) < 30:
         return {"action": "HOLD", "reason": "insufficient_data"}
@@ -206,6 +204,9 @@ def analyze_adx_trend(symbol: str, highs: List[float], lows: List[float], closes
     long_signal = strong_trend and di_bullish and ema_bullish
     short_signal = strong_trend and di_bearish and ema_bearish
     
+    atr = calculate_atr(highs, lows, closes, p["atr_period"]) or price * 0.01
+    direction = 1 if long_signal else -1
+    
     return {
         "action": "LONG" if long_signal else "SHORT" if short_signal else "HOLD",
         "reason": f"ADX({current_adx:.1f},{'strong' if strong_trend else 'weak' if weak_trend else 'medium'}),"
@@ -219,20 +220,28 @@ def analyze_adx_trend(symbol: str, highs: List[float], lows: List[float], closes
         "weak_trend": weak_trend,
         "di_bullish": di_bullish,
         "di_bearish": di_bearish,
+        "atr": atr,
+        "stop_loss": price - direction * p["stop_loss_atr"] * atr,
+        "take_profit": price + direction * p["take_profit_atr"] * atr,
     }
 
 
 class AdxTrader:
-    def __init__(self):
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=True)
-        self.exchange = None
+    def __init__(self, info=None, exchange=None):
+        """info/exchange 可由多策略运行时注入共享实例，缺省时自行创建"""
+        self.info = info or create_info()
+        self.klines = KlineBuffer(self.info)  # K线增量缓冲
+        load_kline_snapshot("adx", self.klines)
+        self.exchange = exchange
         self.last_trade_time = load_trade_times("adx")
-        self._setup_exchange()
+        if self.exchange is None:
+            self._setup_exchange()
+        # 开仓和止盈止损一次提交，出场由交易所触发
+        self.execution = ExecutionEngine("adx", self.exchange, self.info, CONFIG["main_wallet"])
         
     def _setup_exchange(self):
         if CONFIG["api_private_key"]:
-            account = Account.from_key(CONFIG["api_private_key"])
-            self.exchange = Exchange(account, constants.MAINNET_API_URL, account_address=CONFIG["main_wallet"])
+            self.exchange = SharedExchange(create_exchange(CONFIG["api_private_key"], CONFIG["main_wallet"]))
             
     def get_klines(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> Dict:
         """获取K线数据"""
@@ -241,7 +250,7 @@ class AdxTrader:
             end_time = int(datetime.now().timestamp() * 1000)
             start_time = end_time - (limit * 60 * 60 * 1000 if timeframe == "1h" else limit * 60 * 1000)
             
-            candles = self.info.candles_snapshot(symbol, timeframe, start_time, end_time)
+            candles = self.klines.get(symbol, timeframe, start_time, end_time)
             
             return {
                 "open": [float(c["o"]) for c in candles],
@@ -251,7 +260,7 @@ class AdxTrader:
                 "volume": [float(c["v"]) for c in candles],
             }
         except Exception as e:
-            logger.error(f"获取K线失败 {symbol}: {e}")
+            logger.error("获取K线失败 %s: %s", symbol, e)
             return None
     
     def get_position(self, symbol: str) -> Dict:
@@ -267,7 +276,7 @@ class AdxTrader:
                     }
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
         except Exception as e:
-            logger.error(f"获取持仓失败 {symbol}: {e}")
+            logger.error("获取持仓失败 %s: %s", symbol, e)
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
     
     def can_trade(self, symbol: str) -> bool:
@@ -282,10 +291,10 @@ class AdxTrader:
         
         action = signal["action"]
         if action == "LONG" and side_limit == "short_only":
-            logger.info(f"{symbol} 多头信号被过滤 (仅做空)")
+            logger.info("%s 多头信号被过滤 (仅做空)", symbol)
             return
         if action == "SHORT" and side_limit == "long_only":
-            logger.info(f"{symbol} 空头信号被过滤 (仅做多)")
+            logger.info("%s 空头信号被过滤 (仅做多)", symbol)
             return
         
         if self.exchange:
@@ -293,99 +302,130 @@ class AdxTrader:
                 self.exchange.update_leverage(CONFIG["default_leverage"], symbol, is_cross=True)
                 position_value = 30.0
                 current_price = signal["price"]
-                # 计算数量并舍入到正确精度（BTC 5位，ETH 4位）
-                raw_size = position_value / current_price
-                sz_decimals = 5 if symbol == "BTC" else 4
-                size = float(f"{raw_size:.{sz_decimals}f}")
+                # 数量按该币种的 szDecimals 舍入
+                size = round_size(symbol, position_value / current_price)
                 
                 # 确保最小订单金额
                 if size * current_price < CONFIG["min_order_value"]:
-                    logger.warning(f"{symbol} 订单金额太小({size * current_price:.2f}<{CONFIG['min_order_value']}), 跳过")
+                    logger.warning("%s 订单金额太小(%.2f<%s), 跳过",
+                                   symbol, size * current_price, CONFIG["min_order_value"])
                     return
                 
-                is_buy = action == "LONG"
-                # 使用限价单，价格为当前价的1%偏离（确保快速成交）
-                limit_price = current_price * 1.01 if is_buy else current_price * 0.99
-                limit_price = float(f"{limit_price:.1f}")  # 保留1位小数
-                
-                logger.info(f"【准备下单】{symbol} {action} 数量:{size} 价格:{limit_price}")
+                logger.info("【准备下单】%s %s 数量:%s 止损:%.2f 止盈:%.2f",
+                            symbol, action, size, signal["stop_loss"], signal["take_profit"])
                 
-                result = self.exchange.order(
-                    symbol, is_buy, size, limit_price, {"limit": {"tif": "Gtc"}}
+                # 限价单偏离当前价 1%（确保快速成交），止损 / 止盈触发单同一个请求提交
+                outcome = self.execution.submit_bracket(
+                    symbol, action == "LONG", size, current_price,
+                    stop_loss=signal["stop_loss"], take_profit=signal["take_profit"],
                 )
-                logger.info(f"【实盘】{symbol} {action} 结果:{result}")
+                logger.info("【实盘】%s %s 结果:%s", symbol, action, outcome["result"])
                 
-                # 检查订单是否真正成功（不仅外层status，还要检查内部statuses）
-                if result.get("status") != "ok":
-                    logger.error(f"下单失败: {result}")
+                if not outcome["ok"]:
+                    logger.error("下单失败: %s", outcome["error"])
                     return
                 
-                # 检查内部statuses是否有错误
-                statuses = result.get("response", {}).get("data", {}).get("statuses", [])
-                if statuses and len(statuses) > 0:
-                    if "error" in statuses[0]:
-                        logger.error(f"下单被拒绝: {statuses[0]['error']}")
-                        return
-                    if "resting" not in statuses[0] and "filled" not in statuses[0]:
-                        logger.error(f"下单异常: {statuses[0]}")
-                        return
-                
-                logger.info(f"【成功】{symbol} {action} 订单已提交")
+                logger.info("【成功】%s %s 订单已提交 (oid=%s，含止盈止损)", symbol, action, outcome["oid"])
+                record_trade("adx", symbol, action, size, outcome["limit_price"], reason=signal["reason"],
+                             stop_loss=signal["stop_loss"], take_profit=signal["take_profit"])
                 
             except Exception as e:
-                logger.error(f"下单失败 {symbol}: {e}")
+                logger.error("下单失败 %s: %s", symbol, e)
                 import traceback
                 logger.error(traceback.format_exc())
                 return
         else:
-            logger.warning(f"【模拟】{symbol} {action}: {signal['reason']}")
+            logger.warning("【模拟】%s %s: %s", symbol, action, signal["reason"])
             return
         
         self.last_trade_time[symbol] = time.time()
         save_trade_times("adx", self.last_trade_time)
     
+    def process_symbol(self, symbol: str):
+        """单个币种: 记录交易所触发的出场 → 拉K线 → 分析 → 下单"""
+        exit_fill = self.execution.pop_exit(symbol)
+        if exit_fill:
+            logger.info("【平仓】%s %s @ %.2f | 盈亏: $%.2f",
+                        symbol, exit_fill["reason"], exit_fill["price"], exit_fill["pnl"])
+            record_trade("adx", symbol, "CLOSE", exit_fill["size"], exit_fill["price"],
+                         reason=exit_fill["reason"], pnl=exit_fill["pnl"], fee=exit_fill["fee"])
+        
+        with metrics.span("adx", "klines", symbol):
+            klines = self.get_klines(symbol, CONFIG["timeframe"])
+        if not klines or len(klines["close"]) < 50:
+            logger.warning("%s 数据不足，跳过", symbol)
+            return
+        
+        with metrics.span("adx", "indicators", symbol):
+            signal = analyze_adx_trend(
+                symbol,
+                klines["high"],
+                klines["low"],
+                klines["close"]
+            )
+        
+        if not self.can_trade(symbol):
+            signal["action"] = "HOLD"
+            signal["reason"] += " (cooldown)"
+        record_signal("adx", symbol, signal["action"], signal["reason"])
+        
+        if signal["action"] != "HOLD":
+            with metrics.span("adx", "position", symbol):
+                pos = self.get_position(symbol)
+            record_position("adx", symbol, pos["size"])
+            if pos["size"] != 0:
+                logger.info("%s 已有持仓(size=%s), 跳过开仓", symbol, pos["size"])
+                return
+            with metrics.span("adx", "order", symbol):
+                self.execute_trade(symbol, signal)
+        else:
+            logger.info("%s %s: %s", symbol, signal["action"], signal["reason"])
+    
+    def prepare_cycle(self) -> bool:
+        """本轮开始: 没有成交推送时补查一次成交（识别交易所触发的止盈止损）"""
+        self.execution.poll_fills()
+        return True
+
+    def run_cycle(self):
+        """跑一轮全部币种（各币种并发执行，单币种超时不阻塞其它币种）"""
+        self.prepare_cycle()
+        try:
+            run_symbols("adx", self.process_symbol, CONFIG["symbols"],
+                        CONFIG.get("symbol_timeout", SYMBOL_TIMEOUT), logger)
+        finally:
+            self.finish_cycle()
+
+    def finish_cycle(self):
+        """本轮结束: 保存K线快照（重启后只补拉缺口），发布下单延迟"""
+        save_kline_snapshot("adx", self.klines)
+        latency = self.execution.latency_stats()
+        if latency and self.execution.latency_updated():
+            logger.info("下单延迟(ms): %s", latency)
+        record_execution("adx", latency)
+    
     def run(self):
         """主循环"""
         logger.info("=" * 50)
         logger.info("ADX 趋势强度过滤交易机器人启动")
         logger.info("=" * 50)
         
-        while True:
-            try:
-                for symbol in CONFIG["symbols"]:
-                    klines = self.get_klines(symbol, CONFIG["timeframe"])
-                    if not klines or len(klines["close"]) < 50:
-                        logger.warning(f"{symbol} 数据不足，跳过")
-                        continue
-                    
-                    signal = analyze_adx_trend(
-                        symbol,
-                        klines["high"],
-                        klines["low"],
-                        klines["close"]
-                    )
+        try:
+            while True:
+                try:
+                    self.run_cycle()
                     
-                    if not self.can_trade(symbol):
-                        signal["action"] = "HOLD"
-                        signal["reason"] += " (cooldown)"
+                    logger.info("Sleep %ss", CONFIG["check_interval"])
+                    time.sleep(CONFIG["check_interval"])
                     
-                    if signal["action"] != "HOLD":
-                        pos = self.get_position(symbol)
-                        if pos["size"] != 0:
-                            logger.info(f"{symbol} 已有持仓(size={pos['size']}), 跳过开仓")
-                            continue
-                        self.execute_trade(symbol, signal)
-                    else:
-                        logger.info(f"{symbol} {signal['action']}: {signal['reason']}")
-                
-                logger.info(f"Sleep {CONFIG['check_interval']}s")
-                time.sleep(CONFIG["check_interval"])
-                
-            except Exception as e:
-                logger.error(f"交易循环错误: {e}")
-                time.sleep(300)
+                except Exception as e:
+                    logger.error("交易循环错误: %s", e)
+                    time.sleep(300)
+        finally:
+            # 成交推送的 WebSocket 线程不是守护线程，不关掉进程退不出（pm2 重启会卡住）
+            close_fill_streams()
 
 
 if __name__ == "__main__":
     trader = AdxTrader()
+    report_startup(logger, "adx")
     trader.run()
@@ -6,24 +6,23 @@
 """
 
 import json
-import logging
 import os
 import time
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import Dict, List, Tuple
 
-import requests
-from eth_account import Account
-from hyperliquid.exchange import Exchange
-from hyperliquid.info import Info
-from hyperliquid.utils import constants
-from trade_state import load_trade_times, save_trade_times
+from bot_logging import setup_logger
+from symbol_runner import SYMBOL_TIMEOUT, run_symbols
+from hl_client import SharedExchange, create_exchange, create_info
+import indicator_graph
+from indicator_graph import bollinger_nodes
+from kline_buffer import KlineBuffer
+import metrics
+from startup import report_startup
+from status_board import record_position, record_signal
+from trade_journal import record_trade
+from trade_state import load_kline_snapshot, load_trade_times, save_kline_snapshot, save_trade_times
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-WORKSPACE_ROOT = PROJECT_ROOT.parent
-LOG_DIR = WORKSPACE_ROOT / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 CONFIG = {
     "main_wallet": "",
@@ -54,50 +53,7 @@ STRATEGY_PARAMS = {
     "min_bandwidth_pct": 0.01,  # 最小带宽1%，太窄不交易
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trader_06_bb_mean_reversion.log"),
-        logging.StreamHandler(),
-    ],
-)
-logger = logging.getLogger("BbMeanReversionTrader")
-
-
-def sma(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    out = []
-    running = 0.0
-    for idx, v in enumerate(values):
-        running += v
-        if idx >= period:
-            running -= values[idx - period]
-        count = period if idx >= period - 1 else (idx + 1)
-        out.append(running / count)
-    return out
-
-
-def rolling_std(values: List[float], period: int) -> List[float]:
-    if not values:
-        return []
-    out = []
-    for idx in range(len(values)):
-        start = max(0, idx - period + 1)
-        window = values[start:idx+1]
-        mean = sum(window) / len(window)
-        variance = sum((x - mean) ** 2 for x in window) / len(window)
-        out.append(variance ** 0.5)
-    return out
-
-
-def bollinger_bands(values: List[float], period: int, std_mult: float):
-    mid = sma(values, period)
-    std = rolling_std(values, period)
-    upper = [m + std_mult * s for m, s in zip(mid, std)]
-    lower = [m - std_mult * s for m, s in zip(mid, std)]
-    return mid, upper, lower
+logger = setup_logger("BbMeanReversionTrader", "trader_06_bb_mean_reversion.log")
 
 
 def adx_filter(highs: List[float], lows: List[float], closes: List[float]) -> float:
@@ -129,7 +85,9 @@ def analyze_bb_mean_reversion(closes: List[float], highs: List[float], lows: Lis
     p = STRATEGY_PARAMS
     
     # 计算布林带
-    bb_mid, bb_upper, bb_lower = bollinger_bands(closes, p["bb_period"], p["bb_stddev"])
+    bb_mid, bb_upper, bb_lower = indicator_graph.source(close=closes).get(
+        *bollinger_nodes("close", p["bb_period"], p["bb_stddev"])
+    )
     
     if len(closes) < p["bb_period"]:
         return {"action": "HOLD", "reason": "insufficient_data"}
@@ -191,16 +149,19 @@ def analyze_bb_mean_reversion(closes: List[float], highs: List[float], lows: Lis
 
 
 class BbMeanReversionTrader:
-    def __init__(self):
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=True)
-        self.exchange = None
+    def __init__(self, info=None, exchange=None):
+        """info/exchange 可由多策略运行时注入共享实例，缺省时自行创建"""
+        self.info = info or create_info()
+        self.klines = KlineBuffer(self.info)  # K线增量缓冲
+        load_kline_snapshot("bb_mean_reversion", self.klines)
+        self.exchange = exchange
         self.last_trade_time = load_trade_times("bb_mean_reversion")
-        self._setup_exchange()
+        if self.exchange is None:
+            self._setup_exchange()
         
     def _setup_exchange(self):
         if CONFIG["api_private_key"]:
-            account = Account.from_key(CONFIG["api_private_key"])
-            self.exchange = Exchange(account, constants.MAINNET_API_URL, account_address=CONFIG["main_wallet"])
+            self.exchange = SharedExchange(create_exchange(CONFIG["api_private_key"], CONFIG["main_wallet"]))
             
     def get_klines(self, symbol: str, timeframe: str = "1h", limit: int = 100) -> Dict:
         """获取K线数据"""
@@ -209,7 +170,7 @@ class BbMeanReversionTrader:
             end_time = int(datetime.now().timestamp() * 1000)
             start_time = end_time - (limit * 60 * 60 * 1000 if timeframe == "1h" else limit * 60 * 1000)
             
-            candles = self.info.candles_snapshot(symbol, timeframe, start_time, end_time)
+            candles = self.klines.get(symbol, timeframe, start_time, end_time)
             
             return {
                 "open": [float(c["o"]) for c in candles],
@@ -219,7 +180,7 @@ class BbMeanReversionTrader:
                 "volume": [float(c["v"]) for c in candles],
             }
         except Exception as e:
-            logger.error(f"获取K线失败 {symbol}: {e}")
+            logger.error("获取K线失败 %s: %s", symbol, e)
             return None
     
     def get_position(self, symbol: str) -> Dict:
@@ -235,7 +196,7 @@ class BbMeanReversionTrader:
                     }
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
         except Exception as e:
-            logger.error(f"获取持仓失败 {symbol}: {e}")
+            logger.error("获取持仓失败 %s: %s", symbol, e)
             return {"size": 0, "entry_price": 0, "unrealized_pnl": 0}
     
     def can_trade(self, symbol: str) -> bool:
@@ -246,28 +207,73 @@ class BbMeanReversionTrader:
     def execute_trade(self, symbol: str, signal: Dict):
         """执行交易"""
         if not self.exchange:
-            logger.warning(f"[模拟] {symbol} {signal['action']}: {signal['reason']}")
+            logger.warning("[模拟] %s %s: %s", symbol, signal["action"], signal["reason"])
             return
             
         side_limit = CONFIG["trade_side_by_symbol"].get(symbol, CONFIG["trade_side"])
         
         action = signal["action"]
         if action == "LONG" and side_limit == "short_only":
-            logger.info(f"{symbol} 多头信号被过滤 (仅做空)")
+            logger.info("%s 多头信号被过滤 (仅做空)", symbol)
             return
         if action == "SHORT" and side_limit == "long_only":
-            logger.info(f"{symbol} 空头信号被过滤 (仅做多)")
+            logger.info("%s 空头信号被过滤 (仅做多)", symbol)
             return
             
         # 检查是否在震荡市
         if not signal.get("is_ranging", False):
-            logger.info(f"{symbol} 非震荡市，不执行均值回归交易")
+            logger.info("%s 非震荡市，不执行均值回归交易", symbol)
             return
             
-        logger.info(f"[下单] {symbol} {action}: {signal['reason']}")
+        logger.info("[下单] %s %s: %s", symbol, action, signal["reason"])
+        record_trade("bb_mean_reversion", symbol, action, price=signal.get("price", 0.0), status="signal", reason=signal["reason"])
         self.last_trade_time[symbol] = time.time()
         save_trade_times("bb_mean_reversion", self.last_trade_time)
     
+    def process_symbol(self, symbol: str):
+        """单个币种: 拉K线 → 分析 → 下单"""
+        with metrics.span("bb_mean_reversion", "klines", symbol):
+            klines = self.get_klines(symbol, CONFIG["timeframe"])
+        if not klines or len(klines["close"]) < 50:
+            logger.warning("%s 数据不足，跳过", symbol)
+            return
+        
+        with metrics.span("bb_mean_reversion", "indicators", symbol):
+            signal = analyze_bb_mean_reversion(
+                klines["close"],
+                klines["high"],
+                klines["low"]
+            )
+        
+        if not self.can_trade(symbol):
+            signal["action"] = "HOLD"
+            signal["reason"] += " (cooldown)"
+        record_signal("bb_mean_reversion", symbol, signal["action"], signal["reason"])
+        
+        if signal["action"] != "HOLD":
+            with metrics.span("bb_mean_reversion", "position", symbol):
+                pos = self.get_position(symbol)
+            record_position("bb_mean_reversion", symbol, pos["size"])
+            if pos["size"] != 0:
+                logger.info("%s 已有持仓(size=%s), 跳过开仓", symbol, pos["size"])
+                return
+            with metrics.span("bb_mean_reversion", "order", symbol):
+                self.execute_trade(symbol, signal)
+        else:
+            logger.info("%s %s: %s", symbol, signal["action"], signal["reason"])
+    
+    def run_cycle(self):
+        """跑一轮全部币种（各币种并发执行，单币种超时不阻塞其它币种）"""
+        try:
+            run_symbols("bb_mean_reversion", self.process_symbol, CONFIG["symbols"],
+                        CONFIG.get("symbol_timeout", SYMBOL_TIMEOUT), logger)
+        finally:
+            self.finish_cycle()
+
+    def finish_cycle(self):
+        """本轮结束: 保存K线快照，重启后只补拉缺口"""
+        save_kline_snapshot("bb_mean_reversion", self.klines)
+    
     def run(self):
         """主循环"""
         logger.info("=" * 50)
@@ -277,39 +283,17 @@ class BbMeanReversionTrader:
         
         while True:
             try:
-                for symbol in CONFIG["symbols"]:
-                    klines = self.get_klines(symbol, CONFIG["timeframe"])
-                    if not klines or len(klines["close"]) < 50:
-                        logger.warning(f"{symbol} 数据不足，跳过")
-                        continue
-                    
-                    signal = analyze_bb_mean_reversion(
-                        klines["close"],
-                        klines["high"],
-                        klines["low"]
-                    )
-                    
-                    if not self.can_trade(symbol):
-                        signal["action"] = "HOLD"
-                        signal["reason"] += " (cooldown)"
-                    
-                    if signal["action"] != "HOLD":
-                        pos = self.get_position(symbol)
-                        if pos["size"] != 0:
-                            logger.info(f"{symbol} 已有持仓(size={pos['size']}), 跳过开仓")
-                            continue
-                        self.execute_trade(symbol, signal)
-                    else:
-                        logger.info(f"{symbol} {signal['action']}: {signal['reason']}")
+                self.run_cycle()
                 
-                logger.info(f"Sleep {CONFIG['check_interval']}s")
+                logger.info("Sleep %ss", CONFIG["check_interval"])
                 time.sleep(CONFIG["check_interval"])
                 
             except Exception as e:
-                logger.error(f"交易循环错误: {e}")
+                logger.error("交易循环错误: %s", e)
                 time.sleep(300)
 
 
 if __name__ == "__main__":
     trader = BbMeanReversionTrader()
+    report_startup(logger, "bb_mean_reversion")
     trader.run()
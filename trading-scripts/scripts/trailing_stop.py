@@ -7,51 +7,74 @@ Lucky's Trailing Stop Manager
 - 激活条件：涨 3%+ 后启动
 - 最低保护：止损不低于入场价（保本线）
 - 只上不下：价格回调时止损不动
+
+运行方式：
+- python trailing_stop.py            # 检查一次（cron）
+- python trailing_stop.py --serve    # 常驻服务，每 TICK_INTERVAL 秒检查一次
+
+每次检查先取一份快照（持仓 / 挂单 / 中间价，共 3 个请求），所有持仓都基于这份快照计算；
+只有需要挪动止损时才下单（已有止损单时用改单，一个请求原子完成），并指数退避轮询确认新止损单。
 """
 
+import argparse
 import json
 import sys
-import os
+import time
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, List, Optional
 
 # 添加脚本目录到 path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from hl_trade import (
-    get_market_price, 
-    get_account_info, 
-    get_open_orders,
-    get_open_orders_detailed,
     place_stop_loss,
-    cancel_order,
+    modify_stop_loss,
     MAIN_WALLET
 )
+from hl_client import create_info
+from fill_sync import order_oid
+import trade_state
 
 # 配置
 INITIAL_STOP_PCT = 0.035     # 3.5% 初始止损（入场后立即设置）
 TRAILING_PCT = 0.05          # 5% trailing（激活后跟随最高价的 95%）
 ACTIVATION_PCT = 0.03        # 3% 涨幅后激活移动止损
-STATE_FILE = Path(__file__).parent.parent / "memory/trading/trailing_state.json"
+TICK_INTERVAL = 30           # 常驻模式检查间隔（秒）
+# 新止损单确认：首次 0.25 秒后查询，每次翻倍，最多等 8 秒
+CONFIRM_FIRST_DELAY = 0.25
+CONFIRM_MAX_WAIT = 8.0
+# orderStatus 里表示止损单已生效的状态（triggered / filled 说明已经触发过）
+CONFIRMED_STATUSES = ("open", "triggered", "filled")
+# 高水位等状态存在共享的状态库里（trade_state，策略名 trailing）
+STATE_NAME = "trailing"
+LEGACY_STATE_FILE = Path(__file__).parent.parent / "memory/trading/trailing_state.json"
 
 def load_state():
     """加载持仓状态"""
-    if STATE_FILE.exists():
-        with open(STATE_FILE) as f:
-            return json.load(f)
-    return {}
+    if LEGACY_STATE_FILE.exists():
+        # 旧版本的 trailing_state.json 是 {coin: {...}}，导入一次
+        with open(LEGACY_STATE_FILE) as f:
+            trade_state.save_state(STATE_NAME, positions=json.load(f))
+        LEGACY_STATE_FILE.rename(LEGACY_STATE_FILE.with_suffix(".json.migrated"))
+    return trade_state.load_state(STATE_NAME).get("positions", {})
 
 def save_state(state):
-    """保存持仓状态"""
-    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
+    """保存持仓状态（单个事务，崩溃不会写坏）"""
+    trade_state.save_state(STATE_NAME, positions=state)
 
-def get_positions():
-    """获取当前持仓"""
-    info = get_account_info()
+def take_snapshot(info) -> Dict:
+    """一次取齐本轮需要的数据：持仓、挂单（含触发单详情）、全部中间价"""
+    user_state = info.user_state(MAIN_WALLET)
+    return {
+        "positions": parse_positions(user_state.get("assetPositions", [])),
+        "orders": info.frontend_open_orders(MAIN_WALLET),
+        "mids": {coin: float(px) for coin, px in info.all_mids().items()},
+    }
+
+def parse_positions(asset_positions: List[Dict]) -> List[Dict]:
     positions = []
-    for pos in info.get("positions", []):
+    for pos in asset_positions:
         p = pos.get("position", {})
         if float(p.get("szi", 0)) != 0:
             positions.append({
@@ -63,111 +86,152 @@ def get_positions():
             })
     return positions
 
-def get_current_stop_order(coin: str, is_long: bool):
-    """获取当前止损触发单（只匹配真正的 trigger order，不匹配 limit order）"""
-    orders = get_open_orders_detailed()
-    
+def get_positions():
+    """获取当前持仓"""
+    return parse_positions(create_info().user_state(MAIN_WALLET).get("assetPositions", []))
+
+def get_current_stop_order(coin: str, is_long: bool, orders: Optional[List[Dict]] = None):
+    """获取当前止损触发单（只匹配真正的 trigger order，不匹配 limit order）
+
+    orders: 快照里的挂单列表；不传时现查一次
+    """
+    if orders is None:
+        orders = create_info().frontend_open_orders(MAIN_WALLET)
+
     for order in orders:
         # 必须是指定币种
         if order.get("coin") != coin:
             continue
-        
+
         # 必须是 trigger order（止损/止盈触发单）
         if not order.get("isTrigger"):
             continue
-            
+
         # 必须是 reduce only（平仓单）
         if not order.get("reduceOnly"):
             continue
-        
-        trigger_price = float(order.get("triggerPx", 0))
-        side = order.get("side")
-        order_type = order.get("orderType", "")
-        
+
         # 多头止损：触发卖单 (side=A)
         # 空头止损：触发买单 (side=B)
-        if is_long and side == "A":
-            return {
-                "oid": order.get("oid"),
-                "trigger_price": trigger_price,
-                "order_type": order_type,
-                "is_trigger": True
-            }
-        elif not is_long and side == "B":
+        if order.get("side") == ("A" if is_long else "B"):
             return {
                 "oid": order.get("oid"),
-                "trigger_price": trigger_price,
-                "order_type": order_type,
+                "trigger_price": float(order.get("triggerPx", 0)),
+                "order_type": order.get("orderType", ""),
                 "is_trigger": True
             }
-    
+
+    return None
+
+def _stop_at(info, coin: str, is_long: bool, new_stop: float) -> Optional[float]:
+    """挂单里是否已有触发价等于 new_stop 的止损单"""
+    stop = get_current_stop_order(coin, is_long, info.frontend_open_orders(MAIN_WALLET))
+    if stop and abs(stop["trigger_price"] - new_stop) <= new_stop * 1e-4:
+        return stop["trigger_price"]
+    return None
+
+def confirm_stop_order(info, result: Dict, coin: str, is_long: bool, new_stop: float) -> Optional[float]:
+    """确认新止损单已生效，返回触发价；被拒绝或超时返回 None
+
+    下单返回里带 error 直接判失败；有 oid 时查 orderStatus，否则（改单的返回可能不带 oid）查挂单；
+    间隔 0.25s、0.5s、1s… 直到 CONFIRM_MAX_WAIT
+    """
+    if not isinstance(result, dict) or result.get("status") != "ok":
+        return None
+    response = result.get("response")
+    statuses = response.get("data", {}).get("statuses", []) if isinstance(response, dict) else []
+    for status in statuses:
+        if isinstance(status, dict) and "error" in status:
+            print(f"   ❌ Order rejected: {status['error']}")
+            return None
+    oid = order_oid(result)
+
+    delay, waited = CONFIRM_FIRST_DELAY, 0.0
+    while waited < CONFIRM_MAX_WAIT:
+        time.sleep(delay)
+        waited += delay
+        if oid is None:
+            try:
+                price = _stop_at(info, coin, is_long, new_stop)
+            except Exception as e:
+                print(f"   ⚠️ Open orders query failed: {e}")
+                price = None
+            if price is not None:
+                return price
+            delay = min(delay * 2, CONFIRM_MAX_WAIT - waited)
+            continue
+        try:
+            reply = info.query_order_by_oid(MAIN_WALLET, oid)
+        except Exception as e:
+            print(f"   ⚠️ Order status query failed: {e}")
+            reply = {}
+        if reply.get("status") == "order":
+            order_status = reply["order"].get("status")
+            if order_status in CONFIRMED_STATUSES:
+                return float(reply["order"].get("order", {}).get("triggerPx", new_stop))
+            print(f"   ❌ Stop order {oid} {order_status}")
+            return None
+        # unknownOid：还没上链，继续等
+        delay = min(delay * 2, CONFIRM_MAX_WAIT - waited)
     return None
 
-def check_and_update_trailing_stop(coin: str, position: dict, state: dict):
-    """检查并更新移动止损"""
-    
+def calculate_stop(position: dict, current_price: float, pos_state: dict):
+    """更新高水位和激活状态（写回 pos_state），返回 (new_stop, gain_pct)"""
     entry_price = position["entry_price"]
-    current_price = get_market_price(coin)
-    size = position["size"]
     is_long = position["is_long"]
-    
-    # 获取或初始化状态
-    pos_state = state.get(coin, {
-        "entry_price": entry_price,
-        "high_water_mark": entry_price,
-        "trailing_active": False,
-        "last_stop_price": None
-    })
-    
     high_water_mark = pos_state.get("high_water_mark", entry_price)
-    trailing_active = pos_state.get("trailing_active", False)
-    
+
     # 更新最高价（多头）或最低价（空头）
     if is_long:
-        if current_price > high_water_mark:
-            high_water_mark = current_price
-            pos_state["high_water_mark"] = high_water_mark
-    else:
-        if current_price < high_water_mark:
-            high_water_mark = current_price
-            pos_state["high_water_mark"] = high_water_mark
-    
-    # 计算涨幅
-    if is_long:
+        high_water_mark = max(high_water_mark, current_price)
         gain_pct = (high_water_mark - entry_price) / entry_price
     else:
+        high_water_mark = min(high_water_mark, current_price)
         gain_pct = (entry_price - high_water_mark) / entry_price
-    
+    pos_state["high_water_mark"] = high_water_mark
+
     # 检查是否激活
-    if gain_pct >= ACTIVATION_PCT and not trailing_active:
-        trailing_active = True
+    if gain_pct >= ACTIVATION_PCT and not pos_state.get("trailing_active"):
         pos_state["trailing_active"] = True
-        print(f"🔔 Trailing stop ACTIVATED for {coin}! Gain: {gain_pct*100:.1f}%")
-    
+        print(f"🔔 Trailing stop ACTIVATED for {position['coin']}! Gain: {gain_pct*100:.1f}%")
+
     # 计算止损位
     # 1) 未激活时：初始止损 = 入场价 * (1 - INITIAL_STOP_PCT)
     # 2) 激活后：移动止损 = 最高价 * (1 - TRAILING_PCT)，但不低于入场价
     if is_long:
-        initial_stop = entry_price * (1 - INITIAL_STOP_PCT)
-        if trailing_active:
-            trailing_stop = high_water_mark * (1 - TRAILING_PCT)
+        if pos_state.get("trailing_active"):
             # 移动止损不低于入场价（保本线）
-            new_stop = max(trailing_stop, entry_price)
-        else:
-            new_stop = initial_stop
-    else:
-        initial_stop = entry_price * (1 + INITIAL_STOP_PCT)
-        if trailing_active:
-            trailing_stop = high_water_mark * (1 + TRAILING_PCT)
-            # 移动止损不高于入场价（保本线）
-            new_stop = min(trailing_stop, entry_price)
-        else:
-            new_stop = initial_stop
-    
+            return max(high_water_mark * (1 - TRAILING_PCT), entry_price), gain_pct
+        return entry_price * (1 - INITIAL_STOP_PCT), gain_pct
+    if pos_state.get("trailing_active"):
+        # 移动止损不高于入场价（保本线）
+        return min(high_water_mark * (1 + TRAILING_PCT), entry_price), gain_pct
+    return entry_price * (1 + INITIAL_STOP_PCT), gain_pct
+
+def check_and_update_trailing_stop(info, position: dict, snapshot: Dict, state: dict):
+    """基于快照检查并更新一个持仓的移动止损"""
+    coin = position["coin"]
+    is_long = position["is_long"]
+    current_price = snapshot["mids"].get(coin, 0.0)
+
+    # 获取或初始化状态；入场价变了说明是新仓位，高水位重新开始
+    pos_state = state.get(coin)
+    if not pos_state or pos_state.get("entry_price") != position["entry_price"]:
+        pos_state = {
+            "entry_price": position["entry_price"],
+            "high_water_mark": position["entry_price"],
+            "trailing_active": False,
+            "last_stop_price": None
+        }
+        state[coin] = pos_state
+
+    new_stop, gain_pct = calculate_stop(position, current_price, pos_state)
+    trailing_active = pos_state["trailing_active"]
+
     # 获取当前止损单
-    current_stop = get_current_stop_order(coin, is_long)
+    current_stop = get_current_stop_order(coin, is_long, snapshot["orders"])
     current_stop_price = current_stop["trigger_price"] if current_stop else None
-    
+
     # 判断是否需要更新止损
     should_update = False
     if current_stop_price is None:
@@ -181,126 +245,161 @@ def check_and_update_trailing_stop(coin: str, position: dict, state: dict):
         elif not is_long and new_stop < current_stop_price:
             should_update = True
     # 未激活时，已有止损单就不动
-    
-    if should_update:
-        # 取消旧止损单
-        if current_stop:
-            print(f"❌ Canceling old stop @ ${current_stop_price:,.2f}")
-            cancel_result = cancel_order(coin, current_stop["oid"])
-            print(f"   Cancel result: {cancel_result}")
-        
-        # 下新止损单
-        print(f"✅ Setting new stop @ ${new_stop:,.2f}")
-        result = place_stop_loss(coin, size, new_stop, is_long)
-        print(f"   Order result: {result}")
-        
-        # 🔒 验证止损单确实设置成功
-        import time
-        time.sleep(1)  # 等待订单上链
-        verify_stop = get_current_stop_order(coin, is_long)
-        if verify_stop:
-            print(f"   ✅ VERIFIED: Stop order active @ ${verify_stop['trigger_price']:,.2f}")
-            pos_state["last_stop_price"] = verify_stop['trigger_price']
-            pos_state["verified"] = True
-        else:
-            print(f"   ⚠️ WARNING: Stop order NOT FOUND after placement!")
-            print(f"   ⚠️ MANUAL CHECK REQUIRED!")
-            pos_state["verified"] = False
-            # 返回错误状态
-            return {
-                "action": "error",
-                "coin": coin,
-                "error": "Stop order not verified after placement",
-                "result": result
-            }
-        
-        return {
-            "action": "updated",
-            "coin": coin,
-            "old_stop": current_stop_price,
-            "new_stop": verify_stop['trigger_price'],
-            "high_water_mark": high_water_mark,
-            "trailing_active": trailing_active,
-            "verified": True,
-            "result": result
-        }
-    else:
+
+    if not should_update:
         # 已有止损单，无需更新
         return {
             "action": "no_change",
             "coin": coin,
             "current_stop": current_stop_price,
             "calculated_stop": new_stop,
-            "high_water_mark": high_water_mark,
+            "high_water_mark": pos_state["high_water_mark"],
             "trailing_active": trailing_active,
             "gain_pct": gain_pct * 100
         }
 
-def main():
-    """主函数：检查所有持仓的移动止损"""
-    print(f"\n{'='*50}")
-    print(f"🔄 Trailing Stop Check - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"{'='*50}\n")
-    
-    positions = get_positions()
-    
+    try:
+        if current_stop:
+            # 已有止损单：原子改单，中间不会出现没有止损的空窗
+            print(f"✅ Moving stop ${current_stop_price:,.2f} → ${new_stop:,.2f}")
+            result = modify_stop_loss(coin, current_stop["oid"], position["size"], new_stop, is_long,
+                                      current_price=current_price)
+        else:
+            print(f"✅ Setting new stop @ ${new_stop:,.2f}")
+            result = place_stop_loss(coin, position["size"], new_stop, is_long, current_price=current_price)
+    except Exception as e:
+        result = {"status": "err", "response": str(e)}
+    print(f"   Order result: {result}")
+
+    # 🔒 验证止损单确实设置成功
+    verified_price = confirm_stop_order(info, result, coin, is_long, new_stop)
+    if verified_price is None:
+        print(f"   ⚠️ WARNING: Stop order NOT CONFIRMED after placement!")
+        print(f"   ⚠️ MANUAL CHECK REQUIRED!")
+        pos_state["verified"] = False
+        # 返回错误状态
+        return {
+            "action": "error",
+            "coin": coin,
+            "error": "Stop order not verified after placement",
+            "high_water_mark": pos_state["high_water_mark"],
+            "trailing_active": trailing_active,
+            "result": result
+        }
+
+    print(f"   ✅ VERIFIED: Stop order active @ ${verified_price:,.2f}")
+    pos_state["last_stop_price"] = verified_price
+    pos_state["verified"] = True
+    return {
+        "action": "updated",
+        "coin": coin,
+        "old_stop": current_stop_price,
+        "new_stop": verified_price,
+        "high_water_mark": pos_state["high_water_mark"],
+        "trailing_active": trailing_active,
+        "verified": True,
+        "result": result
+    }
+
+def run_tick(info, state: dict) -> List[str]:
+    """一轮检查：取一份快照，逐个持仓计算，返回告警列表"""
+    snapshot = take_snapshot(info)
+    positions = snapshot["positions"]
+
+    # 已平仓的币种清掉状态，下次开仓重新计高水位
+    for coin in [c for c in state if c not in {p["coin"] for p in positions}]:
+        del state[coin]
+
     if not positions:
         print("📭 No open positions")
-        return
-    
-    state = load_state()
+        save_state(state)
+        return []
+
     alerts = []  # 收集需要告警的问题
-    
+
     for pos in positions:
         coin = pos["coin"]
-        current_price = get_market_price(coin)
         print(f"\n📊 {coin} {'LONG' if pos['is_long'] else 'SHORT'}")
         print(f"   Entry: ${pos['entry_price']:,.2f}")
         print(f"   Size: {pos['size']}")
-        print(f"   Current: ${current_price:,.2f}")
+        print(f"   Current: ${snapshot['mids'].get(coin, 0.0):,.2f}")
         print(f"   P&L: ${pos['unrealized_pnl']:,.2f}")
-        
+
         # 🔒 首先检查是否有止损单存在
-        existing_stop = get_current_stop_order(coin, pos['is_long'])
+        existing_stop = get_current_stop_order(coin, pos['is_long'], snapshot["orders"])
         if existing_stop:
             print(f"   🛡️ Stop order active @ ${existing_stop['trigger_price']:,.2f}")
         else:
             print(f"   ⚠️ NO STOP ORDER FOUND!")
             alerts.append(f"⚠️ {coin}: No stop order! Position unprotected!")
-        
-        result = check_and_update_trailing_stop(coin, pos, state)
-        
+
+        if not snapshot["mids"].get(coin):
+            alerts.append(f"❌ {coin}: No mid price, skipped")
+            continue
+
+        result = check_and_update_trailing_stop(info, pos, snapshot, state)
+
         if result["action"] == "updated":
             print(f"   ⬆️ Stop updated: ${result.get('old_stop', 'N/A')} → ${result['new_stop']:,.2f}")
         elif result["action"] == "error":
             print(f"   ❌ ERROR: {result.get('error')}")
             alerts.append(f"❌ {coin}: Stop order failed to set!")
-        elif result["action"] == "no_change":
-            print(f"   ✓ Stop unchanged @ ${result['current_stop']:,.2f}")
         else:
-            print(f"   ⏳ Trailing inactive (need {result['activation_threshold']:.0f}% gain, have {result['gain_pct']:.1f}%)")
-        
-        state[coin] = state.get(coin, {})
+            print(f"   ✓ Stop unchanged @ ${result['current_stop']:,.2f} "
+                  f"(trailing {'on' if result['trailing_active'] else 'off'}, gain {result['gain_pct']:.1f}%)")
+
         state[coin].update({
-            "entry_price": pos["entry_price"],
-            "high_water_mark": result.get("high_water_mark", pos["entry_price"]),
-            "trailing_active": result["action"] not in ["inactive", "error"],
             "last_check": datetime.now().isoformat(),
             "has_stop": existing_stop is not None or result["action"] == "updated"
         })
-    
+
     save_state(state)
-    
-    # 输出告警
+    return alerts
+
+def print_alerts(alerts: List[str]):
     if alerts:
         print(f"\n{'!'*50}")
         print("⚠️ ALERTS:")
         for alert in alerts:
             print(f"   {alert}")
         print(f"{'!'*50}")
-    
+
+def serve_forever(interval: float = TICK_INTERVAL):
+    """常驻模式：复用一个 Info 连接，每 interval 秒检查一次；单轮出错不退出"""
+    info = create_info()
+    state = load_state()
+    print(f"🔄 Trailing stop service started, interval {interval}s")
+    while True:
+        started = time.monotonic()
+        print(f"\n{'='*50}\n🔄 Trailing Stop Tick - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            print_alerts(run_tick(info, state))
+        except Exception as e:
+            print(f"❌ Tick failed: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+def main():
+    """主函数：检查所有持仓的移动止损"""
+    parser = argparse.ArgumentParser(description="Trailing stop manager")
+    parser.add_argument("--serve", action="store_true", help="常驻运行，定时检查")
+    parser.add_argument("--interval", type=float, default=TICK_INTERVAL, help="常驻模式检查间隔（秒）")
+    args = parser.parse_args()
+
+    if args.serve:
+        # pm2 下 stdout 不是终端，按行刷新
+        sys.stdout.reconfigure(line_buffering=True)
+        serve_forever(args.interval)
+        return []
+
+    print(f"\n{'='*50}")
+    print(f"🔄 Trailing Stop Check - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*50}\n")
+
+    alerts = run_tick(create_info(), load_state())
+    print_alerts(alerts)
+
     print(f"\n{'='*50}\n")
-    
+
     return alerts  # 返回告警列表供外部使用
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+全市场扫描 — 一次 metaAndAssetCtxs 预筛 + 批量拉K线 + 二维向量化指标
+
+流程:
+1. fetch_universe: 一次 metaAndAssetCtxs 请求拿到全部永续合约的 24h 成交额和持仓量，按流动性预筛
+2. fetch_candles_bulk: 有界线程池并发拉取幸存币种的K线
+3. stack_klines: 相同长度的K线堆成 (币种 × K线) 矩阵
+4. *_2d 指标: 沿时间轴计算，一次覆盖全部币种；与 auto_trader_nostalgia_for_infinity 里的逐币种实现口径一致
+
+依赖 numpy（只有开启全市场扫描时才会导入本模块）。
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("Universe")
+
+UNIVERSE_DEFAULTS = {
+    "min_day_volume_usd": 5_000_000,   # 24h 名义成交额下限
+    "min_open_interest_usd": 2_000_000,  # 持仓量（按标记价折算 USD）下限
+    "max_symbols": 150,                # 预筛后最多保留多少个币种（按成交额排序）
+    "fetch_workers": 8,                # 并发拉K线的线程数（注意交易所的请求权重限制）
+    "max_signals": 5,                  # 每轮最多交给下单流程的信号数
+}
+
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def fetch_universe(info, min_day_volume_usd: float, min_open_interest_usd: float,
+                   max_symbols: int) -> List[str]:
+    """按 24h 成交额 / 持仓量预筛永续合约，返回按成交额从高到低排序的币种"""
+    meta, ctxs = info.meta_and_asset_ctxs()
+    rows = []
+    for asset, ctx in zip(meta.get("universe", []), ctxs):
+        if asset.get("isDelisted"):
+            continue
+        try:
+            volume = float(ctx.get("dayNtlVlm") or 0)
+            mark = float(ctx.get("markPx") or ctx.get("oraclePx") or 0)
+            open_interest = float(ctx.get("openInterest") or 0) * mark
+        except (TypeError, ValueError):
+            continue
+        if volume >= min_day_volume_usd and open_interest >= min_open_interest_usd:
+            rows.append((volume, asset["name"]))
+    rows.sort(reverse=True)
+    return [name for _, name in rows[:max_symbols]]
+
+
+def fetch_candles_bulk(fetch: Callable[[str], List[Dict]], symbols: Iterable[str],
+                       workers: int) -> Dict[str, List[Dict]]:
+    """有界线程池并发拉K线；拉取失败或为空的币种直接丢弃"""
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(symbols)))) as pool:
+        results = list(pool.map(fetch, symbols))
+    return {s: k for s, k in zip(symbols, results) if k}
+
+
+def stack_klines(klines_by_symbol: Dict[str, List[Dict]],
+                 min_bars: int) -> List[Tuple[List[str], Dict[str, np.ndarray]]]:
+    """按K线数量分组堆成矩阵，返回 [(币种列表, {open/high/low/close/volume: (币种 × K线)})]
+
+    EMA/RSI 的结果依赖起点，不同长度不做截断对齐，保证和逐币种计算一致
+    """
+    groups: Dict[int, List[str]] = {}
+    for symbol, klines in klines_by_symbol.items():
+        if len(klines) >= min_bars:
+            groups.setdefault(len(klines), []).append(symbol)
+
+    batches = []
+    for _, symbols in sorted(groups.items()):
+        arrays = {
+            field: np.array([[k[field] for k in klines_by_symbol[s]] for s in symbols], dtype=float)
+            for field in OHLCV_FIELDS
+        }
+        batches.append((symbols, arrays))
+    return batches
+
+
+def ema_2d(values: np.ndarray, period: int) -> np.ndarray:
+    multiplier = 2 / (period + 1)
+    out = np.empty_like(values)
+    out[:, 0] = values[:, 0]
+    for j in range(1, values.shape[1]):
+        out[:, j] = values[:, j] * multiplier + out[:, j - 1] * (1 - multiplier)
+    return out
+
+
+def sma_2d(values: np.ndarray, period: int) -> np.ndarray:
+    """前 period-1 根按已有数量求均值，与逐币种 sma 一致"""
+    csum = np.cumsum(values, axis=1)
+    out = np.empty_like(values)
+    head = min(period, values.shape[1])
+    out[:, :head] = csum[:, :head] / np.arange(1, head + 1)
+    if values.shape[1] > period:
+        out[:, period:] = (csum[:, period:] - csum[:, :-period]) / period
+    return out
+
+
+def rolling_std_2d(values: np.ndarray, period: int) -> np.ndarray:
+    """总体标准差，前 period-1 根使用已有窗口"""
+    mean = sma_2d(values, period)
+    mean_sq = sma_2d(values * values, period)
+    return np.sqrt(np.clip(mean_sq - mean * mean, 0.0, None))
+
+
+def bollinger_bands_2d(values: np.ndarray, period: int,
+                       std_mult: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    mid = sma_2d(values, period)
+    std = rolling_std_2d(values, period)
+    return mid, mid + std_mult * std, mid - std_mult * std
+
+
+def rsi_wilder_2d(values: np.ndarray, period: int) -> np.ndarray:
+    out = np.full_like(values, 50.0)
+    changes = np.diff(values, axis=1)
+    if changes.shape[1] < period:
+        return out
+    gains = np.clip(changes, 0.0, None)
+    losses = np.clip(-changes, 0.0, None)
+    avg_gain = gains[:, :period].mean(axis=1)
+    avg_loss = losses[:, :period].mean(axis=1)
+
+    for i in range(period, changes.shape[1]):
+        avg_gain = (avg_gain * (period - 1) + gains[:, i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[:, i]) / period
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        out[:, i + 1] = np.where(avg_loss == 0, 100.0, rsi)
+    return out
+
+
+def atr_wilder_2d(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int) -> np.ndarray:
+    out = np.zeros_like(closes)
+    if closes.shape[1] < 2:
+        return out
+    prev_close = closes[:, :-1]
+    tr = np.maximum.reduce([
+        highs[:, 1:] - lows[:, 1:],
+        np.abs(highs[:, 1:] - prev_close),
+        np.abs(lows[:, 1:] - prev_close),
+    ])
+    running = np.zeros(closes.shape[0])
+    for i in range(1, closes.shape[1]):
+        if i <= period:
+            running += tr[:, i - 1]
+            out[:, i] = running / i
+        else:
+            out[:, i] = (out[:, i - 1] * (period - 1) + tr[:, i - 1]) / period
+    return out
@@ -8,16 +8,23 @@
   python backtest.py --profile baseline        # 原始参数
   python backtest.py --profile balanced        # 收益平衡参数 (旧 --optimized)
   python backtest.py --profile win_rate        # 胜率优先参数
+  TRADING_PROFILE=cpu python backtest.py       # cProfile 剖析 run_backtest（--profile 已用于策略档位）
 
 注意: Hyperliquid API 仅保留约 5000 根 1h K 线（约 7 个月），
 无法获取更早的数据。默认回测 2025-08-01 ~ 2026-02-20。
 """
 
 import argparse
+import sys
 import requests
 from datetime import datetime
+from pathlib import Path
 from typing import List, Dict, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import profiling  # noqa: E402
+import synthetic_market  # noqa: E402
+
 # ============== 配置 ==============
 INITIAL_CAPITAL = 100.0  # USDC
 TAKER_FEE = 0.00035
@@ -189,6 +196,7 @@ def fetch_historical_klines(symbol: str, start_date: datetime, end_date: datetim
     return unique
 
 
+@profiling.profiled()
 def run_backtest(
     klines: List[Dict],
     symbol: str = "BTC",
@@ -391,6 +399,7 @@ def main():
     parser.add_argument("--symbol", default="BTC", help="回测币种，如 BTC / ETH")
     parser.add_argument("--start-date", default="2025-08-01", help="起始日期 YYYY-MM-DD")
     parser.add_argument("--end-date", default="2026-02-20", help="结束日期 YYYY-MM-DD")
+    synthetic_market.add_argument(parser)
     args = parser.parse_args()
 
     symbol = args.symbol.upper().strip()
@@ -420,7 +429,10 @@ def main():
     print("=" * 60)
 
     print(f"\n正在获取 {start_date.date()} ~ {end_date.date()} 的历史数据...")
-    klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
+    if args.synthetic is not None:
+        klines = synthetic_market.fetch_historical_klines(symbol, start_date, end_date, "1h", args.synthetic)
+    else:
+        klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
 
     if len(klines) < 60:
         print(f"错误: 仅获取到 {len(klines)} 根 K 线，需要至少 60 根")
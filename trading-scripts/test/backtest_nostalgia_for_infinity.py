@@ -12,11 +12,17 @@ NostalgiaForInfinity 风格策略专用回测脚本（独立文件）。
 """
 
 import argparse
+import sys
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Tuple
 
 import requests
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import profiling  # noqa: E402
+import synthetic_market  # noqa: E402
+
 INITIAL_CAPITAL = 100.0
 TAKER_FEE = 0.00035
 MIN_PROFIT_AFTER_FEE = 0.005
@@ -295,6 +301,37 @@ def max_drawdown(equity_curve: List[float]) -> float:
     return mdd * 100.0
 
 
+# 决定指标数组的参数；这些参数相同时 indicator_arrays 的结果可以在多次回测间复用
+INDICATOR_PARAMS = ("ema_fast", "ema_trend", "ema_long", "rsi_fast", "rsi_main", "atr_period", "bb_period",
+                    "bb_stddev", "volume_sma_period")
+
+
+def indicator_arrays(klines: List[Dict], params: Dict) -> Dict[str, List[float]]:
+    """K线列和指标（只取决于 INDICATOR_PARAMS），参数扫描时同一段K线只算一次"""
+    closes = [k["close"] for k in klines]
+    highs = [k["high"] for k in klines]
+    lows = [k["low"] for k in klines]
+    volumes = [k["volume"] for k in klines]
+    _, bb_upper, bb_lower = bollinger_bands(closes, int(params["bb_period"]), float(params["bb_stddev"]))
+    return {
+        "timestamp": [k["timestamp"] for k in klines],
+        "close": closes,
+        "high": highs,
+        "low": lows,
+        "volume": volumes,
+        "ema_fast": ema(closes, int(params["ema_fast"])),
+        "ema_trend": ema(closes, int(params["ema_trend"])),
+        "ema_long": ema(closes, int(params["ema_long"])),
+        "rsi_fast": rsi_wilder(closes, int(params["rsi_fast"])),
+        "rsi_main": rsi_wilder(closes, int(params["rsi_main"])),
+        "atr": atr_wilder(highs, lows, closes, int(params["atr_period"])),
+        "bb_upper": bb_upper,
+        "bb_lower": bb_lower,
+        "volume_sma": sma(volumes, int(params["volume_sma_period"])),
+    }
+
+
+@profiling.profiled()
 def run_backtest(
     klines: List[Dict],
     symbol: str = "BTC",
@@ -304,27 +341,33 @@ def run_backtest(
     allow_long: bool = True,
     allow_short: bool = True,
     params_override: Dict[str, float] = None,
+    arrays: Dict = None,
 ) -> Dict:
+    """arrays: 预先算好的 indicator_arrays（可以是共享内存视图），调用方保证 INDICATOR_PARAMS 一致"""
     params = resolve_nfi_params(symbol)
     if params_override:
         params.update(params_override)
     warmup = int(max(params["ema_long"], params["volume_sma_period"], params["bb_period"]) + 5)
-    if len(klines) < warmup + 1:
+    count = len(arrays["close"]) if arrays is not None else len(klines)
+    if count < warmup + 1:
         return {"error": f"数据不足，至少需要 {warmup + 1} 根 K 线"}
-
-    closes = [k["close"] for k in klines]
-    highs = [k["high"] for k in klines]
-    lows = [k["low"] for k in klines]
-    volumes = [k["volume"] for k in klines]
-
-    ema_fast = ema(closes, int(params["ema_fast"]))
-    ema_trend = ema(closes, int(params["ema_trend"]))
-    ema_long = ema(closes, int(params["ema_long"]))
-    rsi_fast = rsi_wilder(closes, int(params["rsi_fast"]))
-    rsi_main = rsi_wilder(closes, int(params["rsi_main"]))
-    atr_vals = atr_wilder(highs, lows, closes, int(params["atr_period"]))
-    _, bb_upper, bb_lower = bollinger_bands(closes, int(params["bb_period"]), float(params["bb_stddev"]))
-    volume_sma = sma(volumes, int(params["volume_sma_period"]))
+    if arrays is None:
+        arrays = indicator_arrays(klines, params)
+
+    timestamps = arrays["timestamp"]
+    closes = arrays["close"]
+    highs = arrays["high"]
+    lows = arrays["low"]
+    volumes = arrays["volume"]
+    ema_fast = arrays["ema_fast"]
+    ema_trend = arrays["ema_trend"]
+    ema_long = arrays["ema_long"]
+    rsi_fast = arrays["rsi_fast"]
+    rsi_main = arrays["rsi_main"]
+    atr_vals = arrays["atr"]
+    bb_upper = arrays["bb_upper"]
+    bb_lower = arrays["bb_lower"]
+    volume_sma = arrays["volume_sma"]
 
     balance = initial_capital
     equity_curve = [balance]
@@ -339,12 +382,11 @@ def run_backtest(
     entry_idx = -1
     cooldown_until = -1
 
-    for i in range(warmup, len(klines)):
-        k = klines[i]
-        ts = k["timestamp"]
-        h = k["high"]
-        l = k["low"]
-        c = k["close"]
+    for i in range(warmup, count):
+        ts = timestamps[i]
+        h = highs[i]
+        l = lows[i]
+        c = closes[i]
 
         if has_position:
             exit_type = None
@@ -505,7 +547,7 @@ def run_backtest(
         equity_curve.append(balance)
 
     if has_position:
-        last_price = klines[-1]["close"]
+        last_price = closes[-1]
         if position_side == "LONG":
             pnl_pct = (last_price - entry_price) / entry_price
         else:
@@ -521,9 +563,9 @@ def run_backtest(
                 "pnl": pnl,
                 "balance": balance,
                 "entry_idx": entry_idx,
-                "exit_idx": len(klines) - 1,
+                "exit_idx": count - 1,
                 "exit": "CLOSE_END",
-                "timestamp": klines[-1]["timestamp"],
+                "timestamp": timestamps[-1],
             }
         )
         equity_curve.append(balance)
@@ -558,7 +600,10 @@ def main() -> None:
     parser.add_argument("--initial-capital", type=float, default=INITIAL_CAPITAL, help="初始资金 USDC")
     parser.add_argument("--long-only", action="store_true", help="仅做多（更接近原版 NFI spot 风格）")
     parser.add_argument("--trade-side", choices=["both", "long_only", "short_only"], default="both", help="交易方向模式")
+    profiling.add_argument(parser)
+    synthetic_market.add_argument(parser)
     args = parser.parse_args()
+    profiling.configure(args.profile)
 
     symbol = args.symbol.upper().strip()
     try:
@@ -590,7 +635,10 @@ def main() -> None:
     print("=" * 70)
 
     print(f"获取数据 {start_date.date()} ~ {end_date.date()} ...")
-    klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
+    if args.synthetic is not None:
+        klines = synthetic_market.fetch_historical_klines(symbol, start_date, end_date, "1h", args.synthetic)
+    else:
+        klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
     if len(klines) < 210:
         print(f"错误: 仅获取到 {len(klines)} 根 K 线，至少需要 210 根")
         return
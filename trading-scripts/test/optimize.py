@@ -3,12 +3,24 @@
 策略参数优化 - 基于历史数据寻找提高胜率和收益的参数组合
 
 用法: python optimize.py --symbol BTC --objective win_rate
+
+指标（EMA9/21/55、ATR14）每段K线只算一次；--workers > 1 时K线列和指标放进共享内存（shared_arrays），
+各进程直接读，参数组合分块并行（walk_forward 所有窗口共用一个进程池）。
 """
 
 import argparse
+import math
+import os
+import sys
 from datetime import datetime
+from pathlib import Path
 from typing import List, Dict, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import profiling  # noqa: E402
+import shared_arrays  # noqa: E402
+import synthetic_market  # noqa: E402
+
 # 复用 backtest 的核心逻辑
 from backtest import (
     ema, atr_array, check_profit_after_fees,
@@ -16,6 +28,26 @@ from backtest import (
 )
 
 
+# 每个并行任务的参数组数 = 总组数 / (进程数 × TASKS_PER_WORKER)
+TASKS_PER_WORKER = 4
+
+
+def indicator_arrays(klines: List[Dict]) -> Dict[str, List[float]]:
+    """回测用到的K线列和指标，与参数无关，同一段K线只算一次"""
+    closes = [k["close"] for k in klines]
+    highs = [k["high"] for k in klines]
+    lows = [k["low"] for k in klines]
+    return {
+        "close": closes,
+        "high": highs,
+        "low": lows,
+        "ema9": ema(closes, 9),
+        "ema21": ema(closes, 21),
+        "ema55": ema(closes, 55),
+        "atr14": atr_array(highs, lows, closes, 14),
+    }
+
+
 def run_backtest_with_params(
     klines: List[Dict],
     stop_loss_atr: float = 2.0,
@@ -24,18 +56,23 @@ def run_backtest_with_params(
     min_ema_spread_pct: float = 0.0,     # EMA9 与 EMA21 最小发散度 %
     long_only: bool = False,              # 只做多
     cooldown: int = 1,
+    arrays: Dict = None,                  # indicator_arrays(klines) 的结果（可以是共享内存视图），给了就不再算
 ) -> Dict:
     """带可调参数的回测"""
-    if len(klines) < 60:
+    if arrays is None:
+        if len(klines) < 60:
+            return {"error": "数据不足"}
+        arrays = indicator_arrays(klines)
+    closes = arrays["close"]
+    if len(closes) < 60:
         return {"error": "数据不足"}
 
-    closes = [k["close"] for k in klines]
-    highs = [k["high"] for k in klines]
-    lows = [k["low"] for k in klines]
-    ema9 = ema(closes, 9)
-    ema21 = ema(closes, 21)
-    ema55 = ema(closes, 55)
-    atr14 = atr_array(highs, lows, closes, 14)
+    highs = arrays["high"]
+    lows = arrays["low"]
+    ema9 = arrays["ema9"]
+    ema21 = arrays["ema21"]
+    ema55 = arrays["ema55"]
+    atr14 = arrays["atr14"]
 
     balance = INITIAL_CAPITAL
     position_side = None
@@ -46,9 +83,8 @@ def run_backtest_with_params(
     cooldown_until = -1
     trades = []
 
-    for i in range(60, len(klines)):
-        k = klines[i]
-        h, l, c = k["high"], k["low"], k["close"]
+    for i in range(60, len(closes)):
+        h, l, c = highs[i], lows[i], closes[i]
         current_atr = atr14[i]
 
         # 检查持仓
@@ -126,7 +162,7 @@ def run_backtest_with_params(
 
     # 平仓
     if position_side is not None:
-        last_c = klines[-1]["close"]
+        last_c = closes[-1]
         pnl_pct = (last_c - entry_price) / entry_price if position_side == "LONG" else (entry_price - last_c) / entry_price
         pnl = position_usd * pnl_pct - position_usd * TAKER_FEE * 2
         balance += pnl
@@ -164,6 +200,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--wf-test-days", type=int, default=21, help="walk_forward 模式测试窗口天数")
     parser.add_argument("--wf-step-days", type=int, default=21, help="walk_forward 模式滚动步长天数")
     parser.add_argument("--wf-min-windows", type=int, default=2, help="walk_forward 至少需要的窗口数量")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行进程数，1=串行")
+    profiling.add_argument(parser)
+    synthetic_market.add_argument(parser)
     return parser.parse_args()
 
 
@@ -196,13 +235,10 @@ def generate_configs() -> List[Tuple[float, float, bool, float, bool, int]]:
     return configs
 
 
-def scan_configs(
-    klines: List[Dict],
-    configs: List[Tuple[float, float, bool, float, bool, int]],
-) -> List[Dict]:
+def _scan(arrays: Dict, configs: List[Tuple[float, float, bool, float, bool, int]]) -> List[Dict]:
     results: List[Dict] = []
     for sl, tp, pf, spread, lo, cd in configs:
-        r = run_backtest_with_params(klines, sl, tp, pf, spread, lo, cd)
+        r = run_backtest_with_params([], sl, tp, pf, spread, lo, cd, arrays=arrays)
         if "error" in r:
             continue
         item = {
@@ -220,6 +256,39 @@ def scan_configs(
     return results
 
 
+def _scan_task(task: Tuple[str, List]) -> List[Dict]:
+    """子进程: 在共享内存里的第 N 段K线上跑一块参数组"""
+    table, configs = task
+    return _scan(shared_arrays.tables()[table], configs)
+
+
+@profiling.profiled("scan_configs")
+def scan_windows(
+    segments: List[List[Dict]],
+    configs: List[Tuple[float, float, bool, float, bool, int]],
+    workers: int = 1,
+) -> List[List[Dict]]:
+    """每段K线各扫一遍全部参数组，返回每段的结果；多段共用一个进程池"""
+    arrays = [indicator_arrays(klines) if len(klines) >= 60 else None for klines in segments]
+    if workers <= 1:
+        return [_scan(a, configs) if a is not None else [] for a in arrays]
+
+    size = max(1, math.ceil(len(configs) * len(segments) / (workers * TASKS_PER_WORKER)))
+    chunks = [configs[i:i + size] for i in range(0, len(configs), size)]
+    tasks = [(str(n), chunk) for n, a in enumerate(arrays) if a is not None for chunk in chunks]
+    with shared_arrays.SharedArrays({str(n): a for n, a in enumerate(arrays) if a is not None}) as shared:
+        outputs = iter(shared_arrays.map_tasks(_scan_task, tasks, shared, workers))
+        return [[item for _ in chunks for item in next(outputs)] if a is not None else [] for a in arrays]
+
+
+def scan_configs(
+    klines: List[Dict],
+    configs: List[Tuple[float, float, bool, float, bool, int]],
+    workers: int = 1,
+) -> List[Dict]:
+    return scan_windows([klines], configs, workers)[0]
+
+
 def pick_stable_candidate(candidates: List[Dict], min_test_trades: int = 8) -> Dict:
     # 稳健优先：训练和测试都为正收益，其次最大化两者较小值
     valid = [c for c in candidates if c["test"]["trades"] >= min_test_trades]
@@ -249,6 +318,7 @@ def pick_stable_candidate(candidates: List[Dict], min_test_trades: int = 8) -> D
 
 def evaluate_on_test(top_candidates: List[Dict], test_klines: List[Dict]) -> List[Dict]:
     merged_candidates: List[Dict] = []
+    arrays = indicator_arrays(test_klines) if len(test_klines) >= 60 else None
     for item in top_candidates:
         test_r = run_backtest_with_params(
             test_klines,
@@ -258,6 +328,7 @@ def evaluate_on_test(top_candidates: List[Dict], test_klines: List[Dict]) -> Lis
             min_ema_spread_pct=item["ema_spread"],
             long_only=item["long_only"],
             cooldown=item["cooldown"],
+            arrays=arrays,
         )
         if "error" in test_r:
             continue
@@ -312,6 +383,13 @@ def config_key(item: Dict) -> Tuple[float, float, bool, float, bool, int]:
 
 def main():
     args = parse_args()
+    profiling.configure(args.profile)
+    # walk_forward 的窗口循环写在 optimize 里，整个模式作为一个剖析区间
+    with profiling.section(f"optimize:{args.mode}"):
+        optimize(args)
+
+
+def optimize(args: argparse.Namespace) -> None:
     symbol = args.symbol.upper().strip()
     try:
         start_date = datetime.strptime(args.start_date, "%Y-%m-%d")
@@ -329,7 +407,10 @@ def main():
     print("=" * 70)
 
     print(f"\n获取数据 {start_date.date()} ~ {end_date.date()}...")
-    klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
+    if args.synthetic is not None:
+        klines = synthetic_market.fetch_historical_klines(symbol, start_date, end_date, "1h", args.synthetic)
+    else:
+        klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
     if len(klines) < 60:
         print("数据不足")
         return
@@ -339,7 +420,7 @@ def main():
     print(f"正在扫描 {len(configs)} 组参数...")
 
     if args.mode == "single":
-        results = scan_configs(klines, configs)
+        results = scan_configs(klines, configs, args.workers)
 
         filtered = [r for r in results if r["trades"] >= args.min_trades]
         if not filtered:
@@ -415,7 +496,7 @@ def main():
             f"测试集: {test_start.date()} ~ {test_end.date()} ({len(test_klines)} 根)"
         )
 
-        train_results = scan_configs(train_klines, configs)
+        train_results = scan_configs(train_klines, configs, args.workers)
         train_filtered = [r for r in train_results if r["trades"] >= args.min_trades]
         if not train_filtered:
             print(f"训练集没有满足最少交易数 >= {args.min_trades} 的配置，请调小 --min-trades")
@@ -500,7 +581,9 @@ def main():
         window_results: List[Dict] = []
         candidate_pool: Dict[Tuple[float, float, bool, float, bool, int], Dict] = {}
 
-        for window in windows:
+        # 所有窗口的训练集一次并行扫完，下面按窗口顺序挑候选、测试
+        window_scans = scan_windows([w["train"] for w in windows], configs, args.workers)
+        for window, train_results in zip(windows, window_scans):
             train_klines = window["train"]
             test_klines = window["test"]
             train_start = datetime.fromtimestamp(train_klines[0]["timestamp"] / 1000)
@@ -508,7 +591,6 @@ def main():
             test_start = datetime.fromtimestamp(test_klines[0]["timestamp"] / 1000)
             test_end = datetime.fromtimestamp(test_klines[-1]["timestamp"] / 1000)
 
-            train_results = scan_configs(train_klines, configs)
             train_filtered = [r for r in train_results if r["trades"] >= args.min_trades]
             if not train_filtered:
                 print(
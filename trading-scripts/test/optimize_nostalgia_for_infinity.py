@@ -11,18 +11,35 @@ NFI 专用参数优化（独立文件）
   python trading-scripts/test/optimize_nostalgia_for_infinity.py --symbol BTC
   python trading-scripts/test/optimize_nostalgia_for_infinity.py --symbol ETH --objective return
   python trading-scripts/test/optimize_nostalgia_for_infinity.py --mode single --symbol BTC
+  python trading-scripts/test/optimize_nostalgia_for_infinity.py --workers 8
+
+指标每段K线只算一次（扫描的参数不影响指标）；--workers > 1 时各窗口的K线列和指标放进共享内存（shared_arrays），
+所有窗口共用一个进程池。
 """
 
 import argparse
+import math
+import os
+import sys
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import profiling  # noqa: E402
+import shared_arrays  # noqa: E402
+import synthetic_market  # noqa: E402
+
 from backtest_nostalgia_for_infinity import (
     fetch_historical_klines,
+    indicator_arrays,
     resolve_nfi_params,
     run_backtest,
 )
 
+# 每个并行任务的参数组数 = 总组数 / (进程数 × TASKS_PER_WORKER)
+TASKS_PER_WORKER = 4
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="NFI short_only 参数优化")
@@ -38,6 +55,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--wf-test-days", type=int, default=21, help="walk-forward 测试窗口天数")
     parser.add_argument("--wf-step-days", type=int, default=21, help="walk-forward 步长天数")
     parser.add_argument("--wf-min-windows", type=int, default=3, help="walk-forward 最小有效窗口数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行进程数，1=串行")
+    profiling.add_argument(parser)
+    synthetic_market.add_argument(parser)
     return parser.parse_args()
 
 
@@ -89,7 +109,7 @@ def ranking_key(item: Dict, objective: str) -> Tuple[float, float, float]:
     return item["return_pct"], item["win_rate"], -item["max_drawdown_pct"]
 
 
-def run_with_cfg(klines: List[Dict], symbol: str, cfg: Dict) -> Dict:
+def run_with_cfg(klines: List[Dict], symbol: str, cfg: Dict, arrays: Dict = None) -> Dict:
     overrides = {
         "enable_short": True,
         "stop_loss_atr_mult": float(cfg["sl"]),
@@ -105,6 +125,7 @@ def run_with_cfg(klines: List[Dict], symbol: str, cfg: Dict) -> Dict:
         allow_long=False,
         allow_short=True,
         params_override=overrides,
+        arrays=arrays,
     )
     if "error" in r:
         return r
@@ -117,10 +138,10 @@ def run_with_cfg(klines: List[Dict], symbol: str, cfg: Dict) -> Dict:
     }
 
 
-def scan_configs(klines: List[Dict], symbol: str, configs: List[Dict]) -> List[Dict]:
+def _scan(arrays: Dict, symbol: str, configs: List[Dict]) -> List[Dict]:
     out: List[Dict] = []
     for cfg in configs:
-        r = run_with_cfg(klines, symbol, cfg)
+        r = run_with_cfg([], symbol, cfg, arrays)
         if "error" in r:
             continue
         item = dict(cfg)
@@ -129,10 +150,37 @@ def scan_configs(klines: List[Dict], symbol: str, configs: List[Dict]) -> List[D
     return out
 
 
-def evaluate_on_test(symbol: str, top_candidates: List[Dict], test_klines: List[Dict]) -> List[Dict]:
+def _scan_task(task: Tuple[str, str, List[Dict]]) -> List[Dict]:
+    """子进程: 在共享内存里的第 N 段K线上跑一块参数组"""
+    table, symbol, configs = task
+    return _scan(shared_arrays.tables()[table], symbol, configs)
+
+
+@profiling.profiled("scan_configs")
+def scan_windows(segments: List[List[Dict]], symbol: str, configs: List[Dict], workers: int = 1) -> List[List[Dict]]:
+    """每段K线各扫一遍全部参数组，返回每段的结果；多段共用一个进程池"""
+    params = resolve_nfi_params(symbol)
+    arrays = [indicator_arrays(klines, params) if klines else None for klines in segments]
+    if workers <= 1:
+        return [_scan(a, symbol, configs) if a is not None else [] for a in arrays]
+
+    size = max(1, math.ceil(len(configs) * len(segments) / (workers * TASKS_PER_WORKER)))
+    chunks = [configs[i:i + size] for i in range(0, len(configs), size)]
+    tasks = [(str(n), symbol, chunk) for n, a in enumerate(arrays) if a is not None for chunk in chunks]
+    with shared_arrays.SharedArrays({str(n): a for n, a in enumerate(arrays) if a is not None}) as shared:
+        outputs = iter(shared_arrays.map_tasks(_scan_task, tasks, shared, workers))
+        return [[item for _ in chunks for item in next(outputs)] if a is not None else [] for a in arrays]
+
+
+def scan_configs(klines: List[Dict], symbol: str, configs: List[Dict], workers: int = 1) -> List[Dict]:
+    return scan_windows([klines], symbol, configs, workers)[0]
+
+
+def evaluate_on_test(symbol: str, top_candidates: List[Dict], test_klines: List[Dict],
+                     arrays: Dict = None) -> List[Dict]:
     merged: List[Dict] = []
     for c in top_candidates:
-        test_r = run_with_cfg(test_klines, symbol, c)
+        test_r = run_with_cfg(test_klines, symbol, c, arrays)
         if "error" in test_r:
             continue
         merged.append(
@@ -212,7 +260,7 @@ def split_walk_forward_windows(
 
 
 def print_single_mode(symbol: str, klines: List[Dict], configs: List[Dict], args: argparse.Namespace) -> None:
-    results = scan_configs(klines, symbol, configs)
+    results = scan_configs(klines, symbol, configs, args.workers)
     filtered = [r for r in results if r["trades"] >= args.min_trades]
     if not filtered:
         print(f"没有满足最少交易数 >= {args.min_trades} 的配置")
@@ -246,6 +294,7 @@ def print_single_mode(symbol: str, klines: List[Dict], configs: List[Dict], args
     )
 
 
+@profiling.profiled("walk_forward")
 def print_walk_forward_mode(symbol: str, klines: List[Dict], configs: List[Dict], args: argparse.Namespace) -> None:
     train_bars = args.wf_train_days * 24
     test_bars = args.wf_test_days * 24
@@ -274,10 +323,12 @@ def print_walk_forward_mode(symbol: str, klines: List[Dict], configs: List[Dict]
     }
     candidate_pool[cfg_key(baseline_cfg)] = baseline_cfg
 
-    for w in windows:
+    # 所有窗口的训练集一次并行扫完，下面按窗口顺序挑候选、测试
+    window_scans = scan_windows([w["train"] for w in windows], symbol, configs, args.workers)
+    for w, train_results in zip(windows, window_scans):
         train_klines = w["train"]
         test_klines = w["test"]
-        train_results = scan_configs(train_klines, symbol, configs)
+        test_arrays = indicator_arrays(test_klines, base)
         train_filtered = [r for r in train_results if r["trades"] >= args.min_trades]
         if not train_filtered:
             continue
@@ -287,7 +338,7 @@ def print_walk_forward_mode(symbol: str, klines: List[Dict], configs: List[Dict]
         for c in top_candidates:
             candidate_pool[cfg_key(c)] = c
 
-        merged = evaluate_on_test(symbol, top_candidates, test_klines)
+        merged = evaluate_on_test(symbol, top_candidates, test_klines, test_arrays)
         if not merged:
             continue
 
@@ -304,6 +355,7 @@ def print_walk_forward_mode(symbol: str, klines: List[Dict], configs: List[Dict]
                 "test_start": test_start,
                 "test_end": test_end,
                 "test_klines": test_klines,
+                "test_arrays": test_arrays,
                 "stable_best": stable_best,
             }
         )
@@ -413,7 +465,7 @@ def print_walk_forward_mode(symbol: str, klines: List[Dict], configs: List[Dict]
     baseline_test_dds: List[float] = []
     baseline_test_trades: List[float] = []
     for w in window_results:
-        br = run_with_cfg(w["test_klines"], symbol, baseline_cfg)
+        br = run_with_cfg(w["test_klines"], symbol, baseline_cfg, w["test_arrays"])
         if "error" in br:
             continue
         baseline_test_returns.append(br["return_pct"])
@@ -441,7 +493,7 @@ def print_walk_forward_mode(symbol: str, klines: List[Dict], configs: List[Dict]
         test_dds: List[float] = []
         test_trades: List[float] = []
         for w in window_results:
-            r = run_with_cfg(w["test_klines"], symbol, c)
+            r = run_with_cfg(w["test_klines"], symbol, c, w["test_arrays"])
             if "error" in r:
                 break
             test_returns.append(r["return_pct"])
@@ -566,6 +618,7 @@ def print_walk_forward_mode(symbol: str, klines: List[Dict], configs: List[Dict]
 
 def main() -> None:
     args = parse_args()
+    profiling.configure(args.profile)
     symbol = args.symbol.upper().strip()
     try:
         start_date = datetime.strptime(args.start_date, "%Y-%m-%d")
@@ -583,7 +636,10 @@ def main() -> None:
     print("=" * 100)
 
     print(f"\n获取数据 {start_date.date()} ~ {end_date.date()} ...")
-    klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
+    if args.synthetic is not None:
+        klines = synthetic_market.fetch_historical_klines(symbol, start_date, end_date, "1h", args.synthetic)
+    else:
+        klines = fetch_historical_klines(symbol, start_date, end_date, "1h")
     if len(klines) < 260:
         print(f"数据不足，仅 {len(klines)} 根 K 线")
         return
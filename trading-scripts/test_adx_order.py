@@ -8,12 +8,15 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
 
 from eth_account import Account
 from hyperliquid.exchange import Exchange
 from hyperliquid.info import Info
 from hyperliquid.utils import constants
 
+from asset_meta import round_price
+
 def load_config():
     config_path = Path(__file__).parent / "config" / ".hl_config"
     config = {}
@@ -47,8 +50,7 @@ def test_order_cancel():
     mids = info.all_mids()
     current_price = float(mids.get("BTC", 73000))
     # 高价卖单，保证不成交
-    test_price = int(current_price * 2.1)
-    test_price = round(test_price / 10) * 10
+    test_price = round_price(symbol, current_price * 2.1)
     size = 0.0002
     
     print(f"\n1. 准备下单:")
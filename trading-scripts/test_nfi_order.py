@@ -10,12 +10,15 @@ from pathlib import Path
 
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
 
 from eth_account import Account
 from hyperliquid.exchange import Exchange
 from hyperliquid.info import Info
 from hyperliquid.utils import constants
 
+from asset_meta import round_price
+
 # 读取配置文件
 def load_config():
     config_path = Path(__file__).parent / "config" / ".hl_config"
@@ -56,11 +59,8 @@ def test_order_cancel():
     mids = info.all_mids()
     current_price = float(mids.get("BTC", 73000))
     # 价格高110%（卖单，保证不成交）
-    # BTC szDecimals is 5, but price tick is 0.1
-    # Use integer price to avoid tick size issues
-    ridiculous_price = int(current_price * 2.1)
-    # 确保是0.1的倍数
-    ridiculous_price = round(ridiculous_price / 10) * 10
+    # 按 BTC 的价格精度舍入（5位有效数字）
+    ridiculous_price = round_price(symbol, current_price * 2.1)
     # 最小数量
     size = 0.0002
     